@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+分布式智能体进程入口
+
+启动 gRPC 智能体宿主:
+    python agent_worker.py host --address 0.0.0.0:50051
+
+启动 worker，承载指定的智能体类型（不指定时承载全部可用类型）:
+    python agent_worker.py worker --host-address localhost:50051 --agents image_analysis,video_analysis
+
+主题分片（AGENT_TOPIC_SHARDS=image_analysis=2）时，每个 worker 可只承载部分分片，
+增加 worker 进程即可横向扩展同一种智能体:
+    python agent_worker.py worker --agents image_analysis --shards 0
+    python agent_worker.py worker --agents image_analysis --shards 1
+
+API 进程需设置 AGENT_RUNTIME_MODE=grpc 与 AGENT_HOST_ADDRESS 连接同一个宿主
+"""
+import argparse
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.logger import setup_logging, shutdown_logging
+
+logger = logging.getLogger("agent_worker")
+
+
+async def run_host(address: str) -> None:
+    """运行智能体宿主，直到收到 SIGTERM / SIGINT"""
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntimeHost
+
+    host = GrpcWorkerAgentRuntimeHost(address=address)
+    host.start()
+    logger.info("智能体宿主已启动: %s", address)
+    await host.stop_when_signal()
+    logger.info("智能体宿主已停止")
+
+
+async def run_worker(host_address: str, agent_types: list[str], shards: list[int] | None) -> None:
+    """运行 worker，把智能体注册到宿主，直到收到 SIGTERM / SIGINT"""
+    from app.core.agent_factory import get_agent_factory
+    from app.core.distributed import create_worker_runtime, sweep_idle_agents
+    from app.services import coverage_service, project_counter_service, test_plan_stats_service, vector_index_service
+    from app.utils.image_preprocess import shutdown_executor
+
+    factory = get_agent_factory()
+    unknown = [agent_type for agent_type in agent_types if agent_type not in factory.agent_types]
+    if unknown:
+        raise SystemExit(f"未知的智能体类型: {unknown}，可用类型: {factory.agent_types}")
+
+    # 智能体在 worker 内入库用例、应用需求变更，与 API 进程注册相同的监听器
+    vector_index_service.register_listeners()
+    coverage_service.register_listeners()
+    test_plan_stats_service.register_listeners()
+    project_counter_service.register_listeners()
+
+    runtime = await create_worker_runtime(host_address)
+    await factory.register_agents(runtime, agent_types or None, shards=shards)
+    logger.info("worker 已启动: %s", factory.runtime_agent_types)
+
+    sweeper = asyncio.create_task(sweep_idle_agents(runtime, settings.AGENT_SESSION_TIMEOUT))
+    try:
+        await runtime.stop_when_signal()
+    finally:
+        sweeper.cancel()
+        shutdown_executor()
+        vector_index_service.shutdown_executor()
+        # 写入缓冲中尚未合并的覆盖刷新与项目计数增量
+        coverage_service.coverage_refresher.flush()
+        project_counter_service.project_counters.flush()
+    logger.info("worker 已停止")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分布式智能体进程")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    host_parser = subparsers.add_parser("host", help="启动 gRPC 智能体宿主")
+    host_parser.add_argument("--address", default=settings.AGENT_HOST_ADDRESS, help="监听地址")
+
+    worker_parser = subparsers.add_parser("worker", help="启动智能体 worker")
+    worker_parser.add_argument("--host-address", default=settings.AGENT_HOST_ADDRESS, help="智能体宿主地址")
+    worker_parser.add_argument("--agents", default="", help="承载的智能体类型，逗号分隔，默认全部")
+    worker_parser.add_argument("--shards", default="", help="承载的主题分片号，逗号分隔，默认全部")
+
+    args = parser.parse_args()
+    setup_logging()
+    try:
+        if args.command == "host":
+            asyncio.run(run_host(args.address))
+        else:
+            from app.core.distributed import parse_agent_types
+
+            shards = [int(item) for item in parse_agent_types(args.shards)] or None
+            asyncio.run(run_worker(args.host_address, parse_agent_types(args.agents), shards))
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
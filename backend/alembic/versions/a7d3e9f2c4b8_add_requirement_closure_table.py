@@ -0,0 +1,103 @@
+"""Add requirement hierarchy closure table
+
+Revision ID: a7d3e9f2c4b8
+Revises: f1c3b8e6a2d9
+Create Date: 2026-10-19 18:05:12.377105
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9f2c4b8'
+down_revision = 'f1c3b8e6a2d9'
+branch_labels = None
+depends_on = None
+
+
+# 与 app/models/requirement.py 中的触发器函数一致
+REQUIREMENT_CLOSURE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION requirement_closure_maintain() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO requirement_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1 FROM requirement_closure WHERE descendant_id = NEW.parent_id
+        UNION ALL
+        SELECT NEW.id, NEW.id, 0;
+        RETURN NEW;
+    END IF;
+
+    IF NEW.parent_id IS NOT DISTINCT FROM OLD.parent_id THEN
+        RETURN NEW;
+    END IF;
+    IF NEW.parent_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM requirement_closure WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+    ) THEN
+        RAISE EXCEPTION USING
+            ERRCODE = 'check_violation',
+            MESSAGE = 'requirement ' || NEW.id || ' cannot be moved under its descendant ' || NEW.parent_id;
+    END IF;
+
+    -- 断开子树与原祖先的关联，再挂到新父需求的祖先链下
+    DELETE FROM requirement_closure AS link
+    USING requirement_closure AS sub
+    WHERE sub.ancestor_id = NEW.id
+      AND link.descendant_id = sub.descendant_id
+      AND link.ancestor_id NOT IN (SELECT descendant_id FROM requirement_closure WHERE ancestor_id = NEW.id);
+    INSERT INTO requirement_closure (ancestor_id, descendant_id, depth)
+    SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+    FROM requirement_closure AS sup
+    CROSS JOIN requirement_closure AS sub
+    WHERE sup.descendant_id = NEW.parent_id AND sub.ancestor_id = NEW.id;
+    RETURN NEW;
+END
+$$
+"""
+
+# 按现有 parent_id 回填（深度上限防止历史数据中存在环时无限递归）
+BACKFILL_SQL = """
+INSERT INTO requirement_closure (ancestor_id, descendant_id, depth)
+WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+    SELECT id, id, 0 FROM requirements
+    UNION ALL
+    SELECT tree.ancestor_id, child.id, tree.depth + 1
+    FROM tree
+    JOIN requirements AS child ON child.parent_id = tree.descendant_id
+    WHERE tree.depth < 64
+)
+SELECT ancestor_id, descendant_id, min(depth) FROM tree GROUP BY ancestor_id, descendant_id
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'requirement_closure',
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.SmallInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['requirements.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['requirements.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+    )
+    op.create_index('ix_requirement_closure_descendant', 'requirement_closure', ['descendant_id', 'depth'], unique=False)
+    op.execute(BACKFILL_SQL)
+
+    op.execute(REQUIREMENT_CLOSURE_FUNCTION_SQL)
+    op.execute(
+        'CREATE TRIGGER trg_requirements_closure_insert AFTER INSERT ON requirements '
+        'FOR EACH ROW EXECUTE FUNCTION requirement_closure_maintain()'
+    )
+    op.execute(
+        'CREATE TRIGGER trg_requirements_closure_move AFTER UPDATE OF parent_id ON requirements '
+        'FOR EACH ROW EXECUTE FUNCTION requirement_closure_maintain()'
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS trg_requirements_closure_move ON requirements')
+    op.execute('DROP TRIGGER IF EXISTS trg_requirements_closure_insert ON requirements')
+    op.execute('DROP FUNCTION IF EXISTS requirement_closure_maintain()')
+    op.drop_index('ix_requirement_closure_descendant', table_name='requirement_closure')
+    op.drop_table('requirement_closure')
@@ -0,0 +1,55 @@
+"""Add requirement coverage summary table
+
+Revision ID: b3e8f5a1d6c2
+Revises: a7d3e9f2c4b8
+Create Date: 2026-10-19 18:48:31.520947
+
+升级后运行 python maintenance.py coverage 生成已有需求的覆盖汇总
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8f5a1d6c2'
+down_revision = 'a7d3e9f2c4b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'requirement_coverage',
+        sa.Column('requirement_id', sa.Integer(), nullable=False, comment='需求ID'),
+        sa.Column('project_id', sa.Integer(), nullable=False, comment='项目ID'),
+        sa.Column('test_cases', sa.Integer(), nullable=False, comment='有效用例数（不含已废弃）'),
+        sa.Column('approved_cases', sa.Integer(), nullable=False, comment='已批准用例数'),
+        sa.Column('automated_cases', sa.Integer(), nullable=False, comment='自动化用例数'),
+        sa.Column('planned_cases', sa.Integer(), nullable=False, comment='已加入测试计划的用例数'),
+        sa.Column('executed_cases', sa.Integer(), nullable=False, comment='有执行记录的用例数'),
+        sa.Column('passed_cases', sa.Integer(), nullable=False, comment='最近一次执行通过的用例数'),
+        sa.Column('failed_cases', sa.Integer(), nullable=False, comment='最近一次执行失败的用例数'),
+        sa.Column('blocked_cases', sa.Integer(), nullable=False, comment='最近一次执行阻塞的用例数'),
+        sa.Column('flaky_cases', sa.Integer(), nullable=False, comment='近期结果反复变化的用例数'),
+        sa.Column('last_executed_at', sa.DateTime(timezone=True), nullable=True, comment='最近执行时间'),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=True, comment='汇总时间'),
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='更新时间'),
+        sa.Column('is_deleted', sa.Boolean(), nullable=True, comment='是否删除'),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id']),
+        sa.ForeignKeyConstraint(['requirement_id'], ['requirements.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('requirement_id'),
+    )
+    op.create_index(op.f('ix_requirement_coverage_id'), 'requirement_coverage', ['id'], unique=False)
+    op.create_index('ix_requirement_coverage_project_requirement', 'requirement_coverage', ['project_id', 'requirement_id'], unique=False)
+    # 刷新覆盖汇总时按用例取最近的执行记录
+    op.create_index('ix_test_executions_test_case_id_id', 'test_executions', ['test_case_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_test_executions_test_case_id_id', table_name='test_executions')
+    op.drop_index('ix_requirement_coverage_project_requirement', table_name='requirement_coverage')
+    op.drop_index(op.f('ix_requirement_coverage_id'), table_name='requirement_coverage')
+    op.drop_table('requirement_coverage')
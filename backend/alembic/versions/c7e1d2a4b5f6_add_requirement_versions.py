@@ -0,0 +1,49 @@
+"""Add requirement versions and test case section links
+
+Revision ID: c7e1d2a4b5f6
+Revises: a2bc2434c7b2
+Create Date: 2026-10-19 10:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e1d2a4b5f6'
+down_revision = 'a2bc2434c7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'requirement_versions',
+        sa.Column('requirement_id', sa.Integer(), nullable=False, comment='需求ID'),
+        sa.Column('version', sa.Integer(), nullable=False, comment='版本号'),
+        sa.Column('description', sa.Text(), nullable=True, comment='需求描述'),
+        sa.Column('acceptance_criteria', sa.Text(), nullable=True, comment='验收标准'),
+        sa.Column('creator_id', sa.Integer(), nullable=True, comment='创建者ID'),
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='更新时间'),
+        sa.Column('is_deleted', sa.Boolean(), nullable=True, comment='是否删除'),
+        sa.ForeignKeyConstraint(['creator_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['requirement_id'], ['requirements.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('requirement_id', 'version', name='uq_requirement_versions_requirement_version'),
+    )
+    op.create_index(op.f('ix_requirement_versions_id'), 'requirement_versions', ['id'], unique=False)
+    op.create_index(op.f('ix_requirement_versions_requirement_id'), 'requirement_versions', ['requirement_id'], unique=False)
+
+    op.add_column('test_cases', sa.Column('requirement_section', sa.String(length=255), nullable=True, comment='关联需求章节键'))
+    op.create_index('ix_test_cases_requirement_section', 'test_cases', ['requirement_id', 'requirement_section'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_test_cases_requirement_section', table_name='test_cases')
+    op.drop_column('test_cases', 'requirement_section')
+
+    op.drop_index(op.f('ix_requirement_versions_requirement_id'), table_name='requirement_versions')
+    op.drop_index(op.f('ix_requirement_versions_id'), table_name='requirement_versions')
+    op.drop_table('requirement_versions')
@@ -0,0 +1,25 @@
+"""Add test execution index for incremental test plan statistics
+
+Revision ID: c9a4d2e7b5f1
+Revises: b3e8f5a1d6c2
+Create Date: 2026-10-19 19:26:44.108352
+
+升级后运行 python maintenance.py plan-stats 按执行记录校正已有计划的统计
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a4d2e7b5f1'
+down_revision = 'b3e8f5a1d6c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 按（计划, 用例）取最近一次执行
+    op.create_index('ix_test_executions_plan_case_id', 'test_executions', ['test_plan_id', 'test_case_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_test_executions_plan_case_id', table_name='test_executions')
@@ -0,0 +1,176 @@
+"""Partition test_executions by month and add per-case latest results
+
+Revision ID: d2b7f4c8e1a3
+Revises: c9a4d2e7b5f1
+Create Date: 2026-10-19 20:41:37.552018
+
+把 test_executions 改为按 start_time 的月范围分区表：原表改名后按原结构建分区表，
+为已有数据所在月份到未来 3 个月建分区并复制数据（start_time 为空的记录取 created_at），最后删除原表。
+复制期间会锁住执行记录表，数据量大时请在维护窗口执行；之后由 python maintenance.py execution-partitions 预建分区
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7f4c8e1a3'
+down_revision = 'c9a4d2e7b5f1'
+branch_labels = None
+depends_on = None
+
+
+MONTHS_AHEAD = 3
+
+# 与 app/models/test_case.py 中的触发器函数一致
+TEST_CASE_LATEST_RESULT_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION test_case_latest_result_maintain() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM test_case_latest_results WHERE test_case_id = OLD.test_case_id AND execution_id = OLD.id;
+        IF FOUND THEN
+            INSERT INTO test_case_latest_results (test_case_id, execution_id, test_plan_id, status, start_time)
+            SELECT test_case_id, id, test_plan_id, status, start_time
+            FROM test_executions
+            WHERE test_case_id = OLD.test_case_id
+            ORDER BY start_time DESC, id DESC
+            LIMIT 1
+            ON CONFLICT (test_case_id) DO NOTHING;
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO test_case_latest_results AS latest (test_case_id, execution_id, test_plan_id, status, start_time)
+        VALUES (NEW.test_case_id, NEW.id, NEW.test_plan_id, NEW.status, NEW.start_time)
+        ON CONFLICT (test_case_id) DO UPDATE
+        SET execution_id = EXCLUDED.execution_id,
+            test_plan_id = EXCLUDED.test_plan_id,
+            status = EXCLUDED.status,
+            start_time = EXCLUDED.start_time
+        WHERE (latest.start_time, latest.execution_id) <= (EXCLUDED.start_time, EXCLUDED.execution_id);
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+BACKFILL_LATEST_RESULTS_SQL = """
+INSERT INTO test_case_latest_results (test_case_id, execution_id, test_plan_id, status, start_time)
+SELECT DISTINCT ON (test_case_id) test_case_id, id, test_plan_id, status, start_time
+FROM test_executions
+ORDER BY test_case_id, start_time DESC, id DESC
+"""
+
+_FOREIGN_KEYS = (
+    ('test_executions_test_case_id_fkey', 'test_case_id', 'test_cases'),
+    ('test_executions_test_plan_id_fkey', 'test_plan_id', 'test_plans'),
+    ('test_executions_executor_id_fkey', 'executor_id', 'users'),
+)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_test_executions_id', 'test_executions', ['id'], unique=False)
+    op.create_index('ix_test_executions_test_case_id_id', 'test_executions', ['test_case_id', 'id'], unique=False)
+    op.create_index('ix_test_executions_plan_case_id', 'test_executions', ['test_plan_id', 'test_case_id', 'id'], unique=False)
+
+
+def _drop_indexes(table: str) -> None:
+    for name in ('ix_test_executions_id', 'ix_test_executions_test_case_id_id', 'ix_test_executions_plan_case_id'):
+        op.drop_index(name, table_name=table)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    op.rename_table('test_executions', 'test_executions_legacy')
+    op.execute("ALTER TABLE test_executions_legacy RENAME CONSTRAINT test_executions_pkey TO test_executions_legacy_pkey")
+    _drop_indexes('test_executions_legacy')
+    op.execute("UPDATE test_executions_legacy SET start_time = coalesce(created_at, now()) WHERE start_time IS NULL")
+
+    # 分区表的主键必须包含分区键；沿用原表的 id 序列
+    op.execute(
+        "CREATE TABLE test_executions (LIKE test_executions_legacy INCLUDING DEFAULTS INCLUDING COMMENTS) "
+        "PARTITION BY RANGE (start_time)"
+    )
+    op.execute(
+        "ALTER TABLE test_executions "
+        "ALTER COLUMN start_time SET NOT NULL, "
+        "ALTER COLUMN start_time SET DEFAULT now(), "
+        "ADD CONSTRAINT test_executions_pkey PRIMARY KEY (id, start_time)"
+    )
+    op.execute("ALTER SEQUENCE test_executions_id_seq OWNED BY test_executions.id")
+    for name, column, referred in _FOREIGN_KEYS:
+        op.create_foreign_key(name, 'test_executions', referred, [column], ['id'])
+
+    op.execute("CREATE TABLE test_executions_default PARTITION OF test_executions DEFAULT")
+    first = bind.execute(sa.text("SELECT min(start_time) FROM test_executions_legacy")).scalar()
+    current = date.today().replace(day=1)
+    month = first.date().replace(day=1) if first else current
+    while month <= _add_months(current, MONTHS_AHEAD):
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE test_executions_p{month:%Y_%m} PARTITION OF test_executions "
+            f"FOR VALUES FROM ('{month}') TO ('{upper}')"
+        )
+        month = upper
+
+    op.execute("INSERT INTO test_executions SELECT * FROM test_executions_legacy")
+    op.drop_table('test_executions_legacy')
+
+    _create_indexes()
+    op.create_index(
+        'ix_test_executions_case_latest', 'test_executions',
+        ['test_case_id', sa.text('start_time DESC'), sa.text('id DESC')],
+        unique=False, postgresql_include=['status'],
+    )
+
+    op.create_table(
+        'test_case_latest_results',
+        sa.Column('test_case_id', sa.Integer(), nullable=False),
+        sa.Column('execution_id', sa.Integer(), nullable=False, comment='执行记录ID'),
+        sa.Column('test_plan_id', sa.Integer(), nullable=True, comment='测试计划ID'),
+        sa.Column('status', postgresql.ENUM(name='testexecutionstatus', create_type=False), nullable=True, comment='执行状态'),
+        sa.Column('start_time', sa.DateTime(), nullable=False, comment='开始时间'),
+        sa.ForeignKeyConstraint(['test_case_id'], ['test_cases.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('test_case_id'),
+    )
+    op.execute(BACKFILL_LATEST_RESULTS_SQL)
+    op.execute(TEST_CASE_LATEST_RESULT_FUNCTION_SQL)
+    op.execute(
+        "CREATE TRIGGER trg_test_executions_latest_result AFTER INSERT OR UPDATE OR DELETE ON test_executions "
+        "FOR EACH ROW EXECUTE FUNCTION test_case_latest_result_maintain()"
+    )
+
+
+def downgrade() -> None:
+    # 已归档（摘除并删除）的分区不会恢复
+    op.execute("DROP TRIGGER IF EXISTS trg_test_executions_latest_result ON test_executions")
+    op.execute("DROP FUNCTION IF EXISTS test_case_latest_result_maintain()")
+    op.drop_table('test_case_latest_results')
+    op.drop_index('ix_test_executions_case_latest', table_name='test_executions')
+    _drop_indexes('test_executions')
+
+    op.rename_table('test_executions', 'test_executions_partitioned')
+    op.execute("ALTER TABLE test_executions_partitioned RENAME CONSTRAINT test_executions_pkey TO test_executions_partitioned_pkey")
+    op.execute("CREATE TABLE test_executions (LIKE test_executions_partitioned INCLUDING DEFAULTS INCLUDING COMMENTS)")
+    op.execute(
+        "ALTER TABLE test_executions "
+        "ALTER COLUMN start_time DROP NOT NULL, "
+        "ALTER COLUMN start_time DROP DEFAULT, "
+        "ADD CONSTRAINT test_executions_pkey PRIMARY KEY (id)"
+    )
+    op.execute("ALTER SEQUENCE test_executions_id_seq OWNED BY test_executions.id")
+    for name, column, referred in _FOREIGN_KEYS:
+        op.create_foreign_key(name, 'test_executions', referred, [column], ['id'])
+
+    op.execute("INSERT INTO test_executions SELECT * FROM test_executions_partitioned")
+    op.execute("DROP TABLE test_executions_partitioned CASCADE")
+    _create_indexes()
@@ -0,0 +1,38 @@
+"""Add per-project code sequences
+
+Revision ID: d4f8a1b3c9e7
+Revises: c7e1d2a4b5f6
+Create Date: 2026-10-19 14:05:48.372910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f8a1b3c9e7'
+down_revision = 'c7e1d2a4b5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'project_code_sequences',
+        sa.Column('project_id', sa.Integer(), nullable=False, comment='项目ID'),
+        sa.Column('entity', sa.String(length=50), nullable=False, comment='实体类型'),
+        sa.Column('next_value', sa.Integer(), nullable=False, comment='下一个未分配的序号'),
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='更新时间'),
+        sa.Column('is_deleted', sa.Boolean(), nullable=True, comment='是否删除'),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('project_id', 'entity', name='uq_project_code_sequences_project_entity'),
+    )
+    op.create_index(op.f('ix_project_code_sequences_id'), 'project_code_sequences', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_project_code_sequences_id'), table_name='project_code_sequences')
+    op.drop_table('project_code_sequences')
@@ -0,0 +1,67 @@
+"""Add test case MinHash signatures and LSH buckets
+
+Revision ID: e5a9c2d7f1b4
+Revises: d4f8a1b3c9e7
+Create Date: 2026-10-19 15:42:10.618233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c2d7f1b4'
+down_revision = 'd4f8a1b3c9e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('test_cases', sa.Column('duplicate_of_id', sa.Integer(), nullable=True, comment='疑似重复的用例ID'))
+    op.add_column('test_cases', sa.Column('duplicate_similarity', sa.Float(), nullable=True, comment='与疑似重复用例的相似度'))
+    op.create_foreign_key('fk_test_cases_duplicate_of_id', 'test_cases', 'test_cases', ['duplicate_of_id'], ['id'])
+    op.create_index(op.f('ix_test_cases_duplicate_of_id'), 'test_cases', ['duplicate_of_id'], unique=False)
+
+    op.create_table(
+        'test_case_signatures',
+        sa.Column('test_case_id', sa.Integer(), nullable=False, comment='测试用例ID'),
+        sa.Column('project_id', sa.Integer(), nullable=False, comment='项目ID'),
+        sa.Column('num_perm', sa.Integer(), nullable=False, comment='签名长度'),
+        sa.Column('signature', sa.LargeBinary(), nullable=False, comment='MinHash 签名（uint32 小端序）'),
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='更新时间'),
+        sa.Column('is_deleted', sa.Boolean(), nullable=True, comment='是否删除'),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id']),
+        sa.ForeignKeyConstraint(['test_case_id'], ['test_cases.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('test_case_id'),
+    )
+    op.create_index(op.f('ix_test_case_signatures_id'), 'test_case_signatures', ['id'], unique=False)
+    op.create_index(op.f('ix_test_case_signatures_project_id'), 'test_case_signatures', ['project_id'], unique=False)
+
+    op.create_table(
+        'test_case_lsh_buckets',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('band', sa.SmallInteger(), nullable=False),
+        sa.Column('bucket', sa.BigInteger(), nullable=False),
+        sa.Column('test_case_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id']),
+        sa.ForeignKeyConstraint(['test_case_id'], ['test_cases.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('band', 'test_case_id'),
+    )
+    op.create_index('ix_test_case_lsh_buckets_lookup', 'test_case_lsh_buckets', ['project_id', 'band', 'bucket'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_test_case_lsh_buckets_lookup', table_name='test_case_lsh_buckets')
+    op.drop_table('test_case_lsh_buckets')
+
+    op.drop_index(op.f('ix_test_case_signatures_project_id'), table_name='test_case_signatures')
+    op.drop_index(op.f('ix_test_case_signatures_id'), table_name='test_case_signatures')
+    op.drop_table('test_case_signatures')
+
+    op.drop_index(op.f('ix_test_cases_duplicate_of_id'), table_name='test_cases')
+    op.drop_constraint('fk_test_cases_duplicate_of_id', 'test_cases', type_='foreignkey')
+    op.drop_column('test_cases', 'duplicate_similarity')
+    op.drop_column('test_cases', 'duplicate_of_id')
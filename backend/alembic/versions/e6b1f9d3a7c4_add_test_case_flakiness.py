@@ -0,0 +1,66 @@
+"""Add test case flakiness summary and analytics watermarks
+
+Revision ID: e6b1f9d3a7c4
+Revises: d2b7f4c8e1a3
+Create Date: 2026-10-19 22:16:05.184392
+
+升级后运行 python maintenance.py flakiness 按已有执行记录生成不稳定性汇总，之后定时运行只处理新增记录
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b1f9d3a7c4'
+down_revision = 'd2b7f4c8e1a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'test_case_flakiness',
+        sa.Column('test_case_id', sa.Integer(), nullable=False, comment='测试用例ID'),
+        sa.Column('project_id', sa.Integer(), nullable=False, comment='项目ID'),
+        sa.Column('executions', sa.Integer(), nullable=False, comment='累计通过 / 失败执行次数'),
+        sa.Column('failures', sa.Integer(), nullable=False, comment='累计失败次数'),
+        sa.Column('flips', sa.Integer(), nullable=False, comment='累计通过 / 失败切换次数'),
+        sa.Column('flip_rate', sa.Float(), nullable=False, comment='累计切换率：切换次数 / (执行次数 - 1)'),
+        sa.Column('window_runs', sa.Integer(), nullable=False, comment='最近窗口内的执行次数'),
+        sa.Column('window_failures', sa.Integer(), nullable=False, comment='最近窗口内的失败次数'),
+        sa.Column('window_flips', sa.Integer(), nullable=False, comment='最近窗口内的切换次数'),
+        sa.Column('failure_rate', sa.Float(), nullable=False, comment='最近窗口失败率'),
+        sa.Column('window_flip_rate', sa.Float(), nullable=False, comment='最近窗口切换率'),
+        sa.Column('peak_failure_rate', sa.Float(), nullable=False, comment='历史滑动窗口中的最高失败率'),
+        sa.Column('flakiness_score', sa.Float(), nullable=False, comment='不稳定分数（0-1）'),
+        sa.Column('is_flaky', sa.Boolean(), nullable=False, comment='是否判定为不稳定用例'),
+        sa.Column('recent_outcomes', sa.String(), nullable=False, comment='最近窗口的结果序列（P 通过 / F 失败，从旧到新）'),
+        sa.Column('last_execution_id', sa.Integer(), nullable=True, comment='最近计入的执行记录ID'),
+        sa.Column('last_executed_at', sa.DateTime(), nullable=True, comment='最近计入的执行开始时间'),
+        sa.Column('analyzed_at', sa.DateTime(timezone=True), nullable=True, comment='分析时间'),
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='更新时间'),
+        sa.Column('is_deleted', sa.Boolean(), nullable=True, comment='是否删除'),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id']),
+        sa.ForeignKeyConstraint(['test_case_id'], ['test_cases.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('test_case_id'),
+    )
+    op.create_index(op.f('ix_test_case_flakiness_id'), 'test_case_flakiness', ['id'], unique=False)
+    op.create_index('ix_test_case_flakiness_project_score', 'test_case_flakiness', ['project_id', 'flakiness_score'], unique=False)
+
+    op.create_table(
+        'analytics_watermarks',
+        sa.Column('name', sa.String(length=100), nullable=False, comment='任务名称'),
+        sa.Column('last_id', sa.BigInteger(), nullable=False, comment='已处理的最大记录ID'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='更新时间'),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_watermarks')
+    op.drop_index('ix_test_case_flakiness_project_score', table_name='test_case_flakiness')
+    op.drop_index(op.f('ix_test_case_flakiness_id'), table_name='test_case_flakiness')
+    op.drop_table('test_case_flakiness')
@@ -0,0 +1,79 @@
+"""Add full-text search vectors to test cases, requirements and defects
+
+Revision ID: f1c3b8e6a2d9
+Revises: e5a9c2d7f1b4
+Create Date: 2026-10-19 17:20:36.904125
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c3b8e6a2d9'
+down_revision = 'e5a9c2d7f1b4'
+branch_labels = None
+depends_on = None
+
+
+# 中文片段展开为相邻二元组，其余文字保持原样（与 app/utils/search_text.py 一致）
+SEARCH_TOKENS_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION search_tokens(input text) RETURNS text
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT coalesce(string_agg(
+        CASE WHEN m.part[1] ~ '^[㐀-鿿]' AND length(m.part[1]) > 1 THEN (
+            SELECT string_agg(substr(m.part[1], i, 2), ' ' ORDER BY i)
+            FROM generate_series(1, length(m.part[1]) - 1) AS i
+        ) ELSE m.part[1] END,
+        ' ' ORDER BY m.ord), '')
+    FROM regexp_matches(input, '[㐀-鿿]+|[^㐀-鿿]+', 'g') WITH ORDINALITY AS m(part, ord)
+$$
+"""
+
+SEARCH_FIELDS = {
+    'test_cases': {
+        'A': ('title', 'code'),
+        'B': ('description', 'preconditions'),
+        'C': ('test_steps', 'expected_result', 'test_data'),
+    },
+    'requirements': {
+        'A': ('title', 'code'),
+        'B': ('description',),
+        'C': ('acceptance_criteria',),
+    },
+    'defects': {
+        'A': ('title', 'code'),
+        'B': ('description', 'steps_to_reproduce'),
+        'C': ('expected_result', 'actual_result', 'resolution'),
+    },
+}
+
+
+def search_vector_expression(weighted_fields) -> str:
+    parts = []
+    for weight, fields in weighted_fields.items():
+        text = " || ' ' || ".join(f"coalesce({field}, '')" for field in fields)
+        parts.append(f"setweight(to_tsvector('simple'::regconfig, search_tokens({text})), '{weight}')")
+    return " || ".join(parts)
+
+
+def upgrade() -> None:
+    op.execute(SEARCH_TOKENS_FUNCTION_SQL)
+    for table, fields in SEARCH_FIELDS.items():
+        op.add_column(table, sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(search_vector_expression(fields), persisted=True),
+            nullable=True,
+            comment='全文搜索向量',
+        ))
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    for table in SEARCH_FIELDS:
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
+    op.execute('DROP FUNCTION IF EXISTS search_tokens(text)')
@@ -0,0 +1,37 @@
+"""Keep per plan and case latest results of archived execution partitions
+
+Revision ID: f4d8a2c6e9b1
+Revises: e6b1f9d3a7c4
+Create Date: 2026-10-19 23:42:18.306517
+
+归档服务删除分区前把其中每个（计划, 用例）的最近执行写入本表，计划统计与在线记录合并取最近结果；
+升级前已删除的分区无法补回，升级后运行一次 python maintenance.py plan-stats 以当前数据为准
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4d8a2c6e9b1'
+down_revision = 'e6b1f9d3a7c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'test_plan_archived_results',
+        sa.Column('test_plan_id', sa.Integer(), nullable=False),
+        sa.Column('test_case_id', sa.Integer(), nullable=False),
+        sa.Column('execution_id', sa.Integer(), nullable=False, comment='执行记录ID'),
+        sa.Column('status', postgresql.ENUM(name='testexecutionstatus', create_type=False), nullable=True, comment='执行状态'),
+        sa.Column('start_time', sa.DateTime(), nullable=False, comment='开始时间'),
+        sa.ForeignKeyConstraint(['test_case_id'], ['test_cases.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['test_plan_id'], ['test_plans.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('test_plan_id', 'test_case_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('test_plan_archived_results')
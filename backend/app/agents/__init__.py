@@ -0,0 +1 @@
+# 智能体模块初始化
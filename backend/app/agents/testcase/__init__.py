@@ -0,0 +1 @@
+# 测试用例智能体模块初始化
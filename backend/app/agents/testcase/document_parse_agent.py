@@ -0,0 +1,158 @@
+"""
+文档解析智能体
+流式解析需求文档（PDF / DOCX / Markdown），按标题分块并发分析，合并后交给测试用例生成智能体
+
+解析在后台线程中进行，分块一边产出一边分析，同时进行的分块数受 DOCUMENT_PARSE_PARALLELISM 限制；
+分块结果按内容哈希缓存，文档局部修改后重新上传只会分析变化的分块
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List
+
+from autogen_core import MessageContext, message_handler, type_subscription
+
+from app.core.agents import BaseAgent, TopicTypes, session_topic
+from app.core.config import settings
+from app.core.rate_limiter import llm_rate_limiter
+from app.models.test_case import DocumentParseRequest, TestCaseGenerationRequest
+from app.utils.document_cache import lookup_chunk, store_chunk
+from app.utils.document_parser import DocumentChunk, aiter_chunks, document_format
+from app.utils.image_cache import build_context_key
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_CHUNK_SYSTEM_MESSAGE = (
+    "你是一名资深的测试分析师。用户会提供需求文档中的一个章节片段（开头标注了章节路径），"
+    "请提炼其中的功能点、业务规则、输入约束、边界条件和异常场景，按条目输出，为后续编写测试用例提供依据。"
+    "只依据片段内容，不要补充片段中没有的需求。"
+)
+
+
+@type_subscription(topic_type=TopicTypes.DOCUMENT_PARSE)
+class DocumentParseAgent(BaseAgent):
+
+    def __init__(self, model_client_instance=None, agent_factory=None,
+                 **kwargs):
+        super().__init__(TopicTypes.DOCUMENT_PARSE, model_client_instance, **kwargs)
+        self.agent_factory = agent_factory
+
+    @message_handler
+    async def handle_document_parse_request(
+        self,
+        message: DocumentParseRequest,
+        ctx: MessageContext
+    ) -> None:
+        try:
+            logger.info("开始处理文档解析请求", extra={"session_id": message.session_id})
+            await self.send_response(f"开始解析文档: {message.document_name}", session_id=message.session_id)
+
+            analysis_result = await self._parse_document(message)
+
+            await self.send_response(
+                f"文档解析完成: {message.document_name}",
+                session_id=message.session_id,
+                region="result",
+                data=analysis_result,
+            )
+
+            # 发送到本会话的测试用例生成智能体
+            await self.publish_message(
+                TestCaseGenerationRequest(
+                    session_id=message.session_id,
+                    source_type="document",
+                    source_data={
+                        "document_name": message.document_name,
+                        "analysis_result": analysis_result,
+                    },
+                ),
+                topic_id=session_topic(TopicTypes.TEST_CASE_GENERATOR, message.session_id),
+            )
+            logger.info("文档解析请求处理完成", extra={"session_id": message.session_id})
+
+        except Exception as e:
+            logger.exception("文档解析请求处理失败", extra={"session_id": message.session_id})
+            await self.send_error(message.session_id, f"文档解析失败: {e}")
+
+    async def _parse_document(self, message: DocumentParseRequest) -> Dict[str, Any]:
+        """边解析边分析各分块，全部完成后按分块顺序合并"""
+        start = time.perf_counter()
+        extension = document_format(message.document_path)
+        context_key = build_context_key(
+            model=settings.MODEL_NAME,
+            document_description=message.document_description,
+            analysis_target=message.analysis_target,
+        )
+
+        semaphore = asyncio.Semaphore(max(1, settings.DOCUMENT_PARSE_PARALLELISM))
+        tasks: List[asyncio.Task] = []
+        try:
+            async for chunk in aiter_chunks(message.document_path):
+                # 同时分析的分块达到上限时暂停读取，解析线程随之在有界队列上等待
+                await semaphore.acquire()
+                task = asyncio.create_task(self._analyze_chunk(message, chunk, context_key))
+                task.add_done_callback(lambda _: semaphore.release())
+                tasks.append(task)
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        if not results:
+            raise ValueError("文档中没有可解析的文本内容")
+        succeeded = [result for result in results if not result["error"]]
+        if not succeeded:
+            raise RuntimeError(f"全部 {len(results)} 个分块分析失败: {results[0]['error']}")
+
+        return {
+            "description": "\n\n".join(f"【{result['label']}】\n{result['content']}" for result in succeeded),
+            "document_description": message.document_description,
+            "analysis_target": message.analysis_target,
+            "document_format": extension,
+            "chunks": [{key: value for key, value in result.items() if key != "content"} for result in results],
+            "cached_chunks": sum(1 for result in results if result["cached"]),
+            "failed_chunks": len(results) - len(succeeded),
+            "elapsed": round(time.perf_counter() - start, 3),
+        }
+
+    async def _analyze_chunk(self, message: DocumentParseRequest, chunk: DocumentChunk, context_key: str) -> Dict[str, Any]:
+        """分析单个分块；失败时记录错误，不影响其他分块"""
+        result: Dict[str, Any] = {**chunk.layout(), "label": chunk.label, "content": "", "cached": False, "error": None}
+
+        cached = lookup_chunk(context_key, chunk.content_hash, bypass=message.bypass_cache)
+        if cached is not None:
+            result.update(content=cached, cached=True)
+        else:
+            try:
+                result["content"] = await self._call_model(message, chunk)
+                store_chunk(context_key, chunk.content_hash, result["content"])
+            except Exception as e:
+                logger.exception("文档分块分析失败", extra={"session_id": message.session_id, "chunk": chunk.index})
+                result["error"] = f"{type(e).__name__}: {e}"
+
+        status = "失败" if result["error"] else ("命中缓存" if result["cached"] else "完成")
+        await self.send_response(
+            f"分块 {chunk.index + 1}「{chunk.label}」分析{status}",
+            session_id=message.session_id,
+            data={"chunk": result},
+        )
+        return result
+
+    async def _call_model(self, message: DocumentParseRequest, chunk: DocumentChunk) -> str:
+        task = chunk.text
+        if message.document_description:
+            task = f"文档说明: {message.document_description}\n{task}"
+        if message.analysis_target:
+            task = f"分析目标: {message.analysis_target}\n{task}"
+
+        agent = self.agent_factory.create_assistant_agent(
+            name="document_analyst",
+            system_message=DOCUMENT_CHUNK_SYSTEM_MESSAGE,
+            model_client=self.model_client,
+            stream=False,
+        )
+        async with llm_rate_limiter.limit(settings.MODEL_NAME):
+            result = await agent.run(task=task)
+        content = getattr(result.messages[-1], "content", "") if result.messages else ""
+        return content if isinstance(content, str) else str(content)
@@ -2,20 +2,40 @@
 图片分析智能体
 """
 from datetime import datetime
+import time
 import uuid
-from venv import logger
-from autogen_core import BaseAgent, Image, MessageContext, TopicId, message_handler, type_subscription
-from backend.app.core.llms import _get_uitars_model_client
-from backend.app.models.test_case import ImageAnalysisRequest, ImageAnalysisResponse, TestCaseGenerationRequest
+import logging
+from typing import Any, Dict, List
 
+from autogen_core import Image, MessageContext, message_handler, type_subscription
 
-@type_subscription(topic_type="image_analysis")
+from app.core.agents import BaseAgent, EncodedImage, TopicTypes, session_topic
+from app.core.config import settings
+from app.core.llms import _get_uitars_model_client
+from app.core.rate_limiter import llm_rate_limiter
+from app.models.test_case import ImageAnalysisRequest, ImageAnalysisResponse, TestCaseGenerationRequest
+from app.utils.image_cache import build_context_key, image_analysis_cache, lookup_analysis
+from app.utils.image_preprocess import ImageTile, PreprocessedImage, preprocess_image
+from app.agents.testcase.segment_analysis_agent import fan_out_segments, merge_segment_results
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_IMAGE_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "bmp", "webp", "tiff"}
+
+IMAGE_ANALYSIS_SYSTEM_MESSAGE = (
+    "你是一名资深的 UI 测试分析师。请仔细分析用户提供的界面截图，"
+    "描述页面结构、主要功能区域、可交互元素及其可能的交互流程，为后续编写测试用例提供依据。"
+)
+
+
+@type_subscription(topic_type=TopicTypes.IMAGE_ANALYSIS)
 class ImageAnalyzerAgent(BaseAgent):
     # 初始化智能体
-    def __init__(self, model_client_instance=None,
-                **kwargs):
-        pass
-    
+    def __init__(self, model_client_instance=None, agent_factory=None,
+                 **kwargs):
+        super().__init__(TopicTypes.IMAGE_ANALYSIS, model_client_instance, **kwargs)
+        self.agent_factory = agent_factory
+
     # 使用装饰器激活启用该方法，使用该方法进行消息传递
     @message_handler
     async def handle_image_analysis_request(
@@ -23,131 +43,143 @@ class ImageAnalyzerAgent(BaseAgent):
         message: ImageAnalysisRequest,
         ctx: MessageContext
     ) -> None:
-        
+        start = time.perf_counter()
         try:
-            logger.info(f"开始处理图片分析请求: {message.session_id}")
-            
+            logger.info("开始处理图片分析请求", extra={"session_id": message.session_id})
+
             # 发送反馈消息到前端
-            await self.send_response(
-                f"开始分析图片: {message.image_name}",
-                region="process"
-                )
+            await self.send_response(f"开始分析图片: {message.image_name}", session_id=message.session_id)
 
-            # 调用方法开始分析图片
+            # 分析图片
             analysis_result = await self._analyze_image(message)
 
-            # 调用方法，将图片分析结果包装成下一个智能体的请求发送到下一个智能体
-            test_cases = await self._generate_test_cases_from_image(analysis_result,message)
-
             # 构建响应
             response = ImageAnalysisResponse(
                 session_id=message.session_id,
                 image_name=message.image_name,
                 image_id=str(uuid.uuid4()),
-                analysis_result=analysis_result.model_dump(),
-                test_cases=test_cases,
-                processing_time=0.0,
-                created_at=datetime.now().isoformat()
+                analysis_result=analysis_result,
+                test_cases=[],
+                processing_time=time.perf_counter() - start,
+                created_at=datetime.now(),
             )
 
-            # 发送反馈消息到前端
             await self.send_response(
                 f"图片分析完成: {message.image_name}",
-                region="result"
-            ), 
-
-            # 发送到测试用例生成智能体
-            test_case_request = TestCaseGenerationRequest(
                 session_id=message.session_id,
-                source_type="image",
-                source_data=response.model_dump(),
-                generation_cinfig={}
+                region="result",
+                data=analysis_result,
             )
-            
-            # 发送测试内容请求消息到用例生成主题
+
+            # 发送测试用例生成请求到本会话的用例生成主题
             await self.publish_message(
-                test_case_request,
-                topic_id=TopicId("test_case_generator"),
-                source=self.agent_id
+                TestCaseGenerationRequest(
+                    session_id=message.session_id,
+                    source_type="image",
+                    source_data=response.model_dump(mode="json"),
+                    generation_config={
+                        "auto_save": True,
+                        "generate_mind_map": True
+                    },
+                ),
+                topic_id=session_topic(TopicTypes.TEST_CASE_GENERATOR, message.session_id),
             )
-            logger.info(f"图片分析请求处理完成,接下来由测试用例生成智能体团队处理: {message.session_id}")
-            
-        except Exception as e:
-            logger.error(f"图片分析请求处理失败: {message.session_id}, 错误: {str(e)}")
+            logger.info("图片分析请求处理完成，接下来由测试用例生成智能体处理", extra={"session_id": message.session_id})
 
+        except Exception as e:
+            logger.exception("图片分析请求处理失败", extra={"session_id": message.session_id})
+            await self.send_error(message.session_id, f"图片分析失败: {e}")
 
     # 分析图片方法，加入图片格式校验
-    async def _analyze_image(self, message: ImageAnalysisRequest) -> Any:
+    async def _analyze_image(self, message: ImageAnalysisRequest) -> Dict[str, Any]:
         """分析图片"""
-        try:
-            image_path = message.image_path
-            image_extension = image_path.split(".")[-1] = Image.from_file(image_path)
-            if image_extension not in ["jpg", "jpeg", "png", "gif", "bmp", "webp", "ico", "tiff", "svg", "heic", "heif"]:
-                raise ValueError(f"不支持的图片格式: {image_extension}")    
-            
-            # 发送消息到前端
+        image_extension = message.image_path.rsplit(".", 1)[-1].lower()
+        if image_extension not in SUPPORTED_IMAGE_EXTENSIONS:
+            raise ValueError(f"不支持的图片格式: {image_extension}")
+
+        # 近乎相同的截图直接复用已有的分析结果
+        context_key = build_context_key(
+            model=settings.UITARS_MODEL,
+            image_description=message.image_description,
+            analysis_target=message.analysis_target,
+        )
+        hit, hashes = await lookup_analysis(message.image_path, context_key, bypass=message.bypass_cache)
+        if hit is not None:
+            logger.info("图片分析缓存命中", extra={"session_id": message.session_id, **hit.report()})
             await self.send_response(
-                f"开始分析图片: {message.image_name}",
-                region="process"
-                )
-            
-            # 调用方法分析图片内容
-            analysis_result = await self._analy_image_content(image_path,message)
-
-
-            return analysis_result
-        except Exception as e:
-            logger.error(f"图片分析失败: {str(e)}")
-            raise e
-
-    # 将图片分析结果发送给测试用例生成智能体    
-    async def _generate_test_cases_from_image(self, analysis_result: Any, response: ImageAnalysisRequest) -> List[TestCase]:
-        '''发送到测试用例生成智能体'''
-        try:
-            generation_request = TestCaseGenerationRequest(
-                session_id=response.session_id,
-                source_type="image",
-                source_data=response.model_dump()
-                test_cases=response.test_cases,
-                generation_config={
-                    "auto_save": True,
-                    "generate_mind_map": True
-                }
+                "命中图片分析缓存，复用已有分析结果",
+                session_id=message.session_id,
+                data={"cache": hit.report()},
             )
-        pass
-
-    async def _analy_image_content(self, image_path: str, message: ImageAnalysisRequest) -> None:
-
-        try:
-            # 创建多模态分析智能体
-            agent = await self.agent_factory.create_agent(
-                agent_type="image_analysis",
-                model_client_instance=self._get_uitars_model_client
+            return {**hit.result, "cache": hit.report()}
+
+        # 缩放、去元数据、长截图切片（在进程池中执行）
+        preprocessed = await preprocess_image(message.image_path, settings.UITARS_MODEL)
+        if preprocessed.is_tiled:
+            # 长截图的各切片并发分析后按顺序合并
+            results = await fan_out_segments(
+                self,
+                message.session_id,
+                [(self._tile_label(tile), tile.data) for tile in preprocessed.tiles],
+                self._build_task_text(message, preprocessed),
             )
-            # 调用智能体实例分析图片
-            analysis_result = await agent.run(task=message.image_path)
-
-            # 流式输出发送到前端
-            async for event in agent.run_stream(task=message.image_path):
+            merged = merge_segment_results(results)
+            content = merged.pop("description")
+        else:
+            merged = {}
+            content = await self._analyze_image_content(message, preprocessed)
+        analysis_result = {
+            "description": content,
+            "image_description": message.image_description,
+            "analysis_target": message.analysis_target,
+            "image_layout": preprocessed.layout(),
+            **merged,
+        }
+        if hashes is not None and content:
+            image_analysis_cache.store(context_key, *hashes, analysis_result)
+        return {**analysis_result, "cache": {"hit": False, "bypass": message.bypass_cache}}
+
+    @staticmethod
+    def _tile_label(tile: ImageTile) -> str:
+        return f"第 {tile.index + 1} 段（原图纵向 {tile.box[1]}~{tile.box[3]} 像素）"
+
+    def _build_task_text(self, message: ImageAnalysisRequest, preprocessed: PreprocessedImage) -> str:
+        task_text = "请分析这张界面截图。"
+        if preprocessed.is_tiled:
+            task_text = (f"这是一张长截图按从上到下的顺序切分出的 {len(preprocessed.tiles)} 段之一（相邻段有少量重叠），"
+                         "请分析这一段，位于段首或段尾、被截断的元素请注明。")
+        if message.image_description:
+            task_text += f"\n图片说明: {message.image_description}"
+        if message.analysis_target:
+            task_text += f"\n分析目标: {message.analysis_target}"
+        return task_text
+
+    async def _analyze_image_content(self, message: ImageAnalysisRequest, preprocessed: PreprocessedImage) -> str:
+        """调用多模态模型分析图片内容，并把流式输出转发到前端"""
+        from autogen_agentchat.base import TaskResult
+        from autogen_agentchat.messages import ModelClientStreamingChunkEvent, MultiModalMessage
+
+        # 创建多模态分析智能体
+        agent = self.agent_factory.create_assistant_agent(
+            name="image_analyst",
+            system_message=IMAGE_ANALYSIS_SYSTEM_MESSAGE,
+            model_client=_get_uitars_model_client(),
+        )
+
+        images: List[Image] = [EncodedImage(tile.data) for tile in preprocessed.tiles]
+        task = MultiModalMessage(content=[self._build_task_text(message, preprocessed), *images], source="user")
+
+        analysis_result = ""
+        async with llm_rate_limiter.limit(settings.UITARS_MODEL):
+            async for event in agent.run_stream(task=task):
+                # 流式输出发送到前端
                 if isinstance(event, ModelClientStreamingChunkEvent):
-                    if hasattr(event, 'content') and hasattr(event, 'source'):
-                        chunk_content = event.content
-                        if chunk_content:
-                            await self.send_response(
-                                f"图片分析中: {chunk_content}",
-                                region="process"
-                                )
-            # TaskResult内容提取出来保存发给下一个智能体
-                if isinstance(event, TaskResult):
-                    if hasattr(event, 'messages') and hasattr(event, 'stop_reason'):
+                    if event.content:
+                        await self.send_response(event.content, session_id=message.session_id)
+                # TaskResult 中的最后一条消息作为分析结果
+                elif isinstance(event, TaskResult):
+                    if event.messages:
                         final_message = event.messages[-1]
-                        if hasattr(final_message, 'content'):
-                            analysis_result = final_message.content
-
-                return analysis_result
-        except Exception as e:
-            logger.error(f"图片分析失败: {str(e)}")
-            raise e
-
-
+                        analysis_result = getattr(final_message, "content", "") or ""
 
+        return analysis_result
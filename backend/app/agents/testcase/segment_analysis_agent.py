@@ -0,0 +1,157 @@
+"""
+切片分析智能体
+分析单个图片切片或视频关键帧，由图片 / 视频分析智能体通过 send_message 直接请求并等待结果
+
+fan_out_segments 负责扇出与汇总：并发发送全部切片请求（单请求并发数受 VISUAL_FANOUT_PARALLELISM 限制，
+模型调用再经过全局 LLM 限流器），每完成一个就把部分结果推送到前端，最后按序号排序返回
+"""
+import asyncio
+import base64
+import logging
+import time
+from typing import List, Sequence, Tuple
+
+from autogen_core import MessageContext, message_handler, type_subscription
+
+from app.core.agents import BaseAgent, EncodedImage, TopicTypes, session_agent_id
+from app.core.config import settings
+from app.core.llms import _get_uitars_model_client
+from app.core.rate_limiter import llm_rate_limiter
+from app.models.test_case import VisualSegmentRequest, VisualSegmentResult
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_ANALYSIS_SYSTEM_MESSAGE = (
+    "你是一名资深的 UI 测试分析师。用户会提供一个页面片段（长截图的一段或录屏中的一帧），"
+    "请描述其中的页面结构、可见文本、可交互元素及其状态，只描述片段中实际可见的内容。"
+)
+
+
+@type_subscription(topic_type=TopicTypes.VISUAL_SEGMENT_ANALYSIS)
+class SegmentAnalyzerAgent(BaseAgent):
+
+    def __init__(self, model_client_instance=None, agent_factory=None,
+                 **kwargs):
+        super().__init__(TopicTypes.VISUAL_SEGMENT_ANALYSIS, model_client_instance, **kwargs)
+        self.agent_factory = agent_factory
+
+    @message_handler
+    async def handle_segment_request(
+        self,
+        message: VisualSegmentRequest,
+        ctx: MessageContext
+    ) -> VisualSegmentResult:
+        """分析单个片段；失败时返回带错误信息的结果，不影响其他片段"""
+        from autogen_agentchat.messages import MultiModalMessage
+
+        start = time.perf_counter()
+        try:
+            agent = self.agent_factory.create_assistant_agent(
+                name="segment_analyst",
+                system_message=SEGMENT_ANALYSIS_SYSTEM_MESSAGE,
+                model_client=_get_uitars_model_client(),
+                stream=False,
+            )
+            task = MultiModalMessage(
+                content=[
+                    f"{message.instruction}\n当前片段: {message.label}（{message.index + 1}/{message.total}）",
+                    EncodedImage(base64.b64decode(message.image_data)),
+                ],
+                source="user",
+            )
+            async with llm_rate_limiter.limit(settings.UITARS_MODEL):
+                result = await agent.run(task=task, cancellation_token=ctx.cancellation_token)
+
+            content = getattr(result.messages[-1], "content", "") if result.messages else ""
+            return VisualSegmentResult(
+                session_id=message.session_id,
+                index=message.index,
+                label=message.label,
+                content=content if isinstance(content, str) else str(content),
+                elapsed=time.perf_counter() - start,
+            )
+        except Exception as e:
+            logger.exception("片段分析失败", extra={"session_id": message.session_id, "segment": message.index})
+            return VisualSegmentResult(
+                session_id=message.session_id,
+                index=message.index,
+                label=message.label,
+                error=f"{type(e).__name__}: {e}",
+                elapsed=time.perf_counter() - start,
+            )
+
+
+async def fan_out_segments(agent: BaseAgent,
+                           session_id: str,
+                           segments: Sequence[Tuple[str, bytes]],
+                           instruction: str) -> List[VisualSegmentResult]:
+    """
+    并发分析多个片段并按序号汇总
+
+    参数:
+        agent: 发起请求的智能体（用于 send_message 与推送部分结果）
+        session_id: 会话ID
+        segments: (片段标签, 已编码图片) 列表，顺序即结果顺序
+        instruction: 每个片段共用的分析说明
+
+    返回:
+        按片段顺序排列的分析结果
+    """
+    total = len(segments)
+    semaphore = asyncio.Semaphore(max(1, settings.VISUAL_FANOUT_PARALLELISM))
+    target = session_agent_id(TopicTypes.VISUAL_SEGMENT_ANALYSIS, session_id)
+
+    async def analyze(index: int, label: str, data: bytes) -> VisualSegmentResult:
+        async with semaphore:
+            return await agent.send_message(
+                VisualSegmentRequest(
+                    session_id=session_id,
+                    index=index,
+                    total=total,
+                    label=label,
+                    image_data=base64.b64encode(data).decode("ascii"),
+                    instruction=instruction,
+                ),
+                target,
+            )
+
+    tasks = [asyncio.create_task(analyze(index, label, data)) for index, (label, data) in enumerate(segments)]
+    results: List[VisualSegmentResult] = [None] * total  # type: ignore[list-item]
+    try:
+        for completed, future in enumerate(asyncio.as_completed(tasks), start=1):
+            result = await future
+            results[result.index] = result
+            # 每完成一个片段就推送部分结果
+            status = "失败" if result.error else "完成"
+            await agent.send_response(
+                f"{result.label} 分析{status}（{completed}/{total}）",
+                session_id=session_id,
+                data={"segment": result.model_dump()},
+            )
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return results
+
+
+def merge_segment_results(results: List[VisualSegmentResult]) -> dict:
+    """
+    把各片段的分析结果按顺序合并为一份分析结果
+
+    Raises:
+        RuntimeError: 全部片段都分析失败
+    """
+    succeeded = [result for result in results if not result.error]
+    if not succeeded:
+        raise RuntimeError(f"全部 {len(results)} 个片段分析失败: {results[0].error if results else ''}")
+
+    return {
+        "description": "\n\n".join(f"【{result.label}】\n{result.content}" for result in succeeded),
+        "segments": [
+            {"index": result.index, "label": result.label, "content": result.content,
+             "error": result.error, "elapsed": round(result.elapsed, 3)}
+            for result in results
+        ],
+        "failed_segments": len(results) - len(succeeded),
+    }
@@ -1,19 +1,31 @@
-from datetime import datetime
-import uuid
-from venv import logger
-from autogen_core import BaseAgent, Image, MessageContext, TopicId, message_handler, type_subscription
-from pydantic import BaseModel
-from backend.app.core.llms import _get_uitars_model_client
-from backend.app.models.test_case import ImageAnalysisRequest, ImageAnalysisResponse, TestCaseGenerationRequest, VideoAnalysisRequest
+"""
+测试用例生成智能体
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
 
+from autogen_core import MessageContext, message_handler, type_subscription
 
-@type_subscription(topic_type="test_case_generator")
+from app.core.agents import BaseAgent, TopicTypes
+from app.core.config import settings
+from app.core.rate_limiter import llm_rate_limiter
+from app.core.prompts import prompt_registry
+from app.models.test_case import TestCaseBatch, TestCaseData, TestCaseGenerationRequest
+from app.utils.test_case_stream import TestCaseStreamParser, json_output_options, with_json_format
+
+logger = logging.getLogger(__name__)
+
+
+@type_subscription(topic_type=TopicTypes.TEST_CASE_GENERATOR)
 class TestCaseGeneratorAgent(BaseAgent):
     # 初始化智能体
-    def __init__(self, model_client_instance=None,gent_factory=None,
-                **kwargs):
-        pass
-    
+    def __init__(self, model_client_instance=None, agent_factory=None,
+                 **kwargs):
+        super().__init__(TopicTypes.TEST_CASE_GENERATOR, model_client_instance, **kwargs)
+        self.agent_factory = agent_factory
+
     # 使用装饰器激活启用该方法，使用该方法进行消息传递
     @message_handler
     async def handle_test_case_generation_request(
@@ -21,105 +33,185 @@ class TestCaseGeneratorAgent(BaseAgent):
         message: TestCaseGenerationRequest,
         ctx: MessageContext
     ) -> None:
-        
         try:
-            logger.info(f"开始生成用例: {message.session_id}")
-            
-            # 发送反馈消息到前端
-            await self.send_response(
-                f"开始生成用例: {message.image_name}",
-                region="process"
-                )
-
-            # 调用方法开始生成用例
-            analysis_result = await self._analyze_image(message)
+            logger.info("开始生成测试用例", extra={"session_id": message.session_id})
+            await self.send_response("开始生成测试用例", session_id=message.session_id)
 
-            # 调用方法，将图片分析结果包装成下一个智能体的请求发送到下一个智能体
-            test_cases = await self._generate_test_cases_from_image(analysis_result,message)
+            content, test_cases = await self._generate(message)
 
-            # 构建响应
-            response = ImageAnalysisResponse(
-                session_id=message.session_id,
-                image_name=message.image_name,
-                image_id=str(uuid.uuid4()),
-                analysis_result=analysis_result.model_dump(),
-                test_cases=test_cases,
-                processing_time=0.0,
-                created_at=datetime.now().isoformat()
-            )
+            data = {"test_cases": [case.model_dump(mode="json") for case in test_cases]}
+            if message.generation_config.get("auto_save") and test_cases:
+                data["saved"] = await self._save(message, test_cases)
 
-            # 发送反馈消息到前端
+            # 用例生成是当前工作流的最后一步，发送结束标记
             await self.send_response(
-                f"图片分析完成: {message.image_name}",
-                region="result"
-            ), 
-
-            # 发送到测试用例生成智能体
-            test_case_request = TestCaseGenerationRequest(
+                content,
                 session_id=message.session_id,
-                source_type="image",
-                source_data=response.model_dump(),
-                generation_cinfig={}
-            )
-            
-            # 发送测试内容请求消息到用例生成主题
-            await self.publish_message(
-                test_case_request,
-                topic_id=TopicId("test_case_generator"),
-                source=self.agent_id
+                region="result",
+                is_final=True,
+                data=data,
             )
-            logger.info(f"图片分析请求处理完成,接下来由测试用例生成智能体团队处理: {message.session_id}")
-            
-        except Exception as e:
-            logger.error(f"图片分析请求处理失败: {message.session_id}, 错误: {str(e)}")
-
+            logger.info("测试用例生成完成", extra={"session_id": message.session_id})
 
-    # 分析图片方法，加入图片格式校验
-    async def _analyze_image(self, message: ImageAnalysisRequest) -> Any:
-        """分析图片"""
+        except Exception as e:
+            logger.exception("测试用例生成失败", extra={"session_id": message.session_id})
+            await self.send_error(message.session_id, f"测试用例生成失败: {e}")
+
+    def _build_task(self, message: TestCaseGenerationRequest) -> str:
+        """把来源数据整理成生成任务"""
+        source_data = json.dumps(message.source_data, ensure_ascii=False, default=str)
+        if message.generation_config.get("mode") == "incremental":
+            return (
+                "需求发生了变更，以下只列出变化的章节（change 为 added 表示新增、modified 表示修改），"
+                "未列出的章节及其测试用例保持不变，不要为它们生成用例。\n"
+                "请只针对这些章节生成测试用例：修改的章节参考 existing_test_cases 修订原有用例并保留其编号（code），"
+                "新增的章节编写新用例；每条用例在 requirement_section 字段填写所属章节键（key）。\n"
+                f"{source_data}"
+            )
+        return f"请根据以下{message.source_type}分析结果生成测试用例:\n{source_data}"
+
+    async def _generate(self, message: TestCaseGenerationRequest) -> Tuple[str, List[TestCaseData]]:
+        """
+        调用模型生成结构化测试用例，并把流式输出转发到前端
+
+        输出过程中每解析出一条完整用例就单独推送一次（data.test_case），不必等待全部生成结束
+        """
+        from autogen_agentchat.base import TaskResult
+        from autogen_agentchat.messages import ModelClientStreamingChunkEvent
+
+        agent = self.agent_factory.create_assistant_agent(
+            name="test_case_generator",
+            system_message=with_json_format(prompt_registry.get("test_case_generator.txt")),
+            **json_output_options(self.model_client),
+        )
+
+        task = await self._with_reference(message, self._build_task(message))
+        parser = TestCaseStreamParser()
+        test_cases: List[TestCaseData] = []
+        batch = None
+        result = ""
+        async with llm_rate_limiter.limit(settings.MODEL_NAME):
+            async for event in agent.run_stream(task=task):
+                if isinstance(event, ModelClientStreamingChunkEvent):
+                    if event.content:
+                        await self.send_response(event.content, session_id=message.session_id)
+                        for case in parser.feed(event.content):
+                            test_cases.append(case)
+                            await self._send_test_case(message.session_id, case, len(test_cases))
+                elif isinstance(event, TaskResult):
+                    if event.messages:
+                        content = getattr(event.messages[-1], "content", "")
+                        if isinstance(content, TestCaseBatch):
+                            # json_schema 模式下最终消息是 StructuredMessage
+                            batch = content
+                            result = content.model_dump_json()
+                        else:
+                            result = content or ""
+
+        remaining = batch.test_cases if batch is not None and not parser.parsed else parser.finish()
+        for case in remaining:
+            test_cases.append(case)
+            await self._send_test_case(message.session_id, case, len(test_cases))
+        return result or parser.text, test_cases
+
+    async def _with_reference(self, message: TestCaseGenerationRequest, task: str) -> str:
+        """
+        检索项目中与来源数据相似的已有需求与用例，作为参考附加到任务末尾（RAG_ENABLED 且提供 project_id 时）
+
+        检索失败时返回原任务，不影响生成
+        """
+        project_id = message.generation_config.get("project_id")
+        if not settings.RAG_ENABLED or not project_id:
+            return task
+
+        from app.core.database import AsyncSessionLocal
+        from app.services.vector_index_service import VectorIndexService
+
+        query = json.dumps(message.source_data, ensure_ascii=False, default=str)
         try:
+            async with AsyncSessionLocal() as session:
+                context = await VectorIndexService(session).build_context(project_id, query)
+        except Exception:
+            logger.exception("检索相似用例失败", extra={"session_id": message.session_id})
+            return task
+        if not context:
+            return task
+        return (
+            f"{task}\n\n"
+            "项目中已存在以下相关内容，请不要重复编写已覆盖的用例，新用例也不要与其矛盾：\n"
+            f"{context}"
+        )
+
+    async def _send_test_case(self, session_id: str, case: TestCaseData, number: int) -> None:
+        await self.send_response(
+            f"已生成用例 {number}: {case.title}",
+            session_id=session_id,
+            data={"test_case": case.model_dump(mode="json")},
+        )
+
+    async def _save(self, message: TestCaseGenerationRequest, test_cases: List[TestCaseData]) -> Optional[Dict[str, Any]]:
+        """
+        把生成的用例批量入库（generation_config.auto_save），返回入库结果；未入库时返回 None
+
+        generation_config 需要提供 project_id 与 creator_id；增量生成时 replace_test_case_ids（被替换）与
+        removed_test_case_ids（所属章节已删除）中的旧用例在同一事务内标记为已废弃，入库成功后再记录需求版本快照
+        """
+        from app.core.database import AsyncSessionLocal
+        from app.services.test_case_ingest_service import TestCaseBulkIngestService
+
+        config = message.generation_config
+        if not config.get("project_id") or not config.get("creator_id"):
+            logger.warning("生成配置缺少 project_id / creator_id，跳过用例入库", extra={"session_id": message.session_id})
+            return None
 
-            image_path = message.image_path
-            image_extension = image_path.split(".")[-1] = Image.from_file(image_path)
-            if image_extension not in ["jpg", "jpeg", "png", "gif", "bmp", "webp", "ico", "tiff", "svg", "heic", "heif"]:
-                raise ValueError(f"不支持的图片格式: {image_extension}")    
-            
-            # 发送消息到前端
-            await self.send_response(
-                f"开始分析图片: {message.image_name}",
-                region="process"
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await TestCaseBulkIngestService(session).ingest(
+                    project_id=config["project_id"],
+                    creator_id=config["creator_id"],
+                    test_cases=test_cases,
+                    requirement_id=config.get("requirement_id"),
+                    deprecate_ids=list(config.get("replace_test_case_ids") or []) + list(config.get("removed_test_case_ids") or []),
                 )
-            
-            # 调用方法分析图片内容
-            analysis_result = await self._analy_image_content(image_path,message)
-
-
-            return analysis_result
         except Exception as e:
-            logger.error(f"图片分析失败: {str(e)}")
-            raise e
-
-    # 
-    async def _analy_image_content(self, image_path: str, message: ImageAnalysisRequest) -> None:
+            # 入库失败不影响生成结果的返回
+            logger.exception("测试用例入库失败", extra={"session_id": message.session_id})
+            await self.send_response(f"测试用例入库失败: {e}", session_id=message.session_id)
+            return None
+
+        await self.send_response(f"已保存 {len(result.ids)} 条测试用例", session_id=message.session_id)
+        if config.get("requirement_changes") and config.get("requirement_id"):
+            await self._record_requirement_version(message)
+        return result.to_dict()
+
+    async def _record_requirement_version(self, message: TestCaseGenerationRequest) -> None:
+        """
+        增量生成的用例入库后记录需求版本快照并更新改名章节的用例
+
+        失败时保留上一版本快照，下一次按需求变更生成时会重新比较这些章节
+        """
+        from app.core.database import SessionLocal
+        from app.services.requirement_regeneration_service import RequirementRegenerationService
+
+        config = message.generation_config
+        changes = config["requirement_changes"]
+
+        def record():
+            with SessionLocal() as db:
+                version = RequirementRegenerationService(db).apply_changes(
+                    config["requirement_id"],
+                    base_version=changes.get("base_version"),
+                    renamed_sections=changes.get("renamed_sections") or {},
+                    snapshot=changes.get("snapshot"),
+                    creator_id=config.get("creator_id"),
+                )
+                return version.version if version else None
 
         try:
-
-            # 获取UI-TARS模型客户端用于图像分析
-            uitars_model_client = _get_uitars_model_client()
-
-            # 使用AgentFactory创建图形分析智能体
-            agent = await self.agent_factory.create_agent(
-                agent_type="image_analysis",
-                model_client_instance= uitars_model_client
-            )
-
-            # 加载图片
-            image = Image.from_file(image_path)
-
-            # 调用智能体实例分析图片
-            analysis_result = await agent.run(task=message.image_path)
-
-            return analysis_result
+            version = await asyncio.to_thread(record)
         except Exception as e:
-            logger.error(f"图片分析失败: {str(e)}")
-            raise e
\ No newline at end of file
+            logger.exception("需求版本记录失败", extra={"session_id": message.session_id})
+            await self.send_response(f"需求版本记录失败: {e}", session_id=message.session_id)
+            return
+        if version is not None:
+            await self.send_response(f"已记录需求版本 {version}", session_id=message.session_id)
@@ -1,82 +1,195 @@
 '''
 视频解析智能体
 '''
+import logging
+from typing import List
 
+from autogen_core import MessageContext, message_handler, type_subscription
 
-import uuid
-from venv import logger
-from autogen_core import BaseAgent, MessageContext, TopicId, message_handler, type_subscription
-from pydantic import BaseModel
-from backend.app.models.test_case import VideoAnalysisRequest
+from app.core.agents import BaseAgent, EncodedImage, TopicTypes, session_topic
+from app.core.config import settings
+from app.core.llms import _get_uitars_model_client
+from app.core.rate_limiter import llm_rate_limiter
+from app.models.test_case import TestCaseGenerationRequest, VideoAnalysisRequest
+from app.utils.video_keyframes import Keyframe, extract_keyframes
+from app.agents.testcase.segment_analysis_agent import fan_out_segments, merge_segment_results
 
+logger = logging.getLogger(__name__)
 
-class VideoAnalysisResult(BaseModel):
+VIDEO_ANALYSIS_SYSTEM_MESSAGE = (
+    "你是一名资深的 UI 测试分析师。用户会提供从一段操作录屏中按场景变化提取的关键帧，每帧都标注了时间点。"
+    "请按时间顺序还原用户的操作流程，描述每个页面的结构、可交互元素以及页面之间的跳转关系，为后续编写测试用例提供依据。"
+)
 
-    pass
+VIDEO_SYNTHESIS_SYSTEM_MESSAGE = (
+    "你是一名资深的 UI 测试分析师。用户会提供一段操作录屏中各关键帧的逐帧分析结果，按时间顺序排列并标注了时间点。"
+    "请把它们串联起来：还原完整的操作流程，指出前后帧之间发生的操作、页面跳转与状态变化，"
+    "合并重复出现的页面，对逐帧分析中无法确定的跳转注明推断依据，为后续编写测试用例提供依据。"
+)
 
 
-
-@type_subscription(topic_type="video_analysis")
+@type_subscription(topic_type=TopicTypes.VIDEO_ANALYSIS)
 class VideoAnalyzerAgent(BaseAgent):
 
-    def __init__(self, model_client_instance=None,
-                **kwargs):
-        pass
-
-    def _initialize_ark_client(self):
-        pass
+    def __init__(self, model_client_instance=None, agent_factory=None,
+                 **kwargs):
+        super().__init__(TopicTypes.VIDEO_ANALYSIS, model_client_instance, **kwargs)
+        self.agent_factory = agent_factory
 
     @message_handler
     async def handle_video_analysis_request(
-        sefl,
+        self,
         message: VideoAnalysisRequest,
         ctx: MessageContext
     ) -> None:
-        
         try:
-            logger.info(f"开始处理视频分析请求: {message.session_id}")
-            
-            await self.send_response(
-                f"开始分析视频: {message.video_name}",
-                region="process"
-                )
+            logger.info("开始处理视频分析请求", extra={"session_id": message.session_id})
+            await self.send_response(f"开始分析视频: {message.video_name}", session_id=message.session_id)
 
             # 分析视频
             analysis_result = await self._analyze_video(message)
 
-            # 生成测试用例
-            test_cases = await self._generate_test_cases_from_video(analysis_result,message)
-
-            # 构建响应
-            response = VideoAnalysisResponse(
-                session_id=message.session_id,
-                video_name=message.video_name,
-                video_id=str(uuid.uuid4()),
-                analysis_result=analysis_result.model_dump(),
-                test_cases=test_cases,
-                processing_time=0.0,
-                created_at=datetime.now().isoformat()
-            )
-
             await self.send_response(
                 f"视频分析完成: {message.video_name}",
-                region="result"
-            ), 
-
-            # 发送到测试用例生成智能体
-            test_case_request = TestCaseGenerationRequest(
                 session_id=message.session_id,
-                source_type="video",
-                source_data=response.model_dump(),
-                generation_cinfig={}
+                region="result",
+                data=analysis_result,
             )
 
+            # 发送到本会话的测试用例生成智能体
             await self.publish_message(
-                test_case_request,
-                topic_id=TopicId("test_case_generator"),
-                source=self.agent_id
+                TestCaseGenerationRequest(
+                    session_id=message.session_id,
+                    source_type="video",
+                    source_data={
+                        "video_name": message.video_name,
+                        "analysis_result": analysis_result,
+                    },
+                ),
+                topic_id=session_topic(TopicTypes.TEST_CASE_GENERATOR, message.session_id),
             )
-            logger.info(f"视频分析请求处理完成: {message.session_id}")
-            
+            logger.info("视频分析请求处理完成", extra={"session_id": message.session_id})
+
         except Exception as e:
-            pass
\ No newline at end of file
+            logger.exception("视频分析请求处理失败", extra={"session_id": message.session_id})
+            await self.send_error(message.session_id, f"视频分析失败: {e}")
+
+    async def _analyze_video(self, message: VideoAnalysisRequest) -> dict:
+        """提取关键帧并交给视觉模型分析"""
+        keyframes, stats = await extract_keyframes(message.video_path, settings.UITARS_MODEL)
+        if not keyframes:
+            raise ValueError("未能从视频中提取到任何帧")
+
+        await self.send_response(
+            f"已提取 {len(keyframes)} 个关键帧（采样 {stats['sampled_frames']} 帧）",
+            session_id=message.session_id,
+            data={"keyframes": [keyframe.layout() for keyframe in keyframes]},
+        )
+
+        if len(keyframes) > 1:
+            # 各关键帧并发分析，再按时间顺序汇总一次，补上跨帧的操作与跳转关系
+            results = await fan_out_segments(
+                self,
+                message.session_id,
+                [(f"关键帧 {number} @ {keyframe.timecode}", keyframe.data)
+                 for number, keyframe in enumerate(keyframes, start=1)],
+                self._build_segment_instruction(message, len(keyframes)),
+            )
+            merged = merge_segment_results(results)
+            frames = merged.pop("description")
+            content = await self._synthesize(message, frames, len(keyframes)) or frames
+        else:
+            merged = {}
+            content = await self._analyze_keyframes(message, keyframes)
+        return {
+            "description": content,
+            "video_description": message.video_description,
+            "analysis_target": message.analysis_target,
+            "keyframes": [keyframe.layout() for keyframe in keyframes],
+            "extraction": stats,
+            **merged,
+        }
+
+    def _build_segment_instruction(self, message: VideoAnalysisRequest, total: int) -> str:
+        instruction = f"这是视频《{message.video_name}》按时间顺序提取的 {total} 个关键帧之一，请分析该帧对应的页面与操作状态。"
+        if message.video_description:
+            instruction += f"\n视频说明: {message.video_description}"
+        if message.analysis_target:
+            instruction += f"\n分析目标: {message.analysis_target}"
+        return instruction
+
+    def _build_synthesis_task(self, message: VideoAnalysisRequest, frames: str, total: int) -> str:
+        task = f"以下是视频《{message.video_name}》按时间顺序提取的 {total} 个关键帧的逐帧分析结果。"
+        if message.video_description:
+            task += f"\n视频说明: {message.video_description}"
+        if message.analysis_target:
+            task += f"\n分析目标: {message.analysis_target}"
+        return f"{task}\n\n{frames}"
+
+    async def _synthesize(self, message: VideoAnalysisRequest, frames: str, total: int) -> str:
+        """
+        把按时间顺序排列的逐帧分析交给文本模型汇总为完整的操作流程，并把流式输出转发到前端
+
+        返回:
+            汇总结果；模型调用失败时返回空字符串，由调用方退回逐帧分析的拼接结果
+        """
+        from autogen_agentchat.base import TaskResult
+        from autogen_agentchat.messages import ModelClientStreamingChunkEvent
+
+        await self.send_response("正在汇总各关键帧的分析结果", session_id=message.session_id)
+        agent = self.agent_factory.create_assistant_agent(
+            name="video_synthesizer",
+            system_message=VIDEO_SYNTHESIS_SYSTEM_MESSAGE,
+            model_client=self.model_client,
+        )
+        result = ""
+        try:
+            async with llm_rate_limiter.limit(settings.MODEL_NAME):
+                async for event in agent.run_stream(task=self._build_synthesis_task(message, frames, total)):
+                    if isinstance(event, ModelClientStreamingChunkEvent):
+                        if event.content:
+                            await self.send_response(event.content, session_id=message.session_id)
+                    elif isinstance(event, TaskResult):
+                        if event.messages:
+                            result = getattr(event.messages[-1], "content", "") or ""
+        except Exception:
+            logger.exception("关键帧分析汇总失败，使用逐帧分析结果", extra={"session_id": message.session_id})
+            return ""
+        return result if isinstance(result, str) else str(result)
+
+    def _build_task_content(self, message: VideoAnalysisRequest, keyframes: List[Keyframe]) -> list:
+        """文字说明与关键帧交替排列，每帧前标注时间点"""
+        header = f"以下是视频《{message.video_name}》按时间顺序提取的 {len(keyframes)} 个关键帧。"
+        if message.video_description:
+            header += f"\n视频说明: {message.video_description}"
+        if message.analysis_target:
+            header += f"\n分析目标: {message.analysis_target}"
+
+        content: list = [header]
+        for number, keyframe in enumerate(keyframes, start=1):
+            content.append(f"关键帧 {number} @ {keyframe.timecode}")
+            content.append(EncodedImage(keyframe.data))
+        return content
+
+    async def _analyze_keyframes(self, message: VideoAnalysisRequest, keyframes: List[Keyframe]) -> str:
+        """调用视觉模型分析关键帧，并把流式输出转发到前端"""
+        from autogen_agentchat.base import TaskResult
+        from autogen_agentchat.messages import ModelClientStreamingChunkEvent, MultiModalMessage
+
+        agent = self.agent_factory.create_assistant_agent(
+            name="video_analyst",
+            system_message=VIDEO_ANALYSIS_SYSTEM_MESSAGE,
+            model_client=_get_uitars_model_client(),
+        )
+        task = MultiModalMessage(content=self._build_task_content(message, keyframes), source="user")
+
+        result = ""
+        async with llm_rate_limiter.limit(settings.UITARS_MODEL):
+            async for event in agent.run_stream(task=task):
+                if isinstance(event, ModelClientStreamingChunkEvent):
+                    if event.content:
+                        await self.send_response(event.content, session_id=message.session_id)
+                elif isinstance(event, TaskResult):
+                    if event.messages:
+                        result = getattr(event.messages[-1], "content", "") or ""
+        return result
@@ -1,19 +1,21 @@
 import uuid
-import os
+import logging
 from datetime import datetime
 from typing import Optional, List, Dict
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from autogen_agentchat.agents import AssistantAgent
-from autogen_agentchat.messages import ModelClientStreamingChunkEvent
-
 from utils.sse_stream_service import SSEStreamService
 from app.utils.deps import get_current_user
 from app.models.user import User
 from app.core.config import settings
 from app.core.llms import _deepseek_model_client
+from app.core.metrics import StreamMetrics, LLMCallTracker, register_session_store
+from app.core.logger import bind_session_id
+from app.core.prompts import prompt_registry
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -23,10 +25,13 @@ active_sessions: Dict[str, Dict] = {}
 # 存储会话历史记录的字典
 session_histories: Dict[str, List[Dict]] = {}
 
+register_session_store("ai_chat.active_sessions", active_sessions)
+register_session_store("ai_chat.session_histories", session_histories)
+
 
 def load_prompt_from_file(filename: str) -> str:
     """
-    从文件中加载提示词
+    从提示词注册表加载提示词（未缓存时读取文件）
 
     Args:
         filename: 提示词文件名（不包含路径）
@@ -38,38 +43,19 @@ def load_prompt_from_file(filename: str) -> str:
         HTTPException: 当文件不存在或读取失败时
     """
     try:
-        # 构建文件路径
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        prompts_dir = os.path.join(current_dir, "..", "prompts")
-        file_path = os.path.join(prompts_dir, filename)
-
-        # 规范化路径
-        file_path = os.path.normpath(file_path)
-
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            raise HTTPException(
-                status_code=500,
-                detail=f"提示词文件不存在: {filename}"
-            )
-
-        # 读取文件内容
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-
-        if not content:
-            raise HTTPException(
-                status_code=500,
-                detail=f"提示词文件为空: {filename}"
-            )
-
-        print(f"✅ 成功加载提示词文件: {filename}")
-        return content
-
-    except HTTPException:
-        raise
+        return prompt_registry.get(filename)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=500,
+            detail=f"提示词文件不存在: {filename}"
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=500,
+            detail=f"提示词文件为空: {filename}"
+        )
     except Exception as e:
-        print(f"❌ 加载提示词文件失败: {filename}, 错误: {str(e)}")
+        logger.exception("加载提示词文件失败: %s", filename)
         raise HTTPException(
             status_code=500,
             detail=f"加载提示词文件失败: {str(e)}"
@@ -139,6 +125,8 @@ async def send_message(
     发送聊天消息到AI助手（非流式），使用 autogen
     """
     try:
+        from autogen_agentchat.agents import AssistantAgent
+
         # 创建模型客户端
         model_client = _deepseek_model_client()
 
@@ -189,6 +177,7 @@ async def send_stream_message(
 
         # 生成会话ID
         session_id = request.session_id or str(uuid.uuid4())
+        bind_session_id(session_id)
 
         # 记录当前时间
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -209,6 +198,8 @@ async def send_stream_message(
     async def create_assistant_agent():
         """创建AI助手智能体"""
         try:
+            from autogen_agentchat.agents import AssistantAgent
+
             model_client = _deepseek_model_client()
 
             # 从文件加载系统消息
@@ -227,15 +218,18 @@ async def send_stream_message(
             )
             return agent
         except Exception as e:
-            print(f"❌ 智能体创建失败: {str(e)}")
-            print(f"❌ 错误类型: {type(e)}")
-            import traceback
-            print(f"❌ 错误堆栈: {traceback.format_exc()}")
+            logger.exception("智能体创建失败")
             raise HTTPException(status_code=500, detail=f"智能体创建失败: {str(e)}")
 
     async def run_agent_stream():
         """运行智能体并获取流式输出"""
+        stream_metrics = StreamMetrics("ai_chat")
+        llm_tracker = LLMCallTracker(settings.MODEL_NAME)
+        outcome = "disconnected"
+        bind_session_id(session_id)
         try:
+            from autogen_agentchat.messages import ModelClientStreamingChunkEvent
+
             agent = await create_assistant_agent()
 
             # 创建SSE流式服务
@@ -253,7 +247,10 @@ async def send_stream_message(
                     # 发送每个chunk
                     if event.content:
                         accumulated_content += event.content
+                        stream_metrics.on_chunk()
                         yield sse_service.create_chunk_message(event.content, "api_test_assistant")
+                else:
+                    llm_tracker.observe_event(event)
 
             # 发送完成消息
             yield sse_service.create_done_message(accumulated_content)
@@ -266,23 +263,25 @@ async def send_stream_message(
             if session_id in active_sessions:
                 active_sessions[session_id]["status"] = "completed"
                 active_sessions[session_id]["end_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            outcome = "completed"
 
         except HTTPException:
+            outcome = "error"
             raise
         except Exception as e:
+            outcome = "error"
             # 更新会话状态为错误
             if session_id in active_sessions:
                 active_sessions[session_id]["status"] = "error"
                 active_sessions[session_id]["error"] = str(e)
-            print(f"❌ 智能体运行失败: {str(e)}")
-            print(f"❌ 错误类型: {type(e)}")
-            import traceback
-            print(f"❌ 错误堆栈: {traceback.format_exc()}")
+            logger.exception("智能体运行失败")
 
             # 发送错误消息
             sse_service = SSEStreamService()
             yield sse_service.create_error_message(f"智能体运行失败: {str(e)}")
             raise HTTPException(status_code=500, detail=f"智能体运行失败: {str(e)}")
+        finally:
+            stream_metrics.finish(outcome)
 
     return StreamingResponse(
         run_agent_stream(),
@@ -0,0 +1,106 @@
+import uuid
+import logging
+from typing import AsyncGenerator, Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.logger import bind_session_id
+from app.models.user import User
+from app.services.requirement_regeneration_service import RequirementRegenerationService
+from app.utils.deps import get_current_active_user
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+_orchestrator = None
+
+
+def get_orchestrator():
+    """首次使用时创建编排器：编排器依赖 autogen 运行时，不在应用启动时导入（由启动预热提前加载）"""
+    global _orchestrator
+    if _orchestrator is None:
+        from app.core.orchestrator_service import TestCaseOrchestrator
+
+        _orchestrator = TestCaseOrchestrator()
+    return _orchestrator
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # 禁用 Nginx 缓冲
+}
+
+
+class RequirementRegenerateRequest(BaseModel):
+    """按需求变更增量生成测试用例请求"""
+    session_id: Optional[str] = Field(default=None, description="会话 ID")
+    dry_run: bool = Field(default=False, description="只返回变更计划，不生成用例")
+
+
+async def stream_workflow(session_id: str) -> AsyncGenerator[str, None]:
+    """
+    把会话的智能体输出转换为 SSE
+
+    客户端断开时只停止读取（关闭响应队列），工作流继续运行到入库完成；
+    运行时租约由编排器在收到结束标记或会话超时后归还
+    """
+    async for response in get_orchestrator().stream(session_id, timeout=settings.AGENT_SESSION_TIMEOUT):
+        yield f"data: {response.model_dump_json()}\n\n"
+
+
+@router.post("/requirements/{requirement_id}/regenerate", summary="按需求变更增量生成测试用例")
+async def regenerate_requirement_test_cases(
+    requirement_id: int,
+    request_data: RequirementRegenerateRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    按需求变更增量生成测试用例
+
+    与上一次生成时的需求版本逐章节比较，只把新增、修改的章节及其关联用例发送给生成智能体，
+    未变化章节的用例保持不变；已删除章节的用例标记为已废弃。
+    生成的用例入库成功后才记录新的需求版本，生成或入库失败时下一次仍按原版本比较
+
+    参数:
+        requirement_id: 需求ID
+        request_data: dry_run 为 true 时只返回变更计划
+
+    返回:
+        变更计划（dry_run 或没有变化时），否则为 SSE 格式的生成过程
+    """
+    service = RequirementRegenerationService(db)
+    plan = service.build_plan(requirement_id)
+    if request_data.dry_run or plan.is_empty:
+        return {"plan": plan.summary(), "started": False}
+    if not plan.needs_generation:
+        # 只删除了章节：直接废弃对应用例并记录新版本
+        version = service.apply_plan(plan, creator_id=current_user.id)
+        return {"plan": plan.summary(), "started": False, "version": version.version if version else None}
+
+    session_id = request_data.session_id or str(uuid.uuid4())
+    bind_session_id(session_id)
+    logger.info(
+        "按需求变更增量生成测试用例",
+        extra={
+            "session_id": session_id,
+            "requirement_id": requirement_id,
+            "changed_sections": len(plan.changed),
+            "affected_test_cases": len(plan.affected_case_ids),
+        },
+    )
+
+    # 版本快照与用例废弃在生成的用例入库成功后由生成智能体落库
+    await get_orchestrator().generate_test_cases(service.build_generation_request(plan, session_id, creator_id=current_user.id))
+
+    return StreamingResponse(
+        stream_workflow(session_id),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
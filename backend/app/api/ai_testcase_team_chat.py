@@ -1,34 +1,68 @@
+import re
 import uuid
-import os
+import asyncio
+import logging
 from datetime import datetime
-from typing import Optional, List, Dict, AsyncGenerator
+from typing import Optional, List, Dict, Literal, AsyncGenerator, TYPE_CHECKING
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from autogen_agentchat.agents import AssistantAgent
-from autogen_agentchat.teams import RoundRobinGroupChat
-from autogen_agentchat.conditions import SourceMatchTermination, TextMentionTermination, ExternalTermination
-from autogen_agentchat.messages import ModelClientStreamingChunkEvent
-
+from app.core.config import settings
 from app.core.llms import _deepseek_model_client
+from app.core.metrics import StreamMetrics, LLMCallTracker, register_session_store
+from app.core.logger import bind_session_id
+from app.core.prompts import prompt_registry
+from app.core.rate_limiter import llm_rate_limiter
+from app.utils.test_case_stream import TestCaseStreamParser, json_output_options, with_json_format
 from utils.sse_stream_service import SSEStreamService
 
+# autogen 只在首次处理请求时导入，见 app.core.warmup
+if TYPE_CHECKING:
+    from autogen_agentchat.agents import AssistantAgent
+    from autogen_agentchat.teams import RoundRobinGroupChat
+    from autogen_agentchat.conditions import ExternalTermination
+    from autogen_core import CancellationToken
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # 全局会话存储
 active_sessions: Dict[str, Dict] = {}
 
 # 团队会话存储
-team_sessions: Dict[str, RoundRobinGroupChat] = {}
+team_sessions: Dict[str, "RoundRobinGroupChat"] = {}
 
 # 外部终止控制存储
-external_terminations: Dict[str, ExternalTermination] = {}
+external_terminations: Dict[str, "ExternalTermination"] = {}
+
+# 并行模式的取消令牌存储（停止接口使用）
+parallel_cancellations: Dict[str, "CancellationToken"] = {}
+
+register_session_store("testcase_team.active_sessions", active_sessions)
+register_session_store("testcase_team.team_sessions", team_sessions)
+register_session_store("testcase_team.external_terminations", external_terminations)
+register_session_store("testcase_team.parallel_cancellations", parallel_cancellations)
+
+# 视角名称即 app/prompts 下的提示词文件名（不含 .txt）
+PERSPECTIVE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+MERGER_AGENT_NAME = "test_case_merger"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # 禁用 Nginx 缓冲
+    "Transfer-Encoding": "chunked",  # 启用分块传输
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization",
+}
 
 
 def load_prompt_from_file(filename: str) -> str:
     """
-    从文件中加载提示词
+    从提示词注册表加载提示词（未缓存时读取文件）
     
     Args:
         filename: 提示词文件名（不包含路径）
@@ -40,40 +74,21 @@ def load_prompt_from_file(filename: str) -> str:
         HTTPException: 当文件不存在或读取失败时
     """
     try:
-        # 构建文件路径
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        prompts_dir = os.path.join(current_dir, "..", "prompts")
-        file_path = os.path.join(prompts_dir, filename)
-        
-        # 规范化路径
-        file_path = os.path.normpath(file_path)
-        
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            raise HTTPException(
-                status_code=500, 
-                detail=f"提示词文件不存在: {filename}"
-            )
-        
-        # 读取文件内容
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            
-        if not content:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"提示词文件为空: {filename}"
-            )
-            
-        print(f"✅ 成功加载提示词文件: {filename}")
-        return content
-        
-    except HTTPException:
-        raise
+        return prompt_registry.get(filename)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=500,
+            detail=f"提示词文件不存在: {filename}"
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=500,
+            detail=f"提示词文件为空: {filename}"
+        )
     except Exception as e:
-        print(f"❌ 加载提示词文件失败: {filename}, 错误: {str(e)}")
+        logger.exception("加载提示词文件失败: %s", filename)
         raise HTTPException(
-            status_code=500, 
+            status_code=500,
             detail=f"加载提示词文件失败: {str(e)}"
         )
 
@@ -90,6 +105,18 @@ class TestCaseTeamRequest(BaseModel):
     file_ids: Optional[List[str]] = Field(default=None, description="已解析文件的 ID 列表")
     is_feedback: bool = Field(default=False, description="是否为反馈消息")
     target_agent: Optional[str] = Field(default=None, description="目标智能体名称（用于反馈）")
+    mode: Literal["round_robin", "parallel"] = Field(
+        default="round_robin",
+        description="团队模式：round_robin 为生成、评审、优化依次进行；parallel 为多视角并发生成后合并评审",
+    )
+    perspectives: Optional[List[str]] = Field(
+        default=None,
+        description="并行模式使用的视角（app/prompts 下的提示词名称），默认取 TEAM_PARALLEL_PERSPECTIVES",
+    )
+    output_format: Literal["text", "json"] = Field(
+        default="text",
+        description="输出格式：json 时生成（合并）智能体输出结构化用例，并逐条推送 test_case 事件",
+    )
 
     model_config = {
         "json_schema_extra": {
@@ -100,7 +127,10 @@ class TestCaseTeamRequest(BaseModel):
                 "stream": True,
                 "additional_context": "这是一个Web应用的登录功能",
                 "is_feedback": False,
-                "target_agent": None
+                "target_agent": None,
+                "mode": "round_robin",
+                "perspectives": None,
+                "output_format": "text"
             }
         }
     }
@@ -115,15 +145,24 @@ class TestCaseTeamResponse(BaseModel):
     done: bool
 
 
-async def create_test_case_generator_agent(session_id: str, additional_context: Optional[str] = None) -> AssistantAgent:
+async def create_test_case_generator_agent(
+    session_id: str,
+    additional_context: Optional[str] = None,
+    output_format: str = "text"
+) -> "AssistantAgent":
     """创建测试用例生成智能体"""
     try:
-        model_client = _deepseek_model_client()
+        from autogen_agentchat.agents import AssistantAgent
+
+        model_options = {"model_client": _deepseek_model_client()}
 
         # 从文件加载系统消息
         system_message = load_prompt_from_file("test_case_generator.txt")
 
-
+        # 结构化输出时追加 JSON 格式说明
+        if output_format == "json":
+            system_message = with_json_format(system_message)
+            model_options = json_output_options()
 
         # 如果有附加上下文，添加到系统消息中
         if additional_context:
@@ -131,23 +170,22 @@ async def create_test_case_generator_agent(session_id: str, additional_context:
 
         agent1 = AssistantAgent(
             name="test_case_generator",
-            model_client=model_client,
             system_message=system_message,
             reflect_on_tool_use=True,
             model_client_stream=True,
+            **model_options,
         )
         return agent1
     except Exception as e:
-        print(f"❌ 测试用例生成智能体创建失败: {str(e)}")
-        print(f"❌ 错误类型: {type(e)}")
-        import traceback
-        print(f"❌ 错误堆栈: {traceback.format_exc()}")
+        logger.exception("测试用例生成智能体创建失败")
         raise HTTPException(status_code=500, detail=f"智能体创建失败: {str(e)}")
 
 
-async def create_test_case_reviewer_agent(session_id: str, additional_context: Optional[str] = None) -> AssistantAgent:
+async def create_test_case_reviewer_agent(session_id: str, additional_context: Optional[str] = None) -> "AssistantAgent":
     """创建测试用例评审智能体"""
     try:
+        from autogen_agentchat.agents import AssistantAgent
+
         model_client = _deepseek_model_client()
 
         # 从文件加载系统消息
@@ -168,16 +206,15 @@ async def create_test_case_reviewer_agent(session_id: str, additional_context: O
         )
         return agent2
     except Exception as e:
-        print(f"❌ 测试用例评审智能体创建失败: {str(e)}")
-        print(f"❌ 错误类型: {type(e)}")
-        import traceback
-        print(f"❌ 错误堆栈: {traceback.format_exc()}")
+        logger.exception("测试用例评审智能体创建失败")
         raise HTTPException(status_code=500, detail=f"智能体创建失败: {str(e)}")
 
 
-async def create_test_case_optimizer_agent(session_id: str, additional_context: Optional[str] = None) -> AssistantAgent:
+async def create_test_case_optimizer_agent(session_id: str, additional_context: Optional[str] = None) -> "AssistantAgent":
     """创建测试用例优化智能体"""
     try:
+        from autogen_agentchat.agents import AssistantAgent
+
         model_client = _deepseek_model_client()
 
         # 从文件加载系统消息
@@ -198,22 +235,105 @@ async def create_test_case_optimizer_agent(session_id: str, additional_context:
         )
         return agent3
     except Exception as e:
-        print(f"❌ 测试用例优化智能体创建失败: {str(e)}")
-        print(f"❌ 错误类型: {type(e)}")
-        import traceback
-        print(f"❌ 错误堆栈: {traceback.format_exc()}")
+        logger.exception("测试用例优化智能体创建失败")
         raise HTTPException(status_code=500, detail=f"智能体创建失败: {str(e)}")
 
 
 
+async def create_perspective_agent(perspective: str, additional_context: Optional[str] = None) -> "AssistantAgent":
+    """创建并行模式的视角智能体，系统消息取自同名提示词文件"""
+    try:
+        from autogen_agentchat.agents import AssistantAgent
+
+        system_message = load_prompt_from_file(f"{perspective}.txt")
+        if additional_context:
+            system_message += f"\n\n当前上下文：{additional_context}"
+
+        return AssistantAgent(
+            name=perspective,
+            model_client=_deepseek_model_client(),
+            system_message=system_message,
+            model_client_stream=True,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("视角智能体创建失败: %s", perspective)
+        raise HTTPException(status_code=500, detail=f"智能体创建失败: {str(e)}")
+
+
+async def create_test_case_merger_agent(
+    additional_context: Optional[str] = None,
+    output_format: str = "text"
+) -> "AssistantAgent":
+    """创建并行模式的合并评审智能体"""
+    try:
+        from autogen_agentchat.agents import AssistantAgent
+
+        model_options = {"model_client": _deepseek_model_client()}
+        system_message = load_prompt_from_file(settings.TEAM_MERGE_PROMPT)
+        if output_format == "json":
+            system_message = with_json_format(system_message)
+            model_options = json_output_options()
+        if additional_context:
+            system_message += f"\n\n当前上下文：{additional_context}"
+
+        return AssistantAgent(
+            name=MERGER_AGENT_NAME,
+            system_message=system_message,
+            model_client_stream=True,
+            **model_options,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("合并评审智能体创建失败")
+        raise HTTPException(status_code=500, detail=f"智能体创建失败: {str(e)}")
+
+
+def resolve_perspectives(perspectives: Optional[List[str]]) -> List[str]:
+    """校验并行模式的视角列表，未指定时使用配置的默认视角"""
+    names = perspectives or [item.strip() for item in settings.TEAM_PARALLEL_PERSPECTIVES.split(",") if item.strip()]
+    names = list(dict.fromkeys(names))
+    if not names:
+        raise HTTPException(status_code=400, detail="并行模式至少需要一个视角")
+    for name in names:
+        if not PERSPECTIVE_NAME_PATTERN.match(name) or name == MERGER_AGENT_NAME:
+            raise HTTPException(status_code=400, detail=f"无效的视角名称: {name}")
+        try:
+            prompt_registry.get(f"{name}.txt")
+        except (FileNotFoundError, ValueError):
+            raise HTTPException(status_code=400, detail=f"视角提示词不存在: {name}")
+    return names
+
+
+def build_merge_task(user_message: str, branch_results: Dict[str, str]) -> str:
+    """把原始需求与各视角的输出整理为合并任务"""
+    sections = [f"## 原始需求\n{user_message}"]
+    for name, content in branch_results.items():
+        sections.append(f"## 视角：{name}\n{content}")
+    return "\n\n".join(sections)
+
+
 async def run_team_stream(
-    team: RoundRobinGroupChat,
+    team: "RoundRobinGroupChat",
     user_message: str,
-    session_id: str
+    session_id: str,
+    parse_agent: Optional[str] = None
 ) -> AsyncGenerator[str, None]:
-    """运行团队流式对话"""
+    """
+    运行团队流式对话
+
+    指定 parse_agent 时增量解析该智能体输出的结构化用例，每解析出一条推送一次 test_case 事件
+    """
+    stream_metrics = StreamMetrics("testcase_team")
+    llm_tracker = LLMCallTracker(settings.MODEL_NAME)
+    outcome = "disconnected"
+    bind_session_id(session_id)
     try:
-        print(f"🚀 开始团队流式对话，会话ID: {session_id}")
+        from autogen_agentchat.messages import ModelClientStreamingChunkEvent
+
+        logger.info("开始团队流式对话")
 
         # 创建SSE流式服务
         sse_service = SSEStreamService(session_id)
@@ -224,6 +344,7 @@ async def run_team_stream(
         # 累积响应内容（用于保存历史记录）
         accumulated_content = ""
         current_agent = None
+        parser = TestCaseStreamParser() if parse_agent else None
 
         # 运行团队并获取流式响应
         async for event in team.run_stream(task=user_message):
@@ -250,7 +371,11 @@ async def run_team_stream(
                     # 发送chunk消息
                     if chunk_content:
                         accumulated_content += chunk_content
+                        stream_metrics.on_chunk()
                         yield sse_service.create_chunk_message(chunk_content, agent_name)
+                        if parser and agent_name == parse_agent:
+                            for case in parser.feed(chunk_content):
+                                yield sse_service.create_test_case_message(case.model_dump(mode="json"), agent_name)
 
             # 处理任务结果（对话结束）
             elif hasattr(event, '__class__') and 'TaskResult' in str(type(event)):
@@ -258,21 +383,159 @@ async def run_team_stream(
                 if current_agent:
                     yield sse_service.create_agent_done_message(current_agent, "")
 
+                if parser:
+                    for case in parser.finish():
+                        yield sse_service.create_test_case_message(case.model_dump(mode="json"), parse_agent)
+
                 # 发送完成消息
                 yield sse_service.create_done_message("测试用例生成完成")
                 break
 
-        print(f"✅ 团队流式对话完成，会话ID: {session_id}")
+            else:
+                llm_tracker.observe_event(event)
+
+        outcome = "completed"
+        logger.info("团队流式对话完成", extra={"chunks": stream_metrics.chunks})
 
     except Exception as e:
-        print(f"❌ 团队流式对话运行失败: {str(e)}")
-        import traceback
-        print(f"❌ 错误堆栈: {traceback.format_exc()}")
+        outcome = "error"
+        logger.exception("团队流式对话运行失败")
 
         # 使用SSE服务创建错误消息
         sse_service = SSEStreamService(session_id)
         yield sse_service.create_error_message(f"团队对话运行失败: {str(e)}")
 
+    finally:
+        stream_metrics.finish(outcome)
+
+
+async def run_parallel_team_stream(
+    perspective_agents: List["AssistantAgent"],
+    merger_agent: "AssistantAgent",
+    user_message: str,
+    session_id: str,
+    parse_merged: bool = False
+) -> AsyncGenerator[str, None]:
+    """
+    运行并行模式的团队流式对话
+
+    各视角智能体并发生成，输出按到达顺序交错推送（每个 chunk 带智能体名称）；
+    全部结束后由合并智能体汇总评审。某个视角失败时其余视角照常进行。
+    parse_merged 为 True 时增量解析合并智能体输出的结构化用例，逐条推送 test_case 事件
+    """
+    from autogen_agentchat.base import TaskResult
+    from autogen_agentchat.messages import ModelClientStreamingChunkEvent
+    from autogen_core import CancellationToken
+
+    stream_metrics = StreamMetrics("testcase_team_parallel")
+    llm_tracker = LLMCallTracker(settings.MODEL_NAME)
+    outcome = "disconnected"
+    bind_session_id(session_id)
+
+    cancellation_token = CancellationToken()
+    parallel_cancellations[session_id] = cancellation_token
+    sse_service = SSEStreamService(session_id)
+    queue: asyncio.Queue = asyncio.Queue()
+    branch_done = object()
+    branch_results: Dict[str, str] = {}
+
+    async def run_branch(agent: "AssistantAgent") -> None:
+        try:
+            async with llm_rate_limiter.limit(settings.MODEL_NAME):
+                async for event in agent.run_stream(task=user_message, cancellation_token=cancellation_token):
+                    await queue.put((agent.name, event))
+        except Exception as e:
+            logger.exception("视角生成失败: %s", agent.name)
+            await queue.put((agent.name, e))
+        finally:
+            await queue.put((agent.name, branch_done))
+
+    tasks: List[asyncio.Task] = []
+    try:
+        logger.info("开始并行团队流式对话", extra={"perspectives": [agent.name for agent in perspective_agents]})
+        yield sse_service.create_status_message(f"🤖 {len(perspective_agents)} 个视角正在并行生成测试用例...")
+
+        for agent in perspective_agents:
+            yield sse_service.create_agent_start_message(agent.name)
+        tasks = [asyncio.create_task(run_branch(agent)) for agent in perspective_agents]
+
+        pending = len(tasks)
+        while pending:
+            agent_name, event = await queue.get()
+            if event is branch_done:
+                pending -= 1
+                yield sse_service.create_agent_done_message(agent_name, "")
+            elif isinstance(event, Exception):
+                yield sse_service.create_error_message(f"{agent_name} 生成失败: {str(event)}")
+            elif isinstance(event, ModelClientStreamingChunkEvent):
+                if event.content:
+                    stream_metrics.on_chunk()
+                    yield sse_service.create_chunk_message(event.content, agent_name)
+            elif isinstance(event, TaskResult):
+                if event.messages:
+                    content = getattr(event.messages[-1], "content", "")
+                    if isinstance(content, str) and content:
+                        branch_results[agent_name] = content
+            else:
+                llm_tracker.observe_event(event)
+
+        # 停止接口取消令牌后各视角以 CancelledError 结束，不再进入合并
+        if cancellation_token.is_cancelled():
+            outcome = "stopped"
+            yield sse_service.create_done_message("团队对话已停止")
+            return
+
+        if not branch_results:
+            raise RuntimeError("全部视角生成失败")
+
+        # 合并评审
+        yield sse_service.create_agent_start_message(merger_agent.name)
+        parser = TestCaseStreamParser() if parse_merged else None
+        try:
+            async with llm_rate_limiter.limit(settings.MODEL_NAME):
+                async for event in merger_agent.run_stream(
+                    task=build_merge_task(user_message, branch_results),
+                    cancellation_token=cancellation_token,
+                ):
+                    if isinstance(event, ModelClientStreamingChunkEvent):
+                        if event.content:
+                            stream_metrics.on_chunk()
+                            yield sse_service.create_chunk_message(event.content, merger_agent.name)
+                            if parser:
+                                for case in parser.feed(event.content):
+                                    yield sse_service.create_test_case_message(case.model_dump(mode="json"), merger_agent.name)
+                    elif not isinstance(event, TaskResult):
+                        llm_tracker.observe_event(event)
+        except asyncio.CancelledError:
+            # 合并期间被停止接口取消；客户端断开导致的取消照常向上抛出
+            if not cancellation_token.is_cancelled():
+                raise
+            outcome = "stopped"
+            yield sse_service.create_agent_done_message(merger_agent.name, "")
+            yield sse_service.create_done_message("团队对话已停止")
+            return
+        if parser:
+            for case in parser.finish():
+                yield sse_service.create_test_case_message(case.model_dump(mode="json"), merger_agent.name)
+        yield sse_service.create_agent_done_message(merger_agent.name, "")
+
+        yield sse_service.create_done_message("测试用例生成完成")
+        outcome = "completed"
+        logger.info("并行团队流式对话完成", extra={"chunks": stream_metrics.chunks, "branches": len(branch_results)})
+
+    except Exception as e:
+        outcome = "error"
+        logger.exception("并行团队流式对话运行失败")
+        yield sse_service.create_error_message(f"团队对话运行失败: {str(e)}")
+
+    finally:
+        # 客户端断开或出错时停止仍在运行的视角
+        cancellation_token.cancel()
+        for task in tasks:
+            task.cancel()
+        parallel_cancellations.pop(session_id, None)
+        stream_metrics.finish(outcome)
+
 
 @router.post("/stream", response_class=StreamingResponse, summary="AI测试用例团队流式对话")
 async def testcase_team_stream(
@@ -299,14 +562,13 @@ async def testcase_team_stream(
         if request.client:
             client_ip = request.client.host
 
-        print(f"🌐 客户端IP地址: {client_ip}")
-
         # 校验字段
         if not request_data.content:
             raise HTTPException(status_code=400, detail="消息不能为空")
 
         # 生成会话ID
         session_id = request_data.session_id or str(uuid.uuid4())
+        bind_session_id(session_id)
 
         # 记录当前时间
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -319,15 +581,40 @@ async def testcase_team_stream(
             "user_id": "anonymous"  # 不需要用户认证
         }
 
+        if request_data.mode == "parallel":
+            perspectives = resolve_perspectives(request_data.perspectives)
+            logger.info("创建并行团队会话", extra={"client_ip": client_ip, "perspectives": perspectives})
+
+            perspective_agents = [
+                await create_perspective_agent(perspective, request_data.additional_context)
+                for perspective in perspectives
+            ]
+            merger_agent = await create_test_case_merger_agent(request_data.additional_context, request_data.output_format)
+
+            return StreamingResponse(
+                run_parallel_team_stream(
+                    perspective_agents,
+                    merger_agent,
+                    request_data.content,
+                    session_id,
+                    parse_merged=request_data.output_format == "json",
+                ),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS,
+            )
+
         # 为每次请求创建新的团队实例（避免AutoGen团队状态冲突）
-        print(f"🔧 创建团队会话: {session_id}")
-        print(f"📝 用户消息: {request_data.content}")
+        logger.info("创建团队会话", extra={"client_ip": client_ip, "content_length": len(request_data.content)})
 
         # 创建智能体团队
-        generator_agent = await create_test_case_generator_agent(session_id, request_data.additional_context)
+        generator_agent = await create_test_case_generator_agent(
+            session_id, request_data.additional_context, request_data.output_format
+        )
         reviewer_agent = await create_test_case_reviewer_agent(session_id, request_data.additional_context)
         optimizer_agent = await create_test_case_optimizer_agent(session_id, request_data.additional_context)
-        print(f"✅ 智能体创建完成")
+
+        from autogen_agentchat.teams import RoundRobinGroupChat
+        from autogen_agentchat.conditions import SourceMatchTermination, ExternalTermination
 
         # 创建终止条件 - 使用更合理的终止条件
         # 1. 当提到"测试用例生成完成"或"APPROVE"时终止
@@ -353,25 +640,20 @@ async def testcase_team_stream(
 
         # 运行团队流式对话
         return StreamingResponse(
-            run_team_stream(team, request_data.content, session_id),
+            run_team_stream(
+                team,
+                request_data.content,
+                session_id,
+                parse_agent=generator_agent.name if request_data.output_format == "json" else None,
+            ),
             media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no",  # 禁用 Nginx 缓冲
-                "Transfer-Encoding": "chunked",  # 启用分块传输
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                "Access-Control-Allow-Headers": "Content-Type, Authorization",
-            }
+            headers=SSE_HEADERS
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ 团队会话处理失败: {str(e)}")
-        import traceback
-        print(f"❌ 错误堆栈: {traceback.format_exc()}")
+        logger.exception("团队会话处理失败")
         raise HTTPException(status_code=500, detail=f"团队会话处理失败: {str(e)}")
 
 
@@ -385,13 +667,16 @@ async def stop_team_session(
         if session_id in external_terminations:
             external_terminations[session_id].set()
             return {"message": "团队对话已停止", "session_id": session_id}
+        elif session_id in parallel_cancellations:
+            parallel_cancellations[session_id].cancel()
+            return {"message": "团队对话已停止", "session_id": session_id}
         else:
             raise HTTPException(status_code=404, detail="会话不存在或已结束")
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ 停止团队会话失败: {str(e)}")
+        logger.exception("停止团队会话失败")
         raise HTTPException(status_code=500, detail=f"停止团队会话失败: {str(e)}")
 
 
@@ -413,8 +698,13 @@ async def clear_team_session(
         if session_id in external_terminations:
             del external_terminations[session_id]
 
+        # 取消并清除并行模式的运行
+        cancellation_token = parallel_cancellations.pop(session_id, None)
+        if cancellation_token is not None:
+            cancellation_token.cancel()
+
         return {"message": "团队会话已清除", "session_id": session_id}
 
     except Exception as e:
-        print(f"❌ 清除团队会话失败: {str(e)}")
+        logger.exception("清除团队会话失败")
         raise HTTPException(status_code=500, detail=f"清除团队会话失败: {str(e)}")
@@ -0,0 +1,99 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.models.user import User
+from app.services.coverage_service import CoverageService
+from app.services.requirement_tree_service import RequirementTreeService
+from app.utils.deps import get_current_active_user
+
+router = APIRouter()
+
+
+@router.get("/tree", summary="获取项目需求树")
+async def get_requirement_tree(
+    project_id: int = Query(..., description="项目ID"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    获取项目的完整需求树
+
+    返回先序排列的扁平列表，每个节点带 parent_id 与 depth（根需求为 0），前端可直接按顺序缩进展示
+    """
+    tree_service = RequirementTreeService(db)
+    return {"items": tree_service.tree(project_id)}
+
+
+@router.get("/coverage", summary="获取项目需求覆盖矩阵")
+async def get_project_coverage(
+    project_id: int = Query(..., description="项目ID"),
+    only: Optional[str] = Query(None, description="筛选：uncovered、failed、flaky、not_run"),
+    limit: int = Query(50, ge=1, le=200, description="每页条数"),
+    cursor: Optional[int] = Query(None, description="上一页返回的 next_cursor"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    获取项目各需求的测试覆盖情况
+
+    每个需求包含用例数、已批准 / 自动化 / 已计划用例数、最近执行结果、覆盖率（最近通过的用例占比）与不稳定标记。
+    数据来自预先汇总的覆盖表，用例或执行记录变更后数秒内刷新
+    """
+    coverage_service = CoverageService(db)
+    return coverage_service.project_coverage(project_id, limit=limit, cursor=cursor, only=only)
+
+
+@router.get("/{requirement_id}/subtree", summary="获取需求子树")
+async def get_requirement_subtree(
+    requirement_id: int,
+    max_depth: Optional[int] = Query(None, ge=0, description="最大相对层级"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取需求及其全部后代，depth 为相对该需求的层级"""
+    tree_service = RequirementTreeService(db)
+    return {"items": tree_service.subtree(requirement_id, max_depth=max_depth)}
+
+
+@router.get("/{requirement_id}/ancestors", summary="获取需求祖先链")
+async def get_requirement_ancestors(
+    requirement_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取从根需求到直接父需求的祖先链"""
+    tree_service = RequirementTreeService(db)
+    return {"items": tree_service.ancestors(requirement_id)}
+
+
+@router.get("/{requirement_id}/test-cases", summary="获取需求子树下的测试用例")
+async def get_requirement_test_cases(
+    requirement_id: int,
+    include_descendants: bool = Query(True, description="是否包括后代需求的用例"),
+    include_deprecated: bool = Query(False, description="是否包括已废弃的用例"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取关联到需求（默认包括全部后代需求）的测试用例，每条用例附带不稳定性分析结果"""
+    tree_service = RequirementTreeService(db)
+    return {
+        "items": tree_service.test_cases(
+            requirement_id,
+            include_descendants=include_descendants,
+            include_deprecated=include_deprecated,
+        )
+    }
+
+
+@router.get("/{requirement_id}/coverage", summary="获取需求子树的测试覆盖情况")
+async def get_requirement_coverage(
+    requirement_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """统计子树中的需求数、已有测试用例覆盖的需求数与用例数"""
+    tree_service = RequirementTreeService(db)
+    return tree_service.coverage(requirement_id)
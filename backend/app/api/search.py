@@ -0,0 +1,34 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.models.user import User
+from app.services.search_service import SearchService
+from app.utils.deps import get_current_active_user
+
+router = APIRouter()
+
+
+@router.get("/", summary="全文搜索测试用例、需求与缺陷")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="搜索关键词"),
+    project_id: Optional[int] = Query(None, description="项目ID"),
+    types: Optional[List[str]] = Query(None, description="实体类型：test_case、requirement、defect，默认全部"),
+    limit: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    全文搜索
+
+    中文按相邻二元组匹配（关键词须在原文中连续出现），英文 / 数字按单词匹配，最后一个单词支持前缀匹配。
+    结果按相关度排序，标题命中权重最高；翻页使用 next_cursor
+
+    返回:
+        items 中每条结果包含类型、ID、编号、标题、相关度与高亮片段（<mark> 标记）
+    """
+    search_service = SearchService(db)
+    return search_service.search(q, project_id=project_id, entity_types=types, limit=limit, cursor=cursor)
@@ -0,0 +1,86 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_async_db, get_db
+from app.models.user import User
+from app.services.test_flakiness_service import TestFlakinessService
+from app.services.test_result_import_service import TestResultImportService
+from app.utils.deps import get_current_active_user
+from app.utils.test_report import REPORT_FORMATS, detect_format
+
+router = APIRouter()
+
+
+@router.post("/import", summary="导入 JUnit XML / JSON 测试报告")
+async def import_test_results(
+    file: UploadFile = File(..., description="测试报告文件"),
+    project_id: int = Form(..., description="项目ID"),
+    test_plan_id: Optional[int] = Form(None, description="测试计划ID"),
+    report_format: Optional[str] = Form(None, description="报告格式：junit、json，默认按文件名判断"),
+    environment: Optional[str] = Form(None, description="测试环境"),
+    version: Optional[str] = Form(None, description="测试版本"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    导入 CI 产出的测试报告，批量写入执行记录
+
+    报告中的用例按编号匹配到项目用例：JUnit 的 test_case_code 等 property、用例名或类名中的编号（如 TC-00001），
+    JSON 报告的 code 字段。指定测试计划时匹配到的用例会加入该计划，导入后计划统计随之更新
+
+    返回:
+        导入汇总：总数、写入数、未匹配数（附示例）、无法识别结果数与各状态数量
+    """
+    if file.size is not None and file.size > settings.TEST_RESULT_IMPORT_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"测试报告不能超过 {settings.TEST_RESULT_IMPORT_MAX_SIZE // (1024 * 1024)}MB"
+        )
+    report_format = report_format or detect_format(file.filename, file.content_type)
+    if report_format not in REPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"不支持的报告格式: {report_format}"
+        )
+
+    import_service = TestResultImportService(db)
+    result = await import_service.import_report(
+        file.file,
+        report_format,
+        project_id=project_id,
+        executor_id=current_user.id,
+        test_plan_id=test_plan_id,
+        environment=environment,
+        version=version,
+    )
+    return result.to_dict()
+
+
+@router.get("/flakiness", summary="获取用例不稳定性分析结果")
+async def get_test_flakiness(
+    project_id: int = Query(..., description="项目ID"),
+    test_plan_id: Optional[int] = Query(None, description="只返回该测试计划内的用例"),
+    only_flaky: bool = Query(True, description="只返回判定为不稳定的用例"),
+    limit: int = Query(50, ge=1, le=200, description="每页条数"),
+    offset: int = Query(0, ge=0, description="跳过的条数"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    按不稳定分数从高到低列出用例
+
+    每个用例包含最近窗口的失败率、切换率、历史窗口最高失败率、不稳定分数与最近结果序列（P 通过 / F 失败）。
+    数据来自 python maintenance.py flakiness 增量计算的汇总表
+    """
+    flakiness_service = TestFlakinessService(db)
+    return flakiness_service.list_cases(
+        project_id,
+        test_plan_id=test_plan_id,
+        only_flaky=only_flaky,
+        limit=limit,
+        offset=offset,
+    )
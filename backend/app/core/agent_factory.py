@@ -1,8 +1,26 @@
 # 用于注册智能体
-from venv import logger
-from autogen_core import AgentRuntime, SingleThreadedAgentRuntime
-from backend.app.core.llms import _deepseek_model_client
+import importlib
+import logging
+from typing import Dict, Iterable, Optional, Tuple
 
+from autogen_core import AgentRuntime, TypeSubscription
+
+from app.core.agents import AGENT_NAMES, TopicTypes, shard_name, topic_shards
+from app.core.llms import _deepseek_model_client
+
+logger = logging.getLogger(__name__)
+
+
+# 智能体类型 -> (模块路径, 类名)，按需导入，尚未实现的智能体会被跳过
+AGENT_CLASS_PATHS: Dict[str, Tuple[str, str]] = {
+    TopicTypes.DOCUMENT_PARSE: ("app.agents.testcase.document_parse_agent", "DocumentParseAgent"),
+    TopicTypes.IMAGE_ANALYSIS: ("app.agents.testcase.image_analysis_agent", "ImageAnalyzerAgent"),
+    TopicTypes.VIDEO_ANALYSIS: ("app.agents.testcase.video_analyzer_agent", "VideoAnalyzerAgent"),
+    TopicTypes.VISUAL_SEGMENT_ANALYSIS: ("app.agents.testcase.segment_analysis_agent", "SegmentAnalyzerAgent"),
+    TopicTypes.TEST_CASE_GENERATOR: ("app.agents.testcase.test_case_generator", "TestCaseGeneratorAgent"),
+    TopicTypes.MID_MAP_GENERATION: ("app.agents.testcase.mid_map_generation_agent", "MidMapGenerationAgent"),
+    TopicTypes.EXCEL_EXPORT: ("app.agents.testcase.excel_export_agent", "ExcelExportAgent"),
+}
 
 
 class AgentFactory:
@@ -11,136 +29,158 @@ class AgentFactory:
     '''
     def __init__(self) -> None:
         self._agent_classes: dict[str, type] = {}
-        self._registered_agents: dict[str, bool] = {}
-        self._assistant_agent_configs: dict[str, dict] = {}
-        self._agents: dict[str, dict] = {} # 添加缺失的_agents输出
+        self._agent_kwargs: dict[str, dict] = {}
+        self._agents: dict[str, dict] = {}  # 已注册到运行时的智能体信息
 
         # 注册所有可用的智能体类
         self._register_agent_classes()
 
-        logger.info (f"智能体工厂类初始化完成")
+        logger.info("智能体工厂类初始化完成")
 
     def _register_agent_classes(self) -> None:
         """注册所有可用的智能体类"""
-        try:
-            # 测试用例平台智能体
-            from backend.app.agents.testcase.document_parse_agent import DocumentParseAgent
-            from backend.app.agents.testcase.image_analysis_agent import ImageAnalysisAgent
-            from backend.app.agents.testcase.test_case_generator_agent import TestCaseGeneratorAgent
-            from backend.app.agents.testcase.mid_map_generation_agent import MidMapGenerationAgent
-            from backend.app.agents.testcase.excel_export_agent import ExcelExportAgent
-
-            # 注册测试用例平台智能体
-            self._agent_classes.update({
-                "document_parse": DocumentParseAgent,
-                "image_analysis": ImageAnalysisAgent,
-                "test_case_generator": TestCaseGeneratorAgent,
-                "mid_map_generation": MidMapGenerationAgent,
-                "excel_export": ExcelExportAgent
-            })
-            
-
-            # 调试信息
-            logger.info(f"注册的智能体类: {self._agent_classes}")
-            logger.info(f"注册的智能体类数量: {len(self._agent_classes)}")
-
-        except Exception as e:
-            logger.error(f"智能体类注册失败: {str(e)}")
-
-
-
-    async def register_agents(self, runtime: AgentRuntime) -> None:
-        """注册智能体"""
-        try:
-            if agent_type not in self._agent_classes:
-                raise ValueError(f"❌ 智能体类型 {agent_type} 不存在")
-            
-            agent_class = self._agent_classes[agent_type]
+        for agent_type, (module_path, class_name) in AGENT_CLASS_PATHS.items():
+            try:
+                module = importlib.import_module(module_path)
+                self._agent_classes[agent_type] = getattr(module, class_name)
+            except (ImportError, AttributeError) as e:
+                logger.warning("智能体类 %s 不可用，跳过注册: %s", agent_type, e)
+
+        logger.info("注册的智能体类: %s", sorted(self._agent_classes))
+
+    @property
+    def agent_types(self) -> list[str]:
+        """可用的智能体类型"""
+        return list(self._agent_classes)
+
+    @property
+    def runtime_agent_types(self) -> list[str]:
+        """已注册到运行时的智能体类型名称（分片主题对应多个名称）"""
+        return [name for info in self._agents.values() for name in info["runtime_types"]]
+
+    async def register_agents(self,
+                              runtime: AgentRuntime,
+                              agent_types: Optional[Iterable[str]] = None,
+                              shards: Optional[Iterable[int]] = None) -> None:
+        """
+        将智能体注册到运行时
 
-            # 注册智能体
-            await agent_class.register(runtime, 
-                                       agent_type,lambda:self.create_agent(agent_type,**kwargs))
-        except Exception as e:
-            print(f"❌ 智能体注册失败: {str(e)}")
-            print(f"❌ 错误类型: {type(e)}")
-            import traceback
-            print(f"❌ 错误堆栈: {traceback.format_exc()}")
+        Args:
+            runtime (AgentRuntime): 运行时
+            agent_types (Iterable[str]): 要注册的智能体类型，None 表示全部可用类型
+            shards (Iterable[int]): 分片主题只注册这些分片，None 表示全部分片
+        """
+        for agent_type in (agent_types if agent_types is not None else self.agent_types):
+            await self.register_agent_to_runtime(runtime, agent_type, topic_type=agent_type, shards=shards)
 
     async def register_agent_to_runtime(
-            self, runtime: SingleThreadedAgentRuntime, 
-            agent_type: str, 
+            self, runtime: AgentRuntime,
+            agent_type: str,
             topic_type: str,
+            shards: Optional[Iterable[int]] = None,
             **kwargs) -> None:
         """注册智能体到运行时
 
+        智能体类通过 @type_subscription 订阅自己的主题类型，主题 source 为会话ID，
+        运行时会为每个会话懒创建一个智能体实例
+
+        主题配置了分片时，每个分片注册为独立的智能体类型（如 image_analysis.0），只订阅对应的分片主题。
+        gRPC 宿主要求每个智能体类型只由一个 worker 注册，按分片拆分后即可把同一种智能体分布到多个 worker
+
         Args:
-            runtime (SingleThreadedAgentRuntime): 运行时
+            runtime (AgentRuntime): 运行时
             agent_type (str): 智能体类型
             topic_type (str): 智能体主题类型
+            shards (Iterable[int]): 只注册这些分片，None 表示全部分片
             kwargs (dict): 智能体构造参数
         """
-        try:
-            if agent_type not in self._agent_classes:
-                raise ValueError(f"❌ 智能体类型 {agent_type} 不存在")
-            
-            agent_class = self._agent_classes[agent_type]
-
+        if agent_type not in self._agent_classes:
+            raise ValueError(f"❌ 智能体类型 {agent_type} 不存在")
+
+        agent_class = self._agent_classes[agent_type]
+        merged_kwargs = {**self._agent_kwargs.get(agent_type, {}), **kwargs}
+
+        def factory():
+            return self.create_agent(agent_type, **merged_kwargs)
+
+        shard_count = topic_shards().get(topic_type)
+        if shard_count:
+            shard_ids = sorted(set(shards)) if shards is not None else list(range(shard_count))
+            if any(shard < 0 or shard >= shard_count for shard in shard_ids):
+                raise ValueError(f"❌ 主题 {topic_type} 只有 {shard_count} 个分片: {shard_ids}")
+
+            runtime_types = []
+            for shard in shard_ids:
+                name = shard_name(agent_type, shard)
+                await agent_class.register(runtime, name, factory, skip_class_subscriptions=True)
+                await runtime.add_subscription(
+                    TypeSubscription(topic_type=shard_name(topic_type, shard), agent_type=name)
+                )
+                runtime_types.append(name)
+        else:
             # 注册智能体
-            await agent_class.register(
-                runtime, 
-                agent_type,
-                lambda: self.create_agent(agent_type, **kwargs)
-            )
-
-            # 记录注册信息
-            self._agent[agent_type] = {
-                "angent_type": agent_type,
-                "topic_type": topic_type,
-                "agent_name": AGENT_NAMES.get(agent_type, agent_type),
-                "kwargs": kwargs
-            }
-
-        except Exception as e:
-            print(f"❌ 智能体注册失败: {str(e)}")
-            print(f"❌ 错误类型: {type(e)}")
-            import traceback
-
-    async def create_agent(self, 
-                       agent_type: str, 
+            await agent_class.register(runtime, agent_type, factory)
+            runtime_types = [agent_type]
+
+        # 记录注册信息
+        self._agents[agent_type] = {
+            "agent_type": agent_type,
+            "topic_type": topic_type,
+            "agent_name": AGENT_NAMES.get(agent_type, agent_type),
+            "runtime_types": runtime_types,
+            "kwargs": merged_kwargs
+        }
+        logger.info("%s注册完成: %s", AGENT_NAMES.get(agent_type, agent_type), runtime_types)
+
+    def create_agent(self,
+                     agent_type: str,
+                     **kwargs):
+        """创建自定义智能体（由运行时在首次收到会话消息时调用）"""
+        if agent_type not in self._agent_classes:
+            raise ValueError(f"❌ 智能体类型 {agent_type} 不存在")
+
+        agent_class = self._agent_classes[agent_type]
+
+        # 未指定模型客户端时使用默认的 deepseek 客户端
+        if not kwargs.get('model_client_instance'):
+            kwargs['model_client_instance'] = _deepseek_model_client()
+
+        # 创建智能体实例
+        return agent_class(agent_factory=self, **kwargs)
+
+    def create_assistant_agent(self,
+                               name: str,
+                               system_message: str,
+                               model_client=None,
+                               stream: bool = True,
+                               **kwargs):
+        """创建 AutoGen AssistantAgent，供运行时智能体内部调用模型"""
+        from autogen_agentchat.agents import AssistantAgent
+
+        return AssistantAgent(
+            name=name,
+            model_client=model_client or _deepseek_model_client(),
+            system_message=system_message,
+            model_client_stream=stream,
+            **kwargs
+        )
+
+    def register_agent(self,
+                       agent_type: str,
+                       agent_class: type,
                        **kwargs) -> None:
-    
-        """创建自定义智能体"""
-        try:
-            if agent_type not in self._agent_classes:
-                raise ValueError(f"❌ 智能体类型 {agent_type} 不存在")
-            
-            agent_class = self._agent_classes[agent_type]
-
-            # 根据智能体类型选择模型客户端（完善？）
-
-            if not kwargs.get('model_client_instance'):
-                kwargs['model_client_instance'] = _deepseek_model_client()
-
-            # 创建智能体实例
-
-            agent = await agent_class(**kwargs)
-
-            logger.info(f"智能体 {agent_type} 创建完成")
-            return agent
-        
-        except Exception as e:
-            print(f"❌ 智能体创建失败: {str(e)}")
-            print(f"❌ 错误类型: {type(e)}")
-
-    async def create_assistant_agent(self, **kwargs) -> None:
-        pass
-
-    async def register_agent(self,
-                             angent_type: str,
-                             agent_class: type,
-                             **kwargs) -> None:
-        """注册智能体"""
+        """注册自定义智能体类及其默认构造参数"""
         self._agent_classes[agent_type] = agent_class
         self._agent_kwargs[agent_type] = kwargs
-        pass
-    
\ No newline at end of file
+
+
+# 全局智能体工厂（延迟创建，避免导入时加载全部智能体模块）
+_agent_factory: Optional[AgentFactory] = None
+
+
+def get_agent_factory() -> AgentFactory:
+    """获取全局智能体工厂"""
+    global _agent_factory
+    if _agent_factory is None:
+        _agent_factory = AgentFactory()
+    return _agent_factory
@@ -1,21 +1,150 @@
-#智能体基类
+"""
+智能体基础定义
+包含主题类型常量、智能体显示名称、流式响应消息以及所有运行时智能体的基类
 
+会话路由约定：所有主题都使用 TopicId(type=主题类型, source=session_id)，
+同一会话内的消息只会流向该会话的智能体实例与响应收集器
 
+配置了主题分片（AGENT_TOPIC_SHARDS）时，主题类型带上分片后缀（如 image_analysis.1），
+分片号由会话ID的 CRC32 决定，各进程计算结果一致，同一会话始终落在同一个 worker 上
+"""
+import base64
+import io
+import time
+import zlib
 from abc import ABC
-from autogen_core import RoutedAgent
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional
 
+from autogen_core import AgentId, Image, MessageContext, RoutedAgent, TopicId
+from pydantic import BaseModel, Field
 
-class BaseAgent(RoutedAgent,ABC):
+from .config import settings
 
-    pass
+
+class TopicTypes:
+    """智能体主题类型"""
+    DOCUMENT_PARSE = "document_parse"
+    IMAGE_ANALYSIS = "image_analysis"
+    VIDEO_ANALYSIS = "video_analysis"
+    VISUAL_SEGMENT_ANALYSIS = "visual_segment_analysis"
+    TEST_CASE_GENERATOR = "test_case_generator"
+    MID_MAP_GENERATION = "mid_map_generation"
+    EXCEL_EXPORT = "excel_export"
+    # 智能体输出到前端的流式响应
+    STREAM_OUTPUT = "stream_output"
+
+
+AGENT_NAMES: Dict[str, str] = {
+    TopicTypes.DOCUMENT_PARSE: "文档解析智能体",
+    TopicTypes.IMAGE_ANALYSIS: "图片分析智能体",
+    TopicTypes.VIDEO_ANALYSIS: "视频分析智能体",
+    TopicTypes.VISUAL_SEGMENT_ANALYSIS: "切片分析智能体",
+    TopicTypes.TEST_CASE_GENERATOR: "测试用例生成智能体",
+    TopicTypes.MID_MAP_GENERATION: "思维导图生成智能体",
+    TopicTypes.EXCEL_EXPORT: "Excel导出智能体",
+}
+
+
+@lru_cache(maxsize=1)
+def topic_shards() -> Dict[str, int]:
+    """各主题类型的分片数（只包含分片数大于 1 的主题）"""
+    return settings.agent_topic_shards
+
+
+def shard_name(name: str, shard: int) -> str:
+    """分片后的主题类型 / 智能体类型名称"""
+    return f"{name}.{shard}"
+
+
+def _session_shard_type(type_name: str, session_id: str) -> str:
+    shards = topic_shards().get(type_name)
+    if shards:
+        return shard_name(type_name, zlib.crc32(session_id.encode("utf-8")) % shards)
+    return type_name
+
+
+def session_topic(topic_type: str, session_id: str) -> TopicId:
+    """构造会话级主题，分片主题按会话ID选择分片"""
+    return TopicId(type=_session_shard_type(topic_type, session_id), source=session_id)
+
+
+def session_agent_id(agent_type: str, session_id: str) -> AgentId:
+    """构造会话级智能体ID（用于 send_message 直接请求），分片规则与 session_topic 一致"""
+    return AgentId(type=_session_shard_type(agent_type, session_id), key=session_id)
+
+
+class StreamResponse(BaseModel):
+    """智能体发送给前端的流式响应"""
+    session_id: str = Field(..., description="会话ID")
+    agent_type: str = Field(..., description="智能体类型")
+    agent_name: str = Field(..., description="智能体名称")
+    content: str = Field("", description="响应内容")
+    region: str = Field("process", description="响应区域：process 过程信息，result 结果，error 错误")
+    is_final: bool = Field(False, description="是否为会话的最后一条响应")
+    data: Optional[Dict[str, Any]] = Field(None, description="结构化附加数据")
+    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat(), description="时间戳")
+
+
+class EncodedImage(Image):
+    """直接使用已编码（预处理后）的图片字节发送给模型，避免 autogen 默认重新编码为 PNG"""
+
+    def __init__(self, data: bytes):
+        from PIL import Image as PILImage
+
+        super().__init__(PILImage.open(io.BytesIO(data)))
+        self._base64 = base64.b64encode(data).decode("ascii")
+
+    def to_base64(self) -> str:
+        return self._base64
+
+
+class BaseAgent(RoutedAgent, ABC):
+    """
+    运行时智能体基类
+
+    Args:
+        agent_type: 智能体类型（同时也是其订阅的主题类型）
+        model_client_instance: 模型客户端，为 None 时由子类按需获取
+    """
 
     def __init__(self,
-                 agent_id: str,
-                 agent_name: str,
+                 agent_type: str,
                  model_client_instance=None,
-                 collector: Optional[StreamResponseCollector] = None,
-                **kwargs):
-        pass
+                 **kwargs):
+        super().__init__(description=AGENT_NAMES.get(agent_type, agent_type))
+        self.agent_type = agent_type
+        self.agent_name = AGENT_NAMES.get(agent_type, agent_type)
+        self.model_client = model_client_instance
+        # 最近一次处理消息的时间，worker 进程据此回收空闲的会话实例
+        self.last_active = time.monotonic()
+
+    async def on_message_impl(self, message: Any, ctx: MessageContext) -> Any:
+        self.last_active = time.monotonic()
+        return await super().on_message_impl(message, ctx)
+
+    async def send_response(self,
+                            content: str,
+                            *,
+                            session_id: str,
+                            region: str = "process",
+                            is_final: bool = False,
+                            data: Optional[Dict[str, Any]] = None) -> None:
+        """发送流式响应到会话的响应收集器"""
+        await self.publish_message(
+            StreamResponse(
+                session_id=session_id,
+                agent_type=self.agent_type,
+                agent_name=self.agent_name,
+                content=content,
+                region=region,
+                is_final=is_final,
+                data=data,
+            ),
+            topic_id=session_topic(TopicTypes.STREAM_OUTPUT, session_id),
+        )
 
-    async def handle_message(self, message, source):
-        pass
+    async def send_error(self, session_id: str, error: str) -> None:
+        """发送错误并结束会话"""
+        await self.send_response(error, session_id=session_id, region="error", is_final=True)
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import field_validator, computed_field
 import os
@@ -81,6 +81,156 @@ class Settings(BaseSettings):
     UITARS_MODEL: str = "doubao-1-5-ui-tars-250428"
     UITARS_API_KEY: Optional[str] = None
     UITARS_BASE_URL: str = "https://ark.cn-beijing.volces.com/api/v3"
+
+    # LLM 调用限流配置（按模型，进程内生效）
+    LLM_MAX_CONCURRENCY: int = 8  # 单个模型同时进行的调用数
+    LLM_REQUESTS_PER_MINUTE: int = 0  # 单个模型每分钟请求数，0 表示不限制
+    # 按模型名称覆盖，环境变量使用 JSON，如 {"doubao-1-5-ui-tars-250428": {"concurrency": 4, "rpm": 60}}
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {}
+    VISUAL_FANOUT_PARALLELISM: int = 4  # 单个请求内切片 / 关键帧并发分析数
+
+    # 测试用例团队并行模式：各视角（app/prompts 下同名提示词）并发生成后由合并智能体汇总评审
+    TEAM_PARALLEL_PERSPECTIVES: str = "ui_expert,interaction_analyst,test_scenario_expert"
+    TEAM_MERGE_PROMPT: str = "test_case_merger.txt"
+
+    # 结构化测试用例输出：json_schema（模型支持结构化输出时）、json_object（JSON 模式）或 prompt（仅靠提示词约束）
+    TEST_CASE_JSON_MODE: str = "json_object"
+
+    # 测试用例批量入库配置
+    TEST_CASE_BULK_INSERT_METHOD: str = "insert"  # insert（多行 INSERT ... RETURNING）或 copy（PostgreSQL COPY）
+    TEST_CASE_BULK_BATCH_SIZE: int = 1000  # 单条 INSERT / COPY 的行数
+    TEST_CASE_CODE_BLOCK_SIZE: int = 100  # 每次从编号序列预留的编号数，进程内用完再预留
+    TEST_CASE_CODE_FORMAT: str = "TC-{number:05d}"
+
+    # 测试用例近似重复检测配置（MinHash + LSH）
+    TEST_CASE_DEDUP_ENABLED: bool = True
+    TEST_CASE_DEDUP_ACTION: str = "flag"  # flag（照常入库并标记 duplicate_of_id）或 skip（不入库，返回已有用例ID）
+    TEST_CASE_DEDUP_THRESHOLD: float = 0.8  # 估计的 Jaccard 相似度不低于该值视为重复
+    TEST_CASE_DEDUP_NUM_PERM: int = 128  # 签名长度，修改后需重新计算已保存的签名
+    TEST_CASE_DEDUP_BANDS: int = 32  # LSH band 数，需整除签名长度；越多召回越高、候选越多
+    TEST_CASE_DEDUP_SHINGLE_SIZE: int = 2  # 字符 n-gram 长度（中文按字切分，二元组对改写更稳定）
+
+    # 向量索引与检索增强生成配置（生成用例时注入项目中相似的已有用例 / 需求）
+    EMBEDDING_BACKEND: str = "hashing"  # hashing（特征哈希，无需模型）或 sentence_transformers（本地 CPU 模型）
+    EMBEDDING_MODEL: str = ""  # sentence_transformers 模型名称或本地路径
+    EMBEDDING_DIM: int = 256  # hashing 向量维度，修改后需重建索引
+    VECTOR_INDEX_BACKEND: str = "local"  # local（每个项目一个内存映射文件）或 pgvector
+    VECTOR_INDEX_DIR: str = "data/vector_index"
+    VECTOR_INDEX_CACHE_PROJECTS: int = 4  # 常驻内存的项目索引数
+    RAG_ENABLED: bool = True
+    RAG_TOP_K: int = 8
+    RAG_MIN_SCORE: float = 0.2  # 余弦相似度低于该值的结果不注入
+    RAG_CONTEXT_TOKEN_BUDGET: int = 1500  # 注入提示词的参考内容 token 上限
+    RAG_QUERY_MAX_CHARS: int = 2000  # 用于检索的需求文本截取长度
+
+    # 需求覆盖汇总配置（用例 / 执行变更后按需求增量刷新 requirement_coverage）
+    COVERAGE_REFRESH_DELAY: float = 2.0  # 收到变更后等待的秒数，期间的变更合并为一次刷新
+    COVERAGE_REFRESH_BATCH: int = 500  # 单条刷新语句处理的需求数
+    COVERAGE_CACHE_TTL: float = 30.0  # 覆盖报表分页结果缓存时间（秒），0 表示不缓存
+    COVERAGE_CACHE_MAX_ENTRIES: int = 1000
+
+    # 项目计数配置（需求 / 用例 / 缺陷数按增量缓冲后定期合并写入 projects）
+    PROJECT_COUNTER_BACKEND: str = "memory"  # memory: 进程内缓冲，仅限单工作进程部署；redis: 多进程共享缓冲（使用 REDIS_URL），多进程部署（含 AGENT_RUNTIME_MODE=grpc 的 agent_worker）必须使用
+    PROJECT_COUNTER_FLUSH_INTERVAL: float = 5.0  # 收到增量后等待的秒数，期间的增量合并为每个项目一次 UPDATE
+    PROJECT_COUNTER_REDIS_PREFIX: str = "project_counters"
+
+    # 执行记录分区与归档配置（test_executions 按 start_time 每月一个分区）
+    TEST_EXECUTION_PARTITION_MONTHS_AHEAD: int = 3  # 提前创建的未来月分区数，启动预热与 maintenance 任务中检查
+    TEST_EXECUTION_RETENTION_MONTHS: int = 12  # 在线保留的月数（含当月），更早的分区摘除后归档，0 表示不归档
+    TEST_EXECUTION_ARCHIVE_DIR: str = "data/archive/test_executions"
+    TEST_EXECUTION_ARCHIVE_FORMAT: str = "csv"  # csv: gzip 压缩的 CSV；parquet: zstd 压缩的 Parquet（需要安装 pyarrow）
+    TEST_EXECUTION_ARCHIVE_BATCH: int = 50000  # 导出 Parquet 时每次读取的行数
+
+    # 测试报告导入配置（JUnit XML / JSON 执行结果批量入库）
+    TEST_RESULT_IMPORT_MAX_SIZE: int = 200 * 1024 * 1024  # 上传报告大小上限（字节）
+    TEST_RESULT_IMPORT_BATCH_SIZE: int = 5000  # 单次 COPY 写入的执行记录数
+
+    # 用例不稳定性分析配置（按执行记录增量计算 test_case_flakiness）
+    TEST_FLAKINESS_WINDOW: int = 20  # 滑动窗口包含的最近执行次数
+    TEST_FLAKINESS_MIN_RUNS: int = 5  # 窗口内执行次数少于该值时不判定为不稳定，也不计入最高失败率
+    TEST_FLAKINESS_THRESHOLD: float = 0.3  # 不稳定分数达到该值视为不稳定用例
+    TEST_FLAKINESS_BATCH: int = 50000  # 服务端游标每批读取的执行记录数
+    TEST_FLAKINESS_PENDING_HOURS: int = 24  # 该时间内开始的待执行 / 执行中记录会暂缓推进处理进度，等待其结束
+
+    # 图片预处理配置（发送给视觉模型前缩放、去元数据、切片）
+    IMAGE_DEFAULT_MAX_EDGE: int = 2048  # 未单独配置的模型使用的最长边像素
+    IMAGE_DEFAULT_MAX_PIXELS: int = 2048 * 2048  # 未单独配置的模型使用的单张像素预算
+    # 按模型名称配置尺寸限制，环境变量使用 JSON，如 {"qwen-vl-max-latest": {"max_edge": 2048, "max_pixels": 3211264}}
+    IMAGE_MODEL_LIMITS: Dict[str, Dict[str, int]] = {
+        "doubao-1-5-ui-tars-250428": {"max_edge": 1920, "max_pixels": 1920 * 1080},
+        "qwen-vl-max-latest": {"max_edge": 2048, "max_pixels": 1792 * 1792},
+    }
+    IMAGE_TILE_ASPECT_RATIO: float = 2.5  # 高宽比超过该值的长截图按高度切片
+    IMAGE_TILE_OVERLAP: int = 64  # 相邻切片的重叠像素，避免元素被切断
+    IMAGE_OUTPUT_FORMAT: str = "WEBP"  # 重新编码格式：WEBP、JPEG 或 PNG
+    IMAGE_OUTPUT_QUALITY: int = 85
+    IMAGE_PREPROCESS_WORKERS: int = 2  # 预处理进程池大小
+
+    # 视频关键帧提取配置
+    VIDEO_SAMPLE_FPS: float = 2.0  # 采样帧率，只对采样帧计算场景变化
+    VIDEO_SCENE_THRESHOLD: float = 0.1  # 场景变化得分阈值（0~1），超过即作为关键帧候选
+    VIDEO_MIN_KEYFRAMES: int = 3  # 场景变化不足时用均匀采样帧补足到该数量
+    VIDEO_MAX_KEYFRAMES: int = 12  # 关键帧上限，超出时保留变化最大的帧
+    VIDEO_DEDUP_THRESHOLD: float = 0.03  # 两个关键帧的变化得分低于该值视为重复画面
+
+    # 图片分析缓存配置（感知哈希近似匹配）
+    IMAGE_CACHE_ENABLED: bool = True
+    IMAGE_CACHE_MAX_ENTRIES: int = 5000
+    IMAGE_CACHE_MAX_DISTANCE: int = 4  # pHash / dHash 汉明距离阈值（64 位），越大越容易误命中
+    IMAGE_CACHE_TTL: float = 7 * 24 * 3600  # 缓存有效期（秒），0 表示不过期
+
+    # 需求文档解析配置（逐页提取、按标题分块、分块并发分析）
+    DOCUMENT_MAX_CHUNK_TOKENS: int = 1500  # 单个分块的 token 上限
+    DOCUMENT_TOKEN_ENCODING: str = "cl100k_base"  # tiktoken 编码，无法加载时按字符数估算
+    DOCUMENT_PARSE_PARALLELISM: int = 4  # 单个文档同时分析的分块数
+    DOCUMENT_CHUNK_QUEUE_SIZE: int = 16  # 解析线程领先分析的最大分块数，限制内存占用
+    DOCUMENT_CHUNK_CACHE_ENABLED: bool = True
+    DOCUMENT_CHUNK_CACHE_MAX_ENTRIES: int = 20000
+    DOCUMENT_CHUNK_CACHE_TTL: float = 30 * 24 * 3600  # 缓存有效期（秒），0 表示不过期
+
+    # 日志配置
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json 或 text
+    LOG_SAMPLE_MAX_PER_SECOND: int = 20  # 同一条 INFO/DEBUG 日志每秒最多输出条数，0 表示不限流
+
+    # 启动预热配置
+    PREWARM_ON_STARTUP: bool = False  # 启动后在后台预热 AI 模块与模型客户端（提示词与连接池总是预热）
+    PREWARM_DB_CONNECTIONS: int = 2  # 预先建立的数据库连接数，0 表示不预热连接池
+
+    # 智能体运行时池配置
+    AGENT_RUNTIME_POOL_SIZE: int = 1  # 长期存活的运行时数量
+    AGENT_RUNTIME_MAX_SESSIONS: int = 8  # 每个运行时同时处理的会话数上限
+    AGENT_SESSION_TIMEOUT: float = 600.0  # 会话占用运行时的最长时间（秒），超时强制释放
+
+    # 分布式智能体配置
+    AGENT_RUNTIME_MODE: str = "local"  # local 进程内运行，grpc 连接智能体宿主、由 worker 进程运行智能体
+    AGENT_HOST_ADDRESS: str = "localhost:50051"  # gRPC 智能体宿主地址
+    AGENT_API_AGENT_TYPES: str = ""  # grpc 模式下仍留在 API 进程内运行的智能体类型，逗号分隔
+    AGENT_TOPIC_SHARDS: str = ""  # 主题分片数，如 image_analysis=2,video_analysis=2，按会话ID分配到各 worker
+
+    @computed_field
+    @property
+    def agent_topic_shards(self) -> Dict[str, int]:
+        """解析主题分片配置"""
+        shards: Dict[str, int] = {}
+        for item in self.AGENT_TOPIC_SHARDS.split(","):
+            if "=" not in item:
+                continue
+            topic_type, count = item.split("=", 1)
+            if int(count) > 1:
+                shards[topic_type.strip()] = int(count)
+        return shards
+
+    # 就绪检查配置
+    READINESS_CHECK_TIMEOUT: float = 2.0  # 单项依赖检查超时（秒）
+    READINESS_CACHE_TTL: float = 5.0  # 依赖检查结果缓存时间（秒）
+    READINESS_CHECK_REDIS: bool = True
+    READINESS_CHECK_MODEL: bool = True
+
+    # 监控指标配置
+    METRICS_ENABLED: bool = True
+    EVENT_LOOP_LAG_INTERVAL: float = 0.5  # 事件循环延迟采样间隔（秒）
+    EVENT_LOOP_LAG_WARN_THRESHOLD: float = 0.1  # 超过该延迟（秒）记录告警日志
     
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
@@ -100,6 +250,3 @@ class Settings(BaseSettings):
 
 # 创建全局设置实例
 settings = Settings()
-
-# 确保上传目录存在
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
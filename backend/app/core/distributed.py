@@ -0,0 +1,78 @@
+"""
+分布式智能体运行时模块
+基于 autogen 的 gRPC 宿主 / worker 运行时：宿主只负责转发消息，智能体运行在独立的 worker 进程中，
+API 进程通过同一个宿主发布请求、接收流式响应
+
+跨进程传递的消息需要注册序列化器，新增消息类型时同步加入 message_types()
+"""
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, List, Type
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+
+logger = logging.getLogger(__name__)
+
+
+def message_types() -> List[Type[BaseModel]]:
+    """智能体之间传递的全部消息类型"""
+    from app.core.agents import StreamResponse
+    from app.models.test_case import (
+        DocumentParseRequest, ImageAnalysisRequest, TestCaseGenerationRequest, VideoAnalysisRequest,
+        VisualSegmentRequest, VisualSegmentResult,
+    )
+
+    return [StreamResponse, ImageAnalysisRequest, VideoAnalysisRequest, DocumentParseRequest, TestCaseGenerationRequest,
+            VisualSegmentRequest, VisualSegmentResult]
+
+
+def parse_agent_types(value: str) -> List[str]:
+    """解析逗号分隔的智能体类型列表"""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+async def create_worker_runtime(host_address: str) -> "GrpcWorkerAgentRuntime":
+    """创建并启动连接到智能体宿主的 gRPC worker 运行时"""
+    from autogen_core import try_get_known_serializers_for_type
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+
+    runtime = GrpcWorkerAgentRuntime(host_address=host_address)
+    for message_type in message_types():
+        runtime.add_message_serializer(try_get_known_serializers_for_type(message_type))
+    await runtime.start()
+    logger.info("已连接智能体宿主: %s", host_address)
+    return runtime
+
+
+def evict_idle_agents(runtime, max_idle: float) -> int:
+    """
+    回收空闲的会话智能体实例
+
+    worker 进程收不到会话结束信号，按 BaseAgent.last_active 回收超过 max_idle 秒未处理消息的实例
+
+    返回:
+        回收的实例数
+    """
+    instances = getattr(runtime, "_instantiated_agents", None)
+    if not instances:
+        return 0
+
+    deadline = time.monotonic() - max_idle
+    idle = [agent_id for agent_id, agent in instances.items()
+            if getattr(agent, "last_active", time.monotonic()) < deadline]
+    for agent_id in idle:
+        instances.pop(agent_id, None)
+    return len(idle)
+
+
+async def sweep_idle_agents(runtime, max_idle: float, interval: float = 60.0) -> None:
+    """周期性回收空闲的会话智能体实例，直到任务被取消"""
+    while True:
+        await asyncio.sleep(interval)
+        evicted = evict_idle_agents(runtime, max_idle)
+        if evicted:
+            logger.info("回收空闲智能体实例: %d", evicted)
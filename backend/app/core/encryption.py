@@ -1,8 +1,11 @@
 import base64
 import hashlib
+import logging
 from typing import Optional
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class EncryptionManager:
     """加密管理器 - 用于敏感数据的加密和解密，与前端简单加密兼容"""
@@ -22,7 +25,7 @@ class EncryptionManager:
             return encoded
 
         except Exception as e:
-            print(f"加密失败: {e}")
+            logger.warning("加密失败: %s", type(e).__name__)
             return data
 
     def decrypt(self, encrypted_data: str) -> str:
@@ -40,7 +43,7 @@ class EncryptionManager:
             return encrypted_data
 
         except Exception as e:
-            print(f"解密失败: {e}")
+            logger.debug("解密失败: %s", type(e).__name__)
             return encrypted_data
     
     def encrypt_sensitive_data(self, data: dict) -> dict:
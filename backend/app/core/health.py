@@ -0,0 +1,141 @@
+"""
+就绪检查模块
+检查 PostgreSQL（异步引擎）、Redis 与模型端点是否可用，结果带短超时并缓存，
+避免负载均衡器的高频探测把压力转嫁到依赖服务上
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from .config import settings
+from .warmup import warmup_state
+
+logger = logging.getLogger(__name__)
+
+_redis_client: Optional[Any] = None
+_http_client: Optional[Any] = None
+
+
+async def _check_postgres() -> None:
+    """通过异步引擎执行 SELECT 1"""
+    from .database import async_engine
+
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def _check_redis() -> None:
+    """PING Redis"""
+    global _redis_client
+    if _redis_client is None:
+        import redis.asyncio as redis
+
+        _redis_client = redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.READINESS_CHECK_TIMEOUT,
+            socket_timeout=settings.READINESS_CHECK_TIMEOUT,
+        )
+    await _redis_client.ping()
+
+
+async def _check_model_endpoint() -> None:
+    """请求模型端点的 /models，能收到非 5xx 响应即视为可达（鉴权失败也说明网络可达）"""
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.AsyncClient(timeout=settings.READINESS_CHECK_TIMEOUT)
+    headers = {"Authorization": f"Bearer {settings.API_KEY}"} if settings.API_KEY else {}
+    response = await _http_client.get(f"{settings.BASE_URL.rstrip('/')}/models", headers=headers)
+    if response.status_code >= 500:
+        raise RuntimeError(f"模型端点返回 {response.status_code}")
+
+
+class CachedCheck:
+    """
+    带缓存的依赖检查
+
+    TTL 内直接返回上次结果；并发探测时只有一个协程真正执行检查，其余等待同一结果
+    """
+
+    def __init__(self, name: str, check: Callable[[], Awaitable[None]]):
+        self.name = name
+        self.check = check
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def run(self) -> Dict[str, Any]:
+        if self._result is not None and time.monotonic() - self._checked_at < settings.READINESS_CACHE_TTL:
+            return self._result
+
+        async with self._lock:
+            # 等锁期间其他协程可能已经刷新了结果
+            if self._result is not None and time.monotonic() - self._checked_at < settings.READINESS_CACHE_TTL:
+                return self._result
+
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.check(), timeout=settings.READINESS_CHECK_TIMEOUT)
+                result = {"ok": True}
+            except asyncio.TimeoutError:
+                result = {"ok": False, "error": "timeout"}
+            except Exception as e:
+                result = {"ok": False, "error": f"{type(e).__name__}: {e}"[:200]}
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            if not result["ok"]:
+                logger.warning("依赖检查失败: %s", self.name, extra={"check": self.name, "error": result["error"]})
+
+            self._result = result
+            self._checked_at = time.monotonic()
+            return result
+
+
+def _build_checks() -> Dict[str, CachedCheck]:
+    checks = {"postgres": CachedCheck("postgres", _check_postgres)}
+    if settings.READINESS_CHECK_REDIS:
+        checks["redis"] = CachedCheck("redis", _check_redis)
+    if settings.READINESS_CHECK_MODEL:
+        checks["model"] = CachedCheck("model", _check_model_endpoint)
+    return checks
+
+
+_checks = _build_checks()
+
+
+async def check_readiness() -> Tuple[bool, Dict[str, Any]]:
+    """
+    执行就绪检查
+
+    返回:
+        (是否就绪, 检查报告)
+    """
+    warmup = warmup_state.to_dict()
+    if not warmup_state.ready:
+        # 预热未完成时不探测依赖，直接返回未就绪
+        return False, {"status": "warming_up", "warmup": warmup, "checks": {}}
+
+    names = list(_checks)
+    results = await asyncio.gather(*(_checks[name].run() for name in names))
+    checks = dict(zip(names, results))
+    ready = all(result["ok"] for result in results)
+    return ready, {
+        "status": "ready" if ready else "not_ready",
+        "warmup": warmup,
+        "checks": checks,
+    }
+
+
+async def close_clients() -> None:
+    """关闭就绪检查使用的客户端"""
+    global _redis_client, _http_client
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -2,21 +2,27 @@
 LLM 模型客户端管理模块
 提供各种 LLM 模型客户端的创建和管理功能
 支持 UI 自动化、图像分析等多种场景
+
+autogen_ext / openai 依赖较重，只在首次创建客户端时导入，避免拖慢应用启动
 """
-from typing import Optional
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_core.models import ModelInfo
+import logging
+from typing import Optional, TYPE_CHECKING
 from .config import Settings
 
+if TYPE_CHECKING:
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+logger = logging.getLogger(__name__)
 
 
 # 全局模型客户端缓存
-_uitars_model_client: Optional[OpenAIChatCompletionClient] = None
-_deepseek_client_cache: Optional[OpenAIChatCompletionClient] = None
-_default_model_client: Optional[OpenAIChatCompletionClient] = None
+_uitars_model_client: Optional["OpenAIChatCompletionClient"] = None
+_deepseek_client_cache: Optional["OpenAIChatCompletionClient"] = None
+_deepseek_json_client_cache: Optional["OpenAIChatCompletionClient"] = None
+_default_model_client: Optional["OpenAIChatCompletionClient"] = None
 
 
-def _get_uitars_model_client(settings: Optional[Settings] = None) -> OpenAIChatCompletionClient:
+def _get_uitars_model_client(settings: Optional[Settings] = None) -> "OpenAIChatCompletionClient":
     """
     获取 UI-TARS 模型客户端，用于 UI 自动化和图像分析
 
@@ -29,20 +35,16 @@ def _get_uitars_model_client(settings: Optional[Settings] = None) -> OpenAIChatC
     global _uitars_model_client
 
     if _uitars_model_client is None:
+        from autogen_ext.models.openai import OpenAIChatCompletionClient
+
         if settings is None:
             from .config import settings as global_settings
             settings = global_settings
 
         # 从配置中获取 UI-TARS 模型信息
-        uitars_model = getattr(settings, 'uitars_model', 'gpt-4o')
-        uitars_api_key = getattr(settings, 'uitars_api_key', settings.api_key)
-        uitars_base_url = getattr(settings, 'uitars_base_url', settings.base_url)
-
-        # 调试信息
-        print(f"\n🔍 UI-TARS 模型配置:")
-        print(f"   模型: {uitars_model}")
-        print(f"   API Key: {uitars_api_key[:20]}...{uitars_api_key[-10:] if uitars_api_key and len(uitars_api_key) > 30 else uitars_api_key}")
-        print(f"   Base URL: {uitars_base_url}")
+        uitars_model = settings.UITARS_MODEL
+        uitars_api_key = settings.UITARS_API_KEY or settings.API_KEY
+        uitars_base_url = settings.UITARS_BASE_URL
 
         _uitars_model_client = OpenAIChatCompletionClient(
             model=uitars_model,
@@ -57,12 +59,12 @@ def _get_uitars_model_client(settings: Optional[Settings] = None) -> OpenAIChatC
                 "multiple_system_messages": True,
             },
         )
-        print(f"✅ UI-TARS 模型客户端已创建成功")
+        logger.info("UI-TARS 模型客户端已创建: %s (%s)", uitars_model, uitars_base_url)
 
     return _uitars_model_client
 
 
-def _deepseek_model_client(settings: Optional[Settings] = None) -> OpenAIChatCompletionClient:
+def _deepseek_model_client(settings: Optional[Settings] = None) -> "OpenAIChatCompletionClient":
     """
     获取deepseek模型客户端，用于通用对话和文本处理
 
@@ -75,6 +77,8 @@ def _deepseek_model_client(settings: Optional[Settings] = None) -> OpenAIChatCom
     global _deepseek_client_cache
 
     if _deepseek_client_cache is None:
+        from autogen_ext.models.openai import OpenAIChatCompletionClient
+
         if settings is None:
             from .config import settings as global_settings
             settings = global_settings
@@ -94,11 +98,53 @@ def _deepseek_model_client(settings: Optional[Settings] = None) -> OpenAIChatCom
             # 启用流式输出选项
             stream_options={"include_usage": True},
         )
-        print(f"✅ DeepSeek模型客户端已创建: {settings.MODEL_NAME}")
+        logger.info("DeepSeek模型客户端已创建: %s", settings.MODEL_NAME)
 
     return _deepseek_client_cache
 
 
+def _deepseek_json_model_client(settings: Optional[Settings] = None) -> "OpenAIChatCompletionClient":
+    """
+    获取 JSON 模式的 deepseek 模型客户端（response_format 为 json_object），用于生成结构化测试用例
+
+    不支持 json_schema 结构化输出的模型（如 deepseek）用这种方式保证输出是合法 JSON，
+    提示词中需要说明 JSON 格式
+
+    参数:
+        settings: 配置实例，如果为 None 则使用全局配置
+
+    返回:
+        OpenAIChatCompletionClient 实例
+    """
+    global _deepseek_json_client_cache
+
+    if _deepseek_json_client_cache is None:
+        from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+        if settings is None:
+            from .config import settings as global_settings
+            settings = global_settings
+
+        _deepseek_json_client_cache = OpenAIChatCompletionClient(
+            model=settings.MODEL_NAME,
+            api_key=settings.API_KEY,
+            base_url=settings.BASE_URL,
+            model_info={
+                "vision": False,
+                "function_calling": True,
+                "json_output": True,
+                "structured_output": True,
+                "family": _get_model_family(settings.MODEL_NAME),
+                "multiple_system_messages": True,
+            },
+            response_format={"type": "json_object"},
+            stream_options={"include_usage": True},
+        )
+        logger.info("DeepSeek JSON 模式客户端已创建: %s", settings.MODEL_NAME)
+
+    return _deepseek_json_client_cache
+
+
 def _get_model_family(model_name: Optional[str]) -> str:
     """
     根据模型名称推断模型家族
@@ -135,11 +181,12 @@ def reset_model_clients() -> None:
     重置所有模型客户端缓存
     用于配置更新后重新初始化客户端
     """
-    global _uitars_model_client, _deepseek_client_cache, _default_model_client
+    global _uitars_model_client, _deepseek_client_cache, _deepseek_json_client_cache, _default_model_client
 
     _uitars_model_client = None
     _deepseek_client_cache = None
+    _deepseek_json_client_cache = None
     _default_model_client = None
 
-    print("🔄 所有模型客户端缓存已重置")
+    logger.info("所有模型客户端缓存已重置")
 
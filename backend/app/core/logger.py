@@ -0,0 +1,206 @@
+"""
+结构化日志模块
+提供 JSON 行格式输出、请求/会话 ID 上下文、基于队列的非阻塞写入以及高频事件限流采样
+
+用法:
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.info("团队会话创建", extra={"agent_count": 3})
+"""
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from .config import settings
+
+# 请求与会话上下文，在 asyncio 任务间自动传递
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+session_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("session_id", default=None)
+
+# LogRecord 自带属性，JSON 输出时不作为额外字段
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+def bind_session_id(session_id: Optional[str]) -> contextvars.Token:
+    """将会话 ID 绑定到当前上下文，之后该上下文中的日志都会带上 session_id"""
+    return session_id_var.set(session_id)
+
+
+class ContextFilter(logging.Filter):
+    """在入队前把上下文中的请求/会话 ID 写入日志记录（监听线程中无法读取 contextvars）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        if not hasattr(record, "session_id"):
+            record.session_id = session_id_var.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    高频事件限流采样过滤器
+
+    以 (logger 名称, 消息模板) 为键，每个键在一个时间窗口内最多放行 max_per_window 条
+    INFO 及以下的日志；WARNING 及以上级别始终放行。被丢弃的条数会记录在下一条放行日志的
+    suppressed 字段中。消息模板应使用 %s 占位符而不是 f-string，否则每条日志都是独立的键
+    """
+
+    # 键数量上限，防止 f-string 消息导致计数表无限增长
+    max_keys = 10000
+
+    def __init__(self, max_per_window: int = 20, window_seconds: float = 1.0):
+        super().__init__()
+        self.max_per_window = max_per_window
+        self.window_seconds = window_seconds
+        self._buckets: dict[tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.max_per_window <= 0:
+            return True
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[0] >= self.window_seconds:
+                if bucket is None and len(self._buckets) >= self.max_keys:
+                    self._buckets.clear()
+                suppressed = bucket[2] if bucket else 0
+                self._buckets[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+
+            if bucket[1] < self.max_per_window:
+                bucket[1] += 1
+                return True
+
+            bucket[2] += 1
+            return False
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON 行格式化器"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key in _RESERVED_ATTRS or value is None:
+                continue
+            payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _StructuredQueueHandler(QueueHandler):
+    """
+    保留结构化字段的队列处理器
+
+    标准 QueueHandler.prepare 会用默认格式把记录压扁成字符串；这里只合并消息参数并预先
+    格式化异常堆栈，额外字段原样保留给监听线程中的 JsonFormatter
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging() -> None:
+    """
+    配置根日志：业务线程只把记录放入队列，由后台监听线程负责格式化与写出，
+    因此日志调用永远不会阻塞事件循环
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if settings.LOG_FORMAT == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s [%(name)s] [%(request_id)s/%(session_id)s] %(message)s")
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    queue_handler = _StructuredQueueHandler(queue.SimpleQueue())
+    # 先限流再补充上下文，被丢弃的记录不再做多余的工作
+    queue_handler.addFilter(RateLimitFilter(settings.LOG_SAMPLE_MAX_PER_SECOND))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """停止监听线程并刷出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestContextMiddleware:
+    """
+    请求上下文中间件（纯 ASGI 实现）
+
+    读取或生成 X-Request-ID，写入日志上下文并回传到响应头
+    """
+
+    header_name = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == self.header_name:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(self.header_name, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
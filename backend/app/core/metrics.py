@@ -0,0 +1,426 @@
+"""
+Prometheus 指标采集模块
+提供请求延迟、SSE 流、LLM 调用、数据库连接池、会话存储以及事件循环延迟等指标
+热路径上只做本地计数，流或调用结束时一次性写入指标，保证流式接口的采集开销可以忽略
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Optional, Sized
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 流式接口时长的分桶（秒），覆盖从秒级到数分钟的团队协作
+_STREAM_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+# 首字延迟与单次 LLM 调用的分桶（秒）
+_LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60, 120)
+
+
+# ==========================================
+# HTTP 请求指标
+# ==========================================
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求处理耗时",
+    ["method", "route", "status"],
+)
+
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "正在处理中的 HTTP 请求数",
+    ["method"],
+)
+
+# ==========================================
+# SSE 流式响应指标
+# ==========================================
+SSE_STREAM_DURATION = Histogram(
+    "sse_stream_duration_seconds",
+    "SSE 流从开始到结束的总耗时",
+    ["endpoint", "outcome"],
+    buckets=_STREAM_BUCKETS,
+)
+
+SSE_TIME_TO_FIRST_TOKEN = Histogram(
+    "sse_time_to_first_token_seconds",
+    "SSE 流从开始到第一个内容 chunk 的耗时",
+    ["endpoint"],
+    buckets=_LLM_BUCKETS,
+)
+
+SSE_CHUNKS = Counter(
+    "sse_stream_chunks_total",
+    "SSE 流发送的内容 chunk 总数",
+    ["endpoint"],
+)
+
+SSE_ACTIVE_STREAMS = Gauge(
+    "sse_active_streams",
+    "当前打开的 SSE 流数量",
+    ["endpoint"],
+)
+
+# ==========================================
+# LLM 调用指标
+# ==========================================
+LLM_CALL_LATENCY = Histogram(
+    "llm_call_duration_seconds",
+    "单次 LLM 调用（一个智能体一轮回复）的耗时",
+    ["model", "agent"],
+    buckets=_LLM_BUCKETS,
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM 消耗的 token 数",
+    ["model", "agent", "kind"],
+)
+
+LLM_RATE_LIMIT_WAIT = Histogram(
+    "llm_rate_limit_wait_seconds",
+    "LLM 调用在限流器中的排队时间",
+    ["model"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# ==========================================
+# 图片分析缓存指标
+# ==========================================
+IMAGE_CACHE_LOOKUPS = Counter(
+    "image_analysis_cache_lookups_total",
+    "图片分析缓存查询次数",
+    ["result"],  # hit / miss / bypass
+)
+
+IMAGE_CACHE_SIZE = Gauge(
+    "image_analysis_cache_entries",
+    "图片分析缓存中的条目数",
+)
+
+# ==========================================
+# 文档解析指标
+# ==========================================
+DOCUMENT_CHUNK_CACHE_LOOKUPS = Counter(
+    "document_chunk_cache_lookups_total",
+    "文档分块分析缓存查询次数",
+    ["result"],  # hit / miss / bypass
+)
+
+DOCUMENT_CHUNK_CACHE_SIZE = Gauge(
+    "document_chunk_cache_entries",
+    "文档分块分析缓存中的条目数",
+)
+
+DOCUMENT_CHUNKS = Counter(
+    "document_chunks_total",
+    "解析出的文档分块数",
+    ["format"],
+)
+
+# ==========================================
+# 测试用例与执行结果批量入库指标
+# ==========================================
+TEST_CASE_INGEST_ROWS = Counter(
+    "test_case_ingest_rows_total",
+    "批量入库的测试用例数",
+    ["method"],
+)
+TEST_CASE_INGEST_DURATION = Histogram(
+    "test_case_ingest_duration_seconds",
+    "单次批量入库耗时（秒）",
+    ["method"],
+)
+
+TEST_RESULT_IMPORT_CASES = Counter(
+    "test_result_import_cases_total",
+    "导入的测试报告用例结果数（matched 为匹配到用例并写入的结果）",
+    ["outcome"],
+)
+TEST_RESULT_IMPORT_DURATION = Histogram(
+    "test_result_import_duration_seconds",
+    "单个测试报告导入耗时（秒）",
+    ["format"],
+)
+
+# ==========================================
+# 用例不稳定性分析指标
+# ==========================================
+TEST_FLAKINESS_EXECUTIONS = Counter(
+    "test_flakiness_executions_total",
+    "不稳定性分析处理的执行记录数",
+)
+TEST_FLAKINESS_DURATION = Histogram(
+    "test_flakiness_duration_seconds",
+    "单次不稳定性分析耗时（秒）",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+
+# ==========================================
+# 测试计划统计对账指标
+# ==========================================
+TEST_PLAN_STATS_DRIFT = Counter(
+    "test_plan_stats_drift_total",
+    "对账时发现统计与执行记录不一致并已修正的测试计划数",
+)
+
+# ==========================================
+# 项目计数指标
+# ==========================================
+PROJECT_COUNTER_FLUSHES = Counter(
+    "project_counter_flushes_total",
+    "项目计数增量合并写入数据库的次数",
+    ["outcome"],
+)
+
+PROJECT_COUNTER_DRIFT = Counter(
+    "project_counter_drift_total",
+    "对账时发现计数与实际记录数不一致并已修正的项目数",
+)
+
+# ==========================================
+# 数据库连接池与会话存储指标（抓取时读取，无热路径开销）
+# ==========================================
+DB_POOL_SIZE = Gauge("db_pool_size", "连接池配置大小", ["engine"])
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "已借出的连接数", ["engine"])
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "当前溢出连接数", ["engine"])
+DB_POOL_CHECKED_IN = Gauge("db_pool_checked_in", "池中空闲的连接数", ["engine"])
+
+SESSION_STORE_SIZE = Gauge(
+    "session_store_size",
+    "内存会话存储中的条目数",
+    ["store"],
+)
+
+# ==========================================
+# 事件循环延迟指标
+# ==========================================
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "事件循环调度延迟（实际唤醒时间与预期唤醒时间之差）",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+EVENT_LOOP_LAG_MAX = Gauge(
+    "event_loop_lag_max_seconds",
+    "最近一个采样窗口内的最大事件循环延迟",
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    生成 Prometheus 文本格式的指标数据
+
+    返回:
+        (指标内容, Content-Type)
+    """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def register_session_store(name: str, store: Sized) -> None:
+    """
+    注册内存会话存储，抓取时读取其大小
+
+    参数:
+        name: 存储名称，作为指标标签
+        store: 任意支持 len() 的容器
+    """
+    SESSION_STORE_SIZE.labels(store=name).set_function(lambda: len(store))
+
+
+def _register_pool(name: str, pool: Any) -> None:
+    """注册单个连接池的各项指标"""
+    # 非 QueuePool（如 NullPool）没有这些统计方法
+    if not all(hasattr(pool, attr) for attr in ("size", "checkedout", "overflow", "checkedin")):
+        return
+    DB_POOL_SIZE.labels(engine=name).set_function(pool.size)
+    DB_POOL_CHECKED_OUT.labels(engine=name).set_function(pool.checkedout)
+    DB_POOL_OVERFLOW.labels(engine=name).set_function(pool.overflow)
+    DB_POOL_CHECKED_IN.labels(engine=name).set_function(pool.checkedin)
+
+
+def register_db_pools() -> None:
+    """注册同步与异步数据库引擎的连接池指标"""
+    from .database import engine, async_engine
+
+    _register_pool("sync", engine.pool)
+    _register_pool("async", async_engine.sync_engine.pool)
+
+
+class PrometheusMiddleware:
+    """
+    请求延迟采集中间件（纯 ASGI 实现，避免 BaseHTTPMiddleware 对流式响应的额外包装）
+
+    使用路由模板（如 /api/v1/users/{user_id}）作为标签，避免路径参数导致标签基数膨胀
+    """
+
+    def __init__(self, app, exclude_paths: tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(
+                method=method, route=route_path, status=str(status_code)
+            ).observe(time.perf_counter() - start)
+
+
+class StreamMetrics:
+    """
+    单个 SSE 流的指标采集器
+
+    chunk 计数和首字时间只记录在实例属性上，流结束时调用 finish() 一次性写入指标
+
+    用法:
+        stream_metrics = StreamMetrics("ai_chat")
+        ...
+        stream_metrics.on_chunk()
+        ...
+        stream_metrics.finish("completed")
+    """
+
+    __slots__ = ("endpoint", "start", "first_chunk_at", "chunks", "_finished")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.first_chunk_at: Optional[float] = None
+        self.chunks = 0
+        self._finished = False
+        SSE_ACTIVE_STREAMS.labels(endpoint=endpoint).inc()
+
+    def on_chunk(self) -> None:
+        """记录一个内容 chunk"""
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        self.chunks += 1
+
+    def finish(self, outcome: str = "completed") -> None:
+        """结束流并写入指标，重复调用只生效一次"""
+        if self._finished:
+            return
+        self._finished = True
+        end = time.perf_counter()
+        SSE_ACTIVE_STREAMS.labels(endpoint=self.endpoint).dec()
+        SSE_STREAM_DURATION.labels(endpoint=self.endpoint, outcome=outcome).observe(end - self.start)
+        if self.first_chunk_at is not None:
+            SSE_TIME_TO_FIRST_TOKEN.labels(endpoint=self.endpoint).observe(self.first_chunk_at - self.start)
+        if self.chunks:
+            SSE_CHUNKS.labels(endpoint=self.endpoint).inc(self.chunks)
+
+
+class LLMCallTracker:
+    """
+    基于 AutoGen 事件流的 LLM 调用采集器
+
+    每当智能体产出带 models_usage 的完整消息时，视为一次 LLM 调用结束：
+    记录距上一次调用结束（或开始）的耗时，以及 prompt/completion token 数
+    """
+
+    __slots__ = ("model", "_mark")
+
+    def __init__(self, model: str):
+        self.model = model
+        self._mark = time.perf_counter()
+
+    def observe_event(self, event: Any) -> None:
+        """检查事件，若为一次完整的模型回复则写入指标"""
+        usage = getattr(event, "models_usage", None)
+        if usage is None:
+            return
+        agent = getattr(event, "source", None) or "unknown"
+        now = time.perf_counter()
+        LLM_CALL_LATENCY.labels(model=self.model, agent=agent).observe(now - self._mark)
+        self._mark = now
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        if prompt_tokens:
+            LLM_TOKENS.labels(model=self.model, agent=agent, kind="prompt").inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(model=self.model, agent=agent, kind="completion").inc(completion_tokens)
+
+
+class EventLoopLagMonitor:
+    """
+    事件循环延迟监控器
+
+    周期性地 sleep 固定间隔，实际唤醒时间超出预期的部分即为事件循环被阻塞的时长
+    （同步数据库访问、bcrypt、文件读取等都会体现在这里）
+    """
+
+    def __init__(self, interval: float = 0.5, warn_threshold: float = 0.1, window: int = 20):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.window = window
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        window_max = 0.0
+        samples = 0
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            EVENT_LOOP_LAG.observe(lag)
+            window_max = max(window_max, lag)
+            samples += 1
+            if samples >= self.window:
+                EVENT_LOOP_LAG_MAX.set(window_max)
+                window_max = 0.0
+                samples = 0
+            if lag >= self.warn_threshold:
+                logger.warning("事件循环阻塞 %.3fs", lag)
+
+    def start(self) -> None:
+        """在当前事件循环中启动监控任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="event-loop-lag-monitor")
+
+    async def stop(self) -> None:
+        """停止监控任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局事件循环延迟监控器
+event_loop_monitor = EventLoopLagMonitor(
+    interval=settings.EVENT_LOOP_LAG_INTERVAL,
+    warn_threshold=settings.EVENT_LOOP_LAG_WARN_THRESHOLD,
+)
@@ -1,144 +1,118 @@
 # 用于编排智能体
-from venv import logger
-from autogen_core import SingleThreadedAgentRuntime, TopicId
+import logging
+from typing import AsyncIterator, Optional
+
+from pydantic import BaseModel
+
+from app.core.agents import StreamResponse, TopicTypes, session_topic
+from app.core.runtime_pool import AgentRuntimePool, runtime_pool
+from app.models.test_case import (
+    DocumentParseRequest, ImageAnalysisRequest, TestCaseGenerationRequest, VideoAnalysisRequest,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class TestCaseOrchestrator:
-    async def _initialize_runtime(self, session_id: str) -> None:
-        """初始化运行时"""
-        try:
-            if self.runtime is None:
-                self.runtime = SingleThreadedAgentRuntime()   #分布式部署智能体时修改此参数
-            
-            # 注册所有测试用例相关智能体
-            await self._register_test_case_agents()
-
-            # 注册流式响应搜集器
-            await self.agent_factory.register_register_stream_collector(
-                runtime = self.runtime,
-                collector = self.response_collector
-            )
-
-            # 启动运行时
-            self.runtime.start()
-
-            logger.info(f"运行时初始化完成: {session_id}")
-
-        except Exception as e:
-            logger.error(f"运行时初始化失败: {str(e)}")
-            raise e
-
-    async def _register_test_case_agents(self) -> None:
-        """注册所有测试用例相关智能体"""
-
-        # 注册测试用例生成智能体
-        await self.agent_factory.register_agent_to_runtime(
-            self.runtime, 
-            agent_type="test_case_generator"
-            topic_type=TopicId("test_case_generator")
-        
-        logger.info(f"测试用例生成智能体注册完成")
-
-        # 注册文档分析智能体
-        await self.agent_factory.register_agent_to_runtime(
-            self.runtime, 
-            agent_type="document_parse"
-            topic_type=TopicId("document_parse")
-        )
-        logger.info(f"文档分析智能体注册完成")
-
-        # 注册图片分析智能体
-        await self.agent_factory.register_agent_to_runtime(
-            self.runtime, 
-            agent_type="image_analysis"
-            topic_type=TopicId("image_analysis")
-        )
-        logger.info(f"图片分析智能体注册完成")
-
-        # 注册思维导图生成智能体
-        await self.agent_factory.register_agent_to_runtime(
-            self.runtime, 
-            agent_type="mid_map_generation"
-            topic_type=TopicId("mid_map_generation")
-        )
-        logger.info(f"思维导图生成智能体注册完成")
-
-        # 注册Excel导出智能体
-        await self.agent_factory.register_agent_to_runtime(
-            self.runtime, 
-            agent_type="excel_export"
-            topic_type=TopicId("excel_export")
-        )        
-        logger.info(f"Excel导出智能体注册完成")
+    """
+    测试用例工作流编排器
 
+    运行时由全局运行时池提供，智能体在池启动时已注册完毕；
+    编排器只负责获取租约、向会话级主题发布请求，并从响应收集器读取该会话的流式输出
+    """
 
+    def __init__(self, pool: Optional[AgentRuntimePool] = None):
+        self.pool = pool or runtime_pool
 
-    async def parse_document(self, request: DocumentParseRequest) -> None:
+    async def _start_workflow(self, topic_type: str, session_id: str, message: BaseModel) -> None:
+        """获取运行时租约并把请求发布到会话级主题"""
+        lease = await self.pool.acquire(session_id)
+        # 先打开响应队列，避免智能体的早期输出在消费方就绪前被丢弃
+        self.pool.collector.open(session_id)
         try:
-            """
-            解析文档，并生成测试用例
-
-            智能体消息流：
-            1. DocumentParseRequest 到 document_parse 智能体
-            2. DocumentParseAgent 分析文档内容
-            3. ocumentParseAgent 发送 TestCaseGeneratorRequest 到 test_case_generator 智能体
-            4. test_case_generator 智能体生成并保存测试用例
-            5. test_case_generator 发送MidMapGenertionRequest 到 mid_map_generation 智能体
-            6. mid_map_generation 智能体生成并保存思维导图
-            
-            Args:
-                request (DocumentParseRequest): 图片分析请求
-
-            """
-
-            logger.info(f"图片分析工作流启动: {request.session_id}")
-            # 初始化运行时
-            await self._initialize_runtime(request.session_id)
-
-            # 发送到文档分析智能体
-            await self.runtime.publish_message(
-                request.image, 
-                topic_id=TopicId("document_parse"),
-                source="user"
-            )
-
-            logger.info(f"文档分析工作流启动完成: {request.session_id}")
-        
-        except Exception as e:
-            logger.error(f"文档分析工作流启动失败: {str(e)}")
-            raise e   
+            await lease.runtime.publish_message(message, topic_id=session_topic(topic_type, session_id))
+        except Exception:
+            self.release(session_id)
+            raise
 
     async def analyze_image(self, request: ImageAnalysisRequest) -> None:
+        """
+        解析图片，并生成测试用例
+
+        智能体消息流：
+        1. 发送 ImageAnalysisRequest 到 image_analysis 智能体
+        2. ImageAnalyzerAgent 分析图片内容
+        3. ImageAnalyzerAgent 发送 TestCaseGenerationRequest 到 test_case_generator 智能体
+        4. test_case_generator 智能体生成测试用例并发送结束标记
+
+        Args:
+            request (ImageAnalysisRequest): 图片分析请求
+        """
+        try:
+            logger.info("图片分析工作流启动", extra={"session_id": request.session_id})
+            await self._start_workflow(TopicTypes.IMAGE_ANALYSIS, request.session_id, request)
+        except Exception:
+            logger.exception("图片分析工作流启动失败", extra={"session_id": request.session_id})
+            raise
+
+    async def analyze_video(self, request: VideoAnalysisRequest) -> None:
+        """
+        解析视频，并生成测试用例
+
+        Args:
+            request (VideoAnalysisRequest): 视频分析请求
+        """
+        try:
+            logger.info("视频分析工作流启动", extra={"session_id": request.session_id})
+            await self._start_workflow(TopicTypes.VIDEO_ANALYSIS, request.session_id, request)
+        except Exception:
+            logger.exception("视频分析工作流启动失败", extra={"session_id": request.session_id})
+            raise
+
+    async def parse_document(self, request: DocumentParseRequest) -> None:
+        """
+        解析需求文档，并生成测试用例
+
+        智能体消息流：
+        1. 发送 DocumentParseRequest 到 document_parse 智能体
+        2. DocumentParseAgent 流式解析文档、按标题分块并发分析（未变化的分块复用缓存结果）
+        3. DocumentParseAgent 发送 TestCaseGenerationRequest 到 test_case_generator 智能体
+
+        Args:
+            request (DocumentParseRequest): 文档解析请求
+        """
+        try:
+            logger.info("文档解析工作流启动", extra={"session_id": request.session_id})
+            await self._start_workflow(TopicTypes.DOCUMENT_PARSE, request.session_id, request)
+        except Exception:
+            logger.exception("文档解析工作流启动失败", extra={"session_id": request.session_id})
+            raise
+
+    async def generate_test_cases(self, request: TestCaseGenerationRequest) -> None:
+        """
+        直接发送生成请求到测试用例生成智能体（如按需求变更增量生成）
+
+        Args:
+            request (TestCaseGenerationRequest): 测试用例生成请求
+        """
         try:
-            """
-            解析图片，并生成测试用例
-
-            智能体消息流：
-            1. 发送ImageAnalysisRequest到 image_analysis 智能体
-            2. ImaageAnalyerAgent分析图片内容
-            3. ImageAnalyerAgent 发送 TestCaseGeneratorRequest 到 test_case_generator 智能体
-            4. test_case_generator 智能体生成并保存测试用例
-            5. test_case_generator 发送MidMapGenertionRequest 到 mid_map_generation 智能体
-            6. mid_map_generation 智能体生成并保存思维导图
-            
-            Args:
-                request (ImageAnalysisRequest): 图片分析请求
-
-            """
-            logger.info(f"图片分析工作流启动: {request.session_id}")
-
-        # 初始化运行时
-            await self._initialize_runtime(request.session_id)
-
-            # 发送到图片分析智能体
-            await self.runtime.publish_message(
-                request.image, 
-                topic_id=TopicId("image_analysis"),
-                source="user"
-            )
-
-            logger.info(f"图片分析工作流启动完成: {request.session_id}")
-        
-        except Exception as e:
-            logger.error(f"图片分析工作流启动失败: {str(e)}")
-            raise e
\ No newline at end of file
+            logger.info("测试用例生成工作流启动", extra={"session_id": request.session_id})
+            await self._start_workflow(TopicTypes.TEST_CASE_GENERATOR, request.session_id, request)
+        except Exception:
+            logger.exception("测试用例生成工作流启动失败", extra={"session_id": request.session_id})
+            raise
+
+    async def stream(self, session_id: str, timeout: Optional[float] = None) -> AsyncIterator[StreamResponse]:
+        """
+        读取会话的流式响应
+
+        消费方断开时只关闭响应队列，运行时租约在工作流发送结束标记（或超时）后归还
+        """
+        async for response in self.pool.collector.stream(session_id, timeout=timeout):
+            yield response
+            if response.is_final:
+                self.release(session_id)
+
+    def release(self, session_id: str) -> None:
+        """归还会话的运行时租约（可重复调用）"""
+        self.pool.release(session_id)
@@ -0,0 +1,90 @@
+"""
+提示词注册表模块
+启动预热时一次性把 app/prompts 下的提示词加载到内存，请求路径上不再读磁盘
+"""
+import logging
+import os
+import threading
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "prompts"))
+
+
+class PromptRegistry:
+    """提示词注册表，按文件名缓存提示词内容"""
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR):
+        self.prompts_dir = prompts_dir
+        self._prompts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def _read(self, filename: str) -> str:
+        """
+        从磁盘读取提示词
+
+        Raises:
+            FileNotFoundError: 文件不存在
+            ValueError: 文件内容为空
+        """
+        file_path = os.path.normpath(os.path.join(self.prompts_dir, filename))
+        # 防止通过 ../ 读取提示词目录之外的文件
+        if os.path.dirname(file_path) != self.prompts_dir:
+            raise FileNotFoundError(filename)
+
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+
+        if not content:
+            raise ValueError(f"提示词文件为空: {filename}")
+        return content
+
+    def load_all(self) -> int:
+        """
+        加载目录下全部 .txt 提示词
+
+        Returns:
+            int: 加载的提示词数量
+        """
+        prompts: Dict[str, str] = {}
+        for filename in sorted(os.listdir(self.prompts_dir)):
+            if not filename.endswith(".txt"):
+                continue
+            try:
+                prompts[filename] = self._read(filename)
+            except ValueError:
+                logger.warning("跳过空提示词文件: %s", filename)
+
+        with self._lock:
+            self._prompts.update(prompts)
+            self.loaded = True
+        logger.info("提示词注册表加载完成，共 %d 个", len(prompts))
+        return len(prompts)
+
+    def get(self, filename: str) -> str:
+        """
+        获取提示词，未命中缓存时从磁盘读取并缓存
+
+        Raises:
+            FileNotFoundError: 文件不存在
+            ValueError: 文件内容为空
+        """
+        content = self._prompts.get(filename)
+        if content is None:
+            content = self._read(filename)
+            with self._lock:
+                self._prompts[filename] = content
+        return content
+
+    def reload(self) -> int:
+        """清空缓存并重新加载全部提示词"""
+        with self._lock:
+            self._prompts.clear()
+            self.loaded = False
+        return self.load_all()
+
+
+# 全局提示词注册表
+prompt_registry = PromptRegistry()
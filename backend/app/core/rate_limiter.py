@@ -0,0 +1,93 @@
+"""
+LLM 调用限流模块
+按模型限制同时进行的调用数（信号量）与每分钟请求数（令牌桶），所有智能体的模型调用都经过这里，
+并发扇出时不会超过模型服务的配额
+
+限流状态保存在当前进程内，分布式部署时每个 worker 各自限流，配额需按 worker 数分摊
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from .config import settings
+from .metrics import LLM_RATE_LIMIT_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    Args:
+        rate: 每秒补充的令牌数
+        capacity: 桶容量（允许的突发请求数）
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """取一个令牌，令牌不足时等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _ModelLimit:
+    def __init__(self, concurrency: int, requests_per_minute: int):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.bucket: Optional[TokenBucket] = None
+        if requests_per_minute > 0:
+            self.bucket = TokenBucket(rate=requests_per_minute / 60.0, capacity=max(1.0, min(requests_per_minute, concurrency)))
+
+
+class LLMRateLimiter:
+    """按模型名称限流"""
+
+    def __init__(self):
+        self._limits: Dict[str, _ModelLimit] = {}
+
+    def _get(self, model: str) -> _ModelLimit:
+        limit = self._limits.get(model)
+        if limit is None:
+            config = settings.LLM_RATE_LIMITS.get(model, {})
+            limit = _ModelLimit(
+                concurrency=int(config.get("concurrency", settings.LLM_MAX_CONCURRENCY)),
+                requests_per_minute=int(config.get("rpm", settings.LLM_REQUESTS_PER_MINUTE)),
+            )
+            self._limits[model] = limit
+        return limit
+
+    @asynccontextmanager
+    async def limit(self, model: str) -> AsyncIterator[None]:
+        """
+        在限流内执行一次模型调用
+
+        用法:
+            async with llm_rate_limiter.limit(settings.MODEL_NAME):
+                await agent.run(...)
+        """
+        limit = self._get(model)
+        start = time.perf_counter()
+        async with limit.semaphore:
+            if limit.bucket is not None:
+                await limit.bucket.acquire()
+            LLM_RATE_LIMIT_WAIT.labels(model=model).observe(time.perf_counter() - start)
+            yield
+
+
+# 全局 LLM 限流器
+llm_rate_limiter = LLMRateLimiter()
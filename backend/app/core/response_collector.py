@@ -0,0 +1,111 @@
+"""
+流式响应收集器模块
+以 ClosureAgent 的形式注册到运行时，订阅 stream_output 主题，按会话把智能体输出分发到各自的队列中，
+供 SSE 接口消费
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from autogen_core import AgentRuntime, ClosureAgent, ClosureContext, MessageContext, TypeSubscription
+
+from .agents import StreamResponse, TopicTypes
+
+logger = logging.getLogger(__name__)
+
+COLLECTOR_AGENT_TYPE = "stream_collector"
+
+
+class StreamResponseCollector:
+    """按会话收集智能体流式响应"""
+
+    def __init__(self, max_queue_size: int = 1000):
+        self.max_queue_size = max_queue_size
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._done_callbacks: Dict[str, List[Callable[[str], None]]] = {}
+
+    async def register(self, runtime: AgentRuntime, agent_type: str = COLLECTOR_AGENT_TYPE) -> None:
+        """
+        注册到运行时
+
+        Args:
+            runtime: 运行时
+            agent_type: 收集器的智能体类型；连接同一 gRPC 宿主的每个 API 进程需使用不同的类型
+        """
+        collector = self
+
+        async def collect(_ctx: ClosureContext, message: StreamResponse, _msg_ctx: MessageContext) -> None:
+            collector.dispatch(message)
+
+        await ClosureAgent.register_closure(
+            runtime,
+            agent_type,
+            collect,
+            unknown_type_policy="ignore",
+            description="流式响应收集器",
+            subscriptions=lambda: [
+                TypeSubscription(topic_type=TopicTypes.STREAM_OUTPUT, agent_type=agent_type)
+            ],
+        )
+
+    def open(self, session_id: str) -> asyncio.Queue:
+        """为会话创建响应队列，需在发布第一条消息前调用"""
+        queue = self._queues.get(session_id)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._queues[session_id] = queue
+        return queue
+
+    def close(self, session_id: str) -> None:
+        """
+        关闭会话的响应队列
+
+        会话结束回调不在这里清理：前端断开后工作流仍在运行，仍需在其真正结束时触发回调
+        """
+        self._queues.pop(session_id, None)
+
+    def discard_callbacks(self, session_id: str) -> None:
+        """丢弃会话结束回调（会话已被其他方式结束时调用）"""
+        self._done_callbacks.pop(session_id, None)
+
+    def on_done(self, session_id: str, callback: Callable[[str], None]) -> None:
+        """注册会话结束（收到 is_final 响应）回调"""
+        self._done_callbacks.setdefault(session_id, []).append(callback)
+
+    def dispatch(self, message: StreamResponse) -> None:
+        """把响应投递到会话队列"""
+        queue = self._queues.get(message.session_id)
+        if queue is not None:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning("会话响应队列已满，丢弃响应", extra={"session_id": message.session_id})
+
+        if message.is_final:
+            for callback in self._done_callbacks.pop(message.session_id, []):
+                try:
+                    callback(message.session_id)
+                except Exception:
+                    logger.exception("会话结束回调执行失败")
+
+    async def stream(self, session_id: str, timeout: Optional[float] = None) -> AsyncIterator[StreamResponse]:
+        """
+        逐条读取会话响应，直到收到 is_final 响应或等待超时
+
+        Args:
+            session_id: 会话ID
+            timeout: 两条响应之间的最长等待时间（秒），None 表示一直等待
+        """
+        queue = self.open(session_id)
+        try:
+            while True:
+                message = await asyncio.wait_for(queue.get(), timeout=timeout)
+                yield message
+                if message.is_final:
+                    break
+        finally:
+            self.close(session_id)
+
+    def active_sessions(self) -> int:
+        """当前打开的会话数"""
+        return len(self._queues)
@@ -0,0 +1,216 @@
+"""
+智能体运行时池模块
+维护少量长期存活的 SingleThreadedAgentRuntime，智能体类型与响应收集器在启动时一次性注册，
+各会话通过会话级 TopicId 路由到同一组运行时，不再为每个工作流重新创建运行时
+
+每个运行时有并发会话上限：会话在获取租约后才能发布消息，收到 is_final 响应（或超时）后归还租约
+
+AGENT_RUNTIME_MODE=grpc 时池中的运行时是连接智能体宿主的 gRPC worker 运行时，
+智能体由 agent_worker.py 启动的 worker 进程承载，API 进程只注册响应收集器（以及 AGENT_API_AGENT_TYPES）
+"""
+import asyncio
+import logging
+import uuid
+from typing import Dict, List, Optional
+
+from autogen_core import AgentId, AgentRuntime, SingleThreadedAgentRuntime
+
+from .agent_factory import get_agent_factory
+from .config import settings
+from .distributed import create_worker_runtime, parse_agent_types
+from .response_collector import COLLECTOR_AGENT_TYPE, StreamResponseCollector
+
+logger = logging.getLogger(__name__)
+
+
+class PooledRuntime:
+    """池中的单个运行时及其并发控制"""
+
+    def __init__(self, index: int, runtime: AgentRuntime, max_sessions: int):
+        self.index = index
+        self.runtime = runtime
+        self.semaphore = asyncio.Semaphore(max_sessions)
+        self.active_sessions: set[str] = set()
+
+    def evict_session_agents(self, session_id: str, agent_types: List[str]) -> None:
+        """
+        移除会话对应的智能体实例
+
+        运行时按 (智能体类型, 会话ID) 懒创建实例且不提供公开的回收接口，
+        长期存活的运行时需要在会话结束后主动清理，否则实例会持续累积
+        """
+        instances = getattr(self.runtime, "_instantiated_agents", None)
+        if instances is None:
+            return
+        for agent_type in agent_types:
+            instances.pop(AgentId(agent_type, session_id), None)
+
+
+class RuntimeLease:
+    """会话对运行时的租约，release 可重复调用"""
+
+    def __init__(self, pool: "AgentRuntimePool", pooled: PooledRuntime, session_id: str):
+        self._pool = pool
+        self._pooled = pooled
+        self.session_id = session_id
+        self._released = False
+        self._watchdog: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def runtime(self) -> AgentRuntime:
+        return self._pooled.runtime
+
+    def release(self, *_args) -> None:
+        if self._released:
+            return
+        self._released = True
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+        self._pool._release(self._pooled, self.session_id)
+
+
+class AgentRuntimePool:
+    """
+    智能体运行时池
+
+    Args:
+        size: 运行时数量
+        max_sessions_per_runtime: 每个运行时允许同时运行的会话数
+        session_timeout: 会话租约的最长持有时间（秒），超时后强制归还
+        mode: local 进程内运行时，grpc 连接智能体宿主的 worker 运行时
+    """
+
+    def __init__(self, size: int = 1, max_sessions_per_runtime: int = 8, session_timeout: float = 600.0,
+                 mode: str = "local"):
+        if mode not in ("local", "grpc"):
+            raise ValueError(f"不支持的智能体运行时模式: {mode}")
+        self.mode = mode
+        self.size = max(1, size)
+        self.max_sessions_per_runtime = max(1, max_sessions_per_runtime)
+        self.session_timeout = session_timeout
+        self.collector = StreamResponseCollector()
+        self._runtimes: List[PooledRuntime] = []
+        self._leases: Dict[str, RuntimeLease] = {}
+        self._agent_types: List[str] = []
+        self._start_lock = asyncio.Lock()
+        self._started = False
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self) -> None:
+        """创建运行时并一次性注册全部智能体与响应收集器"""
+        async with self._start_lock:
+            if self._started:
+                return
+
+            factory = get_agent_factory()
+            if self.mode == "grpc":
+                # 每个 API 进程的收集器在宿主上必须是不同的智能体类型
+                collector_type = f"{COLLECTOR_AGENT_TYPE}.{uuid.uuid4().hex[:8]}"
+                agent_types = parse_agent_types(settings.AGENT_API_AGENT_TYPES)
+            else:
+                collector_type = COLLECTOR_AGENT_TYPE
+                agent_types = None
+
+            for index in range(self.size):
+                runtime = await self._create_runtime()
+                # 宿主上每个智能体类型只能由一个连接注册，且响应会广播到每个收集器，
+                # 因此 grpc 模式只在第一个运行时上注册智能体与收集器，其余运行时只用于发布消息
+                if index == 0 or self.mode == "local":
+                    await factory.register_agents(runtime, agent_types)
+                    await self.collector.register(runtime, collector_type)
+                if self.mode == "local":
+                    runtime.start()
+                self._runtimes.append(PooledRuntime(index, runtime, self.max_sessions_per_runtime))
+
+            self._agent_types = factory.runtime_agent_types + [collector_type]
+            self._started = True
+            logger.info("智能体运行时池启动完成: %s 模式 %d 个运行时，每个最多 %d 个会话",
+                        self.mode, self.size, self.max_sessions_per_runtime)
+
+    async def _create_runtime(self) -> AgentRuntime:
+        if self.mode == "grpc":
+            return await create_worker_runtime(settings.AGENT_HOST_ADDRESS)
+        return SingleThreadedAgentRuntime()
+
+    async def acquire(self, session_id: str) -> RuntimeLease:
+        """
+        为会话获取运行时租约，所有运行时都已满时等待
+
+        租约在会话收到 is_final 响应、调用 release 或超时后归还
+        """
+        if not self._started:
+            await self.start()
+
+        # 选择当前会话数最少的运行时
+        pooled = min(self._runtimes, key=lambda item: len(item.active_sessions))
+        await pooled.semaphore.acquire()
+        pooled.active_sessions.add(session_id)
+
+        lease = RuntimeLease(self, pooled, session_id)
+        self._leases[session_id] = lease
+        self.collector.on_done(session_id, lease.release)
+        if self.session_timeout > 0:
+            lease._watchdog = asyncio.get_running_loop().call_later(self.session_timeout, self._expire, lease)
+        return lease
+
+    def _expire(self, lease: RuntimeLease) -> None:
+        logger.warning("会话租约超时，强制归还", extra={"session_id": lease.session_id})
+        lease.release()
+
+    def release(self, session_id: str) -> None:
+        """归还会话的运行时租约（可重复调用）"""
+        lease = self._leases.get(session_id)
+        if lease is not None:
+            lease.release()
+
+    def _release(self, pooled: PooledRuntime, session_id: str) -> None:
+        self._leases.pop(session_id, None)
+        pooled.active_sessions.discard(session_id)
+        pooled.evict_session_agents(session_id, self._agent_types)
+        self.collector.discard_callbacks(session_id)
+        pooled.semaphore.release()
+
+    def stats(self) -> List[dict]:
+        """各运行时的会话占用情况"""
+        return [
+            {
+                "index": pooled.index,
+                "active_sessions": len(pooled.active_sessions),
+                "max_sessions": self.max_sessions_per_runtime,
+                "unprocessed_messages": getattr(pooled.runtime, "unprocessed_messages_count", None),
+            }
+            for pooled in self._runtimes
+        ]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """等待运行时处理完队列中的消息后停止，超时则直接停止"""
+        if not self._started:
+            return
+        for pooled in self._runtimes:
+            if self.mode == "grpc":
+                # worker 运行时没有 stop_when_idle，消息由 worker 进程继续处理
+                await pooled.runtime.stop()
+                continue
+            try:
+                await asyncio.wait_for(pooled.runtime.stop_when_idle(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning("运行时 %d 未能在 %.0fs 内处理完消息，强制停止", pooled.index, timeout)
+                await pooled.runtime.stop()
+            except RuntimeError:
+                # 运行时未启动或已停止
+                pass
+        self._runtimes.clear()
+        self._started = False
+        logger.info("智能体运行时池已停止")
+
+
+# 全局运行时池（首次使用时启动）
+runtime_pool = AgentRuntimePool(
+    size=settings.AGENT_RUNTIME_POOL_SIZE,
+    max_sessions_per_runtime=settings.AGENT_RUNTIME_MAX_SESSIONS,
+    session_timeout=settings.AGENT_SESSION_TIMEOUT,
+    mode=settings.AGENT_RUNTIME_MODE,
+)
@@ -0,0 +1,151 @@
+"""
+启动预热模块
+应用启动时不再同步导入 autogen 与模型客户端，而是在后台任务中预热：
+加载提示词注册表、预先建立数据库连接池中的连接、预建执行记录的未来分区，并按配置导入重量级 AI 模块、创建模型客户端
+
+预热进度记录在 warmup_state 中，就绪检查（/health/ready）在预热完成前始终返回未就绪
+"""
+import asyncio
+import importlib
+import logging
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 需要预热导入的重量级模块
+HEAVY_MODULES = (
+    "autogen_agentchat.agents",
+    "autogen_agentchat.teams",
+    "autogen_agentchat.conditions",
+    "autogen_agentchat.messages",
+    "autogen_ext.models.openai",
+    "app.core.orchestrator_service",
+)
+
+# 预热完成前必须成功的步骤
+REQUIRED_STEPS = ("prompts",)
+
+_warmup_task: Optional[asyncio.Task] = None
+
+
+class WarmupState:
+    """预热进度"""
+
+    def __init__(self) -> None:
+        self.completed = False
+        self.steps: Dict[str, bool] = {}
+
+    @property
+    def ready(self) -> bool:
+        """预热已结束且所有必需步骤都成功"""
+        return self.completed and all(self.steps.get(step) for step in REQUIRED_STEPS)
+
+    def to_dict(self) -> dict:
+        return {"completed": self.completed, "steps": dict(self.steps)}
+
+
+# 全局预热状态
+warmup_state = WarmupState()
+
+
+def _import_heavy_modules() -> None:
+    """导入重量级 AI 模块（在线程中执行）"""
+    for module_name in HEAVY_MODULES:
+        importlib.import_module(module_name)
+
+
+async def _prime_async_pool(connections: int) -> None:
+    """并发建立若干异步连接，使其留在连接池中"""
+    from .database import async_engine
+
+    async def _checkout() -> None:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(_checkout() for _ in range(connections)))
+
+
+def _prime_sync_pool(connections: int) -> None:
+    """同时借出若干同步连接后归还，使其留在连接池中（在线程中执行）"""
+    from .database import engine
+
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            opened.append(conn)
+    finally:
+        for conn in opened:
+            conn.close()
+
+
+def _ensure_execution_partitions() -> None:
+    """预建执行记录的未来月分区（在线程中执行）"""
+    from .database import SessionLocal
+    from app.services.test_execution_archive_service import TestExecutionArchiveService
+
+    with SessionLocal() as db:
+        TestExecutionArchiveService(db).ensure_partitions()
+
+
+async def _run_step(name: str, coro) -> bool:
+    """执行单个预热步骤，失败只记录日志不影响启动"""
+    start = time.perf_counter()
+    try:
+        await coro
+        logger.info("预热完成: %s (%.2fs)", name, time.perf_counter() - start)
+        ok = True
+    except Exception:
+        logger.exception("预热失败: %s", name)
+        ok = False
+    warmup_state.steps[name] = ok
+    return ok
+
+
+async def prewarm() -> None:
+    """加载提示词、预热数据库连接池，并按配置预热重量级模块与模型客户端"""
+    from . import llms
+    from .prompts import prompt_registry
+
+    try:
+        await _run_step("prompts", asyncio.to_thread(prompt_registry.load_all))
+
+        connections = settings.PREWARM_DB_CONNECTIONS
+        if connections > 0:
+            await _run_step("async_db_pool", _prime_async_pool(connections))
+            await _run_step("sync_db_pool", asyncio.to_thread(_prime_sync_pool, connections))
+
+        if settings.TEST_EXECUTION_PARTITION_MONTHS_AHEAD > 0:
+            await _run_step("execution_partitions", asyncio.to_thread(_ensure_execution_partitions))
+
+        if settings.PREWARM_ON_STARTUP:
+            await _run_step("ai_modules", asyncio.to_thread(_import_heavy_modules))
+            await _run_step("model_clients", asyncio.to_thread(llms._deepseek_model_client))
+    finally:
+        warmup_state.completed = True
+
+
+def start_background_prewarm() -> asyncio.Task:
+    """在后台启动预热任务，不阻塞应用开始接收请求"""
+    global _warmup_task
+    if _warmup_task is None or _warmup_task.done():
+        _warmup_task = asyncio.get_running_loop().create_task(prewarm(), name="prewarm")
+    return _warmup_task
+
+
+async def cancel_prewarm() -> None:
+    """取消尚未完成的预热任务"""
+    global _warmup_task
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+        try:
+            await _warmup_task
+        except asyncio.CancelledError:
+            pass
+    _warmup_task = None
@@ -1,9 +1,9 @@
 # 导入所有模型，确保SQLAlchemy能够发现它们
 from .base import BaseModel
 from .user import User, UserRole, UserStatus
-from .project import Project, ProjectMember, ProjectStatus, ProjectPriority, ProjectMemberRole
-from .requirement import Requirement, RequirementType, RequirementStatus, RequirementPriority
-from .test_case import TestCase, TestExecution, TestCaseType, TestCasePriority, TestCaseStatus, TestExecutionStatus
+from .project import Project, ProjectMember, ProjectCodeSequence, ProjectStatus, ProjectPriority, ProjectMemberRole
+from .requirement import Requirement, RequirementVersion, RequirementCoverage, requirement_closure, RequirementType, RequirementStatus, RequirementPriority
+from .test_case import TestCase, TestCaseSignature, test_case_lsh_buckets, TestExecution, TestCaseFlakiness, analytics_watermarks, TestCaseType, TestCasePriority, TestCaseStatus, TestExecutionStatus
 from .test_plan import TestPlan, TestPlanStatus, TestPlanType, test_plan_cases
 from .defect import Defect, DefectComment, DefectAttachment, DefectSeverity, DefectPriority, DefectStatus, DefectType
 
@@ -11,9 +11,9 @@ from .defect import Defect, DefectComment, DefectAttachment, DefectSeverity, Def
 __all__ = [
     "BaseModel",
     "User", "UserRole", "UserStatus",
-    "Project", "ProjectMember", "ProjectStatus", "ProjectPriority", "ProjectMemberRole",
-    "Requirement", "RequirementType", "RequirementStatus", "RequirementPriority",
-    "TestCase", "TestExecution", "TestCaseType", "TestCasePriority", "TestCaseStatus", "TestExecutionStatus",
+    "Project", "ProjectMember", "ProjectCodeSequence", "ProjectStatus", "ProjectPriority", "ProjectMemberRole",
+    "Requirement", "RequirementVersion", "RequirementCoverage", "requirement_closure", "RequirementType", "RequirementStatus", "RequirementPriority",
+    "TestCase", "TestCaseSignature", "test_case_lsh_buckets", "TestExecution", "TestCaseFlakiness", "analytics_watermarks", "TestCaseType", "TestCasePriority", "TestCaseStatus", "TestExecutionStatus",
     "TestPlan", "TestPlanStatus", "TestPlanType", "test_plan_cases",
     "Defect", "DefectComment", "DefectAttachment", "DefectSeverity", "DefectPriority", "DefectStatus", "DefectType"
 ]
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, Text, Enum, Integer, ForeignKey, DateTime
+from sqlalchemy import Index, Column, String, Text, Enum, Integer, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from .base import BaseModel
+from .search import search_vector_column
 import enum
 
 
@@ -47,6 +48,9 @@ class DefectType(str, enum.Enum):
 class Defect(BaseModel):
     """缺陷模型"""
     __tablename__ = "defects"
+    __table_args__ = (
+        Index("ix_defects_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     title = Column(String(200), nullable=False, comment="缺陷标题")
     code = Column(String(50), nullable=False, comment="缺陷编号")
@@ -80,6 +84,13 @@ class Defect(BaseModel):
     
     resolution = Column(Text, comment="解决方案")
     verification_notes = Column(Text, comment="验证说明")
+
+    # 全文搜索
+    search_vector = search_vector_column({
+        "A": ("title", "code"),
+        "B": ("description", "steps_to_reproduce"),
+        "C": ("expected_result", "actual_result", "resolution"),
+    })
     
     # 关联关系
     project = relationship("Project", back_populates="defects")
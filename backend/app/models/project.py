@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Enum, Integer, ForeignKey, DateTime, Table
+from sqlalchemy import Column, String, Text, Enum, Integer, ForeignKey, DateTime, Table, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 import enum
@@ -78,3 +78,18 @@ class ProjectMember(BaseModel):
     
     def __repr__(self):
         return f"<ProjectMember(project_id={self.project_id}, user_id={self.user_id}, role='{self.role}')>"
+
+
+class ProjectCodeSequence(BaseModel):
+    """项目内编号序列（按实体类型分别计数），编号按区间批量分配"""
+    __tablename__ = "project_code_sequences"
+    __table_args__ = (
+        UniqueConstraint("project_id", "entity", name="uq_project_code_sequences_project_entity"),
+    )
+
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, comment="项目ID")
+    entity = Column(String(50), nullable=False, comment="实体类型")
+    next_value = Column(Integer, nullable=False, default=1, comment="下一个未分配的序号")
+
+    def __repr__(self):
+        return f"<ProjectCodeSequence(project_id={self.project_id}, entity='{self.entity}', next_value={self.next_value})>"
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, Text, Enum, Integer, ForeignKey, DateTime
+from sqlalchemy import DDL, Index, Column, String, Text, Enum, Integer, ForeignKey, DateTime, UniqueConstraint, SmallInteger, Table, event
 from sqlalchemy.orm import relationship
 from .base import BaseModel
+from .search import search_vector_column
 import enum
 
 
@@ -36,6 +37,9 @@ class RequirementPriority(str, enum.Enum):
 class Requirement(BaseModel):
     """需求模型"""
     __tablename__ = "requirements"
+    __table_args__ = (
+        Index("ix_requirements_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     title = Column(String(200), nullable=False, comment="需求标题")
     code = Column(String(50), nullable=False, comment="需求编号")
@@ -58,6 +62,13 @@ class Requirement(BaseModel):
     start_date = Column(DateTime, comment="开始日期")
     due_date = Column(DateTime, comment="截止日期")
     completed_date = Column(DateTime, comment="完成日期")
+
+    # 全文搜索
+    search_vector = search_vector_column({
+        "A": ("title", "code"),
+        "B": ("description",),
+        "C": ("acceptance_criteria",),
+    })
     
     # 关联关系
     project = relationship("Project", back_populates="requirements")
@@ -66,6 +77,122 @@ class Requirement(BaseModel):
     
     parent = relationship("Requirement", remote_side="Requirement.id", backref="children")
     test_cases = relationship("TestCase", back_populates="requirement")
+    versions = relationship("RequirementVersion", back_populates="requirement",
+                            cascade="all, delete-orphan", order_by="RequirementVersion.version")
     
     def __repr__(self):
         return f"<Requirement(title='{self.title}', code='{self.code}')>"
+
+
+class RequirementVersion(BaseModel):
+    """需求版本快照，每次按变更重新生成测试用例时记录，作为下一次差异比较的基准"""
+    __tablename__ = "requirement_versions"
+    __table_args__ = (
+        UniqueConstraint("requirement_id", "version", name="uq_requirement_versions_requirement_version"),
+    )
+
+    requirement_id = Column(Integer, ForeignKey("requirements.id"), nullable=False, index=True, comment="需求ID")
+    version = Column(Integer, nullable=False, comment="版本号")
+    description = Column(Text, comment="需求描述")
+    acceptance_criteria = Column(Text, comment="验收标准")
+    creator_id = Column(Integer, ForeignKey("users.id"), comment="创建者ID")
+
+    # 关联关系
+    requirement = relationship("Requirement", back_populates="versions")
+
+    def __repr__(self):
+        return f"<RequirementVersion(requirement_id={self.requirement_id}, version={self.version})>"
+
+
+class RequirementCoverage(BaseModel):
+    """
+    需求测试覆盖汇总（每个需求一行）
+
+    由用例状态变更、新的执行记录等事件触发，按需求重新汇总后写入；覆盖报表直接分页读取，不再实时关联用例、执行与计划表
+    """
+    __tablename__ = "requirement_coverage"
+    __table_args__ = (
+        Index("ix_requirement_coverage_project_requirement", "project_id", "requirement_id"),
+    )
+
+    requirement_id = Column(Integer, ForeignKey("requirements.id", ondelete="CASCADE"), nullable=False, unique=True, comment="需求ID")
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, comment="项目ID")
+    test_cases = Column(Integer, nullable=False, default=0, comment="有效用例数（不含已废弃）")
+    approved_cases = Column(Integer, nullable=False, default=0, comment="已批准用例数")
+    automated_cases = Column(Integer, nullable=False, default=0, comment="自动化用例数")
+    planned_cases = Column(Integer, nullable=False, default=0, comment="已加入测试计划的用例数")
+    executed_cases = Column(Integer, nullable=False, default=0, comment="有执行记录的用例数")
+    passed_cases = Column(Integer, nullable=False, default=0, comment="最近一次执行通过的用例数")
+    failed_cases = Column(Integer, nullable=False, default=0, comment="最近一次执行失败的用例数")
+    blocked_cases = Column(Integer, nullable=False, default=0, comment="最近一次执行阻塞的用例数")
+    flaky_cases = Column(Integer, nullable=False, default=0, comment="近期结果反复变化的用例数")
+    last_executed_at = Column(DateTime(timezone=True), comment="最近执行时间")
+    refreshed_at = Column(DateTime(timezone=True), comment="汇总时间")
+
+    def __repr__(self):
+        return f"<RequirementCoverage(requirement_id={self.requirement_id}, test_cases={self.test_cases})>"
+
+
+# 需求层级闭包表：每对（祖先, 后代）一行，depth 为层级差，每个需求包含 depth=0 的自身一行；
+# 子树查询只需按 ancestor_id 走索引，祖先链按 descendant_id 走索引，不需要递归查询
+requirement_closure = Table(
+    'requirement_closure',
+    BaseModel.metadata,
+    Column('ancestor_id', Integer, ForeignKey('requirements.id', ondelete='CASCADE'), primary_key=True),
+    Column('descendant_id', Integer, ForeignKey('requirements.id', ondelete='CASCADE'), primary_key=True),
+    Column('depth', SmallInteger, nullable=False),
+    Index('ix_requirement_closure_descendant', 'descendant_id', 'depth'),
+)
+
+# 闭包表由触发器在插入需求、修改 parent_id 的同一事务内维护（物理删除由外键级联清理）；
+# 移动到自身子树下会形成环，直接报错
+REQUIREMENT_CLOSURE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION requirement_closure_maintain() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO requirement_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1 FROM requirement_closure WHERE descendant_id = NEW.parent_id
+        UNION ALL
+        SELECT NEW.id, NEW.id, 0;
+        RETURN NEW;
+    END IF;
+
+    IF NEW.parent_id IS NOT DISTINCT FROM OLD.parent_id THEN
+        RETURN NEW;
+    END IF;
+    IF NEW.parent_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM requirement_closure WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+    ) THEN
+        RAISE EXCEPTION USING
+            ERRCODE = 'check_violation',
+            MESSAGE = 'requirement ' || NEW.id || ' cannot be moved under its descendant ' || NEW.parent_id;
+    END IF;
+
+    -- 断开子树与原祖先的关联，再挂到新父需求的祖先链下
+    DELETE FROM requirement_closure AS link
+    USING requirement_closure AS sub
+    WHERE sub.ancestor_id = NEW.id
+      AND link.descendant_id = sub.descendant_id
+      AND link.ancestor_id NOT IN (SELECT descendant_id FROM requirement_closure WHERE ancestor_id = NEW.id);
+    INSERT INTO requirement_closure (ancestor_id, descendant_id, depth)
+    SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+    FROM requirement_closure AS sup
+    CROSS JOIN requirement_closure AS sub
+    WHERE sup.descendant_id = NEW.parent_id AND sub.ancestor_id = NEW.id;
+    RETURN NEW;
+END
+$$
+"""
+
+REQUIREMENT_CLOSURE_TRIGGERS_SQL = (
+    "CREATE TRIGGER trg_requirements_closure_insert AFTER INSERT ON requirements "
+    "FOR EACH ROW EXECUTE FUNCTION requirement_closure_maintain()",
+    "CREATE TRIGGER trg_requirements_closure_move AFTER UPDATE OF parent_id ON requirements "
+    "FOR EACH ROW EXECUTE FUNCTION requirement_closure_maintain()",
+)
+
+# create_all 建好闭包表后创建触发器
+event.listen(requirement_closure, "after_create", DDL(REQUIREMENT_CLOSURE_FUNCTION_SQL).execute_if(dialect="postgresql"))
+for _trigger_sql in REQUIREMENT_CLOSURE_TRIGGERS_SQL:
+    event.listen(requirement_closure, "after_create", DDL(_trigger_sql).execute_if(dialect="postgresql"))
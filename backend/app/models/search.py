@@ -0,0 +1,39 @@
+"""
+全文搜索列定义
+search_vector 为数据库生成列（STORED），由 search_tokens 函数展开中文二元组后按字段权重组合，配合 GIN 索引检索
+"""
+from typing import Dict, Sequence
+
+from sqlalchemy import DDL, Column, Computed, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
+
+from app.core.database import Base
+from app.utils.search_text import SEARCH_TOKENS_FUNCTION_SQL
+
+
+def search_vector_expression(weighted_fields: Dict[str, Sequence[str]]) -> str:
+    """
+    生成列表达式
+
+    参数:
+        weighted_fields: 权重（A-D）-> 字段列表，同一权重的字段拼接后一起分词
+    """
+    parts = []
+    for weight, fields in weighted_fields.items():
+        text = " || ' ' || ".join(f"coalesce({field}, '')" for field in fields)
+        parts.append(f"setweight(to_tsvector('simple'::regconfig, search_tokens({text})), '{weight}')")
+    return " || ".join(parts)
+
+
+def search_vector_column(weighted_fields: Dict[str, Sequence[str]]):
+    """全文搜索生成列（延迟加载，普通查询不会读取）"""
+    return deferred(Column(
+        TSVECTOR,
+        Computed(search_vector_expression(weighted_fields), persisted=True),
+        comment="全文搜索向量",
+    ))
+
+
+# create_all 建表前先创建生成列依赖的函数
+event.listen(Base.metadata, "before_create", DDL(SEARCH_TOKENS_FUNCTION_SQL).execute_if(dialect="postgresql"))
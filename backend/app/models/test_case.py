@@ -1,10 +1,11 @@
 from datetime import datetime
 from typing import Optional, List
-from pydantic import Field
-from sqlalchemy import Column, String, Text, Enum, Integer, ForeignKey, DateTime, Boolean
+from pydantic import BaseModel as MessageModel, Field
+from sqlalchemy import DDL, Column, String, Text, Enum, Integer, ForeignKey, DateTime, Boolean, Index, Float, SmallInteger, BigInteger, LargeBinary, Table, event
 from sqlalchemy.orm import relationship
-from autogen_agentchat.messages import BaseMessage
+from sqlalchemy.sql import func
 from app.models.base import BaseModel
+from app.models.search import search_vector_column
 
 import enum
 
@@ -39,6 +40,10 @@ class TestCaseStatus(str, enum.Enum):
 class TestCase(BaseModel):
     """测试用例模型"""
     __tablename__ = "test_cases"
+    __table_args__ = (
+        Index("ix_test_cases_requirement_section", "requirement_id", "requirement_section"),
+        Index("ix_test_cases_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     title = Column(String(200), nullable=False, comment="用例标题")
     code = Column(String(50), nullable=False, comment="用例编号")
@@ -55,6 +60,7 @@ class TestCase(BaseModel):
     
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, comment="项目ID")
     requirement_id = Column(Integer, ForeignKey("requirements.id"), comment="关联需求ID")
+    requirement_section = Column(String(255), comment="关联需求章节键")
     creator_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="创建者ID")
     assignee_id = Column(Integer, ForeignKey("users.id"), comment="负责人ID")
     
@@ -62,6 +68,17 @@ class TestCase(BaseModel):
     automation_script = Column(Text, comment="自动化脚本")
     
     estimated_time = Column(Integer, comment="预估执行时间(分钟)")
+
+    # 近似重复检测结果
+    duplicate_of_id = Column(Integer, ForeignKey("test_cases.id"), index=True, comment="疑似重复的用例ID")
+    duplicate_similarity = Column(Float, comment="与疑似重复用例的相似度")
+
+    # 全文搜索
+    search_vector = search_vector_column({
+        "A": ("title", "code"),
+        "B": ("description", "preconditions"),
+        "C": ("test_steps", "expected_result", "test_data"),
+    })
     
     # 关联关系
     project = relationship("Project", back_populates="test_cases")
@@ -70,11 +87,40 @@ class TestCase(BaseModel):
     assignee = relationship("User", back_populates="assigned_test_cases", foreign_keys=[assignee_id])
     
     executions = relationship("TestExecution", back_populates="test_case", cascade="all, delete-orphan")
+    duplicate_of = relationship("TestCase", remote_side="TestCase.id", foreign_keys=[duplicate_of_id])
+    signature = relationship("TestCaseSignature", back_populates="test_case", uselist=False, cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<TestCase(title='{self.title}', code='{self.code}')>"
 
 
+class TestCaseSignature(BaseModel):
+    """测试用例的 MinHash 签名（标题、步骤、预期结果）"""
+    __tablename__ = "test_case_signatures"
+
+    test_case_id = Column(Integer, ForeignKey("test_cases.id", ondelete="CASCADE"), unique=True, nullable=False, comment="测试用例ID")
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True, comment="项目ID")
+    num_perm = Column(Integer, nullable=False, comment="签名长度")
+    signature = Column(LargeBinary, nullable=False, comment="MinHash 签名（uint32 小端序）")
+
+    test_case = relationship("TestCase", back_populates="signature")
+
+    def __repr__(self):
+        return f"<TestCaseSignature(test_case_id={self.test_case_id}, num_perm={self.num_perm})>"
+
+
+# 测试用例的 LSH 桶：同一项目内同一 band 桶键相同的用例为候选重复
+test_case_lsh_buckets = Table(
+    'test_case_lsh_buckets',
+    BaseModel.metadata,
+    Column('project_id', Integer, ForeignKey('projects.id'), nullable=False),
+    Column('band', SmallInteger, primary_key=True),
+    Column('bucket', BigInteger, nullable=False),
+    Column('test_case_id', Integer, ForeignKey('test_cases.id', ondelete='CASCADE'), primary_key=True),
+    Index('ix_test_case_lsh_buckets_lookup', 'project_id', 'band', 'bucket'),
+)
+
+
 class TestExecutionStatus(str, enum.Enum):
     """测试执行状态枚举"""
     PENDING = "pending"           # 待执行
@@ -86,9 +132,22 @@ class TestExecutionStatus(str, enum.Enum):
 
 
 class TestExecution(BaseModel):
-    """测试执行记录模型"""
+    """
+    测试执行记录模型
+
+    按 start_time 每月一个分区（PostgreSQL 声明式范围分区），超出已建分区范围的记录写入默认分区；
+    分区键必须包含在主键中，表主键为 (id, start_time)，ORM 仍按 id 识别记录
+    """
     __tablename__ = "test_executions"
-    
+    __table_args__ = (
+        Index("ix_test_executions_test_case_id_id", "test_case_id", "id"),
+        Index("ix_test_executions_plan_case_id", "test_plan_id", "test_case_id", "id"),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
+    __mapper_args__ = {"primary_key": ["id"]}
+
+    # 复合主键中的自增列需要显式声明 autoincrement
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True, comment="主键ID")
     test_case_id = Column(Integer, ForeignKey("test_cases.id"), nullable=False, comment="测试用例ID")
     test_plan_id = Column(Integer, ForeignKey("test_plans.id"), comment="测试计划ID")
     executor_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="执行者ID")
@@ -97,7 +156,7 @@ class TestExecution(BaseModel):
     actual_result = Column(Text, comment="实际结果")
     comments = Column(Text, comment="执行备注")
     
-    start_time = Column(DateTime, comment="开始时间")
+    start_time = Column(DateTime, primary_key=True, nullable=False, server_default=func.now(), comment="开始时间（分区键）")
     end_time = Column(DateTime, comment="结束时间")
     execution_time = Column(Integer, comment="执行时长(秒)")
     
@@ -112,7 +171,133 @@ class TestExecution(BaseModel):
     def __repr__(self):
         return f"<TestExecution(test_case_id={self.test_case_id}, status='{self.status}')>"
 
-class TestCaseData(BaseMessage):
+
+# 按用例取最近一次执行：各分区内走索引倒序取第一条，带上 status 可以只扫索引
+Index(
+    "ix_test_executions_case_latest",
+    TestExecution.test_case_id,
+    TestExecution.start_time.desc(),
+    TestExecution.id.desc(),
+    postgresql_include=["status"],
+)
+
+# 默认分区接收尚未建立月分区的记录，月分区由 TestExecutionArchiveService.ensure_partitions 提前创建
+TEST_EXECUTIONS_DEFAULT_PARTITION_SQL = "CREATE TABLE test_executions_default PARTITION OF test_executions DEFAULT"
+
+# 每个用例最近一次执行（按 start_time、id 取最大）的结果，由触发器在写入执行记录的同一事务内维护；
+# 查询最近结果不需要跨分区扫描执行记录，分区归档后仍保留用例的最近结果
+test_case_latest_results = Table(
+    'test_case_latest_results',
+    BaseModel.metadata,
+    Column('test_case_id', Integer, ForeignKey('test_cases.id', ondelete='CASCADE'), primary_key=True),
+    Column('execution_id', Integer, nullable=False, comment="执行记录ID"),
+    Column('test_plan_id', Integer, comment="测试计划ID"),
+    Column('status', Enum(TestExecutionStatus), comment="执行状态"),
+    Column('start_time', DateTime, nullable=False, comment="开始时间"),
+)
+
+# 已归档分区中每个（计划, 用例）最近一次执行（按 start_time、id 取最大）的结果，归档删除分区前写入；
+# 计划统计的增量维护与对账把它与在线执行记录合并取最近结果，归档不会改变计划统计
+test_plan_archived_results = Table(
+    'test_plan_archived_results',
+    BaseModel.metadata,
+    Column('test_plan_id', Integer, ForeignKey('test_plans.id', ondelete='CASCADE'), primary_key=True),
+    Column('test_case_id', Integer, ForeignKey('test_cases.id', ondelete='CASCADE'), primary_key=True),
+    Column('execution_id', Integer, nullable=False, comment="执行记录ID"),
+    Column('status', Enum(TestExecutionStatus), comment="执行状态"),
+    Column('start_time', DateTime, nullable=False, comment="开始时间"),
+)
+
+# 插入更新的执行时直接覆盖；修改或删除当前最近的执行时按索引重新取该用例最近一条
+# （跨分区移动的 UPDATE 在分区表上按 DELETE + INSERT 触发）
+TEST_CASE_LATEST_RESULT_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION test_case_latest_result_maintain() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM test_case_latest_results WHERE test_case_id = OLD.test_case_id AND execution_id = OLD.id;
+        IF FOUND THEN
+            INSERT INTO test_case_latest_results (test_case_id, execution_id, test_plan_id, status, start_time)
+            SELECT test_case_id, id, test_plan_id, status, start_time
+            FROM test_executions
+            WHERE test_case_id = OLD.test_case_id
+            ORDER BY start_time DESC, id DESC
+            LIMIT 1
+            ON CONFLICT (test_case_id) DO NOTHING;
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO test_case_latest_results AS latest (test_case_id, execution_id, test_plan_id, status, start_time)
+        VALUES (NEW.test_case_id, NEW.id, NEW.test_plan_id, NEW.status, NEW.start_time)
+        ON CONFLICT (test_case_id) DO UPDATE
+        SET execution_id = EXCLUDED.execution_id,
+            test_plan_id = EXCLUDED.test_plan_id,
+            status = EXCLUDED.status,
+            start_time = EXCLUDED.start_time
+        WHERE (latest.start_time, latest.execution_id) <= (EXCLUDED.start_time, EXCLUDED.execution_id);
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+TEST_CASE_LATEST_RESULT_TRIGGER_SQL = (
+    "CREATE TRIGGER trg_test_executions_latest_result AFTER INSERT OR UPDATE OR DELETE ON test_executions "
+    "FOR EACH ROW EXECUTE FUNCTION test_case_latest_result_maintain()"
+)
+
+# create_all 建好分区表后创建默认分区与最近结果触发器
+event.listen(TestExecution.__table__, "after_create", DDL(TEST_EXECUTIONS_DEFAULT_PARTITION_SQL).execute_if(dialect="postgresql"))
+event.listen(TestExecution.__table__, "after_create", DDL(TEST_CASE_LATEST_RESULT_FUNCTION_SQL).execute_if(dialect="postgresql"))
+event.listen(TestExecution.__table__, "after_create", DDL(TEST_CASE_LATEST_RESULT_TRIGGER_SQL).execute_if(dialect="postgresql"))
+
+
+class TestCaseFlakiness(BaseModel):
+    """
+    用例不稳定性分析汇总（每个用例一行）
+
+    由 TestFlakinessService.analyze 按执行记录增量计算，只统计通过 / 失败的执行；
+    追溯与测试计划视图按 test_case_id 直接关联，不需要扫描执行记录
+    """
+    __tablename__ = "test_case_flakiness"
+    __table_args__ = (
+        Index("ix_test_case_flakiness_project_score", "project_id", "flakiness_score"),
+    )
+
+    test_case_id = Column(Integer, ForeignKey("test_cases.id", ondelete="CASCADE"), nullable=False, unique=True, comment="测试用例ID")
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, comment="项目ID")
+    executions = Column(Integer, nullable=False, default=0, comment="累计通过 / 失败执行次数")
+    failures = Column(Integer, nullable=False, default=0, comment="累计失败次数")
+    flips = Column(Integer, nullable=False, default=0, comment="累计通过 / 失败切换次数")
+    flip_rate = Column(Float, nullable=False, default=0.0, comment="累计切换率：切换次数 / (执行次数 - 1)")
+    window_runs = Column(Integer, nullable=False, default=0, comment="最近窗口内的执行次数")
+    window_failures = Column(Integer, nullable=False, default=0, comment="最近窗口内的失败次数")
+    window_flips = Column(Integer, nullable=False, default=0, comment="最近窗口内的切换次数")
+    failure_rate = Column(Float, nullable=False, default=0.0, comment="最近窗口失败率")
+    window_flip_rate = Column(Float, nullable=False, default=0.0, comment="最近窗口切换率")
+    peak_failure_rate = Column(Float, nullable=False, default=0.0, comment="历史滑动窗口中的最高失败率")
+    flakiness_score = Column(Float, nullable=False, default=0.0, comment="不稳定分数（0-1）")
+    is_flaky = Column(Boolean, nullable=False, default=False, comment="是否判定为不稳定用例")
+    recent_outcomes = Column(String, nullable=False, default="", comment="最近窗口的结果序列（P 通过 / F 失败，从旧到新）")
+    last_execution_id = Column(Integer, comment="最近计入的执行记录ID")
+    last_executed_at = Column(DateTime, comment="最近计入的执行开始时间")
+    analyzed_at = Column(DateTime(timezone=True), comment="分析时间")
+
+    def __repr__(self):
+        return f"<TestCaseFlakiness(test_case_id={self.test_case_id}, score={self.flakiness_score})>"
+
+
+# 增量分析任务的进度：每个任务一行，记录已处理到的执行记录ID
+analytics_watermarks = Table(
+    'analytics_watermarks',
+    BaseModel.metadata,
+    Column('name', String(100), primary_key=True, comment="任务名称"),
+    Column('last_id', BigInteger, nullable=False, default=0, comment="已处理的最大记录ID"),
+    Column('updated_at', DateTime(timezone=True), server_default=func.now(), comment="更新时间"),
+)
+
+class TestCaseData(MessageModel):
     """测试用例数据模型"""
     title: str = Field(..., description="用例标题")
     code: Optional[str] = Field(None, description="用例编号")
@@ -123,29 +308,65 @@ class TestCaseData(BaseMessage):
     test_data: Optional[str] = Field(None, description="测试数据")
     type: Optional[TestCaseType] = Field(TestCaseType.FUNCTIONAL, description="用例类型")
     priority: Optional[TestCasePriority] = Field(TestCasePriority.MEDIUM, description="用例优先级")
+    requirement_section: Optional[str] = Field(None, description="关联需求章节键（增量生成时填写）")
 
-class VideoAnalysisRequest(BaseMessage):
+class TestCaseBatch(MessageModel):
+    """结构化输出的测试用例集合"""
+    test_cases: List[TestCaseData] = Field(default_factory=list, description="测试用例")
+
+class VideoAnalysisRequest(MessageModel):
+    session_id: str = Field(..., description="会话ID")
     video_name: str = Field(..., description="视频名称")
     video_path: str = Field(..., description="视频路径")
     video_type: Optional[str] = Field(None, description="视频类型")
     video_description: Optional[str] = Field(None, description="视频描述")
     analysis_target: Optional[str] = Field(None, description="分析目标")
 
-class ImageAnalysisRequest(BaseMessage):
+class ImageAnalysisRequest(MessageModel):
+    session_id: str = Field(..., description="会话ID")
     image_name: str = Field(..., description="图片名称")
     image_path: str = Field(..., description="图片路径")
     image_type: Optional[str] = Field(None, description="图片类型")
     image_description: Optional[str] = Field(None, description="图片描述")
     analysis_target: Optional[str] = Field(None, description="分析目标")
+    bypass_cache: bool = Field(False, description="跳过图片分析缓存，强制重新分析")
 
-class TestCaseGenerationRequest(BaseMessage):
+class DocumentParseRequest(MessageModel):
+    session_id: str = Field(..., description="会话ID")
+    document_name: str = Field(..., description="文档名称")
+    document_path: str = Field(..., description="文档路径")
+    document_type: Optional[str] = Field(None, description="文档类型")
+    document_description: Optional[str] = Field(None, description="文档描述")
+    analysis_target: Optional[str] = Field(None, description="分析目标")
+    bypass_cache: bool = Field(False, description="跳过分块分析缓存，强制重新分析")
+
+class TestCaseGenerationRequest(MessageModel):
     """测试用例智能体请求"""
+    session_id: str = Field(..., description="会话ID")
     source_type: str = Field(..., description="来源类型")
     source_data: dict = Field(..., description="来源数据")
-    test_cases: List[TestCaseData] = Field(..., description="测试用例数据")
+    test_cases: List[TestCaseData] = Field(default_factory=list, description="测试用例数据")
     generation_config: dict = Field(default_factory=dict, description="生成配置")
 
-class ImageAnalysisResponse(BaseMessage):
+class VisualSegmentRequest(MessageModel):
+    """单个图片切片 / 视频关键帧的分析请求"""
+    session_id: str = Field(..., description="会话ID")
+    index: int = Field(..., description="切片 / 关键帧序号")
+    total: int = Field(..., description="切片 / 关键帧总数")
+    label: str = Field(..., description="切片位置或关键帧时间点")
+    image_data: str = Field(..., description="已编码图片的 base64")
+    instruction: str = Field(..., description="分析说明")
+
+class VisualSegmentResult(MessageModel):
+    """单个图片切片 / 视频关键帧的分析结果"""
+    session_id: str = Field(..., description="会话ID")
+    index: int = Field(..., description="切片 / 关键帧序号")
+    label: str = Field(..., description="切片位置或关键帧时间点")
+    content: str = Field("", description="分析内容")
+    error: Optional[str] = Field(None, description="分析失败时的错误信息")
+    elapsed: float = Field(0.0, description="耗时（秒）")
+
+class ImageAnalysisResponse(MessageModel):
     """图片分析响应"""
     session_id: Optional[str] = Field(..., description="会话ID")
     image_name: str = Field(..., description="图片名称")
@@ -49,7 +49,7 @@ class TestPlan(BaseModel):
     environment = Column(String(100), comment="测试环境")
     version = Column(String(50), comment="测试版本")
     
-    # 统计字段
+    # 统计字段：计划内用例数与各用例最近一次执行结果的分布，由 test_plan_stats_service 随执行记录增量维护
     total_cases = Column(Integer, default=0, comment="总用例数")
     passed_cases = Column(Integer, default=0, comment="通过用例数")
     failed_cases = Column(Integer, default=0, comment="失败用例数")
@@ -68,7 +68,7 @@ class TestPlan(BaseModel):
     
     @property
     def pass_rate(self):
-        """通过率"""
-        if self.total_cases == 0:
+        """通过率（读取增量维护的统计字段，不查询执行记录）"""
+        if not self.total_cases:
             return 0
-        return round((self.passed_cases / self.total_cases) * 100, 2)
+        return round(((self.passed_cases or 0) / self.total_cases) * 100, 2)
@@ -0,0 +1,103 @@
+"""
+项目编号分配服务
+按项目、实体类型从 project_code_sequences 预留一段连续序号，进程内逐个发放，用完再预留下一段
+
+预留通过单条 INSERT ... ON CONFLICT DO UPDATE ... RETURNING 原子完成，并在独立事务中立即提交：
+并发的请求 / 进程拿到的区间互不重叠，调用方事务回滚也不会导致编号被重复发放（只会留下空号）
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.models.project import ProjectCodeSequence
+from app.models.test_case import TestCase
+
+logger = logging.getLogger(__name__)
+
+
+class CodeBlockAllocator:
+    """
+    按项目分配连续序号
+
+    参数:
+        entity: 实体类型，与项目 ID 一起确定一条序列
+        model: 实体对应的模型，序列首次创建时从该项目已有的记录数之后开始编号
+        block_size: 每次预留的序号数
+        engine: 预留使用的异步引擎，默认为全局 async_engine
+    """
+
+    def __init__(self, entity: str, model, block_size: int, engine: Optional[AsyncEngine] = None):
+        self.entity = entity
+        self.model = model
+        self.block_size = max(1, block_size)
+        self._engine = engine
+        self._blocks: Dict[int, Tuple[int, int]] = {}  # 项目ID -> [下一个序号, 区间结束)
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            from app.core.database import async_engine
+            self._engine = async_engine
+        return self._engine
+
+    async def allocate(self, project_id: int, count: int) -> List[int]:
+        """为项目分配 count 个序号（升序、项目内唯一，不保证连续）"""
+        if count <= 0:
+            return []
+        lock = self._locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            numbers: List[int] = []
+            start, end = self._blocks.get(project_id, (0, 0))
+            while len(numbers) < count:
+                if start >= end:
+                    start, end = await self._reserve(project_id, max(self.block_size, count - len(numbers)))
+                take = min(end - start, count - len(numbers))
+                numbers.extend(range(start, start + take))
+                start += take
+            self._blocks[project_id] = (start, end)
+            return numbers
+
+    async def _reserve(self, project_id: int, size: int) -> Tuple[int, int]:
+        """在独立事务中预留 size 个序号，返回 [起始, 结束)"""
+        existing = (
+            select(func.count())
+            .select_from(self.model)
+            .where(self.model.project_id == project_id)
+            .scalar_subquery()
+        )
+        table = ProjectCodeSequence.__table__
+        statement = (
+            insert(table)
+            .values(project_id=project_id, entity=self.entity, next_value=existing + 1 + size, is_deleted=False)
+            .on_conflict_do_update(
+                index_elements=[table.c.project_id, table.c.entity],
+                set_={"next_value": table.c.next_value + size, "updated_at": func.now()},
+            )
+            .returning(table.c.next_value)
+        )
+        async with self.engine.begin() as conn:
+            end = (await conn.execute(statement)).scalar_one()
+        logger.debug("预留项目编号区间", extra={"project_id": project_id, "entity": self.entity, "end": end, "size": size})
+        return end - size, end
+
+    def reset(self, project_id: Optional[int] = None) -> None:
+        """丢弃进程内未用完的区间（未用的序号成为空号）"""
+        if project_id is None:
+            self._blocks.clear()
+        else:
+            self._blocks.pop(project_id, None)
+
+
+# 全局测试用例编号分配器
+test_case_code_allocator = CodeBlockAllocator("test_case", TestCase, settings.TEST_CASE_CODE_BLOCK_SIZE)
+
+
+def format_test_case_code(number: int) -> str:
+    """按 TEST_CASE_CODE_FORMAT 生成测试用例编号"""
+    return settings.TEST_CASE_CODE_FORMAT.format(number=number)
@@ -0,0 +1,397 @@
+"""
+需求覆盖汇总服务
+requirement_coverage 为每个需求保存用例数、已批准 / 自动化 / 已计划用例数、最近执行结果分布与不稳定用例数：
+
+1. 变更事件驱动：ORM 会话提交后收集受影响的需求（用例新增 / 修改 / 删除、新的执行记录、测试计划增减用例），
+   批量写入（入库服务、不稳定性分析等）显式调用 coverage_refresher.mark；等待 COVERAGE_REFRESH_DELAY 秒合并后，
+   只对这些需求执行一条汇总 + UPSERT 语句，不重新计算整个项目
+2. 刷新语句从源表重新汇总单个需求，重复执行结果相同，多个进程同时刷新也不会出错
+3. 覆盖报表按需求ID键集分页读取汇总表，分页结果在进程内缓存 COVERAGE_CACHE_TTL 秒，本进程刷新后立即失效
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.requirement import Requirement, RequirementCoverage
+from app.models.test_case import TestCase, TestCaseFlakiness, TestCaseStatus, TestExecution, TestExecutionStatus, test_case_latest_results
+from app.models.test_plan import TestPlan, test_plan_cases
+
+logger = logging.getLogger(__name__)
+
+# 已结束的执行状态（待执行 / 执行中不计入最近结果）
+_FINISHED_STATUSES = (
+    TestExecutionStatus.PASSED,
+    TestExecutionStatus.FAILED,
+    TestExecutionStatus.BLOCKED,
+    TestExecutionStatus.SKIPPED,
+)
+
+COVERAGE_FILTERS = ("uncovered", "failed", "flaky", "not_run")
+
+
+def coverage_refresh_statement(requirement_ids: List[int]):
+    """
+    重新汇总指定需求并写入 requirement_coverage 的 UPSERT 语句
+
+    最近结果读取 test_case_latest_results（按 (start_time, id) 取最近一次执行，分区归档后仍保留），
+    最近一次执行尚未结束的用例不计为已执行；不稳定用例取 test_case_flakiness 中 is_flaky 的用例
+    """
+    cases = (
+        select(TestCase.id, TestCase.requirement_id, TestCase.status, TestCase.is_automated)
+        .where(
+            TestCase.requirement_id.in_(requirement_ids),
+            TestCase.is_deleted == False,
+            TestCase.status != TestCaseStatus.DEPRECATED,
+        )
+        .cte("cases")
+    )
+    latest = test_case_latest_results.c
+    results = (
+        select(latest.test_case_id, latest.status, latest.start_time)
+        .where(latest.test_case_id.in_(select(cases.c.id)), latest.status.in_(_FINISHED_STATUSES))
+        .cte("results")
+    )
+    planned = select(test_plan_cases.c.test_case_id).distinct().where(
+        test_plan_cases.c.test_case_id.in_(select(cases.c.id))
+    ).cte("planned")
+
+    summary = (
+        select(
+            Requirement.id.label("requirement_id"),
+            Requirement.project_id,
+            func.count(cases.c.id).label("test_cases"),
+            func.count(cases.c.id).filter(cases.c.status == TestCaseStatus.APPROVED).label("approved_cases"),
+            func.count(cases.c.id).filter(cases.c.is_automated == True).label("automated_cases"),
+            func.count(planned.c.test_case_id).label("planned_cases"),
+            func.count(results.c.test_case_id).label("executed_cases"),
+            func.count().filter(results.c.status == TestExecutionStatus.PASSED).label("passed_cases"),
+            func.count().filter(results.c.status == TestExecutionStatus.FAILED).label("failed_cases"),
+            func.count().filter(results.c.status == TestExecutionStatus.BLOCKED).label("blocked_cases"),
+            func.count().filter(TestCaseFlakiness.is_flaky == True).label("flaky_cases"),
+            func.max(results.c.start_time).label("last_executed_at"),
+            func.now().label("refreshed_at"),
+        )
+        .select_from(Requirement)
+        .outerjoin(cases, cases.c.requirement_id == Requirement.id)
+        .outerjoin(results, results.c.test_case_id == cases.c.id)
+        .outerjoin(TestCaseFlakiness, TestCaseFlakiness.test_case_id == cases.c.id)
+        .outerjoin(planned, planned.c.test_case_id == cases.c.id)
+        .where(Requirement.id.in_(requirement_ids))
+        .group_by(Requirement.id)
+    )
+    columns = [column.name for column in summary.selected_columns]
+    statement = insert(RequirementCoverage).from_select(columns, summary)
+    return statement.on_conflict_do_update(
+        index_elements=[RequirementCoverage.requirement_id],
+        set_={name: statement.excluded[name] for name in columns if name != "requirement_id"},
+    )
+
+
+def refresh_requirements(connection: Connection, requirement_ids: Iterable[int]) -> int:
+    """按批刷新需求的覆盖汇总，返回刷新的需求数（调用方负责提交）"""
+    ids = sorted(set(requirement_ids))
+    for offset in range(0, len(ids), settings.COVERAGE_REFRESH_BATCH):
+        connection.execute(coverage_refresh_statement(ids[offset:offset + settings.COVERAGE_REFRESH_BATCH]))
+    return len(ids)
+
+
+class CoverageCache:
+    """
+    覆盖报表分页结果缓存（进程内，按项目整体失效）
+
+    Args:
+        max_entries: 最大条目数，超出后淘汰最久未使用的条目
+        ttl: 条目有效期（秒），0 表示不缓存
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, project_id: int, key: str) -> Optional[Any]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get((project_id, key))
+            if entry is None:
+                return None
+            value, created_at = entry
+            if time.monotonic() - created_at > self.ttl:
+                del self._entries[(project_id, key)]
+                return None
+            self._entries.move_to_end((project_id, key))
+            return value
+
+    def store(self, project_id: int, key: str, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(project_id, key)] = (value, time.monotonic())
+            self._entries.move_to_end((project_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, project_ids: Iterable[int]) -> None:
+        targets = set(project_ids)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in targets]:
+                del self._entries[key]
+
+
+coverage_cache = CoverageCache(
+    max_entries=settings.COVERAGE_CACHE_MAX_ENTRIES,
+    ttl=settings.COVERAGE_CACHE_TTL,
+)
+
+
+class CoverageRefresher:
+    """
+    合并变更事件并在后台线程刷新覆盖汇总
+
+    mark 只记录受影响的需求 / 用例ID；第一次标记后等待 delay 秒统一刷新，期间的标记合并到同一批
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._requirement_ids: Set[int] = set()
+        self._test_case_ids: Set[int] = set()
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def mark(self, requirement_ids: Iterable[Optional[int]] = (), test_case_ids: Iterable[Optional[int]] = ()) -> None:
+        with self._lock:
+            self._requirement_ids.update(item for item in requirement_ids if item is not None)
+            self._test_case_ids.update(item for item in test_case_ids if item is not None)
+            if self._timer is None and (self._requirement_ids or self._test_case_ids):
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> int:
+        """立即刷新已标记的需求，返回刷新的需求数"""
+        from app.core.database import engine
+
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            requirement_ids, self._requirement_ids = self._requirement_ids, set()
+            test_case_ids, self._test_case_ids = self._test_case_ids, set()
+        if not requirement_ids and not test_case_ids:
+            return 0
+
+        try:
+            with engine.begin() as connection:
+                if test_case_ids:
+                    requirement_ids.update(connection.execute(
+                        select(TestCase.requirement_id).distinct().where(
+                            TestCase.id.in_(test_case_ids), TestCase.requirement_id.isnot(None)
+                        )
+                    ).scalars())
+                count = refresh_requirements(connection, requirement_ids)
+                project_ids = connection.execute(
+                    select(Requirement.project_id).distinct().where(Requirement.id.in_(requirement_ids))
+                ).scalars().all() if requirement_ids else []
+        except Exception:
+            logger.exception("需求覆盖汇总刷新失败", extra={"requirements": len(requirement_ids)})
+            # 放回待刷新集合，延迟后重试
+            self.mark(requirement_ids, test_case_ids)
+            return 0
+
+        coverage_cache.invalidate(project_ids)
+        logger.debug("需求覆盖汇总已刷新", extra={"requirements": count})
+        return count
+
+
+coverage_refresher = CoverageRefresher(settings.COVERAGE_REFRESH_DELAY)
+
+
+# ---------- 会话提交后收集变更 ----------
+
+_PENDING_KEY = "coverage_pending"
+
+
+def _history_values(record: Any, attribute: str) -> List[Any]:
+    history = inspect(record).attrs[attribute].history
+    return list(history.added or ()) + list(history.deleted or ())
+
+
+def _collect_changes(session: Session, flush_context) -> None:
+    requirement_ids, test_case_ids = session.info.setdefault(_PENDING_KEY, (set(), set()))
+    for record in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(record, Requirement):
+            requirement_ids.add(record.id)
+        elif isinstance(record, TestCase):
+            requirement_ids.add(record.requirement_id)
+            requirement_ids.update(_history_values(record, "requirement_id"))
+        elif isinstance(record, TestExecution):
+            test_case_ids.add(record.test_case_id)
+        elif isinstance(record, TestPlan):
+            test_case_ids.update(case.id for case in _history_values(record, "test_cases"))
+
+
+def _apply_changes(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        coverage_refresher.mark(*pending)
+
+
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners() -> None:
+    """注册 ORM 会话事件，重复调用无副作用"""
+    if event.contains(Session, "after_flush", _collect_changes):
+        return
+    event.listen(Session, "after_flush", _collect_changes)
+    event.listen(Session, "after_commit", _apply_changes)
+    event.listen(Session, "after_rollback", _discard_changes)
+
+
+def last_result(coverage: RequirementCoverage) -> str:
+    """需求的最近结果：有失败为 failed，其次 blocked；全部有效用例最近都通过为 passed，部分通过为 partial"""
+    if coverage.failed_cases:
+        return "failed"
+    if coverage.blocked_cases:
+        return "blocked"
+    if not coverage.executed_cases:
+        return "not_run"
+    return "passed" if coverage.passed_cases == coverage.test_cases else "partial"
+
+
+def coverage_item(requirement: Requirement, coverage: RequirementCoverage) -> Dict[str, Any]:
+    return {
+        "requirement_id": requirement.id,
+        "code": requirement.code,
+        "title": requirement.title,
+        "parent_id": requirement.parent_id,
+        "test_cases": coverage.test_cases,
+        "approved_cases": coverage.approved_cases,
+        "automated_cases": coverage.automated_cases,
+        "planned_cases": coverage.planned_cases,
+        "executed_cases": coverage.executed_cases,
+        "passed_cases": coverage.passed_cases,
+        "failed_cases": coverage.failed_cases,
+        "blocked_cases": coverage.blocked_cases,
+        "flaky_cases": coverage.flaky_cases,
+        "coverage": round(coverage.passed_cases * 100 / coverage.test_cases, 2) if coverage.test_cases else 0.0,
+        "last_result": last_result(coverage),
+        "is_flaky": coverage.flaky_cases > 0,
+        "last_executed_at": coverage.last_executed_at,
+    }
+
+
+class CoverageService:
+    """需求覆盖报表服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def project_coverage(
+        self,
+        project_id: int,
+        limit: int = 50,
+        cursor: Optional[int] = None,
+        only: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        项目需求覆盖矩阵（按需求ID分页）
+
+        参数:
+            project_id: 项目ID
+            limit: 每页条数
+            cursor: 上一页返回的 next_cursor
+            only: 只返回 uncovered（没有有效用例）/ failed / flaky / not_run（有用例但从未执行）的需求
+
+        返回:
+            {"summary": 项目汇总, "items": [...], "next_cursor": ...}
+        """
+        if only is not None and only not in COVERAGE_FILTERS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的筛选条件: {only}"
+            )
+        cache_key = json.dumps([limit, cursor, only])
+        cached = coverage_cache.get(project_id, cache_key)
+        if cached is not None:
+            return cached
+
+        statement = (
+            select(Requirement, RequirementCoverage)
+            .join(RequirementCoverage, RequirementCoverage.requirement_id == Requirement.id)
+            .where(RequirementCoverage.project_id == project_id, Requirement.is_deleted == False)
+            .order_by(RequirementCoverage.requirement_id)
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            statement = statement.where(RequirementCoverage.requirement_id > cursor)
+        if only == "uncovered":
+            statement = statement.where(RequirementCoverage.test_cases == 0)
+        elif only == "failed":
+            statement = statement.where(RequirementCoverage.failed_cases > 0)
+        elif only == "flaky":
+            statement = statement.where(RequirementCoverage.flaky_cases > 0)
+        elif only == "not_run":
+            statement = statement.where(RequirementCoverage.test_cases > 0, RequirementCoverage.executed_cases == 0)
+        rows = self.db.execute(statement).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        result = {
+            "summary": self.summary(project_id),
+            "items": [coverage_item(row.Requirement, row.RequirementCoverage) for row in rows],
+            "next_cursor": rows[-1].Requirement.id if has_more and rows else None,
+        }
+        coverage_cache.store(project_id, cache_key, result)
+        return result
+
+    def summary(self, project_id: int) -> Dict[str, Any]:
+        """项目汇总：需求数、有用例 / 全部通过 / 有失败 / 有不稳定用例的需求数"""
+        row = self.db.execute(
+            select(
+                func.count().label("requirements"),
+                func.count().filter(RequirementCoverage.test_cases > 0).label("covered"),
+                func.count().filter(
+                    and_(RequirementCoverage.test_cases > 0,
+                         RequirementCoverage.passed_cases == RequirementCoverage.test_cases)
+                ).label("passed"),
+                func.count().filter(RequirementCoverage.failed_cases > 0).label("failed"),
+                func.count().filter(RequirementCoverage.flaky_cases > 0).label("flaky"),
+                func.coalesce(func.sum(RequirementCoverage.test_cases), 0).label("test_cases"),
+            )
+            .select_from(RequirementCoverage)
+            .join(Requirement, Requirement.id == RequirementCoverage.requirement_id)
+            .where(RequirementCoverage.project_id == project_id, Requirement.is_deleted == False)
+        ).one()
+        return {
+            "requirements": row.requirements,
+            "covered_requirements": row.covered,
+            "passed_requirements": row.passed,
+            "failed_requirements": row.failed,
+            "flaky_requirements": row.flaky,
+            "test_cases": row.test_cases,
+            "coverage": round(row.covered * 100 / row.requirements, 2) if row.requirements else 0.0,
+        }
+
+    def rebuild(self, project_id: int) -> int:
+        """重新汇总项目全部需求（上线初始化或与源表对账），返回需求数"""
+        requirement_ids = self.db.execute(
+            select(Requirement.id).where(Requirement.project_id == project_id)
+        ).scalars().all()
+        count = refresh_requirements(self.db.connection(), requirement_ids)
+        self.db.commit()
+        coverage_cache.invalidate([project_id])
+        return count
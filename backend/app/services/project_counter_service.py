@@ -0,0 +1,432 @@
+"""
+项目计数服务
+Project.requirement_count / test_case_count / defect_count 为项目下未删除的需求、用例、缺陷数：
+
+1. 增量缓冲：ORM 会话提交后按项目汇总记录增删（含软删除、换项目），批量写入（入库服务等）显式调用 project_counters.add；
+   增量先累加在缓冲区（进程内或 Redis），等待 PROJECT_COUNTER_FLUSH_INTERVAL 秒后每个项目合并为一次
+   UPDATE ... SET x = x + delta，避免批量生成时每条记录都去锁热点项目行
+2. 读取：counts 返回数据库中的计数加上尚未写入的增量，看板读到的是最新值
+3. 对账：绕过 ORM 的写入（Core UPDATE / DELETE 等）会造成漂移，
+   定时运行 python maintenance.py project-counters 按源表重算，只更新不一致的项目；
+   对账在同一事务内先取出缓冲区的全部增量再重算（增量在源表提交后才进入缓冲区，已包含在重算结果中），
+   并用 PostgreSQL 咨询锁与各进程的写入互斥，避免同一增量既计入重算结果又在之后再写入一次
+
+内存缓冲只在当前进程可见，只适用于单工作进程部署；多工作进程或在其他进程运行对账时使用 redis 缓冲
+"""
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, event, func, inspect, or_, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import PROJECT_COUNTER_DRIFT, PROJECT_COUNTER_FLUSHES
+from app.models.defect import Defect
+from app.models.project import Project
+from app.models.requirement import Requirement
+from app.models.test_case import TestCase
+
+logger = logging.getLogger(__name__)
+
+# 被计数的模型 -> projects 上的计数字段
+COUNTED_MODELS = {
+    Requirement: "requirement_count",
+    TestCase: "test_case_count",
+    Defect: "defect_count",
+}
+COUNTER_COLUMNS = tuple(COUNTED_MODELS.values())
+
+_RECONCILE_BATCH = 500
+# 写入增量（共享）与对账（排他）使用的事务级咨询锁
+_COUNTER_LOCK_KEY = 7_231_004
+
+
+def _lock_counters(connection: Connection, exclusive: bool = False) -> None:
+    lock = func.pg_advisory_xact_lock if exclusive else func.pg_advisory_xact_lock_shared
+    connection.execute(select(lock(_COUNTER_LOCK_KEY)))
+
+
+def _pending_deltas() -> Dict[int, Counter]:
+    return defaultdict(Counter)
+
+
+class MemoryCounterBuffer:
+    """进程内增量缓冲，只适用于单工作进程部署（其他进程的对账取不到这里的增量）"""
+
+    def __init__(self):
+        self._deltas: Dict[int, Counter] = _pending_deltas()
+        self._lock = threading.Lock()
+
+    def add(self, deltas: Dict[int, Counter]) -> None:
+        with self._lock:
+            for project_id, delta in deltas.items():
+                self._deltas[project_id].update(delta)
+
+    def take(self) -> Dict[int, Counter]:
+        """取出并清空全部增量"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, _pending_deltas()
+        return deltas
+
+    def pending(self, project_id: int) -> Counter:
+        with self._lock:
+            return Counter(self._deltas.get(project_id, ()))
+
+
+class RedisCounterBuffer:
+    """
+    Redis 增量缓冲，多个工作进程共享
+
+    每个项目一个 Hash（{prefix}:{project_id}），有增量的项目ID记录在集合 {prefix}:dirty 中；
+    取出时在事务中读取并删除 Hash，取出后到达的增量留给下一次写入
+    """
+
+    def __init__(self, url: str, prefix: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+        self._dirty = f"{prefix}:dirty"
+
+    def _key(self, project_id: int) -> str:
+        return f"{self._prefix}:{project_id}"
+
+    def add(self, deltas: Dict[int, Counter]) -> None:
+        pipeline = self._client.pipeline(transaction=False)
+        for project_id, delta in deltas.items():
+            for column, amount in delta.items():
+                if amount:
+                    pipeline.hincrby(self._key(project_id), column, amount)
+            pipeline.sadd(self._dirty, project_id)
+        pipeline.execute()
+
+    def take(self) -> Dict[int, Counter]:
+        deltas = _pending_deltas()
+        project_ids = self._client.spop(self._dirty, count=self._client.scard(self._dirty) or 1) or []
+        for project_id in project_ids:
+            pipeline = self._client.pipeline(transaction=True)
+            pipeline.hgetall(self._key(project_id))
+            pipeline.delete(self._key(project_id))
+            values, _ = pipeline.execute()
+            delta = Counter({column: int(amount) for column, amount in values.items() if int(amount)})
+            if delta:
+                deltas[int(project_id)] = delta
+        return deltas
+
+    def pending(self, project_id: int) -> Counter:
+        values = self._client.hgetall(self._key(project_id))
+        return Counter({column: int(amount) for column, amount in values.items()})
+
+
+def _flush_statement():
+    project = Project.__table__
+    return (
+        update(project)
+        .where(project.c.id == bindparam("project_id"))
+        .values({
+            column: func.coalesce(project.c[column], 0) + bindparam(f"delta_{column}")
+            for column in COUNTER_COLUMNS
+        })
+    )
+
+
+def apply_deltas(connection: Connection, deltas: Dict[int, Counter]) -> int:
+    """
+    把增量写入 projects（调用方负责提交），返回更新的项目数
+
+    每个项目一行参数、一条语句批量执行；按项目ID排序加锁，多个进程同时写入不会死锁
+    """
+    rows = [
+        {"project_id": project_id, **{f"delta_{column}": delta.get(column, 0) for column in COUNTER_COLUMNS}}
+        for project_id, delta in sorted(deltas.items())
+        if any(delta.values())
+    ]
+    if rows:
+        connection.execute(_flush_statement(), rows)
+    return len(rows)
+
+
+class ProjectCounters:
+    """
+    项目计数增量的缓冲与定时写入
+
+    add 只把增量累加到缓冲区；第一次累加后等待 interval 秒统一写入，期间的增量合并到同一批
+    """
+
+    def __init__(self, interval: float, backend: str = "memory"):
+        self.interval = interval
+        self.backend = backend
+        self._buffer = None
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            if self.backend == "redis":
+                self._buffer = RedisCounterBuffer(settings.REDIS_URL, settings.PROJECT_COUNTER_REDIS_PREFIX)
+            elif self.backend == "memory":
+                self._buffer = MemoryCounterBuffer()
+            else:
+                raise ValueError(f"不支持的项目计数缓冲: {self.backend}")
+        return self._buffer
+
+    def add(self, project_id: Optional[int] = None, deltas: Optional[Dict[int, Counter]] = None, **counts: int) -> None:
+        """
+        累加项目计数增量
+
+        参数:
+            project_id: 项目ID，与 counts 一起使用，如 add(1, test_case_count=20)
+            deltas: 多个项目的增量 {project_id: Counter({字段: 增量})}
+        """
+        deltas = {project_id: Counter(counts)} if project_id is not None else dict(deltas or {})
+        deltas = {key: delta for key, delta in deltas.items() if key is not None and any(delta.values())}
+        if not deltas:
+            return
+        try:
+            self.buffer.add(deltas)
+        except Exception:
+            # 缓冲不可用时直接写入数据库，计数不丢失
+            logger.exception("项目计数增量缓冲失败，直接写入数据库", extra={"projects": len(deltas)})
+            self._write(deltas)
+            return
+        self._schedule()
+
+    def _schedule(self) -> None:
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def pending(self, project_id: int) -> Counter:
+        """尚未写入数据库的增量"""
+        try:
+            return self.buffer.pending(project_id)
+        except Exception:
+            logger.exception("读取项目计数增量失败", extra={"project_id": project_id})
+            return Counter()
+
+    def flush(self) -> int:
+        """立即写入缓冲区中的增量，返回更新的项目数"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return self._write()
+
+    def drain(self, connection: Connection) -> Dict[int, Counter]:
+        """
+        在调用方事务内取出缓冲区的全部增量并写入 projects（调用方负责提交，事务失败时用 restore 放回）
+
+        调用方需先持有计数咨询锁，取出与写入之间不会有对账插入
+        """
+        deltas = self.buffer.take()
+        apply_deltas(connection, deltas)
+        return deltas
+
+    def restore(self, deltas: Dict[int, Counter]) -> None:
+        """把未能提交的增量放回缓冲区，延迟后重试"""
+        if not deltas:
+            return
+        try:
+            self.buffer.add(deltas)
+            self._schedule()
+        except Exception:
+            logger.exception("项目计数增量无法放回缓冲区，等待对账修正", extra={"projects": len(deltas)})
+
+    def _write(self, deltas: Optional[Dict[int, Counter]] = None) -> int:
+        """写入指定增量，未指定时取出缓冲区的增量写入；取出与写入在同一事务内并持有共享咨询锁"""
+        from app.core.database import engine
+
+        retry = deltas is None
+        taken: Dict[int, Counter] = {}
+        try:
+            with engine.begin() as connection:
+                _lock_counters(connection)
+                if deltas is None:
+                    taken = deltas = self.drain(connection)
+                else:
+                    apply_deltas(connection, deltas)
+        except Exception:
+            logger.exception("项目计数写入失败", extra={"projects": len(taken or deltas or ())})
+            PROJECT_COUNTER_FLUSHES.labels("error").inc()
+            if retry:
+                self.restore(taken)
+            return 0
+        count = sum(1 for delta in deltas.values() if any(delta.values()))
+        if count:
+            PROJECT_COUNTER_FLUSHES.labels("success").inc()
+            logger.debug("项目计数已写入", extra={"projects": count})
+        return count
+
+
+project_counters = ProjectCounters(settings.PROJECT_COUNTER_FLUSH_INTERVAL, settings.PROJECT_COUNTER_BACKEND)
+
+
+def reconcile_statement(project_ids: List[int]):
+    """按源表重算指定项目的计数，只更新不一致的项目（RETURNING 修正的项目ID）"""
+    expected_columns = []
+    for model, column in COUNTED_MODELS.items():
+        expected_columns.append(
+            select(func.count())
+            .where(model.project_id == Project.id, model.is_deleted == False)
+            .correlate(Project)
+            .scalar_subquery()
+            .label(column)
+        )
+    expected = (
+        select(Project.id, *expected_columns)
+        .where(Project.id.in_(project_ids))
+        .subquery("expected")
+    )
+    return (
+        update(Project)
+        .where(Project.id == expected.c.id)
+        .where(or_(*(getattr(Project, column).is_distinct_from(expected.c[column]) for column in COUNTER_COLUMNS)))
+        .values({column: expected.c[column] for column in COUNTER_COLUMNS})
+        .returning(Project.id)
+    )
+
+
+def reconcile_projects(connection: Connection, project_ids: Iterable[int]) -> List[int]:
+    """分批对账，返回修正的项目ID（调用方负责提交）"""
+    ids = sorted(set(project_ids))
+    corrected: List[int] = []
+    for offset in range(0, len(ids), _RECONCILE_BATCH):
+        corrected.extend(connection.execute(reconcile_statement(ids[offset:offset + _RECONCILE_BATCH])).scalars())
+    return corrected
+
+
+# ---------- 会话提交后收集增量 ----------
+
+_PENDING_KEY = "project_counter_pending"
+
+
+def _previous(record, attribute: str):
+    history = inspect(record).attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(record, attribute)
+
+
+def _collect_deltas(session: Session, flush_context) -> None:
+    deltas: Dict[int, Counter] = session.info.setdefault(_PENDING_KEY, _pending_deltas())
+    for record in session.new:
+        column = COUNTED_MODELS.get(type(record))
+        if column and not record.is_deleted:
+            deltas[record.project_id][column] += 1
+
+    for record in session.dirty:
+        column = COUNTED_MODELS.get(type(record))
+        if not column:
+            continue
+        state = inspect(record)
+        if not (state.attrs.project_id.history.has_changes() or state.attrs.is_deleted.history.has_changes()):
+            continue
+        if not _previous(record, "is_deleted"):
+            deltas[_previous(record, "project_id")][column] -= 1
+        if not record.is_deleted:
+            deltas[record.project_id][column] += 1
+
+    for record in session.deleted:
+        column = COUNTED_MODELS.get(type(record))
+        if column and not _previous(record, "is_deleted"):
+            deltas[_previous(record, "project_id")][column] -= 1
+
+
+def _apply_deltas(session: Session) -> None:
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        project_counters.add(deltas=deltas)
+
+
+def _discard_deltas(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _load_previous_value(target, value, oldvalue, initiator) -> None:
+    """仅用于开启 active_history：修改已过期的记录时先加载旧值，保证能计算增量"""
+
+
+def register_listeners() -> None:
+    """注册 ORM 会话事件，重复调用无副作用"""
+    if event.contains(Session, "after_flush", _collect_deltas):
+        return
+    for model in COUNTED_MODELS:
+        event.listen(model.project_id, "set", _load_previous_value, active_history=True)
+        event.listen(model.is_deleted, "set", _load_previous_value, active_history=True)
+    event.listen(Session, "after_flush", _collect_deltas)
+    event.listen(Session, "after_commit", _apply_deltas)
+    event.listen(Session, "after_rollback", _discard_deltas)
+
+
+class ProjectCounterService:
+    """项目计数读取与对账服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def counts(self, project_id: int) -> Dict[str, int]:
+        """
+        项目的需求 / 用例 / 缺陷数
+
+        返回:
+            数据库中的计数加上尚未写入的增量
+        """
+        row = self.db.execute(
+            select(*(getattr(Project, column) for column in COUNTER_COLUMNS))
+            .where(Project.id == project_id, Project.is_deleted == False)
+        ).first()
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="项目不存在"
+            )
+        pending = project_counters.pending(project_id)
+        return {column: (getattr(row, column) or 0) + pending.get(column, 0) for column in COUNTER_COLUMNS}
+
+    def reconcile(self, project_ids: Optional[Iterable[int]] = None, offline: bool = False) -> List[int]:
+        """
+        取出缓冲区中的增量并按源表重算计数，修正不一致的项目（同一事务内完成）
+
+        持有排他咨询锁期间各进程的增量写入会等待；取出的增量对应的记录已经提交，重算结果已包含它们。
+        取出之后才到达缓冲区的增量一般对应重算之后的提交；仅当某次提交恰好发生在取出与重算之间、
+        而其增量晚于重算才进入缓冲区时会多计一次，下次对账修正
+
+        参数:
+            project_ids: 只处理指定项目，默认全部项目
+            offline: 内存缓冲时必须为 True，表示应用进程已停止、没有其他进程持有未写入的增量
+
+        返回:
+            被修正的项目ID
+        """
+        if project_counters.backend != "redis" and not offline:
+            raise ValueError("内存缓冲的增量只在应用进程内可见，对账需要 PROJECT_COUNTER_BACKEND=redis，或在应用停止后以离线方式运行")
+        statement = select(Project.id).where(Project.is_deleted == False)
+        if project_ids is not None:
+            statement = statement.where(Project.id.in_(list(project_ids)))
+
+        connection = self.db.connection()
+        _lock_counters(connection, exclusive=True)
+        drained: Dict[int, Counter] = {}
+        try:
+            drained = project_counters.drain(connection)
+            ids = self.db.execute(statement).scalars().all()
+            corrected = reconcile_projects(connection, ids)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            project_counters.restore(drained)
+            raise
+        if corrected:
+            PROJECT_COUNTER_DRIFT.inc(len(corrected))
+            logger.warning(
+                "项目计数存在漂移，已按源表修正",
+                extra={"projects": len(ids), "corrected": len(corrected), "project_ids": corrected[:20]},
+            )
+        return corrected
@@ -0,0 +1,278 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.requirement import Requirement, RequirementVersion
+from app.models.test_case import TestCase, TestCaseGenerationRequest, TestCaseStatus
+from app.utils.requirement_diff import SectionChange, diff_sections, split_sections
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RegenerationPlan:
+    """按需求变更重新生成测试用例的计划"""
+    requirement: Requirement
+    base_version: Optional[RequirementVersion]
+    changes: List[SectionChange]
+    affected_cases: Dict[str, List[TestCase]] = field(default_factory=dict)  # 旧章节键 -> 需要重新生成的用例
+    unaffected_case_count: int = 0
+    unmapped_case_count: int = 0  # 未记录所属章节的用例，保持不变
+
+    @property
+    def changed(self) -> List[SectionChange]:
+        return [change for change in self.changes if change.kind != "unchanged"]
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.changed
+
+    @property
+    def affected_case_ids(self) -> List[int]:
+        return [case.id for cases in self.affected_cases.values() for case in cases]
+
+    @property
+    def needs_generation(self) -> bool:
+        """是否有新增 / 修改的章节需要生成用例（只删除章节时不需要调用模型）"""
+        return any(change.kind != "removed" for change in self.changed)
+
+    @property
+    def renamed_sections(self) -> Dict[str, str]:
+        """章节键变化（标题改名、序号移动）：旧键 -> 新键"""
+        return {change.old.key: change.new.key for change in self.changes if change.renamed}
+
+    @property
+    def removed_case_ids(self) -> List[int]:
+        """已删除章节关联的用例"""
+        return [
+            case.id for change in self.changed if change.kind == "removed"
+            for case in self.affected_cases.get(change.old.key, [])
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        """计划摘要（不含章节正文）"""
+        counts: Dict[str, int] = {}
+        for change in self.changes:
+            counts[change.kind] = counts.get(change.kind, 0) + 1
+        return {
+            "requirement_id": self.requirement.id,
+            "base_version": self.base_version.version if self.base_version else None,
+            "sections": counts,
+            "changed_sections": [change.to_dict(include_text=False) for change in self.changed],
+            "affected_test_case_ids": self.affected_case_ids,
+            "unaffected_test_cases": self.unaffected_case_count,
+            "unmapped_test_cases": self.unmapped_case_count,
+        }
+
+
+class RequirementRegenerationService:
+    """需求变更驱动的测试用例增量生成服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_requirement(self, requirement_id: int) -> Requirement:
+        requirement = self.db.query(Requirement).filter(
+            Requirement.id == requirement_id,
+            Requirement.is_deleted == False
+        ).first()
+        if not requirement:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="需求不存在"
+            )
+        return requirement
+
+    def latest_version(self, requirement_id: int) -> Optional[RequirementVersion]:
+        """需求最近一次记录的版本快照"""
+        return self.db.query(RequirementVersion).filter(
+            RequirementVersion.requirement_id == requirement_id,
+            RequirementVersion.is_deleted == False
+        ).order_by(RequirementVersion.version.desc()).first()
+
+    def record_version(self, requirement: Requirement, creator_id: Optional[int] = None,
+                       snapshot: Optional[Dict[str, Any]] = None) -> RequirementVersion:
+        """
+        把需求内容记录为新版本（不提交事务）
+
+        参数:
+            snapshot: 要记录的 description / acceptance_criteria，默认取需求当前内容
+        """
+        current = self.db.query(func.max(RequirementVersion.version)).filter(
+            RequirementVersion.requirement_id == requirement.id
+        ).scalar() or 0
+        snapshot = snapshot or {
+            "description": requirement.description,
+            "acceptance_criteria": requirement.acceptance_criteria,
+        }
+        version = RequirementVersion(
+            requirement_id=requirement.id,
+            version=current + 1,
+            description=snapshot.get("description"),
+            acceptance_criteria=snapshot.get("acceptance_criteria"),
+            creator_id=creator_id,
+        )
+        self.db.add(version)
+        return version
+
+    def build_plan(self, requirement_id: int) -> RegenerationPlan:
+        """
+        比较需求当前内容与最近一次版本快照，找出变化章节及其关联的测试用例
+
+        没有版本快照时全部章节视为新增（首次生成）
+        """
+        requirement = self.get_requirement(requirement_id)
+        base = self.latest_version(requirement_id)
+
+        old_sections = split_sections(base.description, base.acceptance_criteria) if base else []
+        new_sections = split_sections(requirement.description, requirement.acceptance_criteria)
+        plan = RegenerationPlan(requirement, base, diff_sections(old_sections, new_sections))
+
+        stale_keys = {change.old.key for change in plan.changed if change.old is not None}
+        cases = self.db.query(TestCase).filter(
+            TestCase.requirement_id == requirement_id,
+            TestCase.is_deleted == False,
+            TestCase.status != TestCaseStatus.DEPRECATED
+        ).all()
+        for case in cases:
+            if not case.requirement_section:
+                plan.unmapped_case_count += 1
+            elif case.requirement_section in stale_keys:
+                plan.affected_cases.setdefault(case.requirement_section, []).append(case)
+            else:
+                plan.unaffected_case_count += 1
+        return plan
+
+    def build_generation_request(self, plan: RegenerationPlan, session_id: str,
+                                 creator_id: Optional[int] = None) -> TestCaseGenerationRequest:
+        """只包含变化章节与其关联用例的生成请求；指定 creator_id 时生成的用例自动入库"""
+        requirement = plan.requirement
+        sections = []
+        for change in plan.changed:
+            if change.kind == "removed":
+                continue
+            section = change.to_dict()
+            section["existing_test_cases"] = [
+                {
+                    "id": case.id,
+                    "code": case.code,
+                    "title": case.title,
+                    "preconditions": case.preconditions,
+                    "test_steps": case.test_steps,
+                    "expected_result": case.expected_result,
+                }
+                for case in plan.affected_cases.get(change.old.key if change.old else "", [])
+            ]
+            sections.append(section)
+
+        return TestCaseGenerationRequest(
+            session_id=session_id,
+            source_type="requirement_diff",
+            source_data={
+                "requirement": {
+                    "id": requirement.id,
+                    "code": requirement.code,
+                    "title": requirement.title,
+                    "base_version": plan.base_version.version if plan.base_version else None,
+                },
+                "changed_sections": sections,
+            },
+            generation_config={
+                "mode": "incremental",
+                "auto_save": creator_id is not None,
+                "creator_id": creator_id,
+                "project_id": requirement.project_id,
+                "requirement_id": requirement.id,
+                "replace_test_case_ids": [
+                    case.id for change in plan.changed if change.kind == "modified"
+                    for case in plan.affected_cases.get(change.old.key, [])
+                ],
+                "removed_test_case_ids": plan.removed_case_ids,
+                # 生成的用例入库成功后才记录版本快照，生成或入库失败时下一次仍与原快照比较
+                "requirement_changes": {
+                    "base_version": plan.base_version.version if plan.base_version else None,
+                    "renamed_sections": plan.renamed_sections,
+                    "snapshot": {
+                        "description": requirement.description,
+                        "acceptance_criteria": requirement.acceptance_criteria,
+                    },
+                },
+            },
+        )
+
+    def apply_plan(self, plan: RegenerationPlan, creator_id: Optional[int] = None) -> Optional[RequirementVersion]:
+        """不需要生成用例的计划（只删除了章节）直接落库：废弃已删除章节的用例并记录新版本"""
+        return self.apply_changes(
+            plan.requirement.id,
+            base_version=plan.base_version.version if plan.base_version else None,
+            renamed_sections=plan.renamed_sections,
+            deprecate_ids=plan.removed_case_ids,
+            creator_id=creator_id,
+        )
+
+    def apply_changes(
+        self,
+        requirement_id: int,
+        base_version: Optional[int],
+        renamed_sections: Dict[str, str],
+        deprecate_ids: Optional[List[int]] = None,
+        snapshot: Optional[Dict[str, Any]] = None,
+        creator_id: Optional[int] = None,
+    ) -> Optional[RequirementVersion]:
+        """
+        增量生成成功（用例已入库）后落库，提交事务：
+        1. 章节键变化（标题改名、序号移动）的用例更新为新章节键
+        2. deprecate_ids 中的用例标记为已废弃（生成时已随入库废弃的用例可不传）
+        3. 把生成时的需求内容记录为新版本，作为下一次比较的基准
+
+        参数:
+            base_version: 生成时比较的版本号；期间已有其他生成记录了新版本时不再落库，返回 None
+            snapshot: 生成时的需求内容，默认取需求当前内容
+
+        返回:
+            新记录的版本
+        """
+        requirement = self.get_requirement(requirement_id)
+        latest = self.latest_version(requirement_id)
+        if (latest.version if latest else None) != base_version:
+            logger.warning(
+                "需求版本已被其他生成任务更新，跳过本次版本记录",
+                extra={"requirement_id": requirement_id, "base_version": base_version,
+                       "latest_version": latest.version if latest else None},
+            )
+            return None
+
+        if renamed_sections:
+            cases = self.db.query(TestCase).filter(
+                TestCase.requirement_id == requirement_id,
+                TestCase.requirement_section.in_(list(renamed_sections))
+            ).all()
+            for case in cases:
+                case.requirement_section = renamed_sections[case.requirement_section]
+
+        deprecated = 0
+        if deprecate_ids:
+            cases = self.db.query(TestCase).filter(
+                TestCase.id.in_(list(deprecate_ids)),
+                TestCase.requirement_id == requirement_id,
+            ).all()
+            for case in cases:
+                case.status = TestCaseStatus.DEPRECATED
+            deprecated = len(cases)
+
+        version = self.record_version(requirement, creator_id, snapshot)
+        self.db.commit()
+        logger.info(
+            "需求增量生成结果已落库",
+            extra={
+                "requirement_id": requirement_id,
+                "version": version.version,
+                "renamed_sections": len(renamed_sections),
+                "deprecated_test_cases": deprecated,
+            },
+        )
+        return version
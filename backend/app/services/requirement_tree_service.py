@@ -0,0 +1,193 @@
+"""
+需求层级服务
+基于 requirement_closure 闭包表查询需求树：子树、祖先链、子树下的测试用例与覆盖情况都是一次索引连接查询，
+不需要逐层加载 children 或递归 CTE
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.requirement import Requirement, RequirementCoverage, requirement_closure
+from app.models.test_case import TestCase, TestCaseFlakiness, TestCaseStatus
+from app.services.test_flakiness_service import flakiness_item
+
+logger = logging.getLogger(__name__)
+
+closure = requirement_closure.c
+
+# 子树覆盖情况中逐项求和的用例计数
+_COVERAGE_COUNTS = (
+    "test_cases", "approved_cases", "automated_cases", "planned_cases",
+    "executed_cases", "passed_cases", "failed_cases", "blocked_cases", "flaky_cases",
+)
+
+
+def _requirement_item(requirement: Requirement, depth: int) -> Dict[str, Any]:
+    return {
+        "id": requirement.id,
+        "code": requirement.code,
+        "title": requirement.title,
+        "parent_id": requirement.parent_id,
+        "depth": depth,
+        "type": requirement.type.value if requirement.type else None,
+        "status": requirement.status.value if requirement.status else None,
+        "priority": requirement.priority.value if requirement.priority else None,
+    }
+
+
+def _preorder(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    按先序（父节点在前、同级按 ID）排列扁平节点列表
+
+    父节点不在列表中的节点（子树根节点、父需求已删除）作为根
+    """
+    ids = {item["id"] for item in items}
+    children: Dict[Optional[int], List[Dict[str, Any]]] = {}
+    for item in sorted(items, key=lambda item: item["id"]):
+        parent_id = item["parent_id"] if item["parent_id"] in ids else None
+        children.setdefault(parent_id, []).append(item)
+
+    ordered: List[Dict[str, Any]] = []
+    stack = list(reversed(children.get(None, [])))
+    while stack:
+        item = stack.pop()
+        ordered.append(item)
+        stack.extend(reversed(children.get(item["id"], [])))
+    return ordered
+
+
+class RequirementTreeService:
+    """需求层级查询服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _get(self, requirement_id: int) -> Requirement:
+        requirement = self.db.query(Requirement).filter(
+            Requirement.id == requirement_id, Requirement.is_deleted == False
+        ).first()
+        if requirement is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="需求不存在"
+            )
+        return requirement
+
+    def tree(self, project_id: int) -> List[Dict[str, Any]]:
+        """
+        项目的完整需求树（扁平、先序排列）
+
+        depth 为到根需求的层级数（根为 0），由闭包表中的最大层级差得到
+        """
+        rows = self.db.execute(
+            select(Requirement, func.max(closure.depth).label("depth"))
+            .join(requirement_closure, closure.descendant_id == Requirement.id)
+            .where(Requirement.project_id == project_id, Requirement.is_deleted == False)
+            .group_by(Requirement.id)
+        ).all()
+        return _preorder([_requirement_item(row.Requirement, row.depth) for row in rows])
+
+    def subtree(self, requirement_id: int, max_depth: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        需求及其全部后代（扁平、先序排列）
+
+        参数:
+            requirement_id: 子树根需求ID
+            max_depth: 只返回相对层级不超过该值的后代
+
+        返回:
+            节点列表，depth 为相对子树根的层级（根为 0）
+        """
+        self._get(requirement_id)
+        statement = (
+            select(Requirement, closure.depth)
+            .join(requirement_closure, closure.descendant_id == Requirement.id)
+            .where(closure.ancestor_id == requirement_id, Requirement.is_deleted == False)
+        )
+        if max_depth is not None:
+            statement = statement.where(closure.depth <= max_depth)
+        rows = self.db.execute(statement).all()
+        return _preorder([_requirement_item(row.Requirement, row.depth) for row in rows])
+
+    def ancestors(self, requirement_id: int) -> List[Dict[str, Any]]:
+        """祖先链，从根需求到直接父需求"""
+        self._get(requirement_id)
+        rows = self.db.execute(
+            select(Requirement, closure.depth)
+            .join(requirement_closure, closure.ancestor_id == Requirement.id)
+            .where(closure.descendant_id == requirement_id, closure.depth > 0)
+            .order_by(closure.depth.desc())
+        ).all()
+        return [_requirement_item(row.Requirement, row.depth) for row in rows]
+
+    def test_cases(self, requirement_id: int, include_descendants: bool = True,
+                   include_deprecated: bool = False) -> List[Dict[str, Any]]:
+        """
+        关联到需求（默认包括全部后代需求）的测试用例
+
+        返回:
+            用例列表，requirement_depth 为所属需求相对该需求的层级，flakiness 为不稳定性分析结果
+        """
+        self._get(requirement_id)
+        statement = (
+            select(TestCase, closure.depth, TestCaseFlakiness)
+            .join(requirement_closure, closure.descendant_id == TestCase.requirement_id)
+            .outerjoin(TestCaseFlakiness, TestCaseFlakiness.test_case_id == TestCase.id)
+            .where(closure.ancestor_id == requirement_id, TestCase.is_deleted == False)
+            .order_by(closure.depth, TestCase.requirement_id, TestCase.id)
+        )
+        if not include_descendants:
+            statement = statement.where(closure.depth == 0)
+        if not include_deprecated:
+            statement = statement.where(TestCase.status != TestCaseStatus.DEPRECATED)
+        return [
+            {
+                "id": row.TestCase.id,
+                "code": row.TestCase.code,
+                "title": row.TestCase.title,
+                "requirement_id": row.TestCase.requirement_id,
+                "requirement_depth": row.depth,
+                "type": row.TestCase.type.value if row.TestCase.type else None,
+                "priority": row.TestCase.priority.value if row.TestCase.priority else None,
+                "status": row.TestCase.status.value if row.TestCase.status else None,
+                "flakiness": flakiness_item(row.TestCaseFlakiness),
+            }
+            for row in self.db.execute(statement).all()
+        ]
+
+    def coverage(self, requirement_id: int) -> Dict[str, Any]:
+        """
+        子树的测试覆盖情况：汇总子树内各需求的覆盖数据（requirement_coverage），
+        尚未生成汇总的需求按没有用例计算
+        """
+        self._get(requirement_id)
+        row = self.db.execute(
+            select(
+                func.count().label("requirements"),
+                func.count().filter(RequirementCoverage.test_cases > 0).label("covered"),
+                func.count().filter(RequirementCoverage.failed_cases > 0).label("failed"),
+                func.count().filter(RequirementCoverage.flaky_cases > 0).label("flaky"),
+                *(
+                    func.coalesce(func.sum(getattr(RequirementCoverage, name)), 0).label(name)
+                    for name in _COVERAGE_COUNTS
+                ),
+            )
+            .select_from(requirement_closure)
+            .join(Requirement, Requirement.id == closure.descendant_id)
+            .outerjoin(RequirementCoverage, RequirementCoverage.requirement_id == closure.descendant_id)
+            .where(closure.ancestor_id == requirement_id, Requirement.is_deleted == False)
+        ).one()
+        result = {
+            "requirement_id": requirement_id,
+            "requirements": row.requirements,
+            "covered_requirements": row.covered,
+            "uncovered_requirements": row.requirements - row.covered,
+            "failed_requirements": row.failed,
+            "flaky_requirements": row.flaky,
+            "coverage": round(row.covered * 100 / row.requirements, 2) if row.requirements else 0.0,
+        }
+        result.update({name: getattr(row, name) for name in _COVERAGE_COUNTS})
+        return result
@@ -0,0 +1,162 @@
+import base64
+import binascii
+import html
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import Numeric, cast, func, literal, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from app.models.defect import Defect
+from app.models.requirement import Requirement
+from app.models.test_case import TestCase
+from app.utils.search_text import build_tsquery, highlight, query_terms
+
+logger = logging.getLogger(__name__)
+
+# 实体类型 -> (模型, 参与高亮的正文字段)
+SEARCH_ENTITIES = {
+    "test_case": (TestCase, ("description", "preconditions", "test_steps", "expected_result", "test_data")),
+    "requirement": (Requirement, ("description", "acceptance_criteria")),
+    "defect": (Defect, ("description", "steps_to_reproduce", "expected_result", "actual_result", "resolution")),
+}
+
+
+def encode_cursor(rank: Decimal, entity_type: str, entity_id: int) -> str:
+    payload = json.dumps([str(rank), entity_type, entity_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, entity_type, entity_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        rank = Decimal(rank)
+        if not rank.is_finite():
+            raise ValueError("rank must be finite")
+        return rank, str(entity_type), int(entity_id)
+    except (ValueError, TypeError, binascii.Error, InvalidOperation):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+
+
+class SearchService:
+    """测试用例、需求、缺陷的全文搜索服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search(
+        self,
+        query: str,
+        project_id: Optional[int] = None,
+        entity_types: Optional[Sequence[str]] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        跨实体全文搜索
+
+        三类实体在一条 UNION ALL 查询中按相关度（ts_rank_cd，标题权重最高）统一排序，
+        使用 (相关度, 实体类型, ID) 作为键集分页游标，翻页不需要 OFFSET；正文高亮只对当前页计算
+
+        参数:
+            query: 搜索关键词
+            project_id: 只搜索指定项目
+            entity_types: 实体类型（test_case / requirement / defect），默认全部
+            limit: 每页条数
+            cursor: 上一页返回的 next_cursor
+
+        返回:
+            {"items": [...], "next_cursor": ...}
+        """
+        tsquery_text = build_tsquery(query)
+        if tsquery_text is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="搜索关键词不能为空"
+            )
+        types = list(dict.fromkeys(entity_types or SEARCH_ENTITIES))
+        unknown = [item for item in types if item not in SEARCH_ENTITIES]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的搜索类型: {', '.join(unknown)}"
+            )
+
+        tsquery = func.to_tsquery("simple", tsquery_text)
+        selects = []
+        for entity_type in types:
+            model, _ = SEARCH_ENTITIES[entity_type]
+            # 相关度取固定小数位，保证游标比较稳定
+            rank = func.round(cast(func.ts_rank_cd(model.search_vector, tsquery), Numeric), 6)
+            statement = select(
+                rank.label("rank"),
+                literal(entity_type).label("entity_type"),
+                model.id.label("id"),
+            ).where(model.search_vector.op("@@")(tsquery), model.is_deleted == False)
+            if project_id is not None:
+                statement = statement.where(model.project_id == project_id)
+            selects.append(statement)
+
+        matches = union_all(*selects).subquery("matches")
+        statement = select(matches.c.rank, matches.c.entity_type, matches.c.id)
+        if cursor:
+            statement = statement.where(
+                tuple_(matches.c.rank, matches.c.entity_type, matches.c.id) < tuple_(*decode_cursor(cursor))
+            )
+        statement = statement.order_by(
+            matches.c.rank.desc(), matches.c.entity_type.desc(), matches.c.id.desc()
+        ).limit(limit + 1)
+        rows = self.db.execute(statement).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = self._load_items(rows, query_terms(query))
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(*rows[-1]) if has_more and rows else None,
+        }
+
+    def _load_items(self, rows: List, terms: List[str]) -> List[Dict[str, Any]]:
+        """按实体类型分别读取当前页的记录并生成高亮片段，保持排序结果的顺序"""
+        ids_by_type: Dict[str, List[int]] = {}
+        for row in rows:
+            ids_by_type.setdefault(row.entity_type, []).append(row.id)
+
+        records: Dict[tuple, Any] = {}
+        for entity_type, ids in ids_by_type.items():
+            model, _ = SEARCH_ENTITIES[entity_type]
+            for record in self.db.query(model).filter(model.id.in_(ids)).all():
+                records[(entity_type, record.id)] = record
+
+        items = []
+        for row in rows:
+            record = records.get((row.entity_type, row.id))
+            if record is None:
+                continue
+            _, body_fields = SEARCH_ENTITIES[row.entity_type]
+            snippet = None
+            for field in body_fields:
+                snippet = highlight(getattr(record, field), terms)
+                if snippet:
+                    break
+            items.append({
+                "type": row.entity_type,
+                "id": record.id,
+                "code": record.code,
+                "title": record.title,
+                "project_id": record.project_id,
+                "status": record.status.value if record.status else None,
+                "rank": float(row.rank),
+                "highlight": {
+                    "title": highlight(record.title, terms, max_length=len(record.title)) or html.escape(record.title),
+                    "content": snippet,
+                },
+            })
+        return items
@@ -0,0 +1,291 @@
+"""
+测试用例近似重复检测服务
+对标题、测试步骤、预期结果计算 MinHash 签名，按 LSH band 分桶保存到 test_case_signatures / test_case_lsh_buckets：
+
+1. 入库时只查询与新用例同桶的已有用例（索引查找，与项目用例总数无关），再用签名估计相似度
+2. 签名随用例一起保存，之后的检查不需要重新计算已有用例
+3. 历史用例由批处理任务补算签名（backfill）并按相似度聚类（cluster），重复用例标记 duplicate_of_id
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from sqlalchemy import and_, bindparam, delete, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.test_case import TestCase, TestCaseSignature, TestCaseStatus, test_case_lsh_buckets
+from app.utils.minhash import (
+    LSHIndex,
+    MinHasher,
+    band_keys,
+    jaccard,
+    shingles,
+    signature_from_bytes,
+    signature_to_bytes,
+)
+
+logger = logging.getLogger(__name__)
+
+# 单条候选查询携带的桶键数上限
+_BUCKET_QUERY_CHUNK = 5000
+
+
+@lru_cache(maxsize=4)
+def get_hasher(num_perm: int) -> MinHasher:
+    return MinHasher(num_perm)
+
+
+@dataclass
+class Fingerprint:
+    """用例的签名与 LSH 桶键"""
+    signature: np.ndarray
+    keys: List[int]
+
+
+@dataclass
+class DuplicateMatch:
+    """近似重复匹配：test_case_id 为已有用例，batch_index 为同一批中更早的用例序号（二者其一）"""
+    test_case_id: Optional[int]
+    batch_index: Optional[int]
+    similarity: float
+
+
+def case_text(title: Optional[str], test_steps: Optional[str], expected_result: Optional[str]) -> str:
+    """参与比较的用例文本"""
+    return "\n".join(part for part in (title, test_steps, expected_result) if part)
+
+
+class TestCaseDedupService:
+    """测试用例近似重复检测服务"""
+
+    def __init__(self, session: AsyncSession, threshold: Optional[float] = None):
+        self.session = session
+        self.threshold = settings.TEST_CASE_DEDUP_THRESHOLD if threshold is None else threshold
+        self.num_perm = settings.TEST_CASE_DEDUP_NUM_PERM
+        self.bands = settings.TEST_CASE_DEDUP_BANDS
+        self.shingle_size = settings.TEST_CASE_DEDUP_SHINGLE_SIZE
+
+    def fingerprint(self, text: str) -> Fingerprint:
+        signature = get_hasher(self.num_perm).signature(shingles(text, self.shingle_size))
+        return Fingerprint(signature, band_keys(signature, self.bands))
+
+    async def fingerprints(self, texts: Sequence[str]) -> List[Fingerprint]:
+        """在线程中批量计算签名，避免阻塞事件循环"""
+        return await asyncio.to_thread(lambda: [self.fingerprint(text) for text in texts])
+
+    async def find_duplicates(
+        self,
+        project_id: int,
+        fingerprints: Sequence[Fingerprint],
+        exclude_ids: Optional[Iterable[int]] = None,
+    ) -> List[Optional[DuplicateMatch]]:
+        """
+        为每个签名找出最相似的已有用例或批内更早的用例
+
+        已标记为重复、已废弃或已删除的用例不作为匹配目标，保证匹配结果指向保留的那条用例
+
+        返回:
+            与 fingerprints 对应的匹配结果，没有达到阈值的为 None
+        """
+        existing = await self._load_candidates(project_id, fingerprints, set(exclude_ids or ()))
+        existing_index = LSHIndex(self.bands)
+        for test_case_id, fingerprint in existing.items():
+            existing_index.add(test_case_id, fingerprint.signature, fingerprint.keys)
+
+        batch_index = LSHIndex(self.bands)
+        matches: List[Optional[DuplicateMatch]] = []
+        for index, fingerprint in enumerate(fingerprints):
+            best: Optional[DuplicateMatch] = None
+            for test_case_id in existing_index.candidates(fingerprint.signature, fingerprint.keys):
+                similarity = jaccard(fingerprint.signature, existing[test_case_id].signature)
+                if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                    best = DuplicateMatch(test_case_id, None, similarity)
+            if best is None:
+                for earlier in batch_index.candidates(fingerprint.signature, fingerprint.keys):
+                    similarity = jaccard(fingerprint.signature, fingerprints[earlier].signature)
+                    if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                        best = DuplicateMatch(None, earlier, similarity)
+            matches.append(best)
+            if best is None:
+                # 只有保留的用例进入批内索引
+                batch_index.add(index, fingerprint.signature, fingerprint.keys)
+        return matches
+
+    async def _load_candidates(
+        self,
+        project_id: int,
+        fingerprints: Sequence[Fingerprint],
+        exclude_ids: Set[int],
+    ) -> Dict[int, Fingerprint]:
+        """按 (band, 桶键) 查询同桶的已有用例及其签名，走 (project_id, band, bucket) 索引"""
+        wanted = sorted({(band, bucket) for fingerprint in fingerprints for band, bucket in enumerate(fingerprint.keys)})
+        buckets = test_case_lsh_buckets.c
+        candidate_ids: Set[int] = set()
+        for offset in range(0, len(wanted), _BUCKET_QUERY_CHUNK):
+            rows = await self.session.execute(
+                select(buckets.test_case_id)
+                .where(
+                    buckets.project_id == project_id,
+                    tuple_(buckets.band, buckets.bucket).in_(wanted[offset:offset + _BUCKET_QUERY_CHUNK]),
+                )
+            )
+            candidate_ids.update(rows.scalars())
+        candidate_ids -= exclude_ids
+        if not candidate_ids:
+            return {}
+
+        rows = await self.session.execute(
+            select(TestCaseSignature.test_case_id, TestCaseSignature.signature)
+            .join(TestCase, TestCase.id == TestCaseSignature.test_case_id)
+            .where(
+                TestCaseSignature.test_case_id.in_(candidate_ids),
+                TestCaseSignature.num_perm == self.num_perm,
+                TestCase.is_deleted == False,
+                TestCase.status != TestCaseStatus.DEPRECATED,
+                TestCase.duplicate_of_id.is_(None),
+            )
+        )
+        candidates: Dict[int, Fingerprint] = {}
+        for test_case_id, data in rows:
+            signature = signature_from_bytes(data)
+            candidates[test_case_id] = Fingerprint(signature, band_keys(signature, self.bands))
+        return candidates
+
+    async def store(self, project_id: int, test_case_ids: Sequence[int], fingerprints: Sequence[Fingerprint]) -> None:
+        """保存签名与桶键（不提交事务），已有签名的用例先删除旧记录"""
+        if not test_case_ids:
+            return
+        ids = list(test_case_ids)
+        await self.session.execute(delete(test_case_lsh_buckets).where(test_case_lsh_buckets.c.test_case_id.in_(ids)))
+        await self.session.execute(delete(TestCaseSignature).where(TestCaseSignature.test_case_id.in_(ids)))
+
+        await self.session.execute(insert(TestCaseSignature), [
+            {
+                "test_case_id": test_case_id,
+                "project_id": project_id,
+                "num_perm": self.num_perm,
+                "signature": signature_to_bytes(fingerprint.signature),
+                "is_deleted": False,
+            }
+            for test_case_id, fingerprint in zip(ids, fingerprints)
+        ])
+        await self.session.execute(insert(test_case_lsh_buckets), [
+            {"project_id": project_id, "band": band, "bucket": bucket, "test_case_id": test_case_id}
+            for test_case_id, fingerprint in zip(ids, fingerprints)
+            for band, bucket in enumerate(fingerprint.keys)
+        ])
+
+    async def backfill(self, project_id: int, batch_size: int = 1000) -> int:
+        """
+        为项目中还没有签名（或签名长度与当前配置不同）的用例计算并保存签名，每批提交一次
+
+        返回:
+            补算的用例数
+        """
+        total = 0
+        while True:
+            rows = (await self.session.execute(
+                select(TestCase.id, TestCase.title, TestCase.test_steps, TestCase.expected_result)
+                .outerjoin(TestCaseSignature, and_(
+                    TestCaseSignature.test_case_id == TestCase.id,
+                    TestCaseSignature.num_perm == self.num_perm,
+                ))
+                .where(
+                    TestCase.project_id == project_id,
+                    TestCase.is_deleted == False,
+                    TestCaseSignature.id.is_(None),
+                )
+                .order_by(TestCase.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                return total
+            fingerprints = await self.fingerprints([case_text(title, steps, expected) for _, title, steps, expected in rows])
+            await self.store(project_id, [row.id for row in rows], fingerprints)
+            await self.session.commit()
+            total += len(rows)
+            logger.info("已补算测试用例签名", extra={"project_id": project_id, "count": total})
+
+    async def cluster(self, project_id: int, apply: bool = True) -> List[List[int]]:
+        """
+        对项目的全部有效用例聚类
+
+        同桶的用例两两估计相似度，达到阈值的合并为一类（并查集），每类保留 ID 最小（最早创建）的用例，
+        其余用例的 duplicate_of_id 指向它。apply 为 False 时只返回聚类结果
+
+        返回:
+            包含两条及以上用例的聚类（每类按 ID 升序）
+        """
+        start = time.perf_counter()
+        index = LSHIndex(self.bands)
+        result = await self.session.stream(
+            select(TestCaseSignature.test_case_id, TestCaseSignature.signature)
+            .join(TestCase, TestCase.id == TestCaseSignature.test_case_id)
+            .where(
+                TestCaseSignature.project_id == project_id,
+                TestCaseSignature.num_perm == self.num_perm,
+                TestCase.is_deleted == False,
+                TestCase.status != TestCaseStatus.DEPRECATED,
+            )
+            .execution_options(yield_per=1000)
+        )
+        async for test_case_id, data in result:
+            index.add(test_case_id, signature_from_bytes(data))
+
+        parent: Dict[int, int] = {}
+
+        def find(item: int) -> int:
+            parent.setdefault(item, item)
+            while parent[item] != item:
+                parent[item] = parent[parent[item]]
+                item = parent[item]
+            return item
+
+        for left, right in index.candidate_pairs():
+            if index.similarity(left, right) >= self.threshold:
+                root_left, root_right = find(left), find(right)
+                if root_left != root_right:
+                    # 以较小的 ID 为根，根即为保留的用例
+                    parent[max(root_left, root_right)] = min(root_left, root_right)
+
+        groups: Dict[int, List[int]] = {}
+        for item in parent:
+            groups.setdefault(find(item), []).append(item)
+        clusters = sorted((sorted(members) for members in groups.values() if len(members) > 1), key=lambda c: c[0])
+
+        if apply:
+            await self.session.execute(
+                update(TestCase)
+                .where(TestCase.project_id == project_id, TestCase.duplicate_of_id.is_not(None))
+                .values(duplicate_of_id=None, duplicate_similarity=None)
+            )
+            updates = [
+                {"case_id": member, "keep_id": members[0], "similarity": index.similarity(member, members[0])}
+                for members in clusters
+                for member in members[1:]
+            ]
+            if updates:
+                await self.session.execute(
+                    update(TestCase.__table__)
+                    .where(TestCase.__table__.c.id == bindparam("case_id"))
+                    .values(duplicate_of_id=bindparam("keep_id"), duplicate_similarity=bindparam("similarity")),
+                    updates,
+                )
+            await self.session.commit()
+
+        logger.info(
+            "测试用例聚类完成",
+            extra={
+                "project_id": project_id,
+                "cases": len(index),
+                "clusters": len(clusters),
+                "duplicates": sum(len(members) - 1 for members in clusters),
+                "elapsed": round(time.perf_counter() - start, 3),
+            },
+        )
+        return clusters
@@ -0,0 +1,287 @@
+"""
+测试用例批量入库服务
+AI 生成的测试用例按批写入：编号由 CodeBlockAllocator 按项目区间分配，
+行数据通过多行 INSERT ... RETURNING 或 PostgreSQL COPY 写入，项目的用例计数提交后按批累加到计数缓冲；
+写入前用 MinHash 签名与项目已有用例比较，近似重复的用例按 TEST_CASE_DEDUP_ACTION 标记或跳过
+
+逐条 ORM 保存每条用例一次往返，并且“查最大编号再加一”的编号方式在并发时会重复；
+批量入库每 TEST_CASE_BULK_BATCH_SIZE 行一次往返，单批数千条用例在一个事务内完成
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import TEST_CASE_INGEST_DURATION, TEST_CASE_INGEST_ROWS
+from app.models.project import Project
+from app.models.test_case import TestCase, TestCaseData, TestCasePriority, TestCaseStatus, TestCaseType
+from app.services.coverage_service import coverage_refresher
+from app.services.code_sequence_service import format_test_case_code, test_case_code_allocator
+from app.services.project_counter_service import project_counters
+from app.services.test_case_dedup_service import DuplicateMatch, Fingerprint, TestCaseDedupService, case_text
+
+logger = logging.getLogger(__name__)
+
+# COPY 写入的列；created_at / updated_at 使用数据库默认值
+_COPY_COLUMNS = (
+    "id", "title", "code", "description", "preconditions", "test_steps", "expected_result", "test_data",
+    "type", "priority", "status", "project_id", "requirement_id", "requirement_section", "creator_id",
+    "is_automated", "is_deleted", "duplicate_of_id", "duplicate_similarity",
+)
+
+
+@dataclass
+class IngestResult:
+    """
+    批量入库结果，ids / codes / duplicate_of 与输入用例一一对应
+
+    跳过的重复用例（TEST_CASE_DEDUP_ACTION=skip）没有编号，ID 为被合并到的已有用例
+    """
+    ids: List[int] = field(default_factory=list)
+    codes: List[Optional[str]] = field(default_factory=list)
+    duplicate_of: List[Optional[int]] = field(default_factory=list)
+    method: str = "insert"
+    skipped: int = 0
+    deprecated: int = 0
+    elapsed: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": len(self.ids) - self.skipped,
+            "ids": self.ids,
+            "codes": self.codes,
+            "duplicate_of": self.duplicate_of,
+            "duplicates": sum(1 for item in self.duplicate_of if item is not None),
+            "skipped": self.skipped,
+            "method": self.method,
+            "deprecated": self.deprecated,
+            "elapsed": round(self.elapsed, 3),
+        }
+
+
+class TestCaseBulkIngestService:
+    """测试用例批量入库服务"""
+
+    def __init__(self, session: AsyncSession, method: Optional[str] = None, batch_size: Optional[int] = None,
+                 dedup_action: Optional[str] = None):
+        self.session = session
+        self.method = method or settings.TEST_CASE_BULK_INSERT_METHOD
+        self.batch_size = max(1, batch_size or settings.TEST_CASE_BULK_BATCH_SIZE)
+        self.dedup_action = dedup_action or settings.TEST_CASE_DEDUP_ACTION
+        if self.method not in ("insert", "copy"):
+            raise ValueError(f"不支持的批量入库方式: {self.method}")
+        if self.dedup_action not in ("flag", "skip"):
+            raise ValueError(f"不支持的重复处理方式: {self.dedup_action}")
+
+    async def ingest(
+        self,
+        project_id: int,
+        creator_id: int,
+        test_cases: Sequence[TestCaseData],
+        requirement_id: Optional[int] = None,
+        deprecate_ids: Optional[Sequence[int]] = None,
+    ) -> IngestResult:
+        """
+        批量写入测试用例并提交事务
+
+        参数:
+            project_id: 项目ID
+            creator_id: 创建者ID
+            test_cases: 待写入的用例，已带编号的保留原编号（如增量生成时修订的用例）
+            requirement_id: 关联需求ID
+            deprecate_ids: 同一事务内标记为已废弃的旧用例（被本批用例替换）
+
+        返回:
+            IngestResult，ids / codes 顺序与 test_cases 一致
+        """
+        start = time.perf_counter()
+        result = IngestResult(method=self.method)
+        if not test_cases and not deprecate_ids:
+            return result
+        await self._ensure_project(project_id)
+
+        # 近似重复检测：与项目已有用例及批内更早的用例比较
+        matches: List[Optional[DuplicateMatch]] = [None] * len(test_cases)
+        fingerprints: List[Fingerprint] = []
+        dedup = TestCaseDedupService(self.session) if settings.TEST_CASE_DEDUP_ENABLED and test_cases else None
+        if dedup:
+            fingerprints = await dedup.fingerprints([
+                case_text(case.title, case.test_steps, case.expected_result) for case in test_cases
+            ])
+            matches = await dedup.find_duplicates(project_id, fingerprints, exclude_ids=deprecate_ids)
+        skip_duplicates = self.dedup_action == "skip"
+        inserted = [index for index, match in enumerate(matches) if not (skip_duplicates and match)]
+
+        numbers = iter(await test_case_code_allocator.allocate(
+            project_id, sum(1 for index in inserted if not test_cases[index].code)
+        ))
+        codes: Dict[int, str] = {}
+        rows = []
+        for index in inserted:
+            case, match = test_cases[index], matches[index]
+            codes[index] = case.code or format_test_case_code(next(numbers))
+            row = self._to_row(case, codes[index], project_id, creator_id, requirement_id)
+            if match and match.test_case_id is not None:
+                row.update(duplicate_of_id=match.test_case_id, duplicate_similarity=match.similarity)
+            rows.append(row)
+
+        try:
+            ids: List[int] = []
+            for offset in range(0, len(rows), self.batch_size):
+                batch = rows[offset:offset + self.batch_size]
+                if self.method == "copy":
+                    ids.extend(await self._copy(batch))
+                else:
+                    ids.extend(await self._insert(batch))
+            id_of = dict(zip(inserted, ids))
+
+            # 批内重复指向同批中保留的那条用例（它一定已入库）
+            duplicate_of: Dict[int, int] = {}
+            for index, match in enumerate(matches):
+                if match:
+                    duplicate_of[index] = match.test_case_id if match.test_case_id is not None else id_of[match.batch_index]
+            if skip_duplicates:
+                id_of.update(duplicate_of)
+            else:
+                batch_duplicates = [
+                    {"case_id": id_of[index], "keep_id": duplicate_of[index], "similarity": match.similarity}
+                    for index, match in enumerate(matches)
+                    if match and match.batch_index is not None
+                ]
+                if batch_duplicates:
+                    await self.session.execute(
+                        update(TestCase.__table__)
+                        .where(TestCase.__table__.c.id == bindparam("case_id"))
+                        .values(duplicate_of_id=bindparam("keep_id"), duplicate_similarity=bindparam("similarity")),
+                        batch_duplicates,
+                    )
+            if dedup and inserted:
+                await dedup.store(project_id, ids, [fingerprints[index] for index in inserted])
+
+            if deprecate_ids:
+                deprecated = await self.session.execute(
+                    update(TestCase)
+                    .where(
+                        TestCase.id.in_(list(deprecate_ids)),
+                        TestCase.project_id == project_id,
+                        TestCase.status != TestCaseStatus.DEPRECATED,
+                    )
+                    .values(status=TestCaseStatus.DEPRECATED)
+                )
+                result.deprecated = deprecated.rowcount or 0
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        result.ids = [id_of[index] for index in range(len(test_cases))]
+        result.codes = [codes.get(index) for index in range(len(test_cases))]
+        result.duplicate_of = [duplicate_of.get(index) for index in range(len(test_cases))]
+        result.skipped = len(test_cases) - len(inserted)
+        await self._update_vector_index(project_id, rows, ids, deprecate_ids if result.deprecated else None)
+        coverage_refresher.mark([requirement_id], deprecate_ids or ())
+        project_counters.add(project_id, test_case_count=len(rows))
+        result.elapsed = time.perf_counter() - start
+        TEST_CASE_INGEST_ROWS.labels(self.method).inc(len(rows))
+        TEST_CASE_INGEST_DURATION.labels(self.method).observe(result.elapsed)
+        logger.info(
+            "测试用例批量入库完成",
+            extra={
+                "project_id": project_id,
+                "count": len(rows),
+                "method": self.method,
+                "deprecated": result.deprecated,
+                "elapsed": round(result.elapsed, 3),
+            },
+        )
+        return result
+
+    @staticmethod
+    async def _update_vector_index(project_id: int, rows: List[Dict[str, Any]], ids: List[int],
+                                   deprecate_ids: Optional[Sequence[int]]) -> None:
+        """把新用例写入向量索引、移除被废弃的旧用例（失败只记录日志，不影响入库结果）"""
+        if not settings.RAG_ENABLED or not (rows or deprecate_ids):
+            return
+        from app.services.vector_index_service import IndexDocument, document_text, index_documents
+
+        documents = [
+            IndexDocument(project_id, "test_case", case_id, document_text("test_case", row), True)
+            for case_id, row in zip(ids, rows)
+        ]
+        documents.extend(IndexDocument(project_id, "test_case", case_id, "", False) for case_id in deprecate_ids or ())
+        try:
+            await asyncio.to_thread(index_documents, documents)
+        except Exception:
+            logger.exception("测试用例向量索引更新失败", extra={"project_id": project_id})
+
+    async def _ensure_project(self, project_id: int) -> None:
+        exists = await self.session.scalar(
+            select(Project.id).where(Project.id == project_id, Project.is_deleted == False)
+        )
+        if exists is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="项目不存在"
+            )
+
+    @staticmethod
+    def _to_row(case: TestCaseData, code: str, project_id: int, creator_id: int,
+                requirement_id: Optional[int]) -> Dict[str, Any]:
+        return {
+            "title": case.title[:200],
+            "code": code[:50],
+            "description": case.description,
+            "preconditions": case.preconditions,
+            "test_steps": case.test_steps,
+            "expected_result": case.expected_result,
+            "test_data": case.test_data,
+            "type": case.type or TestCaseType.FUNCTIONAL,
+            "priority": case.priority or TestCasePriority.MEDIUM,
+            "status": TestCaseStatus.DRAFT,
+            "project_id": project_id,
+            "requirement_id": requirement_id,
+            "requirement_section": case.requirement_section[:255] if case.requirement_section else None,
+            "creator_id": creator_id,
+            "is_automated": False,
+            "is_deleted": False,
+            "duplicate_of_id": None,
+            "duplicate_similarity": None,
+        }
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """多行 INSERT ... RETURNING，返回的 ID 与 rows 顺序一致"""
+        statement = insert(TestCase).returning(TestCase.id, sort_by_parameter_order=True)
+        return list((await self.session.execute(statement, rows)).scalars())
+
+    async def _copy(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        PostgreSQL COPY 写入
+
+        COPY 不能返回生成的主键，先从 test_cases 的 ID 序列一次取出同样数量的值再随行写入
+        """
+        ids = list((await self.session.execute(
+            text("SELECT nextval(pg_get_serial_sequence('test_cases', 'id')) FROM generate_series(1, :count)"),
+            {"count": len(rows)},
+        )).scalars())
+
+        records = []
+        for row_id, row in zip(ids, rows):
+            values = {**row, "id": row_id}
+            # 与 ORM 一致，枚举列存储枚举名称
+            for key in ("type", "priority", "status"):
+                values[key] = values[key].name
+            records.append(tuple(values[column] for column in _COPY_COLUMNS))
+
+        # 与会话共用同一连接，COPY 处于同一事务中
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            TestCase.__tablename__, records=records, columns=list(_COPY_COLUMNS)
+        )
+        return ids
@@ -0,0 +1,285 @@
+"""
+执行记录分区与归档服务
+test_executions 按 start_time 每月一个分区（test_executions_pYYYY_MM），另有默认分区兜底：
+
+1. 预建分区：提前创建当月及未来 TEST_EXECUTION_PARTITION_MONTHS_AHEAD 个月的分区；
+   默认分区中已有落在新分区范围内的记录时先移入新表再挂载，避免挂载失败
+2. 归档：早于保留期（TEST_EXECUTION_RETENTION_MONTHS）的分区先摘除（DETACH），
+   导出为本地压缩文件（gzip CSV 或 zstd Parquet）并写入清单后删除；中途失败时已摘除的表会在下次运行时继续归档
+3. 最近结果：按用例查询最近一次执行读取 test_case_latest_results，分区归档后仍然可用；
+   删除分区前把每个（计划, 用例）的最近执行并入 test_plan_archived_results，计划统计不因归档变化
+
+按时间范围查询执行记录时带上 start_time 条件即可只扫描相关分区
+"""
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.test_case import TestExecution, test_case_latest_results
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ("csv", "parquet")
+
+_PARTITION_PATTERN = re.compile(r"^test_executions_p(\d{4})_(\d{2})$")
+_DEFAULT_PARTITION = "test_executions_default"
+
+# 已摘除分区中每个（计划, 用例）按 start_time、id 取最近一条，只在比已保留的结果更新时覆盖
+_KEEP_PLAN_RESULTS_SQL = (
+    "INSERT INTO test_plan_archived_results AS kept (test_plan_id, test_case_id, execution_id, status, start_time) "
+    "SELECT DISTINCT ON (test_plan_id, test_case_id) test_plan_id, test_case_id, id, status, start_time "
+    "FROM {name} WHERE test_plan_id IS NOT NULL "
+    "ORDER BY test_plan_id, test_case_id, start_time DESC, id DESC "
+    "ON CONFLICT (test_plan_id, test_case_id) DO UPDATE "
+    "SET execution_id = EXCLUDED.execution_id, status = EXCLUDED.status, start_time = EXCLUDED.start_time "
+    "WHERE (kept.start_time, kept.execution_id) < (EXCLUDED.start_time, EXCLUDED.execution_id)"
+)
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"test_executions_p{month:%Y_%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = _PARTITION_PATTERN.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def list_partitions(connection: Connection) -> Dict[str, bool]:
+    """
+    当前 schema 中的月分区表
+
+    返回:
+        {表名: 是否挂载在 test_executions 下}，已摘除但尚未归档的表为 False
+    """
+    rows = connection.execute(text(
+        "SELECT c.relname, i.inhrelid IS NOT NULL AS attached "
+        "FROM pg_class AS c "
+        "LEFT JOIN pg_inherits AS i ON i.inhrelid = c.oid AND i.inhparent = 'test_executions'::regclass "
+        "WHERE c.relkind = 'r' AND c.relnamespace = current_schema()::regnamespace "
+        "AND c.relname LIKE 'test\\_executions\\_p%'"
+    )).all()
+    return {row.relname: row.attached for row in rows if partition_month(row.relname)}
+
+
+def create_partition(connection: Connection, month: date) -> str:
+    """
+    创建并挂载一个月分区（调用方负责提交）
+
+    新表先按父表结构独立创建，把默认分区中落在该月的记录移入后再挂载，挂载时自动补建父表上的索引
+    """
+    name, lower, upper = partition_name(month), month, add_months(month, 1)
+    bounds = {"lower": lower, "upper": upper}
+    connection.execute(text(f"CREATE TABLE {name} (LIKE test_executions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = connection.execute(text(
+        f"WITH moved AS (DELETE FROM {_DEFAULT_PARTITION} "
+        "WHERE start_time >= :lower AND start_time < :upper RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds).rowcount
+    connection.execute(text(
+        f"ALTER TABLE test_executions ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    ))
+    if moved:
+        # 移出默认分区时删除触发器已按剩余记录重算最近结果，这里用移入的记录补回
+        connection.execute(text(
+            "INSERT INTO test_case_latest_results AS latest (test_case_id, execution_id, test_plan_id, status, start_time) "
+            "SELECT DISTINCT ON (test_case_id) test_case_id, id, test_plan_id, status, start_time "
+            f"FROM {name} ORDER BY test_case_id, start_time DESC, id DESC "
+            "ON CONFLICT (test_case_id) DO UPDATE "
+            "SET execution_id = EXCLUDED.execution_id, test_plan_id = EXCLUDED.test_plan_id, "
+            "status = EXCLUDED.status, start_time = EXCLUDED.start_time "
+            "WHERE (latest.start_time, latest.execution_id) <= (EXCLUDED.start_time, EXCLUDED.execution_id)"
+        ))
+        logger.info("已从默认分区移入执行记录", extra={"partition": name, "rows": moved})
+    return name
+
+
+def _parquet_schema(columns):
+    import pyarrow as pa
+
+    fields = []
+    for column in columns:
+        if isinstance(column.type, Integer):
+            field_type = pa.int64()
+        elif isinstance(column.type, Boolean):
+            field_type = pa.bool_()
+        elif isinstance(column.type, DateTime):
+            field_type = pa.timestamp("us", tz="UTC" if column.type.timezone else None)
+        else:
+            field_type = pa.string()
+        fields.append(pa.field(column.name, field_type))
+    return pa.schema(fields)
+
+
+class TestExecutionArchiveService:
+    """执行记录分区维护与归档服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def ensure_partitions(self, months_ahead: Optional[int] = None, today: Optional[date] = None) -> List[str]:
+        """
+        创建当月及未来 months_ahead 个月中缺少的分区
+
+        返回:
+            新建的分区表名
+        """
+        months_ahead = settings.TEST_EXECUTION_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        current = month_start(today or date.today())
+        existing = list_partitions(self.db.connection())
+        created = []
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if partition_name(month) in existing:
+                continue
+            # 每个分区单独提交，缩短挂载时对默认分区的锁定时间
+            created.append(create_partition(self.db.connection(), month))
+            self.db.commit()
+        if created:
+            logger.info("已创建执行记录分区", extra={"partitions": created})
+        return created
+
+    def archive(
+        self,
+        retention_months: Optional[int] = None,
+        directory: Optional[str] = None,
+        archive_format: Optional[str] = None,
+        dry_run: bool = False,
+        today: Optional[date] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        摘除并归档早于保留期的月分区
+
+        参数:
+            retention_months: 在线保留的月数（含当月），0 表示不归档
+            directory: 归档目录
+            archive_format: csv / parquet
+            dry_run: 只返回待归档的分区，不做修改
+
+        返回:
+            每个分区的归档清单（dry_run 时只有 partition / month）
+        """
+        retention_months = settings.TEST_EXECUTION_RETENTION_MONTHS if retention_months is None else retention_months
+        directory = directory or settings.TEST_EXECUTION_ARCHIVE_DIR
+        archive_format = archive_format or settings.TEST_EXECUTION_ARCHIVE_FORMAT
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"不支持的归档格式: {archive_format}")
+        if retention_months <= 0:
+            return []
+
+        cutoff = add_months(month_start(today or date.today()), 1 - retention_months)
+        partitions = list_partitions(self.db.connection())
+        self.db.rollback()
+        expired = sorted(name for name in partitions if partition_month(name) < cutoff)
+        if dry_run:
+            return [{"partition": name, "month": partition_month(name).isoformat()} for name in expired]
+
+        os.makedirs(directory, exist_ok=True)
+        manifests = []
+        for name in expired:
+            if partitions[name]:
+                # 摘除后新的查询与写入不再访问该表，导出期间数据不会变化
+                self.db.execute(text(f"ALTER TABLE test_executions DETACH PARTITION {name}"))
+                self.db.commit()
+            manifest = self._export(name, directory, archive_format)
+            # 与删除分区在同一事务内保留计划统计所需的最近结果，中途失败重跑时重复合并结果不变
+            self.db.execute(text(_KEEP_PLAN_RESULTS_SQL.format(name=name)))
+            self.db.execute(text(f"DROP TABLE {name}"))
+            self.db.commit()
+            manifests.append(manifest)
+            logger.info("执行记录分区已归档", extra=manifest)
+        return manifests
+
+    def _export(self, name: str, directory: str, archive_format: str) -> Dict[str, Any]:
+        """导出已摘除的分区表，先写临时文件再改名，最后写入清单"""
+        suffix = "csv.gz" if archive_format == "csv" else "parquet"
+        path = os.path.join(directory, f"{name}.{suffix}")
+        temporary = f"{path}.tmp"
+        raw = self.db.connection().connection.dbapi_connection
+        columns = list(TestExecution.__table__.columns)
+        query = f"SELECT {', '.join(column.name for column in columns)} FROM {name} ORDER BY start_time, id"
+
+        if archive_format == "csv":
+            rows = self.db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+            with raw.cursor() as cursor, gzip.open(temporary, "wb") as output:
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", output)
+        else:
+            rows = self._write_parquet(raw, name, query, columns, temporary)
+        self.db.rollback()
+        os.replace(temporary, path)
+
+        manifest = {
+            "partition": name,
+            "month": partition_month(name).isoformat(),
+            "rows": rows,
+            "format": archive_format,
+            "file": os.path.basename(path),
+            "bytes": os.path.getsize(path),
+            "archived_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        return manifest
+
+    @staticmethod
+    def _write_parquet(raw, name: str, query: str, columns, path: str) -> int:
+        """用服务端游标分批读取，逐批写入 Parquet，内存占用与分区大小无关"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = _parquet_schema(columns)
+        rows = 0
+        with raw.cursor(name=f"archive_{name}") as cursor, pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            cursor.itersize = settings.TEST_EXECUTION_ARCHIVE_BATCH
+            cursor.execute(query)
+            while True:
+                batch = cursor.fetchmany(settings.TEST_EXECUTION_ARCHIVE_BATCH)
+                if not batch:
+                    break
+                values = list(zip(*batch))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(values, schema)],
+                    schema=schema,
+                ))
+                rows += len(batch)
+        return rows
+
+    def latest_results(self, test_case_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        用例最近一次执行的结果
+
+        返回:
+            {用例ID: {"execution_id", "test_plan_id", "status", "start_time"}}，没有执行记录的用例不在结果中
+        """
+        ids = list(test_case_ids)
+        if not ids:
+            return {}
+        latest = test_case_latest_results.c
+        rows = self.db.execute(select(test_case_latest_results).where(latest.test_case_id.in_(ids))).all()
+        return {
+            row.test_case_id: {
+                "execution_id": row.execution_id,
+                "test_plan_id": row.test_plan_id,
+                "status": row.status.value if row.status else None,
+                "start_time": row.start_time,
+            }
+            for row in rows
+        }
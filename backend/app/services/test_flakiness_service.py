@@ -0,0 +1,384 @@
+"""
+用例不稳定性分析服务
+按执行记录计算每个用例的切换率、滑动窗口失败率与不稳定分数，写入 test_case_flakiness：
+
+1. 列式批量计算：执行记录按（用例, start_time, id）排序后通过服务端游标分批读取，每批转为 NumPy 数组，
+   切换次数、窗口失败数 / 切换数都由累加和相减得到，不逐条创建 ORM 对象，也不按用例循环计算
+2. 增量处理：analytics_watermarks 记录已处理的最大执行ID，重新运行只读取之后的新记录；
+   汇总表保存每个用例最近一个窗口的结果序列，新记录接在其后计算，窗口统计与全量计算一致
+3. 只统计通过 / 失败；近期开始的待执行 / 执行中记录会让进度停在其之前，等结束后再一并计入
+4. 需求覆盖汇总的不稳定用例数读取 is_flaky，判定变化的用例提交后标记刷新对应需求
+
+不稳定分数 = 窗口切换率 × (1 - |1 - 2 × 窗口失败率|)：结果交替出现时接近 1，稳定通过、稳定失败或一次性回归都接近 0。
+进度按执行ID推进，晚于进度提交但ID更小的记录（与分析并发的长事务写入）会被跳过，
+新记录的开始时间早于已计入的记录时按到达顺序接在序列末尾；两种情况都可用 full=True 全量重建，
+全量重建时已归档分区中的记录不再计入
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import TEST_FLAKINESS_DURATION, TEST_FLAKINESS_EXECUTIONS
+from app.models.test_case import TestCase, TestCaseFlakiness, TestExecution, TestExecutionStatus, analytics_watermarks
+from app.models.test_plan import test_plan_cases
+from app.services.coverage_service import coverage_refresher
+
+# NumPy 只在分析时导入，不拖慢 API 启动
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "test_flakiness"
+
+_OUTCOME_STATUSES = (TestExecutionStatus.PASSED, TestExecutionStatus.FAILED)
+_UNFINISHED_STATUSES = (TestExecutionStatus.PENDING, TestExecutionStatus.RUNNING)
+_PASS, _FAIL = ord("P"), ord("F")
+
+# 每批写入汇总表的列（test_case_id / project_id 之外）
+_SUMMARY_COLUMNS = (
+    "executions", "failures", "flips", "flip_rate",
+    "window_runs", "window_failures", "window_flips", "failure_rate", "window_flip_rate",
+    "peak_failure_rate", "flakiness_score", "is_flaky", "recent_outcomes",
+)
+
+
+def compute_batch(
+    case_ids: "np.ndarray",
+    failed: "np.ndarray",
+    previous: Dict[str, "np.ndarray"],
+    histories: Sequence[str],
+    window: int,
+    min_runs: int,
+    threshold: float,
+) -> Dict[str, Any]:
+    """
+    把一批执行结果接到各用例已有的统计之后，计算新的汇总值（纯 NumPy，不访问数据库）
+
+    参数:
+        case_ids: 按用例分组排列的用例ID（同一用例的记录相邻，按执行先后排列）
+        failed: 与 case_ids 对应的结果，1 为失败、0 为通过
+        previous: 每个用例（按在 case_ids 中出现的顺序）已有的 executions / failures / flips / peak_failure_rate
+        histories: 每个用例已有的最近结果序列（P / F，从旧到新）
+        window: 滑动窗口大小
+        min_runs: 窗口内执行次数少于该值时不判定为不稳定，也不计入最高失败率
+        threshold: 判定为不稳定的分数下限
+
+    返回:
+        每个用例一项的数组：_SUMMARY_COLUMNS 各列、test_case_id 与本批最后一条记录的下标 last_index
+    """
+    import numpy as np
+
+    failed = failed.astype(np.int64)
+    size = len(case_ids)
+    starts = np.flatnonzero(np.r_[True, case_ids[1:] != case_ids[:-1]])
+    counts = np.diff(np.r_[starts, size])
+    history_lengths = np.fromiter((len(history) for history in histories), dtype=np.int64, count=len(starts))
+    lengths = history_lengths + counts
+    offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+
+    # 每个用例的历史结果与本批结果拼成连续的一段
+    outcomes = np.empty(int(lengths.sum()), dtype=np.int64)
+    history_codes = np.frombuffer("".join(histories).encode("ascii"), dtype=np.uint8) == _FAIL
+    history_starts = np.r_[0, np.cumsum(history_lengths)[:-1]]
+    outcomes[np.repeat(offsets - history_starts, history_lengths) + np.arange(len(history_codes))] = history_codes
+    new_positions = np.repeat(offsets + history_lengths - starts, counts) + np.arange(size)
+    outcomes[new_positions] = failed
+
+    # 与同一用例上一条结果不同即为一次切换
+    segments = np.repeat(np.arange(len(starts)), lengths)
+    flips = np.zeros(len(outcomes), dtype=np.int64)
+    flips[1:] = (outcomes[1:] != outcomes[:-1]) & (segments[1:] == segments[:-1])
+
+    # 以每个位置结尾、不跨越用例的窗口 [lower, position]
+    failure_sums = np.r_[0, np.cumsum(outcomes)]
+    flip_sums = np.r_[0, np.cumsum(flips)]
+    positions = np.arange(len(outcomes))
+    lower = np.maximum(offsets[segments], positions - window + 1)
+    runs = positions + 1 - lower
+    window_failures = failure_sums[positions + 1] - failure_sums[lower]
+    window_flips = flip_sums[positions + 1] - flip_sums[lower + 1]
+    rates = np.where(runs >= min_runs, window_failures / runs, 0.0)
+
+    ends = offsets + lengths - 1
+    executions = previous["executions"] + counts
+    total_flips = previous["flips"] + np.add.reduceat(flips[new_positions], starts)
+    end_runs = runs[ends]
+    failure_rate = window_failures[ends] / end_runs
+    window_flip_rate = window_flips[ends] / np.maximum(end_runs - 1, 1)
+    score = window_flip_rate * (1 - np.abs(1 - 2 * failure_rate))
+
+    codes = np.where(outcomes == 1, _FAIL, _PASS).astype(np.uint8).tobytes().decode("ascii")
+    keep = np.minimum(lengths, window)
+    return {
+        "test_case_id": case_ids[starts],
+        "last_index": starts + counts - 1,
+        "executions": executions,
+        "failures": previous["failures"] + np.add.reduceat(failed, starts),
+        "flips": total_flips,
+        "flip_rate": total_flips / np.maximum(executions - 1, 1),
+        "window_runs": end_runs,
+        "window_failures": window_failures[ends],
+        "window_flips": window_flips[ends],
+        "failure_rate": failure_rate,
+        "window_flip_rate": window_flip_rate,
+        "peak_failure_rate": np.maximum(previous["peak_failure_rate"], np.maximum.reduceat(rates[new_positions], starts)),
+        "flakiness_score": score,
+        "is_flaky": (end_runs >= min_runs) & (score >= threshold),
+        "recent_outcomes": [codes[end + 1 - count:end + 1] for end, count in zip(ends.tolist(), keep.tolist())],
+    }
+
+
+def _upsert_statement():
+    statement = insert(TestCaseFlakiness).values(analyzed_at=func.now())
+    columns = ("project_id",) + _SUMMARY_COLUMNS + ("last_execution_id", "last_executed_at")
+    return statement.on_conflict_do_update(
+        index_elements=[TestCaseFlakiness.test_case_id],
+        set_={**{name: statement.excluded[name] for name in columns}, "analyzed_at": func.now(), "updated_at": func.now()},
+    )
+
+
+def flakiness_item(flakiness: Optional[TestCaseFlakiness]) -> Dict[str, Any]:
+    """汇总表中供列表展示的字段，尚未分析的用例返回空值"""
+    if flakiness is None:
+        return {
+            "executions": 0, "failure_rate": None, "window_flip_rate": None, "peak_failure_rate": None,
+            "flakiness_score": None, "is_flaky": False, "recent_outcomes": "", "last_executed_at": None,
+        }
+    return {
+        "executions": flakiness.executions,
+        "failure_rate": round(flakiness.failure_rate, 4),
+        "window_flip_rate": round(flakiness.window_flip_rate, 4),
+        "peak_failure_rate": round(flakiness.peak_failure_rate, 4),
+        "flakiness_score": round(flakiness.flakiness_score, 4),
+        "is_flaky": flakiness.is_flaky,
+        "recent_outcomes": flakiness.recent_outcomes,
+        "last_executed_at": flakiness.last_executed_at,
+    }
+
+
+class TestFlakinessService:
+    """用例不稳定性分析服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def analyze(self, full: bool = False) -> Dict[str, Any]:
+        """
+        计算上次分析之后新增执行记录带来的变化并写入汇总表（整个过程一个事务，结束时提交）
+
+        参数:
+            full: 清空汇总表后从头计算全部执行记录
+
+        返回:
+            {"executions": 处理的执行记录数, "test_cases": 更新的用例数, "flaky_cases": 其中不稳定的用例数,
+             "last_execution_id": 处理进度}
+        """
+        start = time.perf_counter()
+        connection = self.db.connection()
+        low = self._lock_watermark(connection)
+        # 用例ID -> 本次分析前是否不稳定，用于找出判定变化的用例
+        was_flaky: Dict[int, bool] = {}
+        if full:
+            was_flaky = dict.fromkeys(
+                connection.execute(select(TestCaseFlakiness.test_case_id).where(TestCaseFlakiness.is_flaky == True)).scalars(),
+                True,
+            )
+            connection.execute(delete(TestCaseFlakiness))
+            low = 0
+        high = self._upper_bound(connection, low)
+
+        summary = {"executions": 0, "test_cases": 0, "flaky_cases": 0, "last_execution_id": max(low, high or 0)}
+        flaky: Dict[int, bool] = {}
+        if high is not None and high > low:
+            statement = (
+                select(
+                    TestExecution.test_case_id,
+                    TestExecution.id,
+                    (TestExecution.status == TestExecutionStatus.FAILED).label("failed"),
+                    TestExecution.start_time,
+                )
+                .where(
+                    TestExecution.id > low,
+                    TestExecution.id <= high,
+                    TestExecution.status.in_(_OUTCOME_STATUSES),
+                )
+                .order_by(TestExecution.test_case_id, TestExecution.start_time, TestExecution.id)
+            )
+            # 服务端游标分批读取；同一用例跨批次时，后一批读取的是前一批刚写入的汇总
+            batches = connection.execution_options(yield_per=settings.TEST_FLAKINESS_BATCH).execute(statement)
+            for rows in batches.partitions():
+                for case_id, (before, after) in self._apply_batch(connection, rows).items():
+                    was_flaky.setdefault(case_id, before)
+                    flaky[case_id] = after
+                summary["executions"] += len(rows)
+            summary["test_cases"] = len(flaky)
+            summary["flaky_cases"] = sum(flaky.values())
+        self._save_watermark(connection, summary["last_execution_id"])
+        self.db.commit()
+        changed = [case_id for case_id in was_flaky.keys() | flaky.keys() if was_flaky.get(case_id, False) != flaky.get(case_id, False)]
+        if changed:
+            coverage_refresher.mark(test_case_ids=changed)
+
+        elapsed = time.perf_counter() - start
+        TEST_FLAKINESS_EXECUTIONS.inc(summary["executions"])
+        TEST_FLAKINESS_DURATION.observe(elapsed)
+        logger.info("用例不稳定性分析完成", extra={**summary, "full": full, "elapsed": round(elapsed, 3)})
+        return summary
+
+    def _apply_batch(self, connection: Connection, rows: List[Any]) -> Dict[int, Tuple[bool, bool]]:
+        """计算并写入一批执行记录，返回 {用例ID: (本批之前是否不稳定, 本批之后是否不稳定)}"""
+        import numpy as np
+
+        case_column, id_column, failed_column, time_column = zip(*rows)
+        case_ids = np.array(case_column, dtype=np.int64)
+        unique_ids = case_ids[np.r_[True, case_ids[1:] != case_ids[:-1]]].tolist()
+
+        states = {
+            row.id: row
+            for row in connection.execute(
+                select(
+                    TestCase.id,
+                    TestCase.project_id,
+                    TestCaseFlakiness.executions,
+                    TestCaseFlakiness.failures,
+                    TestCaseFlakiness.flips,
+                    TestCaseFlakiness.peak_failure_rate,
+                    TestCaseFlakiness.recent_outcomes,
+                    TestCaseFlakiness.is_flaky,
+                )
+                .outerjoin(TestCaseFlakiness, TestCaseFlakiness.test_case_id == TestCase.id)
+                .where(TestCase.id.in_(unique_ids))
+            )
+        }
+        ordered = [states[case_id] for case_id in unique_ids]
+        previous = {
+            name: np.array([getattr(state, name) or 0 for state in ordered], dtype=np.float64 if name == "peak_failure_rate" else np.int64)
+            for name in ("executions", "failures", "flips", "peak_failure_rate")
+        }
+        result = compute_batch(
+            case_ids,
+            np.array(failed_column, dtype=np.int64),
+            previous,
+            [state.recent_outcomes or "" for state in ordered],
+            window=max(1, settings.TEST_FLAKINESS_WINDOW),
+            min_runs=settings.TEST_FLAKINESS_MIN_RUNS,
+            threshold=settings.TEST_FLAKINESS_THRESHOLD,
+        )
+
+        # NumPy 标量转为 Python 类型后再交给驱动
+        columns = {name: result[name].tolist() if isinstance(result[name], np.ndarray) else result[name] for name in _SUMMARY_COLUMNS}
+        last_index = result["last_index"].tolist()
+        records = [
+            {
+                "test_case_id": case_id,
+                "project_id": state.project_id,
+                **{name: columns[name][position] for name in _SUMMARY_COLUMNS},
+                "last_execution_id": id_column[last_index[position]],
+                "last_executed_at": time_column[last_index[position]],
+            }
+            for position, (case_id, state) in enumerate(zip(unique_ids, ordered))
+        ]
+        connection.execute(_upsert_statement(), records)
+        return {
+            case_id: (bool(state.is_flaky), after)
+            for case_id, state, after in zip(unique_ids, ordered, columns["is_flaky"])
+        }
+
+    @staticmethod
+    def _lock_watermark(connection: Connection) -> int:
+        """读取并锁定处理进度，同时运行的分析任务依次执行，不会重复计入同一批记录"""
+        connection.execute(
+            insert(analytics_watermarks).values(name=WATERMARK_NAME, last_id=0).on_conflict_do_nothing()
+        )
+        return connection.execute(
+            select(analytics_watermarks.c.last_id)
+            .where(analytics_watermarks.c.name == WATERMARK_NAME)
+            .with_for_update()
+        ).scalar_one()
+
+    @staticmethod
+    def _save_watermark(connection: Connection, last_id: int) -> None:
+        connection.execute(
+            analytics_watermarks.update()
+            .where(analytics_watermarks.c.name == WATERMARK_NAME)
+            .values(last_id=last_id, updated_at=func.now())
+        )
+
+    @staticmethod
+    def _upper_bound(connection: Connection, low: int) -> Optional[int]:
+        """
+        本次处理到的执行ID：当前最大ID，存在近期开始且尚未结束的执行时停在其之前，
+        避免之后变为通过 / 失败的记录落在进度之前而被漏掉
+        """
+        high = connection.execute(select(func.max(TestExecution.id)).where(TestExecution.id > low)).scalar()
+        if high is None:
+            return None
+        unfinished = connection.execute(
+            select(func.min(TestExecution.id)).where(
+                TestExecution.id > low,
+                TestExecution.status.in_(_UNFINISHED_STATUSES),
+                TestExecution.start_time >= datetime.now() - timedelta(hours=settings.TEST_FLAKINESS_PENDING_HOURS),
+            )
+        ).scalar()
+        return min(high, unfinished - 1) if unfinished is not None else high
+
+    def list_cases(
+        self,
+        project_id: int,
+        test_plan_id: Optional[int] = None,
+        only_flaky: bool = True,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        项目（或测试计划内）用例的不稳定性分析结果，按不稳定分数从高到低排列
+
+        参数:
+            project_id: 项目ID
+            test_plan_id: 只返回该测试计划内的用例
+            only_flaky: 只返回判定为不稳定的用例
+            limit: 每页条数
+            offset: 跳过的条数
+
+        返回:
+            {"items": [...], "total": 总数}
+        """
+        statement = (
+            select(TestCaseFlakiness, TestCase.code, TestCase.title)
+            .join(TestCase, TestCase.id == TestCaseFlakiness.test_case_id)
+            .where(TestCaseFlakiness.project_id == project_id, TestCase.is_deleted == False)
+        )
+        if test_plan_id is not None:
+            statement = statement.join(test_plan_cases, test_plan_cases.c.test_case_id == TestCaseFlakiness.test_case_id).where(
+                test_plan_cases.c.test_plan_id == test_plan_id
+            )
+        if only_flaky:
+            statement = statement.where(TestCaseFlakiness.is_flaky == True)
+
+        total = self.db.execute(select(func.count()).select_from(statement.subquery())).scalar_one()
+        rows = self.db.execute(
+            statement.order_by(TestCaseFlakiness.flakiness_score.desc(), TestCaseFlakiness.test_case_id)
+            .limit(limit)
+            .offset(offset)
+        ).all()
+        return {
+            "items": [
+                {
+                    "test_case_id": row.TestCaseFlakiness.test_case_id,
+                    "code": row.code,
+                    "title": row.title,
+                    **flakiness_item(row.TestCaseFlakiness),
+                }
+                for row in rows
+            ],
+            "total": total,
+        }
+
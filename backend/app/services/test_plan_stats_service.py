@@ -0,0 +1,301 @@
+"""
+测试计划执行统计服务
+TestPlan 的 total_cases 为计划内用例数，passed / failed / blocked / skipped_cases 为计划内每条用例“最近一次执行”的结果分布；
+最近一次执行按 (start_time, id) 取最大，已归档分区中的执行由 test_plan_archived_results 保留最近结果并参与计算：
+
+1. 增量维护：ORM 刷新（flush）后，在同一事务内按执行记录的变化计算各计划的增量，
+   用 UPDATE ... SET x = x + delta 原子地累加，不重新统计执行记录
+   - 新增执行：该用例在计划内的上一条最近执行的结果 -1，新结果 +1
+   - 修改最近一次执行的状态：旧状态 -1，新状态 +1（修改历史执行不影响统计）
+   - 删除最近一次执行：其结果 -1，前一条执行的结果 +1
+   - 计划增减用例：total_cases 相应增减
+   同一次刷新中同一（计划, 用例）的多条变化（如删除用例时级联删除多条执行）合并计算，只移动一次
+2. 对账：绕过 ORM 的批量写入（Core UPDATE、COPY 等）或无法确定旧状态时，由 reconcile 按执行记录整体重算，
+   只更新统计不一致的计划；定时运行 python maintenance.py plan-stats 修正漂移
+"""
+import logging
+from datetime import datetime
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, inspect, or_, select, union_all, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app.core.metrics import TEST_PLAN_STATS_DRIFT
+from app.models.test_case import TestExecution, TestExecutionStatus, test_plan_archived_results
+from app.models.test_plan import TestPlan, test_plan_cases
+
+logger = logging.getLogger(__name__)
+
+# 执行状态 -> 计数字段；待执行 / 执行中不计入
+STATUS_COLUMNS = {
+    TestExecutionStatus.PASSED: "passed_cases",
+    TestExecutionStatus.FAILED: "failed_cases",
+    TestExecutionStatus.BLOCKED: "blocked_cases",
+    TestExecutionStatus.SKIPPED: "skipped_cases",
+}
+STAT_COLUMNS = ("total_cases",) + tuple(STATUS_COLUMNS.values())
+
+_RECONCILE_BATCH = 500
+_PENDING_KEY = "test_plan_stats_updated"
+
+# (start_time, 执行ID, 状态)，前两项为排序键
+_Result = Tuple[datetime, int, Optional[TestExecutionStatus]]
+
+
+@dataclass
+class _CaseChanges:
+    """一次刷新中同一（计划, 用例）的执行记录变化"""
+    new_ids: Set[int] = field(default_factory=set)
+    removed: List[_Result] = field(default_factory=list)  # 被删除的执行
+    old_statuses: Dict[int, TestExecutionStatus] = field(default_factory=dict)  # 修改了状态的执行：id -> 修改前状态
+
+
+def _latest(connection: Connection, plan_id: int, test_case_id: int,
+            exclude_ids: Iterable[int] = ()) -> Optional[_Result]:
+    """用例在计划内（可排除指定执行）按 (start_time, id) 最近的执行，包括已归档的执行"""
+    statement = (
+        select(TestExecution.start_time, TestExecution.id, TestExecution.status)
+        .where(TestExecution.test_plan_id == plan_id, TestExecution.test_case_id == test_case_id)
+        .order_by(TestExecution.start_time.desc(), TestExecution.id.desc())
+        .limit(1)
+    )
+    exclude_ids = list(exclude_ids)
+    if exclude_ids:
+        statement = statement.where(TestExecution.id.notin_(exclude_ids))
+    archived = test_plan_archived_results.c
+    rows = [
+        connection.execute(statement).first(),
+        connection.execute(
+            select(archived.start_time, archived.execution_id, archived.status)
+            .where(archived.test_plan_id == plan_id, archived.test_case_id == test_case_id)
+        ).first(),
+    ]
+    results = [tuple(row) for row in rows if row is not None]
+    return max(results, key=lambda result: result[:2]) if results else None
+
+
+def _latest_change(connection: Connection, plan_id: int, test_case_id: int,
+                   changes: _CaseChanges) -> Tuple[Optional[TestExecutionStatus], Optional[TestExecutionStatus]]:
+    """
+    （计划, 用例）在本次刷新前后的最近执行状态
+
+    刷新后的状态直接查询；刷新前的状态为排除本次新增执行后的最近执行与本次删除的执行中 (start_time, id) 最大者，
+    本次修改过状态的取修改前状态
+    """
+    after = _latest(connection, plan_id, test_case_id)
+    candidates = list(changes.removed)
+    remaining = _latest(connection, plan_id, test_case_id, exclude_ids=changes.new_ids)
+    if remaining is not None:
+        candidates.append(remaining)
+    if not candidates:
+        return None, after[2] if after else None
+    _, before_id, before_status = max(candidates, key=lambda candidate: candidate[:2])
+    return changes.old_statuses.get(before_id, before_status), after[2] if after else None
+
+
+def _move(delta: Counter, old: Optional[TestExecutionStatus], new: Optional[TestExecutionStatus]) -> None:
+    if old in STATUS_COLUMNS:
+        delta[STATUS_COLUMNS[old]] -= 1
+    if new in STATUS_COLUMNS:
+        delta[STATUS_COLUMNS[new]] += 1
+
+
+def apply_deltas(connection: Connection, deltas: Dict[int, Counter]) -> List[int]:
+    """按计划累加增量，返回有变化的计划ID"""
+    changed = []
+    for plan_id, delta in deltas.items():
+        values = {
+            column: func.coalesce(getattr(TestPlan, column), 0) + amount
+            for column, amount in delta.items() if amount
+        }
+        if values:
+            connection.execute(update(TestPlan).where(TestPlan.id == plan_id).values(**values))
+            changed.append(plan_id)
+    return changed
+
+
+def reconcile_statement(plan_ids: List[int]):
+    """
+    按执行记录重算指定计划的统计，只更新不一致的计划（RETURNING 修正的计划ID）
+
+    在线执行记录与已归档的最近结果合并后，每个（计划, 用例）按 (start_time, id) 取最近一条
+    """
+    archived = test_plan_archived_results.c
+    candidates = union_all(
+        select(
+            TestExecution.test_plan_id, TestExecution.test_case_id,
+            TestExecution.id.label("execution_id"), TestExecution.status, TestExecution.start_time,
+        ).where(TestExecution.test_plan_id.in_(plan_ids)),
+        select(
+            archived.test_plan_id, archived.test_case_id, archived.execution_id, archived.status, archived.start_time,
+        ).where(archived.test_plan_id.in_(plan_ids)),
+    ).subquery("candidates")
+    latest = (
+        select(candidates.c.test_plan_id, candidates.c.status)
+        .distinct(candidates.c.test_plan_id, candidates.c.test_case_id)
+        .order_by(
+            candidates.c.test_plan_id, candidates.c.test_case_id,
+            candidates.c.start_time.desc(), candidates.c.execution_id.desc(),
+        )
+        .subquery("latest")
+    )
+    results = (
+        select(
+            latest.c.test_plan_id,
+            *(func.count().filter(latest.c.status == status).label(column) for status, column in STATUS_COLUMNS.items()),
+        )
+        .group_by(latest.c.test_plan_id)
+        .subquery("results")
+    )
+    totals = (
+        select(test_plan_cases.c.test_plan_id, func.count().label("total_cases"))
+        .where(test_plan_cases.c.test_plan_id.in_(plan_ids))
+        .group_by(test_plan_cases.c.test_plan_id)
+        .subquery("totals")
+    )
+    expected = (
+        select(
+            TestPlan.id,
+            func.coalesce(totals.c.total_cases, 0).label("total_cases"),
+            *(func.coalesce(results.c[column], 0).label(column) for column in STATUS_COLUMNS.values()),
+        )
+        .outerjoin(totals, totals.c.test_plan_id == TestPlan.id)
+        .outerjoin(results, results.c.test_plan_id == TestPlan.id)
+        .where(TestPlan.id.in_(plan_ids))
+        .subquery("expected")
+    )
+    return (
+        update(TestPlan)
+        .where(TestPlan.id == expected.c.id)
+        .where(or_(*(getattr(TestPlan, column).is_distinct_from(expected.c[column]) for column in STAT_COLUMNS)))
+        .values({column: expected.c[column] for column in STAT_COLUMNS})
+        .returning(TestPlan.id)
+    )
+
+
+def reconcile_plans(connection: Connection, plan_ids: Iterable[int]) -> List[int]:
+    """分批对账，返回修正的计划ID（调用方负责提交）"""
+    ids = sorted(set(plan_ids))
+    corrected: List[int] = []
+    for offset in range(0, len(ids), _RECONCILE_BATCH):
+        corrected.extend(connection.execute(reconcile_statement(ids[offset:offset + _RECONCILE_BATCH])).scalars())
+    return corrected
+
+
+# ---------- 会话刷新时增量维护 ----------
+
+def _update_stats(session: Session, flush_context) -> None:
+    connection = session.connection()
+    deltas: Dict[int, Counter] = defaultdict(Counter)
+    # 无法确定旧状态的计划在同一事务内整体重算
+    stale: Set[int] = set()
+    # 同一（计划, 用例）的全部变化合并后只计算一次：从刷新前的最近状态移到刷新后的最近状态
+    changes: Dict[Tuple[int, int], _CaseChanges] = defaultdict(_CaseChanges)
+
+    for record in session.new:
+        if isinstance(record, TestExecution) and record.test_plan_id:
+            changes[(record.test_plan_id, record.test_case_id)].new_ids.add(record.id)
+
+    for record in session.dirty:
+        if isinstance(record, TestExecution):
+            state = inspect(record)
+            plan_history = state.attrs.test_plan_id.history
+            status_history = state.attrs.status.history
+            if any(state.attrs[key].history.has_changes() for key in ("test_plan_id", "test_case_id", "start_time")):
+                # 执行记录换了计划 / 用例或调整了开始时间（影响最近执行的排序）：新旧计划都整体重算
+                stale.update(plan_id for plan_id in (record.test_plan_id, *plan_history.deleted) if plan_id)
+            elif record.test_plan_id and status_history.has_changes():
+                if not status_history.deleted:
+                    # 修改前状态未加载，无法确定旧状态
+                    stale.add(record.test_plan_id)
+                else:
+                    changes[(record.test_plan_id, record.test_case_id)].old_statuses[record.id] = status_history.deleted[0]
+
+    for record in session.deleted:
+        if isinstance(record, TestExecution) and record.test_plan_id:
+            changes[(record.test_plan_id, record.test_case_id)].removed.append(
+                (record.start_time, record.id, record.status)
+            )
+
+    for record in list(session.new) + list(session.dirty):
+        if isinstance(record, TestPlan):
+            history = inspect(record).attrs.test_cases.history
+            change = len(history.added or ()) - len(history.deleted or ())
+            if change:
+                deltas[record.id]["total_cases"] += change
+
+    deleted_plans = {record.id for record in session.deleted if isinstance(record, TestPlan)}
+    for (plan_id, test_case_id), case_changes in sorted(changes.items()):
+        if plan_id in stale or plan_id in deleted_plans:
+            continue
+        _move(deltas[plan_id], *_latest_change(connection, plan_id, test_case_id, case_changes))
+
+    for plan_id in deleted_plans:
+        deltas.pop(plan_id, None)
+    stale -= deleted_plans
+
+    changed = apply_deltas(connection, {plan_id: delta for plan_id, delta in deltas.items() if plan_id not in stale})
+    if stale:
+        reconcile_plans(connection, stale)
+    if changed or stale:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed, stale)
+
+
+def _expire_plans(session: Session, flush_context) -> None:
+    """已加载的 TestPlan 统计字段失效，下次访问时重新读取"""
+    for plan_id in session.info.pop(_PENDING_KEY, ()):
+        plan = session.identity_map.get(identity_key(TestPlan, plan_id))
+        if plan is not None:
+            session.expire(plan, list(STAT_COLUMNS))
+
+
+def _load_previous_status(target, value, oldvalue, initiator) -> None:
+    """仅用于开启 active_history：修改已过期的执行记录状态时先加载旧值，保证能计算增量"""
+
+
+def register_listeners() -> None:
+    """注册 ORM 会话事件，重复调用无副作用"""
+    if event.contains(Session, "after_flush", _update_stats):
+        return
+    event.listen(TestExecution.status, "set", _load_previous_status, active_history=True)
+    event.listen(Session, "after_flush", _update_stats)
+    event.listen(Session, "after_flush_postexec", _expire_plans)
+
+
+class TestPlanStatsService:
+    """测试计划统计对账服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def reconcile(self, project_id: Optional[int] = None, plan_ids: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        按执行记录（含已归档分区保留的最近结果）重算计划统计并修正不一致的计划
+
+        参数:
+            project_id: 只处理指定项目的计划
+            plan_ids: 只处理指定计划，与 project_id 都不指定时处理全部计划
+
+        返回:
+            被修正的计划ID
+        """
+        statement = select(TestPlan.id).where(TestPlan.is_deleted == False)
+        if project_id is not None:
+            statement = statement.where(TestPlan.project_id == project_id)
+        if plan_ids is not None:
+            statement = statement.where(TestPlan.id.in_(list(plan_ids)))
+        ids = self.db.execute(statement).scalars().all()
+
+        corrected = reconcile_plans(self.db.connection(), ids)
+        self.db.commit()
+        if corrected:
+            TEST_PLAN_STATS_DRIFT.inc(len(corrected))
+            logger.warning(
+                "测试计划统计存在漂移，已按执行记录修正",
+                extra={"plans": len(ids), "corrected": len(corrected), "plan_ids": corrected[:20]},
+            )
+        return corrected
@@ -0,0 +1,282 @@
+"""
+测试报告导入服务
+把 CI 产出的 JUnit XML / JSON 报告批量写入执行记录：
+
+1. 报告在线程中流式解析（app.utils.test_report），每 TEST_RESULT_IMPORT_BATCH_SIZE 条结果一批，内存占用与报告大小无关
+2. 用例按编号匹配：导入前一次查询项目全部用例编号建立 编号 -> ID 索引，
+   依次尝试 property 中的编号、用例名 / 类名整体、名称中符合 TEST_CASE_CODE_FORMAT 的片段
+3. 每批通过 PostgreSQL COPY 写入 test_executions，整个报告在一个事务内完成；
+   指定测试计划时匹配到的用例同时加入计划，全部写入后对计划统计整体对账一次，不逐条累加
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from json import JSONDecodeError
+from typing import IO, Any, Dict, Iterator, List, Optional, Pattern, Set, Tuple
+from xml.etree.ElementTree import ParseError
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import TEST_RESULT_IMPORT_CASES, TEST_RESULT_IMPORT_DURATION
+from app.models.project import Project
+from app.models.test_case import TestCase, TestExecution
+from app.models.test_plan import TestPlan, test_plan_cases
+from app.services.coverage_service import coverage_refresher
+from app.services.test_plan_stats_service import reconcile_plans
+from app.utils.test_report import CODE_PROPERTIES, REPORT_FORMATS, ReportCase, iter_report
+
+logger = logging.getLogger(__name__)
+
+# COPY 写入的列；id 使用序列默认值，created_at / updated_at 使用数据库默认值
+_COPY_COLUMNS = (
+    "test_case_id", "test_plan_id", "executor_id", "status", "actual_result", "comments",
+    "start_time", "execution_time", "environment", "version", "is_deleted",
+)
+_UNMATCHED_SAMPLES = 20
+
+
+def code_pattern() -> Pattern:
+    """由 TEST_CASE_CODE_FORMAT 推导的编号正则，如 TC-{number:05d} -> TC-\\d+"""
+    prefix, _, rest = settings.TEST_CASE_CODE_FORMAT.partition("{number")
+    suffix = rest.partition("}")[2]
+    return re.compile(re.escape(prefix) + r"\d+" + re.escape(suffix))
+
+
+def match_case(case: ReportCase, codes: Dict[str, int], pattern: Pattern) -> Optional[int]:
+    """按编号把报告中的用例匹配到测试用例ID，匹配不到返回 None"""
+    for key in CODE_PROPERTIES:
+        value = case.properties.get(key)
+        if value and value.strip() in codes:
+            return codes[value.strip()]
+    for text in (case.name, case.classname):
+        if not text:
+            continue
+        if text in codes:
+            return codes[text]
+        for found in pattern.finditer(text):
+            if found.group() in codes:
+                return codes[found.group()]
+    return None
+
+
+def case_label(case: ReportCase) -> str:
+    return f"{case.classname}::{case.name}" if case.classname else case.name
+
+
+@dataclass
+class ResultImportResult:
+    """报告导入结果"""
+    format: str
+    test_plan_id: Optional[int] = None
+    total: int = 0
+    matched: int = 0
+    unmatched: int = 0
+    invalid: int = 0
+    statuses: Counter = field(default_factory=Counter)
+    unmatched_samples: List[str] = field(default_factory=list)
+    test_cases: int = 0
+    elapsed: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": self.format,
+            "test_plan_id": self.test_plan_id,
+            "total": self.total,
+            "imported": self.matched,
+            "unmatched": self.unmatched,
+            "invalid": self.invalid,
+            "test_cases": self.test_cases,
+            "statuses": {key.value: count for key, count in self.statuses.items()},
+            "unmatched_samples": self.unmatched_samples,
+            "elapsed": round(self.elapsed, 3),
+        }
+
+
+class TestResultImportService:
+    """测试报告导入服务"""
+
+    def __init__(self, session: AsyncSession, batch_size: Optional[int] = None):
+        self.session = session
+        self.batch_size = max(1, batch_size or settings.TEST_RESULT_IMPORT_BATCH_SIZE)
+
+    async def import_report(
+        self,
+        stream: IO[bytes],
+        report_format: str,
+        project_id: int,
+        executor_id: int,
+        test_plan_id: Optional[int] = None,
+        environment: Optional[str] = None,
+        version: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+    ) -> ResultImportResult:
+        """
+        解析报告并写入执行记录，提交事务
+
+        参数:
+            stream: 报告文件（二进制）
+            report_format: junit / json
+            project_id: 项目ID，只匹配该项目下的用例
+            executor_id: 执行者ID
+            test_plan_id: 测试计划ID，匹配到的用例加入计划并更新计划统计
+            environment: 测试环境
+            version: 测试版本
+            start_time: 执行时间，默认当前时间
+
+        返回:
+            ResultImportResult，包含各状态数量与未匹配用例示例
+        """
+        if report_format not in REPORT_FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的报告格式: {report_format}"
+            )
+        start = time.perf_counter()
+        result = ResultImportResult(format=report_format, test_plan_id=test_plan_id)
+        await self._ensure_target(project_id, test_plan_id)
+        codes = await self._code_index(project_id)
+        pattern = code_pattern()
+        defaults = {
+            "test_plan_id": test_plan_id,
+            "executor_id": executor_id,
+            "start_time": start_time or datetime.now(),
+            "environment": environment[:100] if environment else None,
+            "version": version[:50] if version else None,
+        }
+
+        cases = iter_report(stream, report_format)
+        test_case_ids: Set[int] = set()
+        try:
+            while True:
+                # 解析与匹配在线程中进行，不阻塞事件循环
+                rows, batch_ids = await asyncio.to_thread(self._next_batch, cases, codes, pattern, defaults, result)
+                if not rows:
+                    break
+                await self._copy(rows)
+                if test_plan_id is not None:
+                    await self.session.execute(
+                        insert(test_plan_cases)
+                        .values([{"test_plan_id": test_plan_id, "test_case_id": case_id} for case_id in sorted(batch_ids)])
+                        .on_conflict_do_nothing()
+                    )
+                test_case_ids.update(batch_ids)
+
+            if test_plan_id is not None and test_case_ids:
+                await self.session.run_sync(lambda session: reconcile_plans(session.connection(), [test_plan_id]))
+            await self.session.commit()
+        except (ParseError, JSONDecodeError, UnicodeDecodeError) as e:
+            await self.session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"测试报告解析失败: {e}"
+            )
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        coverage_refresher.mark(test_case_ids=test_case_ids)
+        result.test_cases = len(test_case_ids)
+        result.elapsed = time.perf_counter() - start
+        TEST_RESULT_IMPORT_CASES.labels("matched").inc(result.matched)
+        TEST_RESULT_IMPORT_CASES.labels("unmatched").inc(result.unmatched)
+        TEST_RESULT_IMPORT_CASES.labels("invalid").inc(result.invalid)
+        TEST_RESULT_IMPORT_DURATION.labels(report_format).observe(result.elapsed)
+        logger.info(
+            "测试报告导入完成",
+            extra={
+                "project_id": project_id,
+                "test_plan_id": test_plan_id,
+                "total": result.total,
+                "matched": result.matched,
+                "unmatched": result.unmatched,
+                "elapsed": round(result.elapsed, 3),
+            },
+        )
+        return result
+
+    def _next_batch(
+        self,
+        cases: Iterator[ReportCase],
+        codes: Dict[str, int],
+        pattern: Pattern,
+        defaults: Dict[str, Any],
+        result: ResultImportResult,
+    ) -> Tuple[List[tuple], Set[int]]:
+        """解析下一批结果并转换为 COPY 行，报告读完时返回空列表"""
+        rows: List[tuple] = []
+        batch_ids: Set[int] = set()
+        for case in islice(cases, self.batch_size):
+            result.total += 1
+            if case.status is None:
+                result.invalid += 1
+                continue
+            case_id = match_case(case, codes, pattern)
+            if case_id is None:
+                result.unmatched += 1
+                if len(result.unmatched_samples) < _UNMATCHED_SAMPLES:
+                    result.unmatched_samples.append(case_label(case))
+                continue
+            result.matched += 1
+            result.statuses[case.status] += 1
+            batch_ids.add(case_id)
+            values = {
+                **defaults,
+                "test_case_id": case_id,
+                # 与 ORM 一致，枚举列存储枚举名称
+                "status": case.status.name,
+                "actual_result": case.message,
+                "comments": case_label(case)[:1000],
+                "execution_time": round(case.duration) if case.duration is not None else None,
+                "is_deleted": False,
+            }
+            rows.append(tuple(values[column] for column in _COPY_COLUMNS))
+        return rows, batch_ids
+
+    async def _copy(self, rows: List[tuple]) -> None:
+        """与会话共用同一连接 COPY 写入，处于同一事务中"""
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            TestExecution.__tablename__, records=rows, columns=list(_COPY_COLUMNS)
+        )
+
+    async def _code_index(self, project_id: int) -> Dict[str, int]:
+        """项目用例 编号 -> ID 索引（不含已删除用例）"""
+        rows = await self.session.execute(
+            select(TestCase.code, TestCase.id).where(TestCase.project_id == project_id, TestCase.is_deleted == False)
+        )
+        return {code: case_id for code, case_id in rows if code}
+
+    async def _ensure_target(self, project_id: int, test_plan_id: Optional[int]) -> None:
+        exists = await self.session.scalar(
+            select(Project.id).where(Project.id == project_id, Project.is_deleted == False)
+        )
+        if exists is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="项目不存在"
+            )
+        if test_plan_id is None:
+            return
+        plan_project_id = await self.session.scalar(
+            select(TestPlan.project_id).where(TestPlan.id == test_plan_id, TestPlan.is_deleted == False)
+        )
+        if plan_project_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="测试计划不存在"
+            )
+        if plan_project_id != project_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="测试计划不属于该项目"
+            )
@@ -1,3 +1,4 @@
+import logging
 from typing import Optional, List
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
@@ -12,6 +13,8 @@ from app.core.encryption import (
     encrypt_email, decrypt_email, encryption_manager
 )
 
+logger = logging.getLogger(__name__)
+
 
 class UserService:
     """用户服务类"""
@@ -33,15 +36,13 @@ class UserService:
                     user.email = decrypt_email(user.email)
                 except Exception as e:
                     # 如果解密失败，说明数据可能未加密，保持原值
-                    print(f"邮箱解密失败，保持原值: {e}")
-                    pass
+                    logger.debug("邮箱解密失败，保持原值: %s", type(e).__name__)
             if user.phone:
                 try:
                     user.phone = decrypt_phone(user.phone)
                 except Exception as e:
                     # 如果解密失败，说明数据可能未加密，保持原值
-                    print(f"电话解密失败，保持原值: {e}")
-                    pass
+                    logger.debug("电话解密失败，保持原值: %s", type(e).__name__)
 
         return user
     
@@ -98,18 +99,11 @@ class UserService:
     
     def create_user(self, user_data: UserCreate) -> User:
         """创建用户"""
-        print(f"🔍 创建用户 - 接收到的数据: {user_data.dict()}")
-
         # 解密传输过来的敏感数据
         decrypted_password = decrypt_password(user_data.password)
         decrypted_email = decrypt_email(user_data.email)
         decrypted_phone = decrypt_phone(user_data.phone) if user_data.phone else None
 
-        print(f"🔍 解密后的数据:")
-        print(f"- 密码长度: {len(decrypted_password)}")
-        print(f"- 邮箱: {decrypted_email}")
-        print(f"- 电话: {decrypted_phone}")
-
         # 验证解密后的数据
         if len(decrypted_password) < 6:
             raise HTTPException(
@@ -158,7 +152,7 @@ class UserService:
         self.db.commit()
         self.db.refresh(db_user)
 
-        print(f"✅ 用户创建成功: {db_user.username}")
+        logger.info("用户创建成功", extra={"user_id": db_user.id})
 
         # 返回时解密敏感数据用于响应
         db_user.email = decrypt_email(db_user.email)
@@ -169,8 +163,6 @@ class UserService:
     
     def update_user(self, user_id: int, user_data: UserUpdate) -> User:
         """更新用户"""
-        print(f"🔍 更新用户 - 用户ID: {user_id}, 数据: {user_data.dict()}")
-
         db_user = self.get_user_by_id(user_id)
         if not db_user:
             raise HTTPException(
@@ -184,7 +176,6 @@ class UserService:
             if field == 'phone' and value:
                 # 解密传输过来的电话号码，然后加密存储
                 decrypted_phone = decrypt_phone(value)
-                print(f"🔍 更新电话: {decrypted_phone}")
                 setattr(db_user, field, encrypt_phone(decrypted_phone))
             else:
                 setattr(db_user, field, value)
@@ -192,7 +183,7 @@ class UserService:
         self.db.commit()
         self.db.refresh(db_user)
 
-        print(f"✅ 用户更新成功: {db_user.username}")
+        logger.info("用户更新成功", extra={"user_id": db_user.id})
 
         # 返回时解密敏感数据用于响应
         if db_user.email:
@@ -249,23 +240,20 @@ class UserService:
     
     def authenticate_user(self, username: str, password: str) -> Optional[User]:
         """用户认证"""
-        print(f"🔍 用户认证 - 用户名: {username}")
-
         # 解密传输过来的密码
         decrypted_password = decrypt_password(password)
-        print(f"🔍 解密后密码长度: {len(decrypted_password)}")
 
         user = self.get_user_by_username(username)
         if not user:
-            print(f"❌ 用户不存在: {username}")
+            logger.info("用户认证失败: 用户不存在")
             return None
 
         if not verify_password(decrypted_password, user.hashed_password):
-            print(f"❌ 密码验证失败: {username}")
+            logger.info("用户认证失败: 密码错误", extra={"user_id": user.id})
             return None
 
         if user.status != UserStatus.ACTIVE:
-            print(f"❌ 用户状态不活跃: {username}, 状态: {user.status}")
+            logger.info("用户认证失败: 用户状态不活跃", extra={"user_id": user.id, "status": getattr(user.status, "value", user.status)})
             return None
 
         # 更新登录信息
@@ -273,7 +261,7 @@ class UserService:
         user.login_count = str(int(user.login_count) + 1)
         self.db.commit()
 
-        print(f"✅ 用户认证成功: {username}")
+        logger.info("用户认证成功", extra={"user_id": user.id})
 
         # 注意：登录认证时不解密敏感数据，因为登录响应不需要返回email和phone
         # 敏感数据的解密会在其他需要的地方进行（如用户管理页面）
@@ -282,19 +270,17 @@ class UserService:
 
     def authenticate_user_plain(self, username: str, password: str) -> Optional[User]:
         """用户认证（明文密码，用于测试）"""
-        print(f"🔍 用户认证（明文） - 用户名: {username}")
-
         user = self.get_user_by_username(username)
         if not user:
-            print(f"❌ 用户不存在: {username}")
+            logger.info("用户认证失败: 用户不存在")
             return None
 
         if not verify_password(password, user.hashed_password):
-            print(f"❌ 密码验证失败: {username}")
+            logger.info("用户认证失败: 密码错误", extra={"user_id": user.id})
             return None
 
         if user.status != UserStatus.ACTIVE:
-            print(f"❌ 用户状态不活跃: {username}, 状态: {user.status}")
+            logger.info("用户认证失败: 用户状态不活跃", extra={"user_id": user.id, "status": getattr(user.status, "value", user.status)})
             return None
 
         # 更新登录信息
@@ -302,5 +288,5 @@ class UserService:
         user.login_count = str(int(user.login_count) + 1)
         self.db.commit()
 
-        print(f"✅ 用户认证成功（明文）: {username}")
+        logger.info("用户认证成功（明文）", extra={"user_id": user.id})
         return user
@@ -0,0 +1,427 @@
+"""
+向量索引与检索增强服务
+为每个项目的测试用例与需求维护向量索引，生成测试用例时检索相似的已有用例 / 需求注入提示词，
+避免模型重复编写或与已有用例矛盾：
+
+1. 索引后端：local（app.utils.vector_index，每个项目一个内存映射文件，默认）或 pgvector（数据库 vector 扩展 + HNSW 索引）
+2. 增量更新：ORM 会话提交后，把本次新增 / 修改 / 删除的用例与需求交给后台线程重新向量化；
+   批量入库（Core INSERT / COPY）不经过 ORM，由入库服务在提交后显式调用 index_documents
+3. 已删除、已废弃的用例与已删除的需求从索引中移除；更换向量化方式或维度后运行 python maintenance.py vector-index 重建
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.requirement import Requirement
+from app.models.test_case import TestCase, TestCaseStatus
+from app.utils.document_parser import count_tokens
+from app.utils.embedding import get_embedder
+from app.utils.vector_index import LocalVectorIndex, make_key, split_key
+
+logger = logging.getLogger(__name__)
+
+# 实体类型 -> (模型, 参与向量化的字段)
+INDEXED_ENTITIES = {
+    "test_case": (TestCase, ("title", "description", "preconditions", "test_steps", "expected_result")),
+    "requirement": (Requirement, ("title", "description", "acceptance_criteria")),
+}
+_ENTITY_TYPES = {model: entity_type for entity_type, (model, _) in INDEXED_ENTITIES.items()}
+
+# 注入提示词时单条参考内容的字符上限
+_SNIPPET_CHARS = 300
+_REBUILD_BATCH = 1000
+
+
+@dataclass
+class IndexDocument:
+    """待索引的记录快照（脱离会话，可交给后台线程）"""
+    project_id: int
+    entity_type: str
+    entity_id: int
+    text: str
+    active: bool
+
+
+def document_text(entity_type: str, values: Dict[str, Any]) -> str:
+    """参与向量化的文本（字段按 INDEXED_ENTITIES 顺序拼接）"""
+    _, fields = INDEXED_ENTITIES[entity_type]
+    return "\n".join(str(values[field]) for field in fields if values.get(field))
+
+
+def document_of(record: Any) -> IndexDocument:
+    """由用例 / 需求记录生成索引快照"""
+    entity_type = _ENTITY_TYPES[type(record)]
+    _, fields = INDEXED_ENTITIES[entity_type]
+    active = not record.is_deleted
+    if entity_type == "test_case":
+        active = active and record.status != TestCaseStatus.DEPRECATED
+    return IndexDocument(
+        project_id=record.project_id,
+        entity_type=entity_type,
+        entity_id=record.id,
+        text=document_text(entity_type, {field: getattr(record, field) for field in fields}),
+        active=active,
+    )
+
+
+class LocalVectorStore:
+    """本地索引：按项目打开 LocalVectorIndex，最近使用的若干个常驻内存"""
+
+    def __init__(self, root: str, dim: int, cache_size: int):
+        self.root = root
+        self.dim = dim
+        self.cache_size = max(1, cache_size)
+        self._indexes: "OrderedDict[int, LocalVectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index(self, project_id: int) -> LocalVectorIndex:
+        with self._lock:
+            index = self._indexes.pop(project_id, None)
+            if index is None:
+                index = LocalVectorIndex(os.path.join(self.root, str(project_id)), self.dim)
+            self._indexes[project_id] = index
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+            return index
+
+    def upsert(self, project_id: int, keys: List[int], vectors: np.ndarray) -> None:
+        self._index(project_id).upsert(keys, vectors)
+
+    def delete(self, project_id: int, keys: List[int]) -> None:
+        self._index(project_id).delete(keys)
+
+    def clear(self, project_id: int) -> None:
+        self._index(project_id).clear()
+
+    def search(self, project_id: int, vector: np.ndarray, k: int, entity_type: Optional[str] = None,
+               exclude: Sequence[int] = ()) -> List[Tuple[int, float]]:
+        return self._index(project_id).search(vector, k, entity_type=entity_type, exclude=exclude)
+
+
+class PgVectorStore:
+    """
+    pgvector 索引：向量保存在 vector_embeddings 表，余弦距离 HNSW 索引
+
+    表结构依赖向量维度，首次使用时按当前维度创建（需要数据库已安装 vector 扩展）
+    """
+
+    def __init__(self, dim: int):
+        from app.core.database import engine
+
+        self.dim = dim
+        self.engine = engine
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _ensure_table(self) -> None:
+        if self._ready:
+            return
+        with self._lock, self.engine.begin() as connection:
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            connection.execute(text(
+                "CREATE TABLE IF NOT EXISTS vector_embeddings ("
+                " entity_type varchar(20) NOT NULL,"
+                " entity_id integer NOT NULL,"
+                " project_id integer NOT NULL,"
+                f" embedding vector({self.dim}) NOT NULL,"
+                " PRIMARY KEY (entity_type, entity_id))"
+            ))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_vector_embeddings_embedding"
+                " ON vector_embeddings USING hnsw (embedding vector_cosine_ops)"
+            ))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_vector_embeddings_project_id ON vector_embeddings (project_id)"
+            ))
+            self._ready = True
+
+    @staticmethod
+    def _literal(vector: np.ndarray) -> str:
+        return "[" + ",".join(f"{value:.6g}" for value in vector.tolist()) + "]"
+
+    def upsert(self, project_id: int, keys: List[int], vectors: np.ndarray) -> None:
+        self._ensure_table()
+        rows = []
+        for key, vector in zip(keys, vectors):
+            entity_type, entity_id = split_key(key)
+            rows.append({
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "project_id": project_id,
+                "embedding": self._literal(vector),
+            })
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO vector_embeddings (entity_type, entity_id, project_id, embedding)"
+                " VALUES (:entity_type, :entity_id, :project_id, CAST(:embedding AS vector))"
+                " ON CONFLICT (entity_type, entity_id)"
+                " DO UPDATE SET project_id = EXCLUDED.project_id, embedding = EXCLUDED.embedding"
+            ), rows)
+
+    def delete(self, project_id: int, keys: List[int]) -> None:
+        self._ensure_table()
+        rows = [dict(zip(("entity_type", "entity_id"), split_key(key))) for key in keys]
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                "DELETE FROM vector_embeddings WHERE entity_type = :entity_type AND entity_id = :entity_id"
+            ), rows)
+
+    def clear(self, project_id: int) -> None:
+        self._ensure_table()
+        with self.engine.begin() as connection:
+            connection.execute(text("DELETE FROM vector_embeddings WHERE project_id = :project_id"),
+                               {"project_id": project_id})
+
+    def search(self, project_id: int, vector: np.ndarray, k: int, entity_type: Optional[str] = None,
+               exclude: Sequence[int] = ()) -> List[Tuple[int, float]]:
+        self._ensure_table()
+        conditions = "project_id = :project_id"
+        params: Dict[str, Any] = {"project_id": project_id, "query": self._literal(vector), "limit": k + len(exclude)}
+        if entity_type is not None:
+            conditions += " AND entity_type = :entity_type"
+            params["entity_type"] = entity_type
+        with self.engine.connect() as connection:
+            rows = connection.execute(text(
+                "SELECT entity_type, entity_id, 1 - (embedding <=> CAST(:query AS vector)) AS score"
+                f" FROM vector_embeddings WHERE {conditions}"
+                " ORDER BY embedding <=> CAST(:query AS vector) LIMIT :limit"
+            ), params).all()
+        excluded = set(exclude)
+        results = [(make_key(row.entity_type, row.entity_id), float(row.score)) for row in rows]
+        return [item for item in results if item[0] not in excluded][:k]
+
+
+@lru_cache(maxsize=1)
+def get_vector_store():
+    """按 VECTOR_INDEX_BACKEND 返回全局索引后端"""
+    dim = get_embedder().dim
+    if settings.VECTOR_INDEX_BACKEND == "pgvector":
+        return PgVectorStore(dim)
+    if settings.VECTOR_INDEX_BACKEND != "local":
+        raise ValueError(f"不支持的向量索引后端: {settings.VECTOR_INDEX_BACKEND}")
+    return LocalVectorStore(settings.VECTOR_INDEX_DIR, dim, settings.VECTOR_INDEX_CACHE_PROJECTS)
+
+
+def index_documents(documents: Sequence[IndexDocument]) -> None:
+    """向量化并写入索引（同步执行，耗时与文档数成正比）"""
+    store = get_vector_store()
+    by_project: Dict[int, List[IndexDocument]] = {}
+    for document in documents:
+        by_project.setdefault(document.project_id, []).append(document)
+
+    for project_id, items in by_project.items():
+        active = [item for item in items if item.active and item.text]
+        removed = [make_key(item.entity_type, item.entity_id) for item in items if not (item.active and item.text)]
+        if active:
+            vectors = get_embedder().embed([item.text for item in active])
+            store.upsert(project_id, [make_key(item.entity_type, item.entity_id) for item in active], vectors)
+        if removed:
+            store.delete(project_id, removed)
+
+
+# ---------- 会话提交后的增量更新 ----------
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_PENDING_KEY = "vector_index_pending"
+
+
+def _submit(documents: List[IndexDocument]) -> None:
+    """交给单线程后台执行，写入按提交顺序进行"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-index")
+    future = _executor.submit(index_documents, documents)
+    future.add_done_callback(
+        lambda done: done.exception() and logger.error("向量索引更新失败", exc_info=done.exception())
+    )
+
+
+def _collect_changes(session: Session, flush_context) -> None:
+    pending: Dict[Tuple[str, int], IndexDocument] = session.info.setdefault(_PENDING_KEY, {})
+    for record in list(session.new) + list(session.dirty):
+        if type(record) in _ENTITY_TYPES and record.id is not None:
+            document = document_of(record)
+            pending[(document.entity_type, document.entity_id)] = document
+    for record in session.deleted:
+        if type(record) in _ENTITY_TYPES and record.id is not None:
+            entity_type = _ENTITY_TYPES[type(record)]
+            pending[(entity_type, record.id)] = IndexDocument(record.project_id, entity_type, record.id, "", False)
+
+
+def _apply_changes(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        _submit(list(pending.values()))
+
+
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners() -> None:
+    """注册 ORM 会话事件（同步与异步会话共用 Session 事件），重复调用无副作用"""
+    if not settings.RAG_ENABLED or event.contains(Session, "after_flush", _collect_changes):
+        return
+    event.listen(Session, "after_flush", _collect_changes)
+    event.listen(Session, "after_commit", _apply_changes)
+    event.listen(Session, "after_rollback", _discard_changes)
+
+
+def shutdown_executor() -> None:
+    """等待排队中的索引更新完成"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+class VectorIndexService:
+    """项目内相似用例 / 需求检索服务"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def retrieve(
+        self,
+        project_id: int,
+        query: str,
+        k: Optional[int] = None,
+        entity_type: Optional[str] = None,
+        exclude: Sequence[Tuple[str, int]] = (),
+        min_score: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        检索与查询文本最相似的用例 / 需求
+
+        参数:
+            project_id: 项目ID
+            query: 查询文本（超过 RAG_QUERY_MAX_CHARS 的部分不参与检索）
+            k: 返回条数，默认 RAG_TOP_K
+            entity_type: 只检索 test_case 或 requirement
+            exclude: 不返回的 (实体类型, ID)
+            min_score: 相似度下限，默认 RAG_MIN_SCORE
+
+        返回:
+            [{"type", "id", "code", "title", "score", "record"}]，按相似度降序
+        """
+        k = k or settings.RAG_TOP_K
+        min_score = settings.RAG_MIN_SCORE if min_score is None else min_score
+        query = (query or "")[:settings.RAG_QUERY_MAX_CHARS]
+        if not query.strip():
+            return []
+
+        def search() -> List[Tuple[int, float]]:
+            vector = get_embedder().embed([query])[0]
+            start = time.perf_counter()
+            hits = get_vector_store().search(
+                project_id, vector, k, entity_type=entity_type,
+                exclude=[make_key(*item) for item in exclude],
+            )
+            logger.debug("向量检索完成", extra={
+                "project_id": project_id, "hits": len(hits),
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+            })
+            return hits
+
+        hits = [(split_key(key), score) for key, score in await asyncio.to_thread(search) if score >= min_score]
+        if not hits:
+            return []
+
+        # 索引可能滞后于数据库：读取时再过滤已删除 / 已废弃的记录
+        records: Dict[Tuple[str, int], Any] = {}
+        for name in {entity for (entity, _), _ in hits}:
+            model, _ = INDEXED_ENTITIES[name]
+            ids = [entity_id for (entity, entity_id), _ in hits if entity == name]
+            result = await self.session.execute(select(model).where(model.id.in_(ids), model.is_deleted == False))
+            for record in result.scalars():
+                if document_of(record).active:
+                    records[(name, record.id)] = record
+
+        return [
+            {
+                "type": key[0],
+                "id": key[1],
+                "code": records[key].code,
+                "title": records[key].title,
+                "score": round(score, 4),
+                "record": records[key],
+            }
+            for key, score in hits
+            if key in records
+        ]
+
+    async def build_context(self, project_id: int, query: str, token_budget: Optional[int] = None) -> str:
+        """
+        生成注入提示词的参考内容：按相似度依次加入，累计 token 数不超过预算
+
+        返回:
+            参考内容文本，没有相似记录时返回空字符串
+        """
+        token_budget = token_budget or settings.RAG_CONTEXT_TOKEN_BUDGET
+        hits = await self.retrieve(project_id, query)
+        if not hits:
+            return ""
+
+        sections = {"requirement": "相关需求", "test_case": "已有测试用例"}
+        lines: Dict[str, List[str]] = {name: [] for name in sections}
+        used = 0
+        for hit in hits:
+            document = document_of(hit["record"])
+            body = document.text[len(hit["title"]):].strip().replace("\n", " ")
+            if len(body) > _SNIPPET_CHARS:
+                body = body[:_SNIPPET_CHARS] + "…"
+            line = f"- [{hit['code']}] {hit['title']}" + (f": {body}" if body else "")
+            tokens = count_tokens(line)
+            if used + tokens > token_budget:
+                break
+            lines[hit["type"]].append(line)
+            used += tokens
+
+        parts = [f"{title}：\n" + "\n".join(lines[name]) for name, title in sections.items() if lines[name]]
+        return "\n\n".join(parts)
+
+    async def rebuild(self, project_id: int) -> int:
+        """
+        按数据库重建项目索引
+
+        返回:
+            写入索引的记录数
+        """
+        store = get_vector_store()
+        await asyncio.to_thread(store.clear, project_id)
+        total = 0
+        for entity_type, (model, _) in INDEXED_ENTITIES.items():
+            last_id = 0
+            while True:
+                result = await self.session.execute(
+                    select(model)
+                    .where(model.project_id == project_id, model.id > last_id, model.is_deleted == False)
+                    .order_by(model.id)
+                    .limit(_REBUILD_BATCH)
+                )
+                records = result.scalars().all()
+                if not records:
+                    break
+                documents = [document_of(record) for record in records]
+                await asyncio.to_thread(index_documents, documents)
+                total += sum(1 for document in documents if document.active and document.text)
+                last_id = records[-1].id
+                self.session.expunge_all()
+            logger.info("向量索引重建进度", extra={"project_id": project_id, "entity_type": entity_type, "count": total})
+        return total
@@ -1,3 +1,4 @@
+import logging
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -8,6 +9,8 @@ from app.core.security import verify_token
 from app.models.user import User, UserRole
 from app.services.user_service import UserService
 
+logger = logging.getLogger(__name__)
+
 # HTTP Bearer认证
 security = HTTPBearer()
 
@@ -18,20 +21,12 @@ def get_current_user(
 ) -> User:
     """获取当前用户"""
     try:
-        print(f"🔍 get_current_user Debug:")
-        print(f"- Credentials received: {credentials is not None}")
-        if credentials:
-            print(f"- Scheme: {credentials.scheme}")
-            print(f"- Token preview: {credentials.credentials[:20]}...")
-
         # 验证令牌
         payload = verify_token(credentials.credentials)
         user_id = payload.get("sub")
-        print(f"- Token payload: {payload}")
-        print(f"- User ID: {user_id}")
 
         if user_id is None:
-            print("❌ No user ID in token payload")
+            logger.warning("令牌中缺少用户ID")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="无效的认证凭据",
@@ -41,8 +36,7 @@ def get_current_user(
         # 重新抛出HTTP异常
         raise
     except Exception as e:
-        print(f"❌ Exception in get_current_user: {e}")
-        print(f"❌ Exception type: {type(e)}")
+        logger.warning("令牌校验异常: %s", type(e).__name__)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的认证凭据",
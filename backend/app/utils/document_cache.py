@@ -0,0 +1,94 @@
+"""
+文档分块分析结果缓存模块
+以“分析上下文 + 分块内容哈希”为键缓存单个分块的分析结果：
+修改后的需求文档重新上传时，只有内容发生变化的分块需要重新调用模型
+
+条目按最近使用淘汰并带过期时间。缓存保存在当前进程内存中，分布式部署时每个 worker 各自维护
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import DOCUMENT_CHUNK_CACHE_LOOKUPS, DOCUMENT_CHUNK_CACHE_SIZE
+
+
+class ChunkAnalysisCache:
+    """
+    文档分块分析结果缓存
+
+    Args:
+        max_entries: 最大条目数，超出后淘汰最久未使用的条目
+        ttl: 条目有效期（秒），0 表示不过期
+    """
+
+    def __init__(self, max_entries: int = 20000, ttl: float = 30 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(context_key: str, content_hash: str) -> str:
+        return hashlib.sha1(f"{context_key}:{content_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, context_key: str, content_hash: str) -> Optional[str]:
+        key = self._key(context_key, content_hash)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        result, created_at = entry
+        if self.ttl > 0 and time.time() - created_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def store(self, context_key: str, content_hash: str, result: str) -> None:
+        key = self._key(context_key, content_hash)
+        self._entries[key] = (result, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# 全局文档分块分析缓存
+chunk_analysis_cache = ChunkAnalysisCache(
+    max_entries=settings.DOCUMENT_CHUNK_CACHE_MAX_ENTRIES,
+    ttl=settings.DOCUMENT_CHUNK_CACHE_TTL,
+)
+DOCUMENT_CHUNK_CACHE_SIZE.set_function(lambda: len(chunk_analysis_cache))
+
+
+def lookup_chunk(context_key: str, content_hash: str, bypass: bool = False) -> Optional[str]:
+    """
+    查询分块分析缓存
+
+    参数:
+        context_key: 分析上下文索引键
+        content_hash: 分块内容哈希
+        bypass: 跳过读取缓存（分析完成后仍会刷新缓存）
+
+    返回:
+        缓存的分析结果，未命中时为 None
+    """
+    if not settings.DOCUMENT_CHUNK_CACHE_ENABLED:
+        return None
+    if bypass:
+        DOCUMENT_CHUNK_CACHE_LOOKUPS.labels(result="bypass").inc()
+        return None
+    result = chunk_analysis_cache.get(context_key, content_hash)
+    DOCUMENT_CHUNK_CACHE_LOOKUPS.labels(result="hit" if result is not None else "miss").inc()
+    return result
+
+
+def store_chunk(context_key: str, content_hash: str, result: str) -> None:
+    """写入分块分析结果（未启用缓存时忽略）"""
+    if settings.DOCUMENT_CHUNK_CACHE_ENABLED and result:
+        chunk_analysis_cache.store(context_key, content_hash, result)
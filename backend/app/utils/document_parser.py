@@ -0,0 +1,477 @@
+"""
+需求文档解析模块
+逐页 / 逐段流式提取 PDF、DOCX、Markdown 文本，按标题层级切分为不超过 token 上限的分块
+
+整个流程是生成器链：iter_blocks -> chunk_blocks，文档不会整体读入内存，
+aiter_chunks 在后台线程中运行解析，分析方可以边解析边处理已产出的分块
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import re
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from app.core.config import settings
+from app.core.metrics import DOCUMENT_CHUNKS
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DOCUMENT_EXTENSIONS = {"pdf", "docx", "md", "markdown", "txt"}
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# PDF / 纯文本的标题识别：“第X章”“1.2 标题”“一、标题”
+_CHAPTER_RE = re.compile(r"^第[一二三四五六七八九十百零\d]+[章篇部分]\s*\S")
+_SECTION_RE = re.compile(r"^第[一二三四五六七八九十百零\d]+节\s*\S")
+_NUMBERED_RE = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,4})[\s、.．]\s*\S")
+_CN_NUMBERED_RE = re.compile(r"^[一二三四五六七八九十]+[、.．]\s*\S")
+_MD_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_SENTENCE_END_RE = re.compile(r"(?<=[。！？；.!?;])")
+_CJK_RE = re.compile(r"[　-〿一-鿿＀-￯]")
+
+# 标题行不会太长，也不以句末标点结尾
+_MAX_HEADING_CHARS = 40
+_HEADING_TAIL = tuple("。；;，,：:")
+
+
+@dataclass
+class TextBlock:
+    """文档中的一个段落或标题"""
+    text: str
+    page: Optional[int] = None  # 所在页码（从 1 开始），无分页信息时为 None
+    heading_level: int = 0  # 标题层级，0 表示正文
+
+
+@dataclass
+class DocumentChunk:
+    """按标题切分的文档分块"""
+    index: int
+    headings: List[str]  # 标题路径，从一级标题到当前小节
+    text: str  # 交给模型的完整文本（含标题路径）
+    tokens: int
+    pages: Optional[Tuple[int, int]] = None  # 起止页码
+    content_hash: str = field(init=False)
+
+    def __post_init__(self):
+        self.content_hash = hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+    @property
+    def label(self) -> str:
+        title = " > ".join(self.headings) if self.headings else "（无标题）"
+        if self.pages:
+            start, end = self.pages
+            return f"{title} [第 {start} 页]" if start == end else f"{title} [第 {start}-{end} 页]"
+        return title
+
+    def layout(self) -> Dict:
+        """分块信息（随分析结果返回，不含正文）"""
+        return {
+            "index": self.index,
+            "headings": self.headings,
+            "pages": list(self.pages) if self.pages else None,
+            "tokens": self.tokens,
+            "content_hash": self.content_hash,
+        }
+
+
+# ==========================================
+# token 计数
+# ==========================================
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(settings.DOCUMENT_TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning("tiktoken 编码 %s 加载失败，按字符数估算 token: %s", settings.DOCUMENT_TOKEN_ENCODING, e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """计算文本的 token 数；编码不可用时按中文 1 字 1 token、其他 4 字符 1 token 估算"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+# ==========================================
+# 逐页 / 逐段提取
+# ==========================================
+
+def _detect_heading_level(line: str) -> int:
+    """识别 PDF / 纯文本中的标题行，返回标题层级（0 表示正文）"""
+    if len(line) > _MAX_HEADING_CHARS or line.endswith(_HEADING_TAIL):
+        return 0
+    if _CHAPTER_RE.match(line):
+        return 1
+    if _SECTION_RE.match(line):
+        return 2
+    match = _NUMBERED_RE.match(line)
+    if match:
+        return match.group(1).count(".") + 1
+    if _CN_NUMBERED_RE.match(line):
+        return 1
+    return 0
+
+
+def iter_pdf_pages(path: str) -> Iterator[Tuple[int, str]]:
+    """逐页提取 PDF 文本，产出 (页码, 文本)"""
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise RuntimeError("解析 PDF 需要安装 pypdf") from e
+
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages, start=1):
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            logger.warning("PDF 第 %d 页文本提取失败，已跳过: %s", number, path, exc_info=True)
+            text = ""
+        yield number, text
+
+
+def _iter_pdf_blocks(path: str) -> Iterator[TextBlock]:
+    for number, text in iter_pdf_pages(path):
+        paragraph: List[str] = []
+        for raw_line in text.splitlines():
+            line = raw_line.strip()
+            level = _detect_heading_level(line) if line else 0
+            if not line or level:
+                if paragraph:
+                    yield TextBlock("\n".join(paragraph), page=number)
+                    paragraph = []
+                if level:
+                    yield TextBlock(line, page=number, heading_level=level)
+                continue
+            paragraph.append(line)
+        if paragraph:
+            yield TextBlock("\n".join(paragraph), page=number)
+
+
+def _docx_heading_styles(archive: zipfile.ZipFile) -> Dict[str, int]:
+    """从 styles.xml 读取标题样式 ID 到标题层级的映射"""
+    try:
+        root = ElementTree.fromstring(archive.read("word/styles.xml"))
+    except KeyError:
+        return {}
+
+    levels: Dict[str, int] = {}
+    for style in root.iter(f"{_W}style"):
+        style_id = style.get(f"{_W}styleId")
+        name = style.find(f"{_W}name")
+        outline = style.find(f"{_W}pPr/{_W}outlineLvl")
+        name_value = (name.get(f"{_W}val") if name is not None else "") or ""
+        match = re.match(r"(?i)^(?:heading|标题)\s*(\d)$", name_value.strip())
+        if match:
+            levels[style_id] = int(match.group(1))
+        elif name_value.strip().lower() == "title":
+            levels[style_id] = 1
+        elif outline is not None and outline.get(f"{_W}val", "").isdigit():
+            levels[style_id] = int(outline.get(f"{_W}val")) + 1
+    return levels
+
+
+def _paragraph_text(paragraph: ElementTree.Element) -> str:
+    parts: List[str] = []
+    for node in paragraph.iter():
+        if node.tag == f"{_W}t" and node.text:
+            parts.append(node.text)
+        elif node.tag == f"{_W}tab":
+            parts.append("\t")
+        elif node.tag in (f"{_W}br", f"{_W}cr") and node.get(f"{_W}type") != "page":
+            parts.append("\n")
+    return "".join(parts).strip()
+
+
+def _iter_docx_blocks(path: str) -> Iterator[TextBlock]:
+    """
+    用 iterparse 流式读取 document.xml
+
+    表格按行输出（单元格以 " | " 分隔）；页码依据 Word 保存时记录的分页标记，仅供参考
+    """
+    with zipfile.ZipFile(path) as archive:
+        heading_styles = _docx_heading_styles(archive)
+        page = 1
+        table_depth = 0
+        cell: List[str] = []
+        row: List[str] = []
+
+        with archive.open("word/document.xml") as stream:
+            for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+                tag = element.tag
+                if event == "start":
+                    if tag == f"{_W}tbl":
+                        table_depth += 1
+                    elif tag == f"{_W}lastRenderedPageBreak" or (tag == f"{_W}br" and element.get(f"{_W}type") == "page"):
+                        page += 1
+                    continue
+
+                if tag == f"{_W}p":
+                    text = _paragraph_text(element)
+                    if table_depth:
+                        if text:
+                            cell.append(text)
+                    elif text:
+                        style = element.find(f"{_W}pPr/{_W}pStyle")
+                        outline = element.find(f"{_W}pPr/{_W}outlineLvl")
+                        level = heading_styles.get(style.get(f"{_W}val"), 0) if style is not None else 0
+                        if not level and outline is not None and outline.get(f"{_W}val", "").isdigit():
+                            level = int(outline.get(f"{_W}val")) + 1
+                        yield TextBlock(text, page=page, heading_level=min(level, 6))
+                    element.clear()
+                elif tag == f"{_W}tc":
+                    row.append(" ".join(cell))
+                    cell = []
+                elif tag == f"{_W}tr":
+                    if any(row):
+                        yield TextBlock(" | ".join(row), page=page)
+                    row = []
+                    element.clear()
+                elif tag == f"{_W}tbl":
+                    table_depth -= 1
+                    element.clear()
+
+
+def iter_text_blocks(lines: Iterable[str]) -> Iterator[TextBlock]:
+    """逐行读取 Markdown / 纯文本，代码块内的 # 不视为标题"""
+    in_fence = False
+    paragraph: List[str] = []
+    for raw_line in lines:
+        line = raw_line.rstrip("\r\n")
+        stripped = line.strip()
+        if stripped.startswith(("```", "~~~")):
+            in_fence = not in_fence
+            paragraph.append(line)
+            continue
+        if in_fence:
+            paragraph.append(line)
+            continue
+
+        match = _MD_HEADING_RE.match(stripped)
+        if match or not stripped:
+            if paragraph:
+                yield TextBlock("\n".join(paragraph).strip("\n"))
+                paragraph = []
+            if match:
+                yield TextBlock(match.group(2), heading_level=len(match.group(1)))
+            continue
+        paragraph.append(line)
+    if paragraph:
+        yield TextBlock("\n".join(paragraph).strip("\n"))
+
+
+def _iter_markdown_blocks(path: str) -> Iterator[TextBlock]:
+    with open(path, "r", encoding="utf-8", errors="replace") as stream:
+        yield from iter_text_blocks(stream)
+
+
+def document_format(path: str) -> str:
+    """文档格式（扩展名小写），不支持的格式抛出 ValueError"""
+    extension = Path(path).suffix.lower().lstrip(".")
+    if extension not in SUPPORTED_DOCUMENT_EXTENSIONS:
+        raise ValueError(f"不支持的文档格式: {extension}")
+    return extension
+
+
+def iter_blocks(path: str) -> Iterator[TextBlock]:
+    """按文档格式流式产出段落与标题"""
+    extension = document_format(path)
+    if extension == "pdf":
+        return _iter_pdf_blocks(path)
+    if extension == "docx":
+        return _iter_docx_blocks(path)
+    return _iter_markdown_blocks(path)
+
+
+# ==========================================
+# 按标题分块
+# ==========================================
+
+def _split_oversized(text: str, max_tokens: int, counter: Callable[[str], int]) -> Iterator[str]:
+    """把超过上限的段落依次按行、按句、按字符切开"""
+    for separator, pieces in (("\n", text.split("\n")), ("", _SENTENCE_END_RE.split(text))):
+        if len(pieces) < 2:
+            continue
+        buffer: List[str] = []
+        buffer_tokens = 0
+        for piece in pieces:
+            tokens = counter(piece)
+            if tokens > max_tokens:
+                if buffer:
+                    yield separator.join(buffer)
+                    buffer, buffer_tokens = [], 0
+                yield from _split_oversized(piece, max_tokens, counter)
+                continue
+            if buffer and buffer_tokens + tokens > max_tokens:
+                yield separator.join(buffer)
+                buffer, buffer_tokens = [], 0
+            buffer.append(piece)
+            buffer_tokens += tokens
+        if buffer:
+            yield separator.join(buffer)
+        return
+
+    # 没有换行也没有句末标点，按字符数硬切
+    step = max(1, len(text) * max_tokens // max(1, counter(text)))
+    for start in range(0, len(text), step):
+        yield text[start:start + step]
+
+
+def chunk_blocks(blocks: Iterable[TextBlock],
+                 max_tokens: Optional[int] = None,
+                 counter: Callable[[str], int] = count_tokens) -> Iterator[DocumentChunk]:
+    """
+    按标题层级把段落合并为分块
+
+    参数:
+        blocks: iter_blocks 产出的段落与标题
+        max_tokens: 单个分块的 token 上限，默认取 DOCUMENT_MAX_CHUNK_TOKENS
+        counter: token 计数函数
+
+    分块总在标题处断开，只有当前分块还很小（不足上限的 1/4）且遇到的是其下级标题时才并入同一分块，
+    这样同一小节的内容稳定落在同一分块中，文档局部修改后其余分块的内容哈希保持不变
+    """
+    max_tokens = max_tokens or settings.DOCUMENT_MAX_CHUNK_TOKENS
+    min_tokens = max_tokens // 4
+
+    stack: List[Tuple[int, str]] = []  # (层级, 标题)
+    chunk_level = 0  # 当前分块起始小节的层级
+    chunk_headings: List[str] = []
+    body: List[str] = []
+    body_tokens = 0
+    pages: List[int] = []
+    index = 0
+
+    def header() -> str:
+        return " > ".join(chunk_headings)
+
+    def body_budget() -> int:
+        return max(max_tokens // 2, max_tokens - counter(header()) - 2)
+
+    def make_chunk(parts: List[str], tokens: int) -> DocumentChunk:
+        nonlocal index
+        text = "\n\n".join(([f"【{header()}】"] if chunk_headings else []) + parts)
+        chunk = DocumentChunk(
+            index=index,
+            headings=list(chunk_headings),
+            text=text,
+            tokens=tokens + (counter(header()) if chunk_headings else 0),
+            pages=(min(pages), max(pages)) if pages else None,
+        )
+        index += 1
+        return chunk
+
+    def flush() -> Iterator[DocumentChunk]:
+        nonlocal body, body_tokens, pages, chunk_level, chunk_headings
+        if body:
+            yield make_chunk(body, body_tokens)
+        body, body_tokens, pages = [], 0, []
+        # 下一个分块从当前所在小节开始（之前并入正文的下级标题此时成为标题路径）
+        chunk_level = stack[-1][0] if stack else 0
+        chunk_headings = [title for _, title in stack]
+
+    for block in blocks:
+        text = block.text.strip()
+        if not text:
+            continue
+
+        if block.heading_level:
+            level = block.heading_level
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, text))
+            if body and body_tokens < min_tokens and level > chunk_level:
+                # 小分块遇到下级标题：标题并入正文，分块继续
+                body.append(f"{'#' * level} {text}")
+                body_tokens += counter(text) + 1
+                continue
+            yield from flush()
+            continue
+
+        tokens = counter(text)
+        budget = body_budget()
+        if tokens > budget:
+            yield from flush()
+            for piece in _split_oversized(text, budget, counter):
+                if block.page is not None:
+                    pages = [block.page]
+                yield make_chunk([piece], counter(piece))
+            pages = []
+            continue
+
+        if body and body_tokens + tokens > budget:
+            yield from flush()
+        body.append(text)
+        body_tokens += tokens
+        if block.page is not None:
+            pages.append(block.page)
+
+    yield from flush()
+
+
+def iter_chunks(path: str, max_tokens: Optional[int] = None) -> Iterator[DocumentChunk]:
+    """流式解析文档并产出分块"""
+    extension = document_format(path)
+    for chunk in chunk_blocks(iter_blocks(path), max_tokens):
+        DOCUMENT_CHUNKS.labels(format=extension).inc()
+        yield chunk
+
+
+_DONE = object()
+
+
+async def aiter_chunks(path: str,
+                       max_tokens: Optional[int] = None,
+                       queue_size: Optional[int] = None) -> AsyncIterator[DocumentChunk]:
+    """
+    在后台线程中解析文档，以异步迭代器产出分块
+
+    队列有上限，分析跟不上时解析线程会等待；迭代提前结束时解析线程随之退出
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.DOCUMENT_CHUNK_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while not stop.is_set():
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                continue
+        future.cancel()
+        return False
+
+    def produce() -> None:
+        try:
+            for chunk in iter_chunks(path, max_tokens):
+                if not put(chunk):
+                    return
+        except Exception as e:
+            put(e)
+            return
+        put(_DONE)
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,92 @@
+"""
+文本向量化模块
+默认使用特征哈希向量（中文二元组 + 英文单词，带符号哈希到固定维度后 L2 归一化）：纯 CPU、无需下载模型、结果确定，
+适合用例 / 需求这类术语重合度高的短文本检索；配置 EMBEDDING_BACKEND=sentence_transformers 时改用本地句向量模型
+
+更换向量化方式或维度后需要重建向量索引（python maintenance.py vector-index）
+"""
+import hashlib
+import logging
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.search_text import CJK_RANGE, bigrams
+
+logger = logging.getLogger(__name__)
+
+_CJK_RUN_RE = re.compile(f"[{CJK_RANGE}]+")
+_WORD_RE = re.compile(r"[0-9a-z]{2,}")
+
+
+def _features(text: str) -> Counter:
+    lowered = (text or "").lower()
+    features: Counter = Counter()
+    for run in _CJK_RUN_RE.findall(lowered):
+        features.update(bigrams(run))
+    features.update(_WORD_RE.findall(_CJK_RUN_RE.sub(" ", lowered)))
+    return features
+
+
+class HashingEmbedder:
+    """特征哈希向量，词频取对数平滑"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in _features(text).items():
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dim] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """返回 (len(texts), dim) 的 float32 单位向量矩阵"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._vector(text) for text in texts])
+
+
+class SentenceTransformerEmbedder:
+    """本地句向量模型（需要安装 sentence-transformers，强制使用 CPU）"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = int(self._model.get_sentence_embedding_dimension())
+        self.name = model_name
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.asarray(
+            self._model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True),
+            dtype=np.float32,
+        )
+
+
+@lru_cache(maxsize=1)
+def get_embedder(backend: Optional[str] = None):
+    """按 EMBEDDING_BACKEND 返回全局向量化器"""
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "sentence_transformers":
+        if not settings.EMBEDDING_MODEL:
+            raise ValueError("EMBEDDING_BACKEND=sentence_transformers 时必须配置 EMBEDDING_MODEL")
+        return SentenceTransformerEmbedder(settings.EMBEDDING_MODEL)
+    if backend != "hashing":
+        raise ValueError(f"不支持的向量化方式: {backend}")
+    return HashingEmbedder(settings.EMBEDDING_DIM)
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    return get_embedder().embed(texts)
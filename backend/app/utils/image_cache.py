@@ -0,0 +1,168 @@
+"""
+图片分析结果缓存模块
+以感知哈希为键缓存 analysis_result：同一张或几乎相同的截图再次分析时直接返回已有结果，不再调用视觉模型
+
+分析上下文（模型、图片说明、分析目标）不同的请求分别建索引，互不命中；
+条目按最近使用淘汰并带过期时间。缓存保存在当前进程内存中，分布式部署时每个 worker 各自维护
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import IMAGE_CACHE_LOOKUPS, IMAGE_CACHE_SIZE
+from app.utils.image_hash import BKTree, compute_image_hashes, hamming_distance
+from app.utils.image_preprocess import run_in_pool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    context_key: str
+    phash: int
+    dhash: int
+    result: Dict[str, Any]
+    created_at: float
+
+
+@dataclass
+class CacheHit:
+    """缓存命中信息"""
+    result: Dict[str, Any]
+    phash_distance: int
+    dhash_distance: int
+    age_seconds: float
+
+    def report(self) -> Dict[str, Any]:
+        """命中信息（随分析结果返回给前端）"""
+        return {
+            "hit": True,
+            "phash_distance": self.phash_distance,
+            "dhash_distance": self.dhash_distance,
+            "age_seconds": round(self.age_seconds, 1),
+        }
+
+
+def build_context_key(**context: Any) -> str:
+    """根据影响分析结果的上下文生成索引键"""
+    payload = json.dumps(context, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ImageAnalysisCache:
+    """
+    基于感知哈希的图片分析结果缓存
+
+    Args:
+        max_entries: 最大条目数，超出后淘汰最久未使用的条目
+        max_distance: pHash 与 dHash 的汉明距离都不超过该值才视为命中
+        ttl: 条目有效期（秒），0 表示不过期
+    """
+
+    def __init__(self, max_entries: int = 5000, max_distance: int = 4, ttl: float = 7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self._trees: Dict[str, BKTree[CacheEntry]] = {}
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        return self.ttl > 0 and now - entry.created_at > self.ttl
+
+    def lookup(self, context_key: str, phash: int, dhash: int) -> Optional[CacheHit]:
+        """查找距离阈值内最接近的未过期条目"""
+        tree = self._trees.get(context_key)
+        if tree is None:
+            return None
+
+        now = time.time()
+        for phash_distance, entry in tree.search(phash, self.max_distance):
+            if self._expired(entry, now):
+                self._evict(entry)
+                continue
+            dhash_distance = hamming_distance(dhash, entry.dhash)
+            if dhash_distance > self.max_distance:
+                continue
+            self._entries.move_to_end(id(entry))
+            return CacheHit(entry.result, phash_distance, dhash_distance, now - entry.created_at)
+        return None
+
+    def store(self, context_key: str, phash: int, dhash: int, result: Dict[str, Any]) -> None:
+        """写入分析结果；已有完全相同哈希的条目时替换"""
+        tree = self._trees.setdefault(context_key, BKTree())
+        for distance, entry in tree.search(phash, 0):
+            if entry.dhash == dhash:
+                self._evict(entry)
+
+        entry = CacheEntry(context_key, phash, dhash, result, time.time())
+        tree.add(phash, entry)
+        self._entries[id(entry)] = entry
+
+        while len(self._entries) > self.max_entries:
+            _, oldest = self._entries.popitem(last=False)
+            self._evict(oldest)
+
+    def _evict(self, entry: CacheEntry) -> None:
+        self._entries.pop(id(entry), None)
+        tree = self._trees.get(entry.context_key)
+        if tree is not None:
+            tree.remove(entry.phash, entry)
+            if not len(tree):
+                del self._trees[entry.context_key]
+
+    def clear(self) -> None:
+        self._trees.clear()
+        self._entries.clear()
+
+
+# 全局图片分析缓存
+image_analysis_cache = ImageAnalysisCache(
+    max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+    max_distance=settings.IMAGE_CACHE_MAX_DISTANCE,
+    ttl=settings.IMAGE_CACHE_TTL,
+)
+IMAGE_CACHE_SIZE.set_function(lambda: len(image_analysis_cache))
+
+
+async def image_hashes(path: str) -> Tuple[int, int]:
+    """在预处理进程池中计算图片的 (pHash, dHash)"""
+    return await run_in_pool(compute_image_hashes, path)
+
+
+async def lookup_analysis(path: str, context_key: str, bypass: bool = False) -> Tuple[Optional[CacheHit], Optional[Tuple[int, int]]]:
+    """
+    查询图片分析缓存
+
+    参数:
+        path: 图片路径
+        context_key: 分析上下文索引键
+        bypass: 跳过读取缓存（仍会计算哈希，分析完成后刷新缓存）
+
+    返回:
+        (命中信息, 图片哈希)；未启用缓存或哈希计算失败时哈希为 None
+    """
+    if not settings.IMAGE_CACHE_ENABLED:
+        return None, None
+
+    try:
+        hashes = await image_hashes(path)
+    except Exception:
+        logger.warning("图片哈希计算失败，跳过缓存: %s", path, exc_info=True)
+        return None, None
+
+    if bypass:
+        IMAGE_CACHE_LOOKUPS.labels(result="bypass").inc()
+        return None, hashes
+
+    hit = image_analysis_cache.lookup(context_key, *hashes)
+    IMAGE_CACHE_LOOKUPS.labels(result="hit" if hit else "miss").inc()
+    return hit, hashes
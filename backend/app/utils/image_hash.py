@@ -0,0 +1,180 @@
+"""
+图片感知哈希模块
+提供 pHash（DCT 低频分量）与 dHash（相邻像素梯度）两种 64 位感知哈希，以及按汉明距离检索的 BK 树
+
+近乎相同的截图（压缩差异、轻微缩放、状态栏时间变化）哈希值只相差几位，
+BK 树利用三角不等式剪枝，只需比较少量节点即可找到距离阈值内的全部哈希
+"""
+from typing import Any, Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+_PHASH_SIZE = 32
+_PHASH_LOW_FREQ = 8
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """DCT-II 变换矩阵"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / size)
+
+
+_DCT = _dct_matrix(_PHASH_SIZE)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def phash(pixels: np.ndarray) -> int:
+    """
+    计算 pHash
+
+    参数:
+        pixels: 32x32 灰度像素矩阵
+
+    返回:
+        64 位哈希
+    """
+    coefficients = _DCT @ pixels.astype(np.float64) @ _DCT.T
+    low = coefficients[:_PHASH_LOW_FREQ, :_PHASH_LOW_FREQ].ravel()
+    # 直流分量只反映整体亮度，不参与中位数计算
+    median = np.median(low[1:])
+    return _bits_to_int(low > median)
+
+
+def dhash(pixels: np.ndarray) -> int:
+    """
+    计算 dHash
+
+    参数:
+        pixels: 8 行 9 列灰度像素矩阵
+
+    返回:
+        64 位哈希
+    """
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个哈希之间的汉明距离"""
+    return (a ^ b).bit_count()
+
+
+def compute_image_hashes(path: str) -> Tuple[int, int]:
+    """
+    读取图片并计算 (pHash, dHash)
+
+    先按 EXIF 旋转，再缩成灰度缩略图；JPEG 在解码阶段直接缩小，大图也只需几十毫秒
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as source:
+        if source.format == "JPEG":
+            source.draft("L", (_PHASH_SIZE * 2, _PHASH_SIZE * 2))
+        image = ImageOps.exif_transpose(source).convert("L")
+
+    phash_pixels = np.asarray(image.resize((_PHASH_SIZE, _PHASH_SIZE), Image.Resampling.LANCZOS))
+    dhash_pixels = np.asarray(image.resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+    return phash(phash_pixels), dhash(dhash_pixels)
+
+
+class _Node(Generic[T]):
+    __slots__ = ("key", "value", "children", "deleted")
+
+    def __init__(self, key: int, value: T):
+        self.key = key
+        self.value = value
+        self.children: Dict[int, "_Node[T]"] = {}
+        self.deleted = False
+
+
+class BKTree(Generic[T]):
+    """
+    按汉明距离组织的 BK 树
+
+    删除只做标记，被标记的节点超过一半时整体重建
+    """
+
+    def __init__(self):
+        self._root: Optional[_Node[T]] = None
+        self._size = 0
+        self._deleted = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: int, value: T) -> None:
+        """插入哈希及其关联的值"""
+        node = _Node(key, value)
+        self._size += 1
+        if self._root is None:
+            self._root = node
+            return
+
+        current = self._root
+        while True:
+            distance = hamming_distance(key, current.key)
+            child = current.children.get(distance)
+            if child is None:
+                current.children[distance] = node
+                return
+            current = child
+
+    def search(self, key: int, max_distance: int) -> List[Tuple[int, T]]:
+        """
+        查找距离不超过 max_distance 的全部条目
+
+        返回:
+            按距离升序排列的 (距离, 值) 列表
+        """
+        results: List[Tuple[int, T]] = []
+        if self._root is None:
+            return results
+
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(key, node.key)
+            if distance <= max_distance and not node.deleted:
+                results.append((distance, node.value))
+            # 三角不等式：只有与当前节点距离在 [d - r, d + r] 内的子树可能包含结果
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for edge, child in node.children.items() if low <= edge <= high)
+
+        results.sort(key=lambda item: item[0])
+        return results
+
+    def remove(self, key: int, value: Any) -> bool:
+        """标记删除指定哈希上的指定值（沿插入时的路径查找）"""
+        node = self._root
+        while node is not None:
+            distance = hamming_distance(key, node.key)
+            if distance == 0 and node.value is value and not node.deleted:
+                node.deleted = True
+                self._size -= 1
+                self._deleted += 1
+                if self._deleted > self._size:
+                    self._rebuild()
+                return True
+            node = node.children.get(distance)
+        return False
+
+    def _iter_nodes(self) -> Iterator[_Node[T]]:
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children.values())
+
+    def _rebuild(self) -> None:
+        alive = [(node.key, node.value) for node in self._iter_nodes() if not node.deleted]
+        self._root = None
+        self._size = 0
+        self._deleted = 0
+        for key, value in alive:
+            self.add(key, value)
@@ -0,0 +1,197 @@
+"""
+图片预处理模块
+在发送给视觉模型之前对截图做归一化：按 EXIF 自动旋转、去除元数据、按模型的最长边与像素预算缩放、
+重新编码为体积更小的格式，超长页面按固定高度切片并记录切片布局，便于之后把各切片的分析结果合并回原图坐标
+
+解码与编码是 CPU 密集操作，统一放在进程池中执行，不阻塞事件循环
+"""
+import asyncio
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class ImageTile:
+    """预处理后的单个切片"""
+    index: int
+    data: bytes = field(repr=False)
+    width: int
+    height: int
+    # 切片在原图（已自动旋转）中的区域: (left, top, right, bottom)
+    box: Tuple[int, int, int, int]
+
+
+@dataclass
+class PreprocessedImage:
+    """预处理结果"""
+    original_width: int
+    original_height: int
+    scale: float
+    format: str
+    tiles: List[ImageTile]
+
+    @property
+    def is_tiled(self) -> bool:
+        return len(self.tiles) > 1
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(len(tile.data) for tile in self.tiles)
+
+    def layout(self) -> Dict:
+        """切片布局（不含图片数据），随分析结果一起保存"""
+        return {
+            "original_size": [self.original_width, self.original_height],
+            "scale": self.scale,
+            "format": self.format,
+            "tiles": [
+                {key: value for key, value in asdict(tile).items() if key != "data"}
+                for tile in self.tiles
+            ],
+        }
+
+
+def get_model_limits(model: Optional[str]) -> Tuple[int, int]:
+    """
+    获取模型的图片尺寸限制
+
+    返回:
+        (最长边像素, 单张图片像素预算)
+    """
+    limits = settings.IMAGE_MODEL_LIMITS.get(model or "", {})
+    return (
+        int(limits.get("max_edge", settings.IMAGE_DEFAULT_MAX_EDGE)),
+        int(limits.get("max_pixels", settings.IMAGE_DEFAULT_MAX_PIXELS)),
+    )
+
+
+def _encode(image, image_format: str, quality: int) -> bytes:
+    """重新编码图片；不传 exif / icc_profile，元数据随之丢弃"""
+    buffer = io.BytesIO()
+    options = {"optimize": True} if image_format == "PNG" else {"quality": quality}
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def _preprocess_sync(path: str, max_edge: int, max_pixels: int, tile_aspect_ratio: float,
+                     tile_overlap: int, image_format: str, quality: int) -> PreprocessedImage:
+    """在进程池中执行的预处理逻辑，参数均为可序列化的基本类型"""
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as source:
+        source_width = source.size[0]
+        # JPEG 可在解码阶段直接按 1/2、1/4、1/8 缩小（不会小于目标尺寸），减少大图解码开销
+        if source.format == "JPEG":
+            source.draft("RGB", (max_edge, max_edge))
+        draft_scale = source_width / source.size[0]
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            # 透明区域铺白底，直接转 RGB 会变成黑色
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        original_width, original_height = image.size
+
+    width, height = image.size
+    tall = height / width > tile_aspect_ratio
+
+    if tall:
+        # 超长页面：宽度缩放到最长边以内，再按像素预算确定切片高度
+        scale = min(1.0, max_edge / width)
+    else:
+        scale = min(1.0, max_edge / max(width, height), (max_pixels / (width * height)) ** 0.5)
+
+    if scale < 1.0:
+        width, height = max(1, round(width * scale)), max(1, round(height * scale))
+        image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    if tall:
+        tile_height = max(1, min(max_edge, max_pixels // width))
+        overlap = min(tile_overlap, tile_height // 4)
+        boxes = []
+        top = 0
+        while True:
+            bottom = min(height, top + tile_height)
+            boxes.append((0, top, width, bottom))
+            if bottom >= height:
+                break
+            top = bottom - overlap
+    else:
+        boxes = [(0, 0, width, height)]
+
+    to_original = 1.0 / scale * draft_scale
+    tiles = []
+    for index, box in enumerate(boxes):
+        crop = image.crop(box) if len(boxes) > 1 else image
+        tiles.append(ImageTile(
+            index=index,
+            data=_encode(crop, image_format, quality),
+            width=crop.width,
+            height=crop.height,
+            box=tuple(round(value * to_original) for value in box),
+        ))
+
+    return PreprocessedImage(
+        original_width=round(original_width * draft_scale),
+        original_height=round(original_height * draft_scale),
+        scale=round(scale / draft_scale, 6),
+        format=image_format.lower(),
+        tiles=tiles,
+    )
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_PREPROCESS_WORKERS)
+    return _executor
+
+
+async def run_in_pool(func, *args):
+    """在预处理进程池中执行函数（函数与参数需可序列化）"""
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+
+async def preprocess_image(path: str, model: Optional[str] = None) -> PreprocessedImage:
+    """
+    在进程池中预处理图片
+
+    参数:
+        path: 图片路径
+        model: 目标视觉模型名称，用于选择尺寸限制
+
+    返回:
+        PreprocessedImage
+    """
+    max_edge, max_pixels = get_model_limits(model)
+    result = await run_in_pool(
+        _preprocess_sync,
+        path,
+        max_edge,
+        max_pixels,
+        settings.IMAGE_TILE_ASPECT_RATIO,
+        settings.IMAGE_TILE_OVERLAP,
+        settings.IMAGE_OUTPUT_FORMAT.upper(),
+        settings.IMAGE_OUTPUT_QUALITY,
+    )
+    logger.debug("图片预处理完成: %s -> %d 个切片, %d 字节", path, len(result.tiles), result.total_bytes)
+    return result
+
+
+def shutdown_executor() -> None:
+    """关闭预处理进程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
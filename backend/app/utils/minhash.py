@@ -0,0 +1,149 @@
+"""
+MinHash / LSH 近似去重模块
+把文本切成字符 n-gram（shingle），用 MinHash 签名估计两段文本的 Jaccard 相似度，
+再把签名按 band 分桶（LSH）：只有至少一个 band 完全相同的记录才作为候选比较，避免与全部记录两两比较
+
+签名为 num_perm 个 uint32，可序列化为字节保存；band 桶键为 64 位整数，便于在数据库中建索引查询
+"""
+import hashlib
+import re
+import struct
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 32) + 15)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_EMPTY_HASH = 0xFFFFFFFF
+
+# 步骤序号、标点与空白不参与比较
+_STEP_NUMBER_RE = re.compile(r"(?m)^\s*(?:\d{1,3}[.)、．]|[（(]\d{1,3}[)）]|[-*•])\s*")
+_NOISE_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """去掉步骤序号、标点与空白并转小写"""
+    return _NOISE_RE.sub("", _STEP_NUMBER_RE.sub("", text or "")).lower()
+
+
+def shingles(text: str, size: int = 2) -> Set[str]:
+    """规范化文本的字符 n-gram 集合（中文没有分词边界，按字符切分）"""
+    normalized = normalize_text(text)
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[index:index + size] for index in range(len(normalized) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash 签名计算
+
+    参数:
+        num_perm: 签名长度（排列数），越大估计越准
+        seed: 随机排列的种子，签名只在相同 num_perm / seed 之间可比
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        self.num_perm = num_perm
+        generator = np.random.RandomState(seed)
+        # a < 2^31、哈希值 < 2^32，乘积不会溢出 uint64
+        self._a = generator.randint(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: Iterable[str]) -> np.ndarray:
+        """计算集合的签名；空集合返回全部为最大值的签名（与任何集合都不相似）"""
+        hashes = np.fromiter(
+            (struct.unpack("<I", hashlib.blake2b(item.encode("utf-8"), digest_size=4).digest())[0] for item in items),
+            dtype=np.uint64,
+        )
+        if hashes.size == 0:
+            return np.full(self.num_perm, _EMPTY_HASH, dtype=np.uint32)
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def text_signature(self, text: str, shingle_size: int = 2) -> np.ndarray:
+        return self.signature(shingles(text, shingle_size))
+
+
+def jaccard(left: np.ndarray, right: np.ndarray) -> float:
+    """由两个签名估计 Jaccard 相似度"""
+    if left.shape != right.shape:
+        raise ValueError("签名长度不一致，无法比较")
+    return float(np.count_nonzero(left == right)) / len(left)
+
+
+def signature_to_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+
+def signature_from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray, bands: int) -> List[int]:
+    """
+    把签名切成 bands 段，每段哈希为一个 64 位有符号整数（与 band 序号一起作为桶键）
+
+    两个签名的 Jaccard 相似度为 s 时，至少一段相同的概率为 1 - (1 - s^r)^b（r 为每段长度）
+    """
+    if len(signature) % bands:
+        raise ValueError(f"签名长度 {len(signature)} 不能被 band 数 {bands} 整除")
+    rows = len(signature) // bands
+    data = signature.astype("<u4").tobytes()
+    return [
+        struct.unpack("<q", hashlib.blake2b(data[band * rows * 4:(band + 1) * rows * 4], digest_size=8).digest())[0]
+        for band in range(bands)
+    ]
+
+
+class LSHIndex:
+    """
+    内存中的 LSH 索引
+
+    用于批内去重与历史用例聚类；持久化的桶保存在 test_case_lsh_buckets 中
+    """
+
+    def __init__(self, bands: int):
+        self.bands = bands
+        self._buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._signatures: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key: int, signature: np.ndarray, keys: Optional[List[int]] = None) -> None:
+        self._signatures[key] = signature
+        for band, bucket in enumerate(keys or band_keys(signature, self.bands)):
+            self._buckets[(band, bucket)].append(key)
+
+    def candidates(self, signature: np.ndarray, keys: Optional[List[int]] = None) -> Set[int]:
+        """与签名至少有一段相同的记录"""
+        found: Set[int] = set()
+        for band, bucket in enumerate(keys or band_keys(signature, self.bands)):
+            found.update(self._buckets.get((band, bucket), ()))
+        return found
+
+    def query(self, signature: np.ndarray, threshold: float) -> List[Tuple[int, float]]:
+        """相似度不低于 threshold 的记录，按相似度降序"""
+        matches = [
+            (key, jaccard(signature, self._signatures[key]))
+            for key in self.candidates(signature)
+        ]
+        return sorted((match for match in matches if match[1] >= threshold), key=lambda match: (-match[1], match[0]))
+
+    def candidate_pairs(self) -> Iterator[Tuple[int, int]]:
+        """同桶记录组成的候选对（去重）"""
+        seen: Set[Tuple[int, int]] = set()
+        for members in self._buckets.values():
+            if len(members) < 2:
+                continue
+            for index, left in enumerate(members):
+                for right in members[index + 1:]:
+                    pair = (left, right) if left < right else (right, left)
+                    if pair not in seen:
+                        seen.add(pair)
+                        yield pair
+
+    def similarity(self, left: int, right: int) -> float:
+        return jaccard(self._signatures[left], self._signatures[right])
@@ -0,0 +1,164 @@
+"""
+需求章节差异模块
+把需求描述与验收标准切分为章节，比较两个版本的章节变化（新增 / 删除 / 修改 / 未变化）
+
+章节键由字段名与标题路径组成（如“需求描述 > 登录 > 密码规则”），没有标题的段落与验收标准条目按序号区分；
+测试用例通过 TestCase.requirement_section 记录所属章节键，只有变化章节关联的用例需要重新生成
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Dict, Iterator, List, Optional
+
+from app.utils.document_parser import iter_text_blocks
+
+DESCRIPTION_ROOT = "需求描述"
+ACCEPTANCE_ROOT = "验收标准"
+
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*+•]|\d{1,3}[.)、．]|[（(]\d{1,3}[)）])\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+_ORDINAL_KEY_RE = re.compile(r"^[^>]+ §\d+$")
+
+
+@dataclass
+class RequirementSection:
+    """需求章节"""
+    key: str
+    text: str
+    content_hash: str
+
+    @classmethod
+    def create(cls, key: str, text: str) -> "RequirementSection":
+        # 只对正文做哈希（忽略空白差异与列表序号），标题改名、条目前插入新条目不算内容变化
+        normalized = _WHITESPACE_RE.sub(" ", _LIST_ITEM_RE.sub("", text, count=1)).strip()
+        return cls(key, text, hashlib.sha1(normalized.encode("utf-8")).hexdigest())
+
+
+@dataclass
+class SectionChange:
+    """章节变化"""
+    kind: str  # added / removed / modified / unchanged
+    old: Optional[RequirementSection] = None
+    new: Optional[RequirementSection] = None
+
+    @property
+    def key(self) -> str:
+        return (self.new or self.old).key
+
+    @property
+    def renamed(self) -> bool:
+        """章节键发生变化（标题改名或序号移动）"""
+        return self.old is not None and self.new is not None and self.old.key != self.new.key
+
+    def to_dict(self, include_text: bool = True) -> Dict:
+        result = {
+            "change": self.kind,
+            "key": self.key,
+            "old_key": self.old.key if self.old else None,
+        }
+        if include_text:
+            result["old_text"] = self.old.text if self.old else None
+            result["new_text"] = self.new.text if self.new else None
+        return result
+
+
+def _is_ordinal(key: str) -> bool:
+    return _ORDINAL_KEY_RE.search(key) is not None
+
+
+def _split_items(text: str) -> List[str]:
+    """把列表形式的段落拆成条目，续行并入上一条"""
+    items: List[str] = []
+    for line in text.split("\n"):
+        if not line.strip():
+            continue
+        if _LIST_ITEM_RE.match(line) or not items:
+            items.append(line.strip())
+        else:
+            items[-1] += "\n" + line.strip()
+    return items
+
+
+def _iter_sections(text: str, root: str) -> Iterator[RequirementSection]:
+    stack: List[tuple] = []  # (层级, 标题)
+    body: List[str] = []
+    seen: Dict[str, int] = {}
+    headless = 0
+
+    def unique(key: str) -> str:
+        # 同名标题按出现顺序编号
+        seen[key] = seen.get(key, 0) + 1
+        return key if seen[key] == 1 else f"{key} §{seen[key]}"
+
+    def heading_key() -> str:
+        return " > ".join([root] + [title for _, title in stack])
+
+    def flush() -> Iterator[RequirementSection]:
+        if body:
+            yield RequirementSection.create(unique(heading_key()), "\n\n".join(body))
+            body.clear()
+
+    for block in iter_text_blocks(text.splitlines()):
+        if block.heading_level:
+            yield from flush()
+            while stack and stack[-1][0] >= block.heading_level:
+                stack.pop()
+            stack.append((block.heading_level, block.text.strip()))
+        elif stack:
+            body.append(block.text.strip())
+        else:
+            # 首个标题之前的内容逐段 / 逐条作为独立章节
+            for item in _split_items(block.text):
+                headless += 1
+                yield RequirementSection.create(f"{root} §{headless}", item)
+    yield from flush()
+
+
+def split_sections(description: Optional[str], acceptance_criteria: Optional[str]) -> List[RequirementSection]:
+    """把需求描述与验收标准切分为章节"""
+    return [
+        *_iter_sections(description or "", DESCRIPTION_ROOT),
+        *_iter_sections(acceptance_criteria or "", ACCEPTANCE_ROOT),
+    ]
+
+
+def diff_sections(old: List[RequirementSection], new: List[RequirementSection]) -> List[SectionChange]:
+    """
+    比较两个版本的章节
+
+    先按内容哈希对齐章节序列（插入、删除章节不影响其他章节），对齐不上的区段内再按章节键配对为“修改”，
+    只有序号的章节按位置配对，其余视为新增或删除（标题改名且内容也变化时按删除 + 新增处理）
+
+    返回:
+        按新版本顺序排列的章节变化（删除的章节排在其原位置附近）
+    """
+    changes: List[SectionChange] = []
+    matcher = SequenceMatcher(a=[s.content_hash for s in old], b=[s.content_hash for s in new], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            changes.extend(SectionChange("unchanged", old[i], new[j]) for i, j in zip(range(i1, i2), range(j1, j2)))
+            continue
+
+        old_block, new_block = old[i1:i2], new[j1:j2]
+        old_by_key = {section.key: section for section in old_block}
+        paired: Dict[int, RequirementSection] = {}
+        for index, section in enumerate(new_block):
+            match = old_by_key.pop(section.key, None)
+            if match is not None:
+                paired[index] = match
+
+        leftover = [section for section in old_block if section.key in old_by_key]
+        for index, section in enumerate(new_block):
+            if index not in paired and _is_ordinal(section.key):
+                # 无标题段落 / 验收条目只有序号，序号变化时按位置配对
+                match = next((old_section for old_section in leftover if _is_ordinal(old_section.key)), None)
+                if match is not None:
+                    leftover.remove(match)
+                    paired[index] = match
+            if index in paired:
+                changes.append(SectionChange("modified", paired[index], section))
+            else:
+                changes.append(SectionChange("added", None, section))
+        changes.extend(SectionChange("removed", section, None) for section in leftover)
+    return changes
@@ -0,0 +1,117 @@
+"""
+全文搜索文本处理模块
+PostgreSQL 内置的 simple 解析器会把一整段中文当成一个词，无法按词命中。这里采用二元组（bigram）方案：
+入库时数据库函数 search_tokens 把连续的中文字符展开为相邻二元组（“登录失败” -> “登录 录失 失败”），
+其余文字交给 simple 解析器；查询时按同样规则把中文片段转成相邻二元组的短语查询（<->），
+保证命中的是原文中连续出现的片段
+
+高亮在返回的当前页上用 Python 完成（二元组向量无法直接交给 ts_headline 定位原文）
+"""
+import html
+import re
+from typing import List, Optional
+
+# 与数据库函数 search_tokens 使用相同的中文字符范围
+CJK_RANGE = "㐀-鿿"
+_CJK_RUN_RE = re.compile(f"[{CJK_RANGE}]+")
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+# 入库时使用的数据库函数：保持原文顺序，中文片段替换为相邻二元组，单个汉字保留原样
+SEARCH_TOKENS_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION search_tokens(input text) RETURNS text
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT coalesce(string_agg(
+        CASE WHEN m.part[1] ~ '^[{CJK_RANGE}]' AND length(m.part[1]) > 1 THEN (
+            SELECT string_agg(substr(m.part[1], i, 2), ' ' ORDER BY i)
+            FROM generate_series(1, length(m.part[1]) - 1) AS i
+        ) ELSE m.part[1] END,
+        ' ' ORDER BY m.ord), '')
+    FROM regexp_matches(input, '[{CJK_RANGE}]+|[^{CJK_RANGE}]+', 'g') WITH ORDINALITY AS m(part, ord)
+$$
+"""
+
+DROP_SEARCH_TOKENS_FUNCTION_SQL = "DROP FUNCTION IF EXISTS search_tokens(text)"
+
+
+def bigrams(run: str) -> List[str]:
+    """中文片段的相邻二元组，单字返回自身"""
+    if len(run) < 2:
+        return [run]
+    return [run[index:index + 2] for index in range(len(run) - 1)]
+
+
+def search_tokens(text: str) -> str:
+    """与数据库函数 search_tokens 相同的展开规则（用于调试与离线比对）"""
+    parts: List[str] = []
+    position = 0
+    for match in _CJK_RUN_RE.finditer(text):
+        if match.start() > position:
+            parts.append(text[position:match.start()])
+        parts.append(" ".join(bigrams(match.group())))
+        position = match.end()
+    if position < len(text):
+        parts.append(text[position:])
+    return " ".join(parts)
+
+
+def query_terms(query: str) -> List[str]:
+    """查询中的中文片段与英文 / 数字单词（小写），用于生成 tsquery 与高亮"""
+    lowered = query.lower()
+    terms = _CJK_RUN_RE.findall(lowered)
+    terms.extend(_WORD_RE.findall(_CJK_RUN_RE.sub(" ", lowered)))
+    return list(dict.fromkeys(term for term in terms if term))
+
+
+def build_tsquery(query: str) -> Optional[str]:
+    """
+    把用户输入转换为 to_tsquery('simple', ...) 的查询串
+
+    中文片段转为相邻二元组的短语（<->），单个汉字按前缀匹配；英文单词最后一个按前缀匹配；各部分之间为 AND。
+    只保留汉字、字母与数字，输入中的 tsquery 运算符不会生效
+
+    返回:
+        查询串，没有可搜索的内容时返回 None
+    """
+    clauses: List[str] = []
+    terms = query_terms(query)
+    for index, term in enumerate(terms):
+        if _CJK_RUN_RE.fullmatch(term):
+            if len(term) == 1:
+                clauses.append(f"'{term}':*")
+            else:
+                clauses.append("(" + " <-> ".join(f"'{gram}'" for gram in bigrams(term)) + ")")
+        else:
+            suffix = ":*" if index == len(terms) - 1 else ""
+            clauses.append(f"'{term}'{suffix}")
+    return " & ".join(clauses) or None
+
+
+def highlight(text: Optional[str], terms: List[str], max_length: int = 120,
+              start_tag: str = "<mark>", end_tag: str = "</mark>") -> Optional[str]:
+    """
+    截取包含查询词的片段并高亮（HTML 转义后插入标记）
+
+    返回:
+        高亮片段；文本中没有任何查询词时返回 None
+    """
+    if not text or not terms:
+        return None
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(text)
+    if first is None:
+        return None
+
+    start = max(0, first.start() - max_length // 3)
+    end = min(len(text), start + max_length)
+    start = max(0, min(start, end - max_length))
+    window = text[start:end]
+
+    parts: List[str] = []
+    position = 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[position:match.start()]))
+        parts.append(f"{start_tag}{html.escape(match.group())}{end_tag}")
+        position = match.end()
+    parts.append(html.escape(window[position:]))
+    snippet = "".join(parts).replace("\n", " ")
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
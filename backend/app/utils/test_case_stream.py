@@ -0,0 +1,189 @@
+"""
+结构化测试用例输出模块
+让生成智能体输出 {"test_cases": [...]} 形式的 JSON，并在流式输出过程中增量解析：
+每条用例的右花括号一到达就产出对应的 TestCaseData，不必等整段输出结束后再解析
+
+TEST_CASE_JSON_MODE 决定约束方式：json_schema 使用模型的结构化输出（output_content_type），
+json_object 使用 JSON 模式客户端，prompt 只依靠提示词；三种方式都会在系统消息后追加格式说明
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.prompts import prompt_registry
+from app.models.test_case import TestCaseBatch, TestCaseData, TestCasePriority, TestCaseType
+
+logger = logging.getLogger(__name__)
+
+JSON_FORMAT_PROMPT = "test_case_json_format.txt"
+
+_TEXT_FIELDS = ("description", "preconditions", "test_steps", "expected_result", "test_data", "code")
+_TYPE_VALUES = {item.value for item in TestCaseType}
+_PRIORITY_VALUES = {item.value for item in TestCasePriority}
+
+
+def with_json_format(system_message: str) -> str:
+    """在系统消息后追加 JSON 输出格式说明"""
+    return f"{system_message}\n\n{prompt_registry.get(JSON_FORMAT_PROMPT)}"
+
+
+def json_output_options(model_client=None) -> Dict[str, Any]:
+    """
+    按 TEST_CASE_JSON_MODE 返回创建生成智能体时使用的模型客户端与结构化输出参数
+
+    参数:
+        model_client: json_schema / prompt 模式使用的模型客户端，默认为 DeepSeek 客户端
+
+    返回:
+        {"model_client": ..., "output_content_type": ...}（不需要的键省略）
+    """
+    from app.core.llms import _deepseek_json_model_client, _deepseek_model_client
+
+    mode = settings.TEST_CASE_JSON_MODE
+    if mode == "json_object":
+        return {"model_client": _deepseek_json_model_client()}
+    options: Dict[str, Any] = {"model_client": model_client or _deepseek_model_client()}
+    if mode == "json_schema":
+        options["output_content_type"] = TestCaseBatch
+    return options
+
+
+def to_test_case(value: Any) -> Optional[TestCaseData]:
+    """把模型输出的单条用例对象规整为 TestCaseData，无法识别时返回 None"""
+    if not isinstance(value, dict) or not value.get("title"):
+        return None
+
+    data = dict(value)
+    for key in _TEXT_FIELDS:
+        item = data.get(key)
+        if isinstance(item, list):
+            if key == "test_steps":
+                data[key] = "\n".join(f"{number}. {step}" for number, step in enumerate(item, start=1))
+            else:
+                data[key] = "\n".join(str(part) for part in item)
+        elif isinstance(item, (dict, int, float)):
+            data[key] = json.dumps(item, ensure_ascii=False) if isinstance(item, dict) else str(item)
+
+    # 枚举值不合法时回退为默认值
+    for key, allowed in (("type", _TYPE_VALUES), ("priority", _PRIORITY_VALUES)):
+        item = data.get(key)
+        if isinstance(item, str) and item.lower() in allowed:
+            data[key] = item.lower()
+        else:
+            data.pop(key, None)
+
+    try:
+        return TestCaseData.model_validate(data)
+    except ValidationError:
+        return None
+
+
+class TestCaseStreamParser:
+    """
+    增量解析流式输出中的测试用例
+
+    逐字符跟踪 JSON 的括号层级与字符串状态：输出中出现的第一个数组视为用例数组，
+    它的每个直接子对象闭合时立即解析为一条用例。用例之前的代码块标记、说明文字会被忽略
+
+    用法:
+        parser = TestCaseStreamParser()
+        for chunk in stream:
+            for test_case in parser.feed(chunk):
+                ...
+        remaining = parser.finish()
+    """
+
+    def __init__(self):
+        self._text: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._case_depth: Optional[int] = None  # 用例数组所在的层级
+        self._collecting = False  # 正在读取一条用例
+        self._buffer: List[str] = []
+        self.parsed = 0
+        self.skipped = 0
+
+    def feed(self, chunk: str) -> List[TestCaseData]:
+        """输入一段流式输出，返回其中新闭合的用例"""
+        cases: List[TestCaseData] = []
+        self._text.append(chunk)
+        for char in chunk:
+            if self._collecting:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+            elif char in "{[":
+                if (char == "{" and self._case_depth is not None and len(self._stack) == self._case_depth
+                        and self._stack[-1] == "["):
+                    self._collecting = True
+                    self._buffer = ["{"]
+                self._stack.append(char)
+                if char == "[" and self._case_depth is None:
+                    self._case_depth = len(self._stack)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._collecting and len(self._stack) == self._case_depth:
+                    case = self._parse("".join(self._buffer))
+                    if case is not None:
+                        cases.append(case)
+                    self._collecting = False
+                    self._buffer = []
+                elif char == "]" and self._case_depth is not None and len(self._stack) < self._case_depth:
+                    # 用例数组结束，之后出现的数组重新识别
+                    self._case_depth = None
+        return cases
+
+    def _parse(self, text: str) -> Optional[TestCaseData]:
+        try:
+            case = to_test_case(json.loads(text))
+        except json.JSONDecodeError:
+            case = None
+        if case is None:
+            self.skipped += 1
+            logger.debug("跳过无法解析的用例片段: %.80s", text)
+            return None
+        self.parsed += 1
+        return case
+
+    @property
+    def text(self) -> str:
+        """目前收到的完整输出"""
+        return "".join(self._text)
+
+    def finish(self) -> List[TestCaseData]:
+        """
+        输出结束后调用：流式过程中一条都没解析出来时（如模型只输出了单个用例对象），对完整输出再解析一次
+        """
+        if self.parsed:
+            return []
+        text = self.text.strip()
+        start = min((index for index in (text.find("{"), text.find("[")) if index >= 0), default=-1)
+        if start < 0:
+            return []
+        try:
+            value = json.loads(text[start:text.rfind("}" if text[start] == "{" else "]") + 1])
+        except json.JSONDecodeError:
+            return []
+
+        if isinstance(value, dict):
+            items = value.get("test_cases") if isinstance(value.get("test_cases"), list) else [value]
+        else:
+            items = value if isinstance(value, list) else []
+        cases = [case for case in (to_test_case(item) for item in items) if case is not None]
+        self.parsed += len(cases)
+        return cases
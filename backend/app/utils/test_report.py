@@ -0,0 +1,204 @@
+"""
+测试报告流式解析
+把 CI 产出的 JUnit XML / JSON 测试报告逐条解析为 ReportCase，内存占用与报告大小无关：
+
+- JUnit XML：iterparse 增量解析，每条 testcase 处理完立即从父节点移除
+- JSON：顶层数组或逐行 JSON（NDJSON）按元素增量解码；整个报告为 {"testcases": [...]} 对象时只能整体解析
+"""
+import json
+import re
+import xml.etree.ElementTree as ElementTree
+from codecs import getincrementaldecoder
+from dataclasses import dataclass, field
+from typing import IO, Any, Dict, Iterator, Optional
+
+from app.models.test_case import TestExecutionStatus
+
+REPORT_FORMATS = ("junit", "json")
+
+# 报告中的结果 -> 执行状态；JUnit 的 error（用例本身出错）按失败记录
+STATUS_ALIASES = {
+    "passed": TestExecutionStatus.PASSED,
+    "pass": TestExecutionStatus.PASSED,
+    "success": TestExecutionStatus.PASSED,
+    "ok": TestExecutionStatus.PASSED,
+    "failed": TestExecutionStatus.FAILED,
+    "failure": TestExecutionStatus.FAILED,
+    "fail": TestExecutionStatus.FAILED,
+    "error": TestExecutionStatus.FAILED,
+    "broken": TestExecutionStatus.FAILED,
+    "skipped": TestExecutionStatus.SKIPPED,
+    "skip": TestExecutionStatus.SKIPPED,
+    "disabled": TestExecutionStatus.SKIPPED,
+    "pending": TestExecutionStatus.SKIPPED,
+    "blocked": TestExecutionStatus.BLOCKED,
+}
+
+# JUnit 中标识用例编号的 property 名称
+CODE_PROPERTIES = ("test_case_code", "test_case", "case_code", "code")
+
+_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = re.compile(r"\s*")
+_SEPARATORS = re.compile(r"[\s,]*")
+_MESSAGE_MAX_CHARS = 4000
+
+
+@dataclass
+class ReportCase:
+    """报告中的一条用例结果，status 为 None 表示无法识别的结果"""
+    name: str
+    classname: Optional[str] = None
+    status: Optional[TestExecutionStatus] = None
+    duration: Optional[float] = None
+    message: Optional[str] = None
+    properties: Dict[str, str] = field(default_factory=dict)
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """按文件名 / 内容类型判断报告格式，无法判断时按 JUnit XML 处理"""
+    name = (filename or "").lower()
+    if name.endswith((".json", ".jsonl", ".ndjson")) or "json" in (content_type or ""):
+        return "json"
+    return "junit"
+
+
+def _duration(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _truncate(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    text = text.strip()
+    return text[:_MESSAGE_MAX_CHARS] if text else None
+
+
+def _junit_case(element: ElementTree.Element) -> ReportCase:
+    status = TestExecutionStatus.PASSED
+    message = None
+    properties: Dict[str, str] = {}
+    for child in element:
+        tag = child.tag
+        if tag in ("failure", "error"):
+            status = TestExecutionStatus.FAILED
+            message = "\n".join(part for part in (child.get("message"), child.text) if part)
+        elif tag == "skipped":
+            status = TestExecutionStatus.SKIPPED
+            message = child.get("message") or child.text
+        elif tag == "properties":
+            for prop in child.iter("property"):
+                if prop.get("name"):
+                    properties[prop.get("name")] = prop.get("value") or prop.text or ""
+    return ReportCase(
+        name=element.get("name") or "",
+        classname=element.get("classname"),
+        status=status,
+        duration=_duration(element.get("time")),
+        message=_truncate(message),
+        properties=properties,
+    )
+
+
+def iter_junit(stream: IO[bytes]) -> Iterator[ReportCase]:
+    """
+    增量解析 JUnit XML（testsuites / testsuite / testcase 任意嵌套）
+
+    只保留当前路径上的元素：每条 testcase 解析后从父节点移除，已结束的 testsuite 同样移除
+    """
+    path = []
+    for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            path.append(element)
+            continue
+        path.pop()
+        if element.tag == "testcase":
+            yield _junit_case(element)
+        elif element.tag != "testsuite":
+            continue
+        if path:
+            path[-1].remove(element)
+        element.clear()
+
+
+def _json_case(item: Any) -> ReportCase:
+    if not isinstance(item, dict):
+        return ReportCase(name=str(item))
+    status = item.get("status", item.get("result", item.get("outcome")))
+    properties = item.get("properties") if isinstance(item.get("properties"), dict) else {}
+    if item.get("code"):
+        properties = {**properties, "code": str(item["code"])}
+    return ReportCase(
+        name=str(item.get("name") or item.get("title") or ""),
+        classname=item.get("classname") or item.get("suite"),
+        status=STATUS_ALIASES.get(str(status).lower()) if status is not None else None,
+        duration=_duration(item.get("time", item.get("duration"))),
+        message=_truncate(item.get("message")),
+        properties={str(key): str(value) for key, value in properties.items()},
+    )
+
+
+def iter_json(stream: IO[bytes]) -> Iterator[ReportCase]:
+    """
+    增量解析 JSON 报告
+
+    支持三种形式：用例数组 [{...}, ...]、每行一个用例的 NDJSON、{"testcases": [...]} 对象；
+    每个用例包含 name / classname / code / status / time / message
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    position = 0
+    in_array = None
+    finished = False
+    read_size = _CHUNK_SIZE
+
+    while True:
+        position = (_SEPARATORS if in_array else _WHITESPACE).match(buffer, position).end()
+        if in_array is None and position < len(buffer):
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+                continue
+        if in_array and buffer.startswith("]", position):
+            return
+        if position < len(buffer):
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if finished:
+                    raise
+            else:
+                read_size = _CHUNK_SIZE
+                if isinstance(item, dict) and isinstance(item.get("testcases"), list):
+                    for case in item["testcases"]:
+                        yield _json_case(case)
+                else:
+                    yield _json_case(item)
+                continue
+        if finished:
+            if in_array:
+                raise json.JSONDecodeError("JSON 数组未结束", buffer, position)
+            return
+        # 只保留未解析的部分
+        buffer = buffer[position:]
+        position = 0
+        chunk = stream.read(read_size)
+        if not chunk:
+            finished = True
+            buffer += text_decoder.decode(b"", final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
+            # 单个元素跨越多次读取时加大读取量，避免反复从头解码
+            read_size = min(read_size * 2, 64 * _CHUNK_SIZE)
+
+
+def iter_report(stream: IO[bytes], report_format: str) -> Iterator[ReportCase]:
+    """按格式逐条返回报告中的用例结果"""
+    if report_format == "junit":
+        return iter_junit(stream)
+    if report_format == "json":
+        return iter_json(stream)
+    raise ValueError(f"不支持的报告格式: {report_format}")
@@ -0,0 +1,212 @@
+"""
+本地向量索引模块
+每个项目一个目录，向量以 float16 矩阵保存在内存映射文件中（vectors.f16），对应的记录键保存在 keys.i64，
+meta.json 记录维度、容量与已用行数：
+
+- 新增记录追加到末尾，容量不足时翻倍扩容；已有记录原地覆盖；删除只把键置为 -1（重建索引时压缩）
+- 查询时把矩阵转为 float32 缓存在内存中（只在文件变化后重新加载），一次矩阵向量乘法得到全部相似度，
+  argpartition 取 top-k；10 万条 256 维向量单次查询约十几毫秒
+- 写入在文件锁内进行，多个进程可以共享同一个索引目录
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 记录键 = 实体类型编号 << 40 | 实体ID
+ENTITY_CODES = {"test_case": 1, "requirement": 2}
+_ENTITY_NAMES = {code: name for name, code in ENTITY_CODES.items()}
+_ID_BITS = 40
+_DELETED = -1
+_INITIAL_CAPACITY = 1024
+
+
+def make_key(entity_type: str, entity_id: int) -> int:
+    return (ENTITY_CODES[entity_type] << _ID_BITS) | int(entity_id)
+
+
+def split_key(key: int) -> Tuple[str, int]:
+    return _ENTITY_NAMES[key >> _ID_BITS], key & ((1 << _ID_BITS) - 1)
+
+
+class LocalVectorIndex:
+    """
+    单个项目的向量索引
+
+    参数:
+        path: 索引目录
+        dim: 向量维度，与已有索引不一致时需要重建
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.ndarray] = None  # float32 查询缓存
+        self._keys: Optional[np.ndarray] = None
+        self._loaded_version: Optional[int] = None
+
+    # ---------- 文件 ----------
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"dim": self.dim, "capacity": 0, "count": 0, "version": 0}
+
+    def _write_meta(self, meta: Dict) -> None:
+        temp_path = f"{self._meta_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(temp_path, self._meta_path)
+
+    def _open(self, name: str, dtype, capacity: int, columns: Optional[int] = None) -> np.memmap:
+        shape = (capacity, columns) if columns else (capacity,)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r+", shape=shape)
+
+    def _resize(self, meta: Dict, capacity: int) -> None:
+        """扩容：新文件写完后原子替换"""
+        for name, dtype, columns, fill in (("vectors.f16", np.float16, self.dim, 0), ("keys.i64", np.int64, None, _DELETED)):
+            shape = (capacity, columns) if columns else (capacity,)
+            temp_path = os.path.join(self.path, f"{name}.tmp")
+            grown = np.memmap(temp_path, dtype=dtype, mode="w+", shape=shape)
+            grown[:] = fill
+            if meta["capacity"]:
+                grown[:meta["count"]] = self._open(name, dtype, meta["capacity"], columns)[:meta["count"]]
+            grown.flush()
+            del grown
+            os.replace(temp_path, os.path.join(self.path, name))
+        meta["capacity"] = capacity
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[Dict]:
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, open(os.path.join(self.path, ".lock"), "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                meta = self._read_meta()
+                if meta["count"] and meta["dim"] != self.dim:
+                    raise ValueError(f"索引维度 {meta['dim']} 与当前向量维度 {self.dim} 不一致，请重建索引")
+                meta["dim"] = self.dim
+                yield meta
+                meta["version"] = meta.get("version", 0) + 1
+                self._write_meta(meta)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ---------- 写入 ----------
+
+    def upsert(self, keys: Sequence[int], vectors: np.ndarray) -> None:
+        """写入或覆盖记录的向量"""
+        if not len(keys):
+            return
+        with self._write_lock() as meta:
+            stored_keys = self._open("keys.i64", np.int64, meta["capacity"]) if meta["capacity"] else np.empty(0, np.int64)
+            rows = {int(key): row for row, key in enumerate(stored_keys[:meta["count"]]) if key != _DELETED}
+            new_keys = [int(key) for key in dict.fromkeys(int(key) for key in keys) if int(key) not in rows]
+            required = meta["count"] + len(new_keys)
+            if required > meta["capacity"]:
+                capacity = max(_INITIAL_CAPACITY, meta["capacity"])
+                while capacity < required:
+                    capacity *= 2
+                self._resize(meta, capacity)
+
+            matrix = self._open("vectors.f16", np.float16, meta["capacity"], self.dim)
+            stored_keys = self._open("keys.i64", np.int64, meta["capacity"])
+            for key in new_keys:
+                rows[key] = meta["count"]
+                stored_keys[meta["count"]] = key
+                meta["count"] += 1
+            for key, vector in zip(keys, vectors):
+                matrix[rows[int(key)]] = vector.astype(np.float16)
+            matrix.flush()
+            stored_keys.flush()
+
+    def delete(self, keys: Sequence[int]) -> int:
+        """删除记录，返回实际删除的条数"""
+        targets = {int(key) for key in keys}
+        if not targets:
+            return 0
+        with self._write_lock() as meta:
+            if not meta["capacity"]:
+                return 0
+            stored_keys = self._open("keys.i64", np.int64, meta["capacity"])
+            rows = np.nonzero(np.isin(stored_keys[:meta["count"]], list(targets)))[0]
+            stored_keys[rows] = _DELETED
+            stored_keys.flush()
+            return len(rows)
+
+    def clear(self) -> None:
+        """清空索引（重建前调用）"""
+        with self._write_lock() as meta:
+            meta.update(count=0)
+            if meta["capacity"]:
+                stored_keys = self._open("keys.i64", np.int64, meta["capacity"])
+                stored_keys[:] = _DELETED
+                stored_keys.flush()
+
+    # ---------- 查询 ----------
+
+    def _ensure_loaded(self) -> None:
+        """索引文件变化（版本号不同）时重新加载查询缓存"""
+        meta = self._read_meta()
+        if meta.get("version") == self._loaded_version:
+            return
+        if not meta["count"]:
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            self._keys = np.empty(0, dtype=np.int64)
+        else:
+            if meta["dim"] != self.dim:
+                raise ValueError(f"索引维度 {meta['dim']} 与当前向量维度 {self.dim} 不一致，请重建索引")
+            count = meta["count"]
+            self._matrix = np.asarray(self._open("vectors.f16", np.float16, meta["capacity"], self.dim)[:count], dtype=np.float32)
+            self._keys = np.array(self._open("keys.i64", np.int64, meta["capacity"])[:count])
+        self._loaded_version = meta.get("version")
+
+    def search(self, vector: np.ndarray, k: int, entity_type: Optional[str] = None,
+               exclude: Optional[Sequence[int]] = None) -> List[Tuple[int, float]]:
+        """
+        余弦相似度最高的 k 条记录（向量已归一化，内积即余弦）
+
+        参数:
+            entity_type: 只返回该类型的记录
+            exclude: 不返回的记录键
+
+        返回:
+            [(记录键, 相似度)]，按相似度降序
+        """
+        with self._lock:
+            self._ensure_loaded()
+            matrix, keys = self._matrix, self._keys
+        if not len(keys) or k <= 0:
+            return []
+
+        scores = matrix @ vector.astype(np.float32)
+        invalid = keys == _DELETED
+        if entity_type is not None:
+            invalid |= (keys >> _ID_BITS) != ENTITY_CODES[entity_type]
+        if exclude:
+            invalid |= np.isin(keys, list(exclude))
+        scores[invalid] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(keys[row]), float(scores[row])) for row in top if np.isfinite(scores[row])]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return int(np.count_nonzero(self._keys != _DELETED))
@@ -0,0 +1,191 @@
+"""
+视频关键帧提取模块
+流式解码视频（任何时刻只保留少量帧），按固定采样率取帧，用 NumPy 向量化计算与上一采样帧的
+像素差分与灰度直方图距离，场景变化超过阈值的帧作为关键帧候选
+
+帧数预算：
+- 候选超过最大帧数时保留变化得分最高的帧（最小堆，内存上界为最大帧数）
+- 场景变化不足最小帧数时用均匀采样帧补足（采样间隔按需倍增，内存上界为两倍最小帧数）
+最后去掉与已保留帧几乎相同的画面（如页面来回切换），按时间排序后交给视觉模型
+
+解码依赖 PyAV（pip install av），在图片预处理进程池中执行
+"""
+import heapq
+import io
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.image_preprocess import get_model_limits, run_in_pool
+
+logger = logging.getLogger(__name__)
+
+# 计算帧差时使用的缩略图尺寸
+_THUMB_SIZE = (64, 36)
+_HIST_BINS = 32
+
+
+@dataclass
+class Keyframe:
+    """提取出的关键帧"""
+    index: int
+    timestamp: float  # 秒
+    score: float  # 场景变化得分，均匀补帧为 0
+    data: bytes = field(repr=False)
+    width: int = 0
+    height: int = 0
+    # 灰度缩略图，仅用于去重，返回前清空
+    thumb: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def timecode(self) -> str:
+        minutes, seconds = divmod(self.timestamp, 60)
+        return f"{int(minutes):02d}:{seconds:04.1f}"
+
+    def layout(self) -> dict:
+        return {"index": self.index, "timestamp": round(self.timestamp, 3), "timecode": self.timecode,
+                "score": round(self.score, 4), "width": self.width, "height": self.height}
+
+
+def _scene_score(thumb: np.ndarray, previous: np.ndarray) -> float:
+    """
+    场景变化得分：像素平均绝对差与直方图总变差距离的较大值，取值 0~1
+
+    像素差对局部内容变化敏感，直方图距离对整体色调变化（弹窗、页面切换）敏感
+    """
+    pixel_diff = np.abs(thumb.astype(np.int16) - previous.astype(np.int16)).mean() / 255.0
+    hist = np.bincount(thumb.ravel() // (256 // _HIST_BINS), minlength=_HIST_BINS) / thumb.size
+    previous_hist = np.bincount(previous.ravel() // (256 // _HIST_BINS), minlength=_HIST_BINS) / previous.size
+    hist_distance = 0.5 * np.abs(hist - previous_hist).sum()
+    return float(max(pixel_diff, hist_distance))
+
+
+def _encode_frame(frame, max_edge: int, max_pixels: int, image_format: str, quality: int) -> Tuple[bytes, int, int]:
+    """按视觉模型的尺寸限制缩放并编码帧"""
+    width, height = frame.width, frame.height
+    scale = min(1.0, max_edge / max(width, height), (max_pixels / (width * height)) ** 0.5)
+    if scale < 1.0:
+        width, height = max(2, round(width * scale)), max(2, round(height * scale))
+    image = frame.to_image(width=width, height=height) if scale < 1.0 else frame.to_image()
+    buffer = io.BytesIO()
+    options = {"optimize": True} if image_format == "PNG" else {"quality": quality}
+    image.convert("RGB").save(buffer, format=image_format, **options)
+    return buffer.getvalue(), image.width, image.height
+
+
+def extract_keyframes_sync(path: str, sample_fps: float, scene_threshold: float, min_frames: int,
+                           max_frames: int, dedup_threshold: float, max_edge: int, max_pixels: int,
+                           image_format: str, quality: int) -> Tuple[List[Keyframe], dict]:
+    """
+    提取关键帧（在进程池中执行）
+
+    返回:
+        (按时间排序的关键帧, 统计信息)
+    """
+    import av
+
+    # (得分, 序号, Keyframe) 最小堆，保留得分最高的 max_frames 个场景变化帧
+    scene_heap: List[Tuple[float, int, Keyframe]] = []
+    # 均匀采样的补充帧，超过 2 * min_frames 时丢弃一半并把采样间隔翻倍
+    uniform: List[Keyframe] = []
+    uniform_step = 1
+
+    previous_thumb: Optional[np.ndarray] = None
+    next_sample_time = 0.0
+    sampled = 0
+    decoded = 0
+
+    def make_keyframe(frame, timestamp: float, score: float, thumb: np.ndarray) -> Keyframe:
+        data, width, height = _encode_frame(frame, max_edge, max_pixels, image_format, quality)
+        return Keyframe(index=sampled, timestamp=timestamp, score=score, data=data, width=width, height=height,
+                        thumb=thumb)
+
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        duration = float(container.duration / av.time_base) if container.duration else None
+
+        for frame in container.decode(stream):
+            decoded += 1
+            if frame.time is None or frame.time < next_sample_time:
+                continue
+            timestamp = float(frame.time)
+            next_sample_time = timestamp + 1.0 / sample_fps
+
+            # 缩略图由解码器直接缩放输出灰度，避免先转出整帧 RGB
+            thumb = frame.to_ndarray(width=_THUMB_SIZE[0], height=_THUMB_SIZE[1], format="gray")
+            score = 1.0 if previous_thumb is None else _scene_score(thumb, previous_thumb)
+            previous_thumb = thumb
+
+            if score >= scene_threshold:
+                if len(scene_heap) < max_frames:
+                    heapq.heappush(scene_heap, (score, sampled, make_keyframe(frame, timestamp, score, thumb)))
+                elif score > scene_heap[0][0]:
+                    heapq.heapreplace(scene_heap, (score, sampled, make_keyframe(frame, timestamp, score, thumb)))
+            elif min_frames > 0 and sampled % uniform_step == 0:
+                uniform.append(make_keyframe(frame, timestamp, 0.0, thumb))
+                if len(uniform) > 2 * min_frames:
+                    uniform = uniform[::2]
+                    uniform_step *= 2
+
+            sampled += 1
+
+    keyframes = [item[2] for item in scene_heap]
+    if len(keyframes) < min_frames and uniform:
+        # 从均匀采样帧中等间隔挑选补足
+        needed = min(min_frames - len(keyframes), len(uniform))
+        picks = np.linspace(0, len(uniform) - 1, needed).round().astype(int)
+        keyframes.extend(uniform[i] for i in sorted(set(picks.tolist())))
+
+    keyframes.sort(key=lambda keyframe: keyframe.timestamp)
+
+    # 去除重复画面：与已保留的任一帧（不只是相邻帧）变化得分过低则丢弃
+    kept: List[Keyframe] = []
+    for keyframe in keyframes:
+        if any(_scene_score(keyframe.thumb, existing.thumb) < dedup_threshold for existing in kept):
+            continue
+        kept.append(keyframe)
+    for keyframe in keyframes:
+        keyframe.thumb = None
+
+    stats = {
+        "duration": duration,
+        "decoded_frames": decoded,
+        "sampled_frames": sampled,
+        "scene_candidates": len(scene_heap),
+        "duplicates_removed": len(keyframes) - len(kept),
+        "keyframes": len(kept),
+    }
+    return kept, stats
+
+
+async def extract_keyframes(path: str, model: Optional[str] = None) -> Tuple[List[Keyframe], dict]:
+    """
+    在进程池中提取视频关键帧
+
+    参数:
+        path: 视频路径
+        model: 目标视觉模型名称，用于选择关键帧的尺寸限制
+
+    返回:
+        (按时间排序的关键帧, 统计信息)
+    """
+    max_edge, max_pixels = get_model_limits(model)
+    keyframes, stats = await run_in_pool(
+        extract_keyframes_sync,
+        path,
+        settings.VIDEO_SAMPLE_FPS,
+        settings.VIDEO_SCENE_THRESHOLD,
+        settings.VIDEO_MIN_KEYFRAMES,
+        settings.VIDEO_MAX_KEYFRAMES,
+        settings.VIDEO_DEDUP_THRESHOLD,
+        max_edge,
+        max_pixels,
+        settings.IMAGE_OUTPUT_FORMAT.upper(),
+        settings.IMAGE_OUTPUT_QUALITY,
+    )
+    logger.info("视频关键帧提取完成: %s", path, extra=stats)
+    return keyframes, stats
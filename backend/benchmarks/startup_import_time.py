@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准脚本
+使用 `python -X importtime` 在独立进程中导入应用入口，统计总耗时并按顶层包汇总导入耗时
+
+用法（在 backend 目录下执行）:
+    python benchmarks/startup_import_time.py
+    python benchmarks/startup_import_time.py --module main --runs 5 --top 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_import(module: str) -> tuple[float, str]:
+    """在新进程中导入模块，返回墙钟耗时与 importtime 输出"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    return elapsed, result.stderr
+
+
+def parse_importtime(output: str) -> dict[str, int]:
+    """
+    解析 importtime 输出，按顶层包汇总自身耗时（微秒）
+
+    每行格式: import time: self [us] | cumulative | imported package
+    """
+    totals: dict[str, int] = defaultdict(int)
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, _cumulative, name = line[len("import time:"):].split("|")
+        except ValueError:
+            continue
+        top_level = name.strip().split(".")[0]
+        totals[top_level] += int(self_us.strip())
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="统计应用启动导入耗时")
+    parser.add_argument("--module", default="main", help="要导入的模块，默认 main")
+    parser.add_argument("--runs", type=int, default=3, help="重复次数，取中位数")
+    parser.add_argument("--top", type=int, default=15, help="输出耗时最高的前 N 个顶层包")
+    args = parser.parse_args()
+
+    wall_times = []
+    totals_per_run = []
+    for _ in range(args.runs):
+        elapsed, output = run_import(args.module)
+        wall_times.append(elapsed)
+        totals_per_run.append(parse_importtime(output))
+
+    packages = set().union(*totals_per_run)
+    median_totals = {
+        pkg: statistics.median(run.get(pkg, 0) for run in totals_per_run)
+        for pkg in packages
+    }
+    import_total = sum(median_totals.values())
+
+    print(f"模块: {args.module}  运行次数: {args.runs}")
+    print(f"进程墙钟耗时（中位数）: {statistics.median(wall_times) * 1000:.1f} ms")
+    print(f"导入耗时合计（中位数）: {import_total / 1000:.1f} ms")
+    print()
+    print(f"{'顶层包':<32}{'耗时(ms)':>12}{'占比':>10}")
+    for pkg, us in sorted(median_totals.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        share = us / import_total * 100 if import_total else 0
+        print(f"{pkg:<32}{us / 1000:>12.1f}{share:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
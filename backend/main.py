@@ -1,9 +1,57 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
+from app.core import metrics
+from app.core.logger import setup_logging, RequestContextMiddleware
+from app.core import warmup, health
 import os
 
+# 初始化结构化日志（队列异步写出）
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时准备目录与监控，并按配置在后台预热；关闭时清理后台任务"""
+    # 确保上传目录存在
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+
+    # 启动事件循环延迟监控并注册连接池指标
+    if settings.METRICS_ENABLED:
+        metrics.register_db_pools()
+        metrics.event_loop_monitor.start()
+
+    # 用例 / 需求变更后增量更新向量索引
+    from app.services import coverage_service, project_counter_service, test_plan_stats_service, vector_index_service
+    vector_index_service.register_listeners()
+    # 用例 / 执行变更后增量刷新需求覆盖汇总
+    coverage_service.register_listeners()
+    # 执行记录变更时在同一事务内累加测试计划统计
+    test_plan_stats_service.register_listeners()
+    # 需求 / 用例 / 缺陷增删后缓冲项目计数增量，定时合并写入
+    project_counter_service.register_listeners()
+
+    # 后台预热提示词、连接池以及（按配置）AI 模块与模型客户端，不阻塞启动
+    warmup.start_background_prewarm()
+
+    yield
+
+    await warmup.cancel_prewarm()
+    # 运行时池只在首次使用时启动，未启动时直接跳过
+    from app.core.runtime_pool import runtime_pool
+    await runtime_pool.stop()
+    from app.utils.image_preprocess import shutdown_executor
+    shutdown_executor()
+    vector_index_service.shutdown_executor()
+    coverage_service.coverage_refresher.flush()
+    project_counter_service.project_counters.flush()
+    await health.close_clients()
+    await metrics.event_loop_monitor.stop()
+
+
 # 创建FastAPI应用实例
 app = FastAPI(
     title=settings.APP_NAME,
@@ -11,6 +59,7 @@ app = FastAPI(
     description="API专用AI测试管理平台",
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
+    lifespan=lifespan,
 )
 
 # 配置CORS中间件
@@ -22,9 +71,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 挂载静态文件目录
-if os.path.exists(settings.UPLOAD_DIR):
-    app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+# 请求上下文中间件（X-Request-ID 写入日志上下文）
+app.add_middleware(RequestContextMiddleware)
+
+# 配置指标采集中间件
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.PrometheusMiddleware)
+
+# 挂载静态文件目录（目录在 lifespan 中创建）
+app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR, check_dir=False), name="uploads")
 
 # 根路径
 @app.get("/")
@@ -40,6 +95,26 @@ async def root():
 async def health_check():
     return {"status": "healthy", "app": settings.APP_NAME}
 
+
+# 存活检查：进程能响应即视为存活
+@app.get("/health/live")
+async def liveness_check():
+    return {"status": "alive", "app": settings.APP_NAME}
+
+
+# 就绪检查：预热完成且数据库、Redis、模型端点可用时才返回 200
+@app.get("/health/ready")
+async def readiness_check():
+    ready, report = await health.check_readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
+
+# 监控指标端点
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        content, content_type = metrics.render_metrics()
+        return Response(content=content, media_type=content_type)
+
 # 添加API路由
 from app.api.api_router import api_router
 app.include_router(api_router, prefix="/api/v1")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+维护任务入口
+面向定时任务 / 运维手工执行的批处理命令
+
+用法:
+    python maintenance.py dedup [--project-id 1] [--dry-run]   # 补算用例签名并聚类历史重复用例
+    python maintenance.py vector-index [--project-id 1]        # 重建用例 / 需求向量索引
+    python maintenance.py coverage [--project-id 1]            # 重新汇总需求覆盖数据
+    python maintenance.py plan-stats [--project-id 1]          # 按执行记录校正测试计划统计
+    python maintenance.py project-counters [--project-id 1] [--offline]  # 按源表校正项目的需求 / 用例 / 缺陷数
+    python maintenance.py execution-partitions [--months-ahead 3]  # 预建执行记录的未来月分区
+    python maintenance.py execution-archive [--retention-months 12] [--format csv] [--dry-run]  # 归档过期的执行记录分区
+    python maintenance.py flakiness [--full]                   # 按新增执行记录计算用例不稳定性
+"""
+import argparse
+import asyncio
+import logging
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.core.logger import setup_logging, shutdown_logging
+from app.models.project import Project
+
+logger = logging.getLogger("maintenance")
+
+
+async def _project_ids(project_id: Optional[int]) -> List[int]:
+    if project_id is not None:
+        return [project_id]
+    async with AsyncSessionLocal() as session:
+        return list((await session.execute(
+            select(Project.id).where(Project.is_deleted == False).order_by(Project.id)
+        )).scalars())
+
+
+async def run_dedup(project_id: Optional[int], dry_run: bool) -> None:
+    """补算缺失的签名后按项目聚类，dry_run 时只输出聚类结果"""
+    from app.services.test_case_dedup_service import TestCaseDedupService
+
+    for current in await _project_ids(project_id):
+        async with AsyncSessionLocal() as session:
+            service = TestCaseDedupService(session)
+            backfilled = await service.backfill(current)
+            clusters = await service.cluster(current, apply=not dry_run)
+        duplicates = sum(len(members) - 1 for members in clusters)
+        print(f"项目 {current}: 补算签名 {backfilled} 条，重复聚类 {len(clusters)} 个，重复用例 {duplicates} 条")
+        if dry_run:
+            for members in clusters:
+                print(f"  保留 {members[0]}，重复 {members[1:]}")
+
+
+async def run_vector_index(project_id: Optional[int]) -> None:
+    """按数据库重建项目的向量索引"""
+    from app.services.vector_index_service import VectorIndexService
+
+    for current in await _project_ids(project_id):
+        async with AsyncSessionLocal() as session:
+            count = await VectorIndexService(session).rebuild(current)
+        print(f"项目 {current}: 已索引 {count} 条用例 / 需求")
+
+
+async def run_coverage(project_id: Optional[int]) -> None:
+    """从源表重新汇总项目的需求覆盖数据（上线初始化或对账）"""
+    from app.core.database import SessionLocal
+    from app.services.coverage_service import CoverageService
+
+    for current in await _project_ids(project_id):
+        with SessionLocal() as db:
+            count = await asyncio.to_thread(CoverageService(db).rebuild, current)
+        print(f"项目 {current}: 已汇总 {count} 个需求")
+
+
+async def run_plan_stats(project_id: Optional[int]) -> None:
+    """按执行记录对账测试计划统计，修正漂移"""
+    from app.core.database import SessionLocal
+    from app.services.test_plan_stats_service import TestPlanStatsService
+
+    with SessionLocal() as db:
+        corrected = await asyncio.to_thread(TestPlanStatsService(db).reconcile, project_id)
+    print(f"已修正 {len(corrected)} 个测试计划的统计" + (f": {corrected}" if corrected else ""))
+
+
+async def run_project_counters(project_id: Optional[int], offline: bool) -> None:
+    """取出缓冲中的计数增量并按源表对账项目计数，修正漂移"""
+    from app.core.database import SessionLocal
+    from app.services.project_counter_service import ProjectCounterService
+
+    project_ids = [project_id] if project_id is not None else None
+    with SessionLocal() as db:
+        try:
+            corrected = await asyncio.to_thread(ProjectCounterService(db).reconcile, project_ids, offline)
+        except ValueError as exc:
+            print(exc)
+            return
+    print(f"已修正 {len(corrected)} 个项目的计数" + (f": {corrected}" if corrected else ""))
+
+
+async def run_execution_partitions(months_ahead: Optional[int]) -> None:
+    """创建当月及未来几个月缺少的执行记录分区"""
+    from app.core.database import SessionLocal
+    from app.services.test_execution_archive_service import TestExecutionArchiveService
+
+    with SessionLocal() as db:
+        created = await asyncio.to_thread(TestExecutionArchiveService(db).ensure_partitions, months_ahead)
+    print(f"已创建 {len(created)} 个分区" + (f": {created}" if created else ""))
+
+
+async def run_execution_archive(retention_months: Optional[int], archive_format: Optional[str], dry_run: bool) -> None:
+    """摘除早于保留期的执行记录分区并导出为压缩文件，dry_run 时只列出待归档的分区"""
+    from app.core.database import SessionLocal
+    from app.services.test_execution_archive_service import TestExecutionArchiveService
+
+    with SessionLocal() as db:
+        manifests = await asyncio.to_thread(
+            TestExecutionArchiveService(db).archive, retention_months, None, archive_format, dry_run
+        )
+    for manifest in manifests:
+        if dry_run:
+            print(f"待归档 {manifest['partition']}（{manifest['month']}）")
+        else:
+            print(f"已归档 {manifest['partition']}: {manifest['rows']} 行 -> {manifest['file']}（{manifest['bytes']} 字节）")
+    if not manifests:
+        print("没有需要归档的分区")
+
+
+async def run_flakiness(full: bool) -> None:
+    """按新增执行记录增量计算用例不稳定性，full 时清空后全量重算"""
+    from app.core.database import SessionLocal
+    from app.services.coverage_service import coverage_refresher
+    from app.services.test_flakiness_service import TestFlakinessService
+
+    with SessionLocal() as db:
+        summary = await asyncio.to_thread(TestFlakinessService(db).analyze, full)
+    # 进程退出前刷新不稳定判定变化的需求覆盖汇总
+    await asyncio.to_thread(coverage_refresher.flush)
+    print(
+        f"已处理 {summary['executions']} 条执行记录，更新 {summary['test_cases']} 个用例，"
+        f"其中不稳定 {summary['flaky_cases']} 个，处理进度 {summary['last_execution_id']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="维护任务")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    dedup_parser = subparsers.add_parser("dedup", help="补算测试用例签名并聚类近似重复用例")
+    dedup_parser.add_argument("--project-id", type=int, default=None, help="只处理指定项目，默认全部项目")
+    dedup_parser.add_argument("--dry-run", action="store_true", help="只输出聚类结果，不更新 duplicate_of_id")
+
+    vector_parser = subparsers.add_parser("vector-index", help="重建测试用例与需求的向量索引")
+    vector_parser.add_argument("--project-id", type=int, default=None, help="只处理指定项目，默认全部项目")
+
+    coverage_parser = subparsers.add_parser("coverage", help="重新汇总需求覆盖数据")
+    coverage_parser.add_argument("--project-id", type=int, default=None, help="只处理指定项目，默认全部项目")
+
+    plan_stats_parser = subparsers.add_parser("plan-stats", help="按执行记录校正测试计划统计")
+    plan_stats_parser.add_argument("--project-id", type=int, default=None, help="只处理指定项目，默认全部项目")
+
+    counters_parser = subparsers.add_parser("project-counters", help="按源表校正项目的需求 / 用例 / 缺陷数")
+    counters_parser.add_argument("--project-id", type=int, default=None, help="只处理指定项目，默认全部项目")
+    counters_parser.add_argument("--offline", action="store_true", help="使用内存缓冲时必须指定：应用已停止，没有未写入的增量")
+
+    partitions_parser = subparsers.add_parser("execution-partitions", help="预建执行记录的未来月分区")
+    partitions_parser.add_argument("--months-ahead", type=int, default=None, help="提前创建的月数，默认按配置")
+
+    archive_parser = subparsers.add_parser("execution-archive", help="归档早于保留期的执行记录分区")
+    archive_parser.add_argument("--retention-months", type=int, default=None, help="在线保留的月数（含当月），默认按配置")
+    archive_parser.add_argument("--format", choices=("csv", "parquet"), default=None, help="归档格式，默认按配置")
+    archive_parser.add_argument("--dry-run", action="store_true", help="只列出待归档的分区")
+
+    flakiness_parser = subparsers.add_parser("flakiness", help="按新增执行记录计算用例不稳定性")
+    flakiness_parser.add_argument("--full", action="store_true", help="清空汇总表后按全部执行记录重算")
+
+    args = parser.parse_args()
+    setup_logging()
+    try:
+        if args.command == "dedup":
+            asyncio.run(run_dedup(args.project_id, args.dry_run))
+        elif args.command == "vector-index":
+            asyncio.run(run_vector_index(args.project_id))
+        elif args.command == "coverage":
+            asyncio.run(run_coverage(args.project_id))
+        elif args.command == "plan-stats":
+            asyncio.run(run_plan_stats(args.project_id))
+        elif args.command == "project-counters":
+            asyncio.run(run_project_counters(args.project_id, args.offline))
+        elif args.command == "execution-partitions":
+            asyncio.run(run_execution_partitions(args.months_ahead))
+        elif args.command == "execution-archive":
+            asyncio.run(run_execution_archive(args.retention_months, args.format, args.dry_run))
+        elif args.command == "flakiness":
+            asyncio.run(run_flakiness(args.full))
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+需求章节差异测试
+"""
+from app.utils.requirement_diff import diff_sections, split_sections
+
+
+def _changes(old_criteria: str, new_criteria: str):
+    changes = diff_sections(split_sections("", old_criteria), split_sections("", new_criteria))
+    return [
+        (change.kind, change.old.text if change.old else None, change.new.text if change.new else None)
+        for change in changes
+    ]
+
+
+def test_numbered_item_inserted_keeps_later_items_unchanged():
+    changes = _changes("1. 能登录\n2. 能注册\n3. 能注销", "1. 能找回\n2. 能登录\n3. 能注册\n4. 能注销")
+
+    assert changes == [
+        ("added", None, "1. 能找回"),
+        ("unchanged", "1. 能登录", "2. 能登录"),
+        ("unchanged", "2. 能注册", "3. 能注册"),
+        ("unchanged", "3. 能注销", "4. 能注销"),
+    ]
+
+
+def test_numbered_item_removed_keeps_later_items_unchanged():
+    changes = _changes("1. 能找回\n2. 能登录\n3. 能注册\n4. 能注销", "1. 能登录\n2. 能注册\n3. 能注销")
+
+    assert changes == [
+        ("removed", "1. 能找回", None),
+        ("unchanged", "2. 能登录", "1. 能登录"),
+        ("unchanged", "3. 能注册", "2. 能注册"),
+        ("unchanged", "4. 能注销", "3. 能注销"),
+    ]
+
+
+def test_renumbered_unchanged_items_are_renamed():
+    old = split_sections("", "1. 能登录\n2. 能注册")
+    new = split_sections("", "1. 能找回\n2. 能登录\n3. 能注册")
+
+    renamed = {change.old.key: change.new.key for change in diff_sections(old, new) if change.renamed}
+
+    assert renamed == {"验收标准 §1": "验收标准 §2", "验收标准 §2": "验收标准 §3"}
+
+
+def test_numbered_item_edited_is_modified():
+    changes = _changes("1. 能登录\n2. 能注册", "1. 能登录\n2. 能用手机号注册")
+
+    assert changes == [
+        ("unchanged", "1. 能登录", "1. 能登录"),
+        ("modified", "2. 能注册", "2. 能用手机号注册"),
+    ]
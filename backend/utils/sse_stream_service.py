@@ -7,18 +7,22 @@ from typing import AsyncGenerator, Any, Optional, Dict, Literal
 from pydantic import BaseModel, Field
 from datetime import datetime
 import json
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 
 class SSEMessage(BaseModel):
     """SSE 消息模型"""
-    type: Literal["status", "chunk", "message", "agent_start", "agent_message", "agent_done", "done", "error"]
+    type: Literal["status", "chunk", "message", "agent_start", "agent_message", "agent_done", "test_case", "done", "error"]
     content: str
     session_id: Optional[str] = Field(None, description="会话 ID")
     agent_name: Optional[str] = Field(None, description="智能体名称")
     timestamp: Optional[str] = Field(None, description="时间戳")
     done: bool = Field(False, description="是否完成")
     id: Optional[str] = Field(None, description="消息 ID")
+    data: Optional[Dict[str, Any]] = Field(None, description="结构化数据（如 test_case 事件的用例）")
 
     def to_sse_format(self) -> str:
         """转换为 SSE 格式"""
@@ -120,6 +124,19 @@ class SSEStreamService:
         )
         return message.to_sse_format()
     
+    def create_test_case_message(self, test_case: Dict[str, Any], agent_name: Optional[str] = None) -> str:
+        """创建测试用例消息（流式解析出一条完整用例时发送）"""
+        message = SSEMessage(
+            type="test_case",
+            content=test_case.get("title", ""),
+            session_id=self.session_id,
+            agent_name=agent_name,
+            timestamp=datetime.now().isoformat(),
+            id=str(uuid.uuid4()),
+            data=test_case
+        )
+        return message.to_sse_format()
+    
     def create_done_message(self, content: str = "") -> str:
         """创建完成消息"""
         message = SSEMessage(
@@ -232,7 +249,7 @@ class SSEStreamService:
                 
                 # 检查是否是 TaskResult（最终结果）
                 if event_type == 'TaskResult':
-                    print(f"🏁 团队对话结束，消息总数: {self.message_count}")
+                    logger.info("团队对话结束，消息总数: %d", self.message_count)
                     yield self.create_done_message()
                     yield "data: [DONE]\n\n"
                     return